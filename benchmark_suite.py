@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+性能测试套件
+对不同规模的测试数据库（synthetic_data 生成）测量刷新、保存、删除、复制密钥等操作的数据库耗时，
+可选在虚拟显示（Xvfb）下测量主窗口表格刷新和编辑往返；结果写为 JSON，可与其他版本的结果对比
+"""
+
+import contextlib
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import vault_db
+from profiling import OperationStats, environment
+from row_store import KeyRow, RowStore, ROW_QUERY
+from synthetic_data import fill_vault, parse_count
+
+# 测试数据库目录
+BENCH_DIR = "benchmarks"
+
+# 默认测试规模和每个操作的重复次数
+BENCH_SIZES = "1k,10k,100k"
+BENCH_REPEAT = 20
+
+# 结果文件格式
+RESULT_FORMAT = "apikey-manager-benchmark"
+RESULT_VERSION = 1
+
+# 界面测试时推迟健康检查、目录同步和备份（毫秒），避免测试期间访问网络
+GUI_TIMER_DELAY_MS = 24 * 60 * 60 * 1000
+
+# 等待界面操作完成的超时（秒）
+GUI_WAIT_TIMEOUT = 120
+
+def time_operation(stats: Dict[str, OperationStats], name: str, fn: Callable, *args):
+    """执行一次操作并记录耗时，返回操作结果"""
+    started = time.perf_counter()
+    result = fn(*args)
+    stats.setdefault(name, OperationStats()).add(time.perf_counter() - started)
+    return result
+
+def summarize(stats: Dict[str, OperationStats]) -> Dict[str, Dict[str, float]]:
+    return {name: item.summary() for name, item in stats.items()}
+
+def prepare_vault(count: int, seed: int = 0, directory: str = BENCH_DIR) -> str:
+    """准备 count 条记录的测试数据库（已存在且记录数一致时直接使用）"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"vault-{count}-{seed}.db")
+    if os.path.exists(path):
+        con = vault_db.connect(path)
+        try:
+            existing = con.execute("SELECT COUNT(*) FROM api_keys").fetchone()[0]
+        finally:
+            con.close()
+        if existing == count:
+            return path
+        os.remove(path)
+    print(f"生成 {count} 条测试数据...", file=sys.stderr)
+    fill_vault(path, count, seed)
+    return path
+
+def sample_ids(db_file: str, count: int, seed: int) -> List[int]:
+    """随机选取 count 个已有记录的ID"""
+    con = vault_db.connect(db_file)
+    try:
+        ids = [row[0] for row in con.execute("SELECT id FROM api_keys")]
+    finally:
+        con.close()
+    return random.Random(seed).sample(ids, min(count, len(ids)))
+
+# ---------- 数据库操作 ----------
+
+def load_rows(db_file: str, order_by: str = "ORDER BY id") -> List[KeyRow]:
+    """与主窗口刷新相同：读取全部记录生成行缓存"""
+    con = vault_db.connect(db_file)
+    try:
+        return [KeyRow(*row) for row in con.execute(f"{ROW_QUERY} {order_by}")]
+    finally:
+        con.close()
+
+def fetch_for_edit(db_file: str, key_id: int):
+    """与打开编辑对话框相同：读取完整记录"""
+    con = vault_db.connect(db_file)
+    try:
+        return vault_db.read_key(con, key_id)
+    finally:
+        con.close()
+
+def read_record(db_file: str, key_id: int) -> Dict[str, str]:
+    con = vault_db.connect(db_file)
+    try:
+        return vault_db.get_keys(con, [key_id])[0]
+    finally:
+        con.close()
+
+def save_new(db_file: str, record: Dict[str, str]) -> int:
+    """与对话框保存新密钥相同"""
+    con = vault_db.connect(db_file)
+    try:
+        key_id = vault_db.insert_key(con, *(record[field] for field in vault_db.KEY_FIELDS))
+        con.commit()
+        return key_id
+    finally:
+        con.close()
+
+def save_existing(db_file: str, key_id: int, record: Dict[str, str], version: int = None):
+    """与对话框保存修改相同（按读取时的行版本条件更新）"""
+    con = vault_db.connect(db_file)
+    try:
+        vault_db.update_key(con, key_id, *(record[field] for field in vault_db.KEY_FIELDS),
+                            expected_version=version)
+        con.commit()
+    finally:
+        con.close()
+
+def delete_key(db_file: str, key_id: int) -> int:
+    con = vault_db.connect(db_file)
+    try:
+        return vault_db.delete_keys(con, [key_id])
+    finally:
+        con.close()
+
+def copy_api_keys(db_file: str, ids: List[int]) -> List[str]:
+    """与复制密钥相同：一次查询读取选中记录的密钥"""
+    con = vault_db.connect(db_file)
+    try:
+        return [record["api_key"] for record in vault_db.get_keys(con, ids)]
+    finally:
+        con.close()
+
+def bench_database(db_file: str, repeat: int = BENCH_REPEAT, seed: int = 0) -> Dict[str, Dict[str, float]]:
+    """测量各数据库操作；新增的记录测量删除时移除，数据库记录数保持不变"""
+    from synthetic_data import generate_records
+    
+    stats: Dict[str, OperationStats] = {}
+    ids = sample_ids(db_file, repeat, seed)
+    con = vault_db.connect(db_file)
+    try:
+        vault_db.init_schema(con)
+        con.commit()
+        next_index = con.execute("SELECT MAX(id) FROM api_keys").fetchone()[0] + 1
+    finally:
+        con.close()
+    # 与已有记录不重复的新记录，以及修改时使用的内容
+    new_records = list(generate_records(repeat, seed + 1, next_index * 2))
+    
+    for _ in range(max(3, repeat // 5)):
+        time_operation(stats, "refresh_data.load", load_rows, db_file)
+        time_operation(stats, "refresh_data.load_sorted", load_rows, db_file,
+                       f"ORDER BY {vault_db.sort_expression('vendor')} DESC, id DESC")
+    for key_id, record in zip(ids, new_records):
+        loaded = time_operation(stats, "edit.fetch", fetch_for_edit, db_file, key_id)
+        time_operation(stats, "copy_api_key", copy_api_keys, db_file, [key_id])
+        original = read_record(db_file, key_id)
+        time_operation(stats, "save.update", save_existing, db_file, key_id,
+                       dict(original, notes=record["notes"]), loaded[-1])
+    time_operation(stats, "copy_api_key.batch", copy_api_keys, db_file, ids)
+    added = [time_operation(stats, "save.insert", save_new, db_file, record) for record in new_records]
+    for key_id in added:
+        time_operation(stats, "delete_key", delete_key, db_file, key_id)
+    
+    store = RowStore()
+    store.load(load_rows(db_file))
+    terms = ("openai", "生产环境 限速", "claude sonnet", "#12")
+    for _ in range(max(1, repeat // len(terms))):
+        store.search_index = None
+        time_operation(stats, "filter.first", store.filter, store, terms[0])
+        for term in terms[1:]:
+            time_operation(stats, "filter", store.filter, store, term)
+    return summarize(stats)
+
+# ---------- 界面操作 ----------
+
+@contextlib.contextmanager
+def virtual_display():
+    """提供可用的显示：Windows/macOS 或已设置 DISPLAY 时直接使用，否则启动 Xvfb"""
+    if os.name == "nt" or sys.platform == "darwin" or os.environ.get("DISPLAY"):
+        yield
+        return
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        raise RuntimeError("没有可用的显示：请设置 DISPLAY 或安装 Xvfb")
+    read_fd, write_fd = os.pipe()
+    process = subprocess.Popen([xvfb, "-displayfd", str(write_fd), "-screen", "0", "1600x1000x24",
+                                "-nolisten", "tcp"], pass_fds=(write_fd,),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.close(write_fd)
+    try:
+        with os.fdopen(read_fd) as pipe:
+            display = pipe.readline().strip()
+        if not display:
+            raise RuntimeError("Xvfb 启动失败")
+        os.environ["DISPLAY"] = f":{display}"
+        yield
+    finally:
+        os.environ.pop("DISPLAY", None)
+        process.terminate()
+        process.wait()
+
+@contextlib.contextmanager
+def auto_confirm(messagebox):
+    """测试期间提示框直接返回（确认类提示视为“是”）"""
+    names = ("showinfo", "showwarning", "showerror", "askyesno", "askyesnocancel")
+    saved = {name: getattr(messagebox, name) for name in names}
+    for name in names:
+        setattr(messagebox, name, (lambda *args, **kwargs: True) if name.startswith("ask")
+                else (lambda *args, **kwargs: None))
+    try:
+        yield
+    finally:
+        for name, fn in saved.items():
+            setattr(messagebox, name, fn)
+
+def wait_until(root, condition: Callable[[], bool], timeout: float = GUI_WAIT_TIMEOUT):
+    """处理界面事件直到条件成立"""
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("等待界面操作超时")
+        root.update()
+        time.sleep(0.001)
+
+def bench_gui(db_file: str, repeat: int = BENCH_REPEAT, seed: int = 0) -> Dict[str, Dict[str, float]]:
+    """在真实窗口中测量：启动到表格加载完成、刷新、打开编辑并保存、复制、删除、筛选"""
+    import gui_apikey_manager as gui
+    from synthetic_data import generate_records
+    
+    gui.DB_FILE = db_file
+    for name in ("HEALTH_CHECK_INITIAL_DELAY_MS", "CATALOG_SYNC_DELAY_MS", "BACKUP_INITIAL_DELAY_MS"):
+        setattr(gui, name, GUI_TIMER_DELAY_MS)
+    stats: Dict[str, OperationStats] = {}
+    ids = sample_ids(db_file, repeat, seed)
+    
+    with auto_confirm(gui.messagebox):
+        started = time.perf_counter()
+        app = gui.APIKeyManager()
+        root = app.root
+        try:
+            wait_until(root, lambda: len(app.row_store) > 0 and app.refresh_task is None)
+            stats["startup"] = OperationStats()
+            stats["startup"].add(time.perf_counter() - started)
+            
+            def refresh():
+                done = []
+                app.refresh_data(on_loaded=lambda: done.append(True))
+                wait_until(root, lambda: done)
+            
+            def select(key_id):
+                app.tree.selection_set(str(key_id))
+                app.tree.see(str(key_id))
+            
+            def edit(key_id, notes):
+                select(key_id)
+                app.edit_key()
+                app.edit_dialog.notes_field.set_value(notes)
+                app.edit_dialog.save()
+                wait_until(root, lambda: app.refresh_task is None)
+            
+            def delete(key_id):
+                select(key_id)
+                app.delete_key()
+                wait_until(root, lambda: str(key_id) not in app.row_store)
+            
+            def apply_filter(text):
+                app.filter_var.set(text)
+                app.apply_filter()
+                root.update_idletasks()
+            
+            for _ in range(max(3, repeat // 5)):
+                time_operation(stats, "refresh_data", refresh)
+            for index, key_id in enumerate(ids):
+                time_operation(stats, "edit_round_trip", edit, key_id, f"性能测试修改 {index}")
+                time_operation(stats, "copy_api_key", lambda: (select(key_id), app.copy_api_key()))
+            
+            next_index = max(row.id for row in app.row_store) + 1
+            added = [save_new(db_file, record) for record in generate_records(repeat, seed + 2, next_index * 3)]
+            refresh()
+            for key_id in added:
+                time_operation(stats, "delete_key", delete, key_id)
+            
+            for text in ("openai", "生产环境 限速", "claude sonnet", "#12"):
+                time_operation(stats, "filter", apply_filter, text)
+                time_operation(stats, "filter.clear", apply_filter, "")
+        finally:
+            root.destroy()
+    return summarize(stats)
+
+# ---------- 结果 ----------
+
+def git_revision() -> Optional[str]:
+    """当前代码版本（不在 git 仓库中时为 None）"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(sizes: List[int], repeat: int = BENCH_REPEAT, seed: int = 0, gui: bool = False,
+              directory: str = BENCH_DIR) -> Dict:
+    """按规模依次测试，返回结果（可直接写为 JSON）"""
+    result = {
+        "format": RESULT_FORMAT,
+        "version": RESULT_VERSION,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "revision": git_revision(),
+        "environment": environment(),
+        "repeat": repeat,
+        "seed": seed,
+        "sizes": {}
+    }
+    for size in sizes:
+        db_file = prepare_vault(size, seed, directory)
+        entry = {"database": bench_database(db_file, repeat, seed),
+                 "file_bytes": os.path.getsize(db_file)}
+        if gui:
+            try:
+                with virtual_display():
+                    entry["gui"] = bench_gui(db_file, repeat, seed)
+            except Exception as e:  # 没有显示或界面出错时只记录原因，数据库结果照常输出
+                entry["gui_error"] = f"{type(e).__name__}: {e}"
+        result["sizes"][str(size)] = entry
+        print(f"{size} 条记录测试完成", file=sys.stderr)
+    return result
+
+def iter_operations(result: Dict):
+    """遍历结果中的 (规模, 分组, 操作, 汇总)"""
+    for size, entry in result.get("sizes", {}).items():
+        for group in ("database", "gui"):
+            for name, summary in entry.get(group, {}).items():
+                yield size, group, name, summary
+
+def format_result(result: Dict, baseline: Dict = None) -> str:
+    """结果表格；给出基准结果时附上中位数的变化"""
+    previous = {(size, group, name): summary for size, group, name, summary in iter_operations(baseline or {})}
+    lines = [f"{'规模':>8} {'分组':<9}{'操作':<26}{'p50ms':>10}{'p95ms':>10}{'最大ms':>10}"
+             + (f"{'基准p50':>10}{'变化':>9}" if baseline else "")]
+    for size, group, name, summary in iter_operations(result):
+        line = (f"{size:>8} {group:<9}{name:<26}{summary['p50_ms']:>10.2f}{summary['p95_ms']:>10.2f}"
+                f"{summary['max_ms']:>10.2f}")
+        old = previous.get((size, group, name))
+        if old and old["p50_ms"]:
+            line += f"{old['p50_ms']:>10.2f}{(summary['p50_ms'] / old['p50_ms'] - 1) * 100:>+8.0f}%"
+        lines.append(line)
+    for size, entry in result.get("sizes", {}).items():
+        if "gui_error" in entry:
+            lines.append(f"{size:>8} 界面测试未运行: {entry['gui_error']}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    
+    parser = argparse.ArgumentParser(description="API Key Manager 性能测试")
+    parser.add_argument("--sizes", default=BENCH_SIZES, help=f"测试规模，逗号分隔（默认 {BENCH_SIZES}，最大可到 1m）")
+    parser.add_argument("--repeat", type=int, default=BENCH_REPEAT, help="每个操作的重复次数")
+    parser.add_argument("--seed", type=int, default=0, help="测试数据的随机种子")
+    parser.add_argument("--gui", action="store_true", help="同时测量界面操作（无显示时自动启动 Xvfb）")
+    parser.add_argument("--dir", default=BENCH_DIR, help="测试数据库目录")
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    parser.add_argument("--compare", metavar="JSON", help="与之前保存的结果对比")
+    args = parser.parse_args()
+    
+    suite_result = run_suite([parse_count(size) for size in args.sizes.split(",")], args.repeat, args.seed,
+                             args.gui, args.dir)
+    baseline_result = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline_result = json.load(f)
+    print(format_result(suite_result, baseline_result))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(suite_result, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+模型列表流式解析模块
+/models 接口的响应（聚合网关的完整目录可达数 MB）按网络数据块增量解析：定位目标数组后逐个解析其中的元素，
+由调用方边读边筛选、只保留需要的字段，整份响应和完整的对象树不会同时出现在内存中。
+缓冲区只保存当前未解析完的一个元素，超过上限时报错，峰值内存与响应大小无关
+"""
+
+import codecs
+import json
+import re
+from typing import Any, Iterable, Iterator
+
+# 每次从网络读取的字节数
+CATALOG_CHUNK_SIZE = 64 * 1024
+
+# 单个元素（以及跳过的非目标字段）的最大长度（字符）
+CATALOG_MAX_ITEM_SIZE = 1024 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# 直接调用解码器的 C 扫描函数（省去 raw_decode 的包装开销）；值不完整时抛出 JSONDecodeError 或 StopIteration
+_SCAN = json.JSONDecoder().scan_once
+
+class CatalogStreamError(ValueError):
+    """响应不是合法的 JSON，或单个元素超过长度上限"""
+
+class _Reader:
+    """在按块到达的文本上逐个解析 JSON 值"""
+    
+    def __init__(self, chunks: Iterable[bytes]):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+    
+    def fill(self) -> bool:
+        """丢弃已解析的部分并追加下一块数据；没有更多数据时返回 False"""
+        if self.eof:
+            return False
+        if len(self.buffer) - self.pos > CATALOG_MAX_ITEM_SIZE:
+            raise CatalogStreamError(f"单个元素超过 {CATALOG_MAX_ITEM_SIZE} 字符")
+        text = ""
+        for chunk in self.chunks:
+            text = self.decoder.decode(chunk)
+            if text:
+                break
+        else:
+            text = self.decoder.decode(b"", final=True)
+            self.eof = True
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return bool(text) or not self.eof
+    
+    def peek(self) -> str:
+        """跳过空白，返回下一个字符（数据结束时返回空串）"""
+        if self.pos < len(self.buffer) and self.buffer[self.pos] not in " \t\n\r":
+            return self.buffer[self.pos]
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+    
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise CatalogStreamError(f"缺少 {char!r}")
+        self.pos += 1
+    
+    def value(self) -> Any:
+        """解析下一个完整的值（数据不完整时继续读取）"""
+        if self.pos >= len(self.buffer) or self.buffer[self.pos] in " \t\n\r":
+            self.peek()
+        while True:
+            try:
+                value, end = _SCAN(self.buffer, self.pos)
+            except (json.JSONDecodeError, StopIteration) as e:
+                if not self.fill():
+                    raise CatalogStreamError(f"JSON 格式错误: {e if isinstance(e, ValueError) else '缺少值'}") from None
+                continue
+            # 只有数字不自带结束符：结束在缓冲区末尾附近时可能被截断（如 12|34、1.5e|3），读入下一块后重新解析
+            if end + 2 >= len(self.buffer) and type(value) in (int, float) and not self.eof:
+                self.fill()
+                continue
+            self.pos = end
+            return value
+    
+    def array(self) -> Iterator[Any]:
+        """逐个返回数组（当前位置为 "["）的元素"""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            # 元素之后通常紧跟 ","（及一个空格），直接跳过
+            buffer, pos = self.buffer, self.pos
+            if buffer[pos:pos + 1] == ",":
+                self.pos = pos + 2 if buffer[pos + 1:pos + 2] == " " else pos + 1
+                continue
+            char = self.peek()
+            self.pos += 1
+            if char == "]":
+                return
+            if not char:
+                raise CatalogStreamError("响应不完整")
+            if char != ",":
+                raise CatalogStreamError("数组元素之间缺少 ','")
+    
+    def drain(self):
+        """读完剩余数据（不解析），使连接可以放回连接池"""
+        for _ in self.chunks:
+            pass
+        self.buffer, self.pos, self.eof = "", 0, True
+
+def iter_items(chunks: Iterable[bytes], key: str) -> Iterator[Any]:
+    """
+    逐个返回响应中顶层字段 key 的数组元素（响应本身是数组时返回其元素）；
+    其他顶层字段解析后直接丢弃，找不到该字段时不返回任何元素
+    """
+    reader = _Reader(chunks)
+    first = reader.peek()
+    if first == "[":
+        yield from reader.array()
+        reader.drain()
+        return
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        name = reader.value()
+        reader.expect(":")
+        if name == key and reader.peek() == "[":
+            yield from reader.array()
+            reader.drain()  # 目标数组之后通常只剩分页等少量字段
+            return
+        reader.value()
+        char = reader.peek()
+        reader.pos += 1
+        if char == "}":
+            return
+        if not char:
+            raise CatalogStreamError("响应不完整")
+        if char != ",":
+            raise CatalogStreamError("对象字段之间缺少 ','")
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    import tracemalloc
+    
+    def synthetic_chunks(count: int, chunk_size: int = CATALOG_CHUNK_SIZE) -> Iterator[bytes]:
+        """逐块生成聚合网关风格（带描述、价格、架构等元数据）的模型目录"""
+        pending = [b'{"object": "list", "data": [']
+        size = len(pending[0])
+        for index in range(count):
+            item = {
+                "id": f"{('openai/gpt', 'anthropic/claude', 'meta/llama', 'qwen/qwen')[index % 4]}-{index}",
+                "name": f"Model {index}",
+                "created": 1700000000 + index,
+                "description": "多语言通用对话模型，支持工具调用与结构化输出。" * 8,
+                "context_length": 128000,
+                "architecture": {"modality": "text+image->text", "input_modalities": ["text", "image"],
+                                 "output_modalities": ["text"], "tokenizer": "Other"},
+                "pricing": {"prompt": "0.000003", "completion": "0.000015", "image": "0", "request": "0"},
+                "top_provider": {"context_length": 128000, "max_completion_tokens": 8192, "is_moderated": False},
+                "supported_parameters": ["tools", "tool_choice", "temperature", "top_p", "max_tokens",
+                                         "response_format", "structured_outputs", "seed", "stop"]
+            }
+            data = (b"," if index else b"") + json.dumps(item, ensure_ascii=False).encode("utf-8")
+            pending.append(data)
+            size += len(data)
+            if size >= chunk_size:
+                joined = b"".join(pending)
+                pending, size = [joined[chunk_size:]], len(joined) - chunk_size
+                yield joined[:chunk_size]
+        yield b"".join(pending) + b'], "has_more": false}'
+    
+    def measure(label: str, run) -> int:
+        tracemalloc.start()
+        started = time.perf_counter()
+        kept = run()
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{label:<10}保留 {kept} 个模型，用时 {elapsed * 1000:8.1f} ms，内存峰值 {peak / 1024 / 1024:7.2f} MiB")
+        return peak
+    
+    parser = argparse.ArgumentParser(description="比较整体解析和流式解析模型目录的内存峰值")
+    parser.add_argument("--items", type=int, default=20000, help="生成的模型数（默认 20000，约 22 MB）")
+    parser.add_argument("--match", default="gpt", help="保留 id 中包含该文本的模型")
+    args = parser.parse_args()
+    
+    total = sum(len(chunk) for chunk in synthetic_chunks(args.items))
+    print(f"目录大小 {total / 1024 / 1024:.1f} MiB，{args.items} 个模型")
+    
+    def whole():
+        data = json.loads(b"".join(synthetic_chunks(args.items)))
+        return len([item["id"] for item in data.get("data", []) if args.match in item.get("id", "")])
+    
+    def streamed():
+        return len([item["id"] for item in iter_items(synthetic_chunks(args.items), "data")
+                    if args.match in item.get("id", "")])
+    
+    before = measure("整体解析", whole)
+    after = measure("流式解析", streamed)
+    print(f"内存峰值降为 {after / before:.1%}")
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+厂商目录同步模块
+用数据库中保存的密钥并发获取各厂商的最新模型列表，与 vendor_models_config.json 对比；
+只有发生变化时才原子地重写配置文件，并把变化追加到精简的历史记录中
+"""
+
+import json
+import os
+import tempfile
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import vault_db
+from task_runner import batch_runner
+from vendor_catalog import vendor_catalog, VendorCatalog
+
+# 目录变化历史（每行一条 JSON 记录）
+HISTORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vendor_models_history.jsonl")
+
+# 同时同步的最大厂商数（线程来自批处理通道）
+SYNC_MAX_WORKERS = 4
+
+# 目录超过该时间（秒）未更新时，启动后自动同步
+SYNC_MAX_AGE_SECONDS = 24 * 60 * 60
+
+class VendorChange(NamedTuple):
+    """单个厂商的模型变化"""
+    vendor: str
+    added: List[str]
+    removed: List[str]
+
+def compute_diff(current: List[str], fetched: List[str]) -> Tuple[List[str], List[str]]:
+    """对比当前模型与获取到的模型，返回 (新增, 移除)"""
+    current_set, fetched_set = set(current), set(fetched)
+    added = sorted(fetched_set - current_set)
+    removed = sorted(current_set - fetched_set)
+    return added, removed
+
+def merge_models(current: List[str], added: List[str], removed: List[str]) -> List[str]:
+    """保持原有顺序：删除移除的模型，新增模型追加到末尾"""
+    removed_set = set(removed)
+    return [m for m in current if m not in removed_set] + added
+
+def write_json_atomic(path: str, data: Dict):
+    """先写入同目录的临时文件再替换，避免读取方看到写了一半的文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".vendor_models_", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def catalog_age_seconds(catalog: VendorCatalog = vendor_catalog) -> float:
+    """距离目录上次更新的秒数（无法解析时视为很久以前）"""
+    try:
+        updated = time.mktime(time.strptime(catalog.last_updated, "%Y-%m-%d %H:%M:%S"))
+    except (TypeError, ValueError):
+        return float("inf")
+    return time.time() - updated
+
+class CatalogSync:
+    """厂商目录同步任务"""
+    
+    def __init__(self, db_file: str = vault_db.DB_FILE, catalog: VendorCatalog = vendor_catalog,
+                 history_file: str = HISTORY_FILE, max_workers: int = SYNC_MAX_WORKERS):
+        self.db_file = db_file
+        self.catalog = catalog
+        self.history_file = history_file
+        self.max_workers = max_workers
+    
+    def pick_keys(self) -> Dict[str, tuple]:
+        """
+        每个有模型列表接口的厂商挑选一个使用官方地址的密钥（优先使用最近验证有效的）；
+        代理、网关的地址返回的是它们自己的模型集合，不能代表厂商目录
+        """
+        from model_fetcher import model_fetcher
+        
+        con = vault_db.connect(self.db_file)
+        try:
+            rows = con.execute("""
+                SELECT vendor, api_key, api_url FROM api_keys
+                ORDER BY vendor, health_status = 'ok' DESC, health_checked_at DESC, id
+            """).fetchall()
+        finally:
+            con.close()
+        
+        keys = {}
+        for vendor, api_key, api_url in rows:
+            if (vendor not in keys and vendor in self.catalog.vendor_models and model_fetcher.has_listing(vendor)
+                    and model_fetcher.is_default_url(vendor, api_url)):
+                keys[vendor] = (api_key, None)
+        return keys
+    
+    def fetch_vendor(self, vendor: str, api_key: str, api_url: str) -> Optional[List[str]]:
+        """获取某厂商的模型列表；失败或结果不是接口的实际返回（提示文字、内置列表）时返回 None"""
+        from model_fetcher import SOURCE_LIVE, model_fetcher
+        
+        models = model_fetcher.get_models_for_vendor(vendor, api_key, api_url or None)
+        if models.source != SOURCE_LIVE or not models:
+            return None
+        return list(models)
+    
+    def collect_changes(self) -> Tuple[List[VendorChange], List[str]]:
+        """并发获取所有厂商，返回 (有变化的厂商, 获取失败的厂商)"""
+        keys = self.pick_keys()
+        changes, failed = [], []
+        if not keys:
+            return changes, failed
+        
+        def fetch(vendor):
+            try:
+                return vendor, self.fetch_vendor(vendor, *keys[vendor])
+            except Exception:
+                return vendor, None
+        
+        fetched_by_vendor = dict(batch_runner.imap_unordered(fetch, keys, parallelism=self.max_workers))
+        for vendor in keys:
+            fetched = fetched_by_vendor[vendor]
+            if fetched is None:
+                failed.append(vendor)
+                continue
+            added, removed = compute_diff(self.catalog.models_for(vendor), fetched)
+            if added or removed:
+                changes.append(VendorChange(vendor, added, removed))
+        return changes, failed
+    
+    def apply_changes(self, changes: List[VendorChange]) -> bool:
+        """把变化写入配置文件和历史记录；没有变化时不写任何文件"""
+        if not changes:
+            return False
+        
+        with open(self.catalog.path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        vendor_models = config.setdefault("vendor_models", {})
+        for change in changes:
+            vendor_models[change.vendor] = merge_models(vendor_models.get(change.vendor, []),
+                                                        change.added, change.removed)
+        updated_at = time.strftime("%Y-%m-%d %H:%M:%S")
+        config["last_updated"] = updated_at
+        write_json_atomic(self.catalog.path, config)
+        
+        with open(self.history_file, "a", encoding="utf-8") as f:
+            for change in changes:
+                entry = {"at": updated_at, "vendor": change.vendor}
+                if change.added:
+                    entry["+"] = change.added
+                if change.removed:
+                    entry["-"] = change.removed
+                f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+        # 目录由调用方（界面线程）通过 reload_if_changed 重新加载，监听者不会在后台线程中被调用
+        return True
+    
+    def run(self) -> Tuple[List[VendorChange], List[str]]:
+        """执行一次同步，返回 (有变化的厂商, 获取失败的厂商)"""
+        changes, failed = self.collect_changes()
+        self.apply_changes(changes)
+        return changes, failed
+
+if __name__ == "__main__":
+    changes, failed = CatalogSync().run()
+    for change in changes:
+        print(f"{change.vendor}: +{len(change.added)} -{len(change.removed)}")
+    if failed:
+        print(f"获取失败: {', '.join(failed)}")
+    if not changes:
+        print("厂商目录没有变化")
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+端点测速模块
+对保存的或候选的 API 地址多次测量 DNS 解析、TCP 连接、TLS 握手和首字节时间（取中位数），结果写入数据库；
+每个密钥可以保存多个备用地址（镜像/代理），按测速结果排名并自动选用最快的可用地址
+"""
+
+import socket
+import ssl
+import statistics
+import time
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+import vault_db
+from task_runner import batch_runner
+
+# 每个地址的测量次数和单次超时（秒）
+BENCH_SAMPLES = 5
+BENCH_TIMEOUT = 5.0
+
+# 同时测速的最大地址数（线程来自批处理通道；同一地址的多次测量按顺序进行）
+BENCH_MAX_WORKERS = 4
+
+# 测速结果有效期（秒），过期后才重新测量
+BENCH_TTL_SECONDS = 6 * 60 * 60
+
+# 视为可用的 /models 响应状态：2xx，或未带密钥时的 401/403（说明确实是 API 端点，而不是 404 页面、跳转或门户）
+HEALTHY_AUTH_STATUSES = {401, 403}
+
+def healthy_status(status: Optional[int]) -> bool:
+    return status is not None and (200 <= status < 300 or status in HEALTHY_AUTH_STATUSES)
+
+class Sample(NamedTuple):
+    """单次测量（毫秒）；失败时 error 非空"""
+    dns_ms: float
+    connect_ms: float
+    tls_ms: Optional[float]
+    ttfb_ms: float
+    total_ms: float
+    status: Optional[int]
+    error: str
+
+class BenchResult(NamedTuple):
+    """某个地址的测速结果（各阶段为成功样本的中位数）"""
+    url: str
+    dns_ms: Optional[float]
+    connect_ms: Optional[float]
+    tls_ms: Optional[float]
+    ttfb_ms: Optional[float]
+    total_ms: Optional[float]
+    status: Optional[int]
+    samples: int
+    failures: int
+    healthy: bool
+    error: str
+    measured_at: float
+
+def probe_target(url: str):
+    """解析测速目标：(主机, 端口, 是否TLS, 请求路径)。请求 <基础地址>/models，无需密钥也会得到响应"""
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError(f"无效的地址: {url}")
+    use_tls = parts.scheme == "https"
+    port = parts.port or (443 if use_tls else 80)
+    path = parts.path.rstrip("/") + "/models"
+    return parts.hostname, port, use_tls, path
+
+def measure_once(url: str, timeout: float = BENCH_TIMEOUT) -> Sample:
+    """测量一次：每个阶段单独计时，使用新连接以包含完整的握手开销"""
+    dns_ms = connect_ms = ttfb_ms = 0.0
+    tls_ms = None
+    start = time.perf_counter()
+    sock = None
+    try:
+        host, port, use_tls, path = probe_target(url)
+        
+        mark = time.perf_counter()
+        family, socktype, proto, _, address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0]
+        dns_ms = (time.perf_counter() - mark) * 1000
+        
+        mark = time.perf_counter()
+        sock = socket.socket(family, socktype, proto)
+        sock.settimeout(timeout)
+        sock.connect(address)
+        connect_ms = (time.perf_counter() - mark) * 1000
+        
+        if use_tls:
+            mark = time.perf_counter()
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+            tls_ms = (time.perf_counter() - mark) * 1000
+        
+        request = (f"GET {path} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: apikey-manager-bench\r\n"
+                   f"Accept: */*\r\nConnection: close\r\n\r\n")
+        mark = time.perf_counter()
+        sock.sendall(request.encode("ascii"))
+        first = sock.recv(1024)
+        ttfb_ms = (time.perf_counter() - mark) * 1000
+        if not first:
+            raise ConnectionError("连接被关闭，未收到响应")
+        
+        status_line = first.split(b"\r\n", 1)[0].split()
+        status = int(status_line[1]) if len(status_line) > 1 and status_line[1].isdigit() else None
+        total_ms = (time.perf_counter() - start) * 1000
+        return Sample(dns_ms, connect_ms, tls_ms, ttfb_ms, total_ms, status, "")
+    except (OSError, ValueError) as e:
+        total_ms = (time.perf_counter() - start) * 1000
+        return Sample(dns_ms, connect_ms, tls_ms, ttfb_ms, total_ms, None, str(e) or type(e).__name__)
+    finally:
+        if sock is not None:
+            sock.close()
+
+def _median(values: List[Optional[float]]) -> Optional[float]:
+    values = [v for v in values if v is not None]
+    return round(statistics.median(values), 2) if values else None
+
+def summarize(url: str, samples: List[Sample]) -> BenchResult:
+    """汇总多次测量：过半成功且 /models 返回 2xx 或 401/403 视为可用"""
+    ok = [s for s in samples if not s.error]
+    failures = len(samples) - len(ok)
+    statuses = [s.status for s in ok if s.status is not None]
+    status = statistics.median_low(statuses) if statuses else None
+    healthy = len(ok) * 2 > len(samples) and healthy_status(status)
+    error = next((s.error for s in samples if s.error), "")
+    return BenchResult(
+        url,
+        _median([s.dns_ms for s in ok]),
+        _median([s.connect_ms for s in ok]),
+        _median([s.tls_ms for s in ok]),
+        _median([s.ttfb_ms for s in ok]),
+        _median([s.total_ms for s in ok]),
+        status, len(samples), failures, healthy, error, time.time()
+    )
+
+def benchmark_url(url: str, samples: int = BENCH_SAMPLES, timeout: float = BENCH_TIMEOUT) -> BenchResult:
+    """对一个地址测量多次并汇总"""
+    return summarize(url, [measure_once(url, timeout) for _ in range(samples)])
+
+def rank_key(result: Optional[BenchResult]):
+    """排序键：可用的在前，再按总耗时；没有测速结果的排在最后"""
+    if result is None:
+        return 2, float("inf")
+    return (0 if result.healthy else 1), (result.total_ms if result.total_ms is not None else float("inf"))
+
+def default_url(vendor: str) -> str:
+    """厂商的默认API地址（未填写API URL时实际使用的地址），没有默认地址时返回空串"""
+    from model_fetcher import DEFAULT_BASE_URLS
+    return DEFAULT_BASE_URLS.get(vendor, "").rstrip("/")
+
+class EndpointBench:
+    """端点测速和备用地址选择"""
+    
+    def __init__(self, db_file: str = vault_db.DB_FILE, samples: int = BENCH_SAMPLES,
+                 timeout: float = BENCH_TIMEOUT, max_workers: int = BENCH_MAX_WORKERS,
+                 ttl: float = BENCH_TTL_SECONDS):
+        self.db_file = db_file
+        self.samples = samples
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.ttl = ttl
+    
+    def add_mirror(self, key_id: int, url: str):
+        """
+        为密钥添加备用地址；首次添加时把密钥当前的地址也加入候选
+        （未填写地址时加入厂商的默认地址，使其参与测速，只有更快的镜像才会替换它）
+        """
+        url = url.strip().rstrip("/")
+        con = vault_db.connect(self.db_file)
+        try:
+            row = con.execute("SELECT vendor, api_url FROM api_keys WHERE id = ?", (key_id,)).fetchone()
+            if row is None:
+                raise ValueError(f"密钥 #{key_id} 不存在")
+            urls = [url]
+            current = (row[1] or "").strip().rstrip("/") or default_url(row[0])
+            if current:
+                urls.insert(0, current)
+            con.executemany("""
+                INSERT OR IGNORE INTO key_mirrors (key_id, url, rank)
+                VALUES (?, ?, (SELECT COUNT(*) FROM key_mirrors WHERE key_id = ?))
+            """, [(key_id, u, key_id) for u in urls])
+            con.commit()
+        finally:
+            con.close()
+    
+    def remove_mirror(self, key_id: int, url: str):
+        """删除密钥的某个备用地址"""
+        con = vault_db.connect(self.db_file)
+        try:
+            con.execute("DELETE FROM key_mirrors WHERE key_id = ? AND url = ?", (key_id, url.strip().rstrip("/")))
+            con.commit()
+        finally:
+            con.close()
+    
+    def mirrors(self, key_id: int) -> List[tuple]:
+        """密钥的备用地址及测速结果（按排名）：(地址, 排名, 总耗时, 是否可用, 测速时间)"""
+        con = vault_db.connect(self.db_file)
+        try:
+            return con.execute("""
+                SELECT m.url, m.rank, b.total_ms, b.healthy, b.measured_at
+                FROM key_mirrors m LEFT JOIN endpoint_benchmarks b ON b.url = m.url
+                WHERE m.key_id = ?
+                ORDER BY m.rank, m.url
+            """, (key_id,)).fetchall()
+        finally:
+            con.close()
+    
+    def stale_urls(self, now: float = None) -> List[str]:
+        """需要测速的地址：备用地址以及密钥本身的地址中，从未测过或结果已过期的"""
+        now = time.time() if now is None else now
+        con = vault_db.connect(self.db_file)
+        try:
+            rows = con.execute("""
+                SELECT u.url FROM (
+                    SELECT url FROM key_mirrors
+                    UNION
+                    SELECT RTRIM(TRIM(api_url), '/') FROM api_keys WHERE api_url LIKE 'http%'
+                ) u
+                LEFT JOIN endpoint_benchmarks b ON b.url = u.url
+                WHERE b.measured_at IS NULL OR b.measured_at < ?
+                ORDER BY u.url
+            """, (now - self.ttl,)).fetchall()
+        finally:
+            con.close()
+        return [row[0] for row in rows]
+    
+    def run(self, urls: List[str]) -> List[BenchResult]:
+        """并发测速并保存结果"""
+        urls = list(dict.fromkeys(u.strip().rstrip("/") for u in urls if u and u.strip()))
+        if not urls:
+            return []
+        measured = {result.url: result for result in batch_runner.imap_unordered(
+            lambda u: benchmark_url(u, self.samples, self.timeout), urls, parallelism=self.max_workers)}
+        results = [measured[url] for url in urls]
+        self.save_results(results)
+        return results
+    
+    def save_results(self, results: List[BenchResult]):
+        """在一个事务中写入测速结果"""
+        con = vault_db.connect(self.db_file)
+        try:
+            con.executemany("""
+                INSERT OR REPLACE INTO endpoint_benchmarks
+                    (url, dns_ms, connect_ms, tls_ms, ttfb_ms, total_ms, status,
+                     samples, failures, healthy, error, measured_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(r.url, r.dns_ms, r.connect_ms, r.tls_ms, r.ttfb_ms, r.total_ms, r.status,
+                   r.samples, r.failures, int(r.healthy), r.error, r.measured_at) for r in results])
+            con.commit()
+        finally:
+            con.close()
+    
+    def load_results(self, con) -> Dict[str, BenchResult]:
+        """读取所有测速结果"""
+        rows = con.execute("""
+            SELECT url, dns_ms, connect_ms, tls_ms, ttfb_ms, total_ms, status,
+                   samples, failures, healthy, error, measured_at
+            FROM endpoint_benchmarks
+        """).fetchall()
+        return {row[0]: BenchResult(*row[:9], bool(row[9]), row[10] or "", row[11]) for row in rows}
+    
+    def select_fastest(self) -> List[tuple]:
+        """
+        按测速结果重排每个密钥的备用地址，并把密钥的地址切换为最快的可用地址；
+        没有可用地址时保持不变。返回切换记录 (密钥ID, 原地址, 新地址)
+        """
+        con = vault_db.connect(self.db_file)
+        try:
+            results = self.load_results(con)
+            mirrors: Dict[int, List[str]] = {}
+            for key_id, url in con.execute("SELECT key_id, url FROM key_mirrors ORDER BY key_id, rank"):
+                mirrors.setdefault(key_id, []).append(url)
+            
+            switched = []
+            for key_id, urls in mirrors.items():
+                ranked = sorted(urls, key=lambda u: rank_key(results.get(u)))
+                con.executemany("UPDATE key_mirrors SET rank = ? WHERE key_id = ? AND url = ?",
+                                [(rank, key_id, url) for rank, url in enumerate(ranked)])
+                best = results.get(ranked[0])
+                if best is None or not best.healthy:
+                    continue
+                row = con.execute("SELECT vendor, api_url FROM api_keys WHERE id = ?", (key_id,)).fetchone()
+                current = (row[1] or "").strip().rstrip("/") if row else None
+                # 未填写地址等同于使用默认地址：默认地址最快时保持为空
+                if row is not None and (current or default_url(row[0])) != best.url:
+                    with vault_db.actor_scope(con):
+                        con.execute("UPDATE api_keys SET api_url = ? WHERE id = ?", (best.url, key_id))
+                    switched.append((key_id, current, best.url))
+            con.commit()
+            return switched
+        finally:
+            con.close()
+    
+    def refresh(self) -> List[tuple]:
+        """测量所有过期的地址，然后为每个密钥选择最快的地址"""
+        self.run(self.stale_urls())
+        return self.select_fastest()
+
+def run_demo():
+    """用本地替身服务器演示：三个注入了不同延迟的镜像和一个无法连接的地址"""
+    import os
+    import tempfile
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    
+    def make_server(delay: float, status: int = 401):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(delay)
+                body = b'{"error": "missing api key"}'
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server, f"http://127.0.0.1:{server.server_port}/v1"
+    
+    servers = [make_server(0.12), make_server(0.01), make_server(0.05), make_server(0.0, status=503)]
+    closed = socket.socket()
+    closed.bind(("127.0.0.1", 0))
+    dead_url = f"http://127.0.0.1:{closed.getsockname()[1]}/v1"
+    closed.close()
+    
+    fd, db_file = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        con = vault_db.connect(db_file)
+        vault_db.init_schema(con)
+        cur = con.execute("INSERT INTO api_keys (vendor, api_key, api_url) VALUES (?, ?, ?)",
+                          ("OpenAI", "sk-demo", servers[0][1]))
+        key_id = cur.lastrowid
+        con.commit()
+        con.close()
+        
+        bench = EndpointBench(db_file, samples=3, timeout=1.0)
+        for _, url in servers[1:]:
+            bench.add_mirror(key_id, url)
+        bench.add_mirror(key_id, dead_url)
+        
+        for result in bench.run(bench.stale_urls()):
+            print(f"{result.url}: 总耗时 {result.total_ms} ms（DNS {result.dns_ms} / 连接 {result.connect_ms} / "
+                  f"首字节 {result.ttfb_ms}），状态 {result.status}，{'可用' if result.healthy else '不可用'}"
+                  + (f" - {result.error}" if result.error else ""))
+        for key_id, old, new in bench.select_fastest():
+            print(f"密钥 #{key_id}: {old} -> {new}")
+        print("排名:", [url for url, *_ in bench.mirrors(key_id)])
+    finally:
+        for server, _ in servers:
+            server.shutdown()
+        os.remove(db_file)
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="端点测速与备用地址选择")
+    parser.add_argument("--db", default=vault_db.DB_FILE, help="数据库文件")
+    parser.add_argument("--key", type=int, help="密钥ID（与 --add-mirror / --remove-mirror / --list 一起使用）")
+    parser.add_argument("--add-mirror", metavar="URL", help="为密钥添加备用地址")
+    parser.add_argument("--remove-mirror", metavar="URL", help="删除密钥的备用地址")
+    parser.add_argument("--list", action="store_true", help="列出密钥的备用地址及测速结果")
+    parser.add_argument("--url", action="append", default=[], help="只测量指定地址（可重复）")
+    parser.add_argument("--samples", type=int, default=BENCH_SAMPLES, help="每个地址的测量次数")
+    parser.add_argument("--demo", action="store_true", help="使用本地替身服务器演示")
+    args = parser.parse_args()
+    
+    if args.demo:
+        run_demo()
+        raise SystemExit
+    
+    con = vault_db.connect(args.db)
+    vault_db.init_schema(con)
+    con.close()
+    bench = EndpointBench(args.db, samples=args.samples)
+    
+    if args.key is not None and (args.add_mirror or args.remove_mirror or args.list):
+        if args.add_mirror:
+            bench.add_mirror(args.key, args.add_mirror)
+        if args.remove_mirror:
+            bench.remove_mirror(args.key, args.remove_mirror)
+        for url, rank, total_ms, healthy, _ in bench.mirrors(args.key):
+            state = "未测速" if healthy is None else ("可用" if healthy else "不可用")
+            print(f"{rank + 1}. {url} {total_ms if total_ms is not None else '-'} ms {state}")
+    elif args.url:
+        for result in bench.run(args.url):
+            print(f"{result.url}: {result.total_ms} ms（首字节 {result.ttfb_ms} ms），"
+                  f"{'可用' if result.healthy else '不可用'}")
+    else:
+        for key_id, old, new in bench.refresh():
+            print(f"密钥 #{key_id}: {old} -> {new}")
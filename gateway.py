@@ -0,0 +1,616 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+本地网关模块
+提供 OpenAI 兼容的本地接口：按请求中的模型名或别名从密钥库选出密钥，注入认证头后转发到上游；
+上游使用保持连接的连接池，流式响应边收边发不做缓冲，/metrics 输出每个密钥的吞吐量统计
+只转发使用 Bearer 认证的 OpenAI 兼容上游（见 BEARER_VENDORS），其他厂商的密钥不会被选中。
+所有接口（包括 /metrics）都要求令牌，未指定时启动时随机生成；Host 不是监听地址或带有浏览器 Origin 的请求一律拒绝，
+网页无法通过 DNS 重绑定或跨站表单使用库中的密钥
+"""
+
+import hmac
+import http.client
+import json
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+import vault_db
+from vendor_catalog import vendor_catalog
+
+# 网关默认监听地址（只监听本机）
+GATEWAY_HOST = "127.0.0.1"
+GATEWAY_PORT = 8787
+
+# 本机回环地址的各种写法（Host 头校验时视为同一地址）
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "[::1]", "::1")
+
+# 未指定令牌时随机生成的令牌长度（字节）
+GATEWAY_TOKEN_BYTES = 24
+
+# 每个上游主机保留的空闲连接数，以及连接超时（秒）
+POOL_MAX_IDLE = 8
+UPSTREAM_TIMEOUT = 120
+
+# 模型到密钥的查找结果缓存时间（秒），以及最多缓存的模型名数（模型名由客户端任意填写）
+ROUTE_CACHE_TTL = 30
+ROUTE_CACHE_MAX_ENTRIES = 1024
+
+# 使用 Bearer 认证、接口与 OpenAI 兼容的厂商；其余厂商（Google、Anthropic、Azure 等）认证方式不同，不转发
+BEARER_VENDORS = ("OpenAI", "Groq", "DeepSeek", "Moonshot", "智谱AI", "字节豆包", "Perplexity",
+                  "Together AI", "自定义")
+
+# 转发响应时每次读取的最大字节数
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# 不转发的逐跳头
+HOP_BY_HOP_HEADERS = {"connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+                      "te", "trailers", "transfer-encoding", "upgrade", "content-length"}
+
+class Route(NamedTuple):
+    """一次请求的转发目标"""
+    key_id: int
+    vendor: str
+    api_key: str
+    base_url: str
+    upstream_model: str
+
+class KeyResolver:
+    """按模型名或别名查找密钥（依次匹配：别名、密钥可访问的模型、密钥的默认模型、厂商目录）"""
+    
+    def __init__(self, db_file: str = vault_db.DB_FILE, cache_ttl: float = ROUTE_CACHE_TTL,
+                 cache_size: int = ROUTE_CACHE_MAX_ENTRIES):
+        self.db_file = db_file
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.cache: Dict[str, tuple] = {}
+        self.lock = threading.Lock()
+    
+    def resolve(self, model: str) -> Optional[Route]:
+        """返回模型对应的转发目标，找不到时返回 None"""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.cache.get(model)
+            if entry and entry[0] > now:
+                return entry[1]
+        route = self.lookup(model)
+        with self.lock:
+            self.cache.pop(model, None)
+            if len(self.cache) >= self.cache_size:
+                # 先清除过期的，仍然已满时淘汰最早写入的
+                for name in [name for name, entry in self.cache.items() if entry[0] <= now]:
+                    del self.cache[name]
+                while len(self.cache) >= self.cache_size:
+                    del self.cache[next(iter(self.cache))]
+            self.cache[model] = (now + self.cache_ttl, route)
+        return route
+    
+    def lookup(self, model: str) -> Optional[Route]:
+        """查询数据库（每一步都走索引），只选用 BEARER_VENDORS 的密钥"""
+        # 有效的密钥优先，其次是最近检查过的
+        preference = (f"AND k.vendor IN ({', '.join('?' * len(BEARER_VENDORS))}) "
+                      "ORDER BY k.health_status = 'ok' DESC, k.health_checked_at DESC, k.id LIMIT 1")
+        con = vault_db.connect(self.db_file)
+        try:
+            row = con.execute(f"""
+                SELECT k.id, k.vendor, k.api_key, k.api_url, k.model FROM api_keys k
+                WHERE k.alias = ? {preference}
+            """, (model,) + BEARER_VENDORS).fetchone()
+            if row:
+                return self.make_route(row, row[4] or model)
+            
+            for sql in (f"""
+                SELECT k.id, k.vendor, k.api_key, k.api_url, m.model_id FROM models m
+                JOIN key_models km ON km.model_pk = m.id
+                JOIN api_keys k ON k.id = km.key_id
+                WHERE m.model_id = ? {preference}
+            """, f"""
+                SELECT k.id, k.vendor, k.api_key, k.api_url, k.model FROM api_keys k
+                WHERE k.model = ? COLLATE NOCASE {preference}
+            """):
+                row = con.execute(sql, (model,) + BEARER_VENDORS).fetchone()
+                if row:
+                    return self.make_route(row, model)
+            
+            # 最后按厂商目录找到提供该模型的厂商，使用该厂商的任意密钥
+            for vendor in vendor_catalog.model_vendors.get(model, []):
+                row = con.execute(f"""
+                    SELECT k.id, k.vendor, k.api_key, k.api_url, k.model FROM api_keys k
+                    WHERE k.vendor = ? {preference}
+                """, (vendor,) + BEARER_VENDORS).fetchone()
+                if row:
+                    return self.make_route(row, model)
+            return None
+        finally:
+            con.close()
+    
+    def make_route(self, row: tuple, upstream_model: str) -> Optional[Route]:
+        key_id, vendor, api_key, api_url, _ = row
+        if vendor not in BEARER_VENDORS:
+            return None
+        base_url = (api_url or vendor_catalog.url_for(vendor) or "").strip().rstrip("/")
+        if not base_url.startswith(("http://", "https://")):
+            return None
+        return Route(key_id, vendor, api_key.strip(), base_url, upstream_model)
+    
+    def models(self) -> List[str]:
+        """网关可转发的模型名和别名"""
+        vendors = f"vendor IN ({', '.join('?' * len(BEARER_VENDORS))})"
+        con = vault_db.connect(self.db_file)
+        try:
+            rows = con.execute(f"""
+                SELECT alias FROM api_keys WHERE alias IS NOT NULL AND alias != '' AND {vendors}
+                UNION
+                SELECT model FROM api_keys WHERE model IS NOT NULL AND model != '' AND {vendors}
+                UNION
+                SELECT m.model_id FROM models m JOIN key_models km ON km.model_pk = m.id
+                JOIN api_keys k ON k.id = km.key_id WHERE k.{vendors}
+            """, BEARER_VENDORS * 3).fetchall()
+        finally:
+            con.close()
+        return sorted(row[0] for row in rows)
+
+class UpstreamPool:
+    """按 (协议, 主机, 端口) 保存空闲的保持连接，请求结束后归还复用"""
+    
+    def __init__(self, max_idle: int = POOL_MAX_IDLE, timeout: float = UPSTREAM_TIMEOUT):
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.idle: Dict[tuple, List[http.client.HTTPConnection]] = {}
+        self.lock = threading.Lock()
+        self.opened = 0  # 新建的连接数（用于观察复用效果）
+    
+    def acquire(self, origin: tuple) -> http.client.HTTPConnection:
+        """取出一个空闲连接，没有时新建"""
+        with self.lock:
+            connections = self.idle.get(origin)
+            if connections:
+                return connections.pop()
+            self.opened += 1
+        scheme, host, port = origin
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout)
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+    
+    def release(self, origin: tuple, connection: http.client.HTTPConnection):
+        """归还连接；空闲连接已满时关闭"""
+        with self.lock:
+            connections = self.idle.setdefault(origin, [])
+            if len(connections) < self.max_idle:
+                connections.append(connection)
+                return
+        connection.close()
+    
+    def close(self):
+        """关闭所有空闲连接"""
+        with self.lock:
+            connections = [c for group in self.idle.values() for c in group]
+            self.idle.clear()
+        for connection in connections:
+            connection.close()
+
+class KeyStats:
+    """单个密钥的统计"""
+    __slots__ = ("requests", "errors", "bytes_sent", "bytes_received", "latency_ms", "ttfb_ms")
+    
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0      # 转发给上游的请求体
+        self.bytes_received = 0  # 从上游收到的响应体
+        self.latency_ms = 0.0
+        self.ttfb_ms = 0.0
+
+class GatewayMetrics:
+    """按密钥统计请求数、错误数、字节数和耗时"""
+    
+    def __init__(self):
+        self.started = time.time()
+        self.keys: Dict[int, KeyStats] = {}
+        self.lock = threading.Lock()
+    
+    def record(self, key_id: int, status: int, bytes_sent: int, bytes_received: int,
+               latency_ms: float, ttfb_ms: float):
+        with self.lock:
+            stats = self.keys.get(key_id)
+            if stats is None:
+                stats = self.keys[key_id] = KeyStats()
+            stats.requests += 1
+            stats.errors += 1 if status >= 400 else 0
+            stats.bytes_sent += bytes_sent
+            stats.bytes_received += bytes_received
+            stats.latency_ms += latency_ms
+            stats.ttfb_ms += ttfb_ms
+    
+    def snapshot(self) -> Dict:
+        """当前统计（吞吐量按网关运行时间计算）"""
+        uptime = max(time.time() - self.started, 1e-6)
+        with self.lock:
+            keys = {
+                str(key_id): {
+                    "requests": s.requests,
+                    "errors": s.errors,
+                    "bytes_sent": s.bytes_sent,
+                    "bytes_received": s.bytes_received,
+                    "requests_per_second": round(s.requests / uptime, 3),
+                    "bytes_per_second": round((s.bytes_sent + s.bytes_received) / uptime, 1),
+                    "avg_latency_ms": round(s.latency_ms / s.requests, 2) if s.requests else None,
+                    "avg_ttfb_ms": round(s.ttfb_ms / s.requests, 2) if s.requests else None
+                }
+                for key_id, s in self.keys.items()
+            }
+        return {"uptime_seconds": round(uptime, 1), "keys": keys}
+
+class GatewayHandler(BaseHTTPRequestHandler):
+    """OpenAI 兼容请求处理"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # 响应头和分片分开写出，避免与延迟确认叠加产生约40ms停顿
+    
+    def log_message(self, format, *args):
+        if self.server.gateway.verbose:
+            super().log_message(format, *args)
+    
+    def send_json(self, status: int, payload: Dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def send_error_json(self, status: int, message: str, error_type: str = "invalid_request_error"):
+        self.send_json(status, {"error": {"message": message, "type": error_type}})
+    
+    def authorized(self) -> bool:
+        """校验 Host（防止 DNS 重绑定）、拒绝浏览器发起的跨站请求，并校验网关令牌"""
+        gateway = self.server.gateway
+        if (self.headers.get("Host") or "").lower() not in gateway.allowed_hosts:
+            self.send_error_json(403, "Host 与网关监听地址不符", "permission_error")
+            return False
+        if self.headers.get("Origin") is not None:
+            self.send_error_json(403, "网关不接受浏览器网页发起的请求", "permission_error")
+            return False
+        if hmac.compare_digest(self.headers.get("Authorization", "").encode("utf-8"),
+                               f"Bearer {gateway.token}".encode("utf-8")):
+            return True
+        self.send_error_json(401, "网关令牌无效", "authentication_error")
+        return False
+    
+    def do_GET(self):
+        path = urlsplit(self.path).path.rstrip("/")
+        if path == "/metrics":
+            if self.authorized():
+                self.send_json(200, self.server.gateway.metrics.snapshot())
+        elif path in ("/v1/models", "/models"):
+            if self.authorized():
+                models = self.server.gateway.resolver.models()
+                self.send_json(200, {"object": "list", "data": [
+                    {"id": model, "object": "model", "owned_by": "apikey-manager"} for model in models]})
+        else:
+            self.send_error_json(404, f"未知的路径: {path}")
+    
+    def do_POST(self):
+        length = self.headers.get("Content-Length")
+        if length is None:
+            self.close_connection = True
+            self.send_error_json(411, "请求需要 Content-Length")
+            return
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # 无法确定请求体的边界，返回错误后关闭连接
+            self.close_connection = True
+            self.send_error_json(400, "Content-Length 无效")
+            return
+        # 先读完请求体，出错返回后连接仍可继续使用
+        body = self.rfile.read(length)
+        if not self.authorized():
+            return
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            self.send_error_json(400, "请求体不是有效的 JSON")
+            return
+        model = payload.get("model") if isinstance(payload, dict) else None
+        if not model:
+            self.send_error_json(400, "请求中缺少 model")
+            return
+        
+        route = self.server.gateway.resolver.resolve(model)
+        if route is None:
+            self.send_error_json(404, f"密钥库中没有可用于模型 {model} 的密钥", "model_not_found")
+            return
+        if route.upstream_model != model:
+            # 别名替换为真实模型名
+            payload["model"] = route.upstream_model
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.server.gateway.forward(self, route, body)
+
+class Gateway:
+    """本地网关"""
+    
+    def __init__(self, db_file: str = vault_db.DB_FILE, host: str = GATEWAY_HOST, port: int = GATEWAY_PORT,
+                 token: str = None, verbose: bool = False):
+        self.resolver = KeyResolver(db_file)
+        self.pool = UpstreamPool()
+        self.metrics = GatewayMetrics()
+        # 未指定令牌时随机生成（token_generated 为 True，启动时显示给用户）
+        self.token_generated = not token
+        self.token = token or secrets.token_urlsafe(GATEWAY_TOKEN_BYTES)
+        self.verbose = verbose
+        self.server = ThreadingHTTPServer((host, port), GatewayHandler)
+        self.server.daemon_threads = True
+        self.server.gateway = self
+        self.allowed_hosts = self.host_names(host, self.server.server_address[1])
+    
+    @staticmethod
+    def host_names(host: str, port: int) -> set:
+        """请求中允许的 Host 头：监听地址（回环地址的各种写法视为相同）加端口"""
+        names = set(LOOPBACK_HOSTS) if host.lower() in LOOPBACK_HOSTS else {host.lower()}
+        names = {f"[{name}]" if ":" in name and not name.startswith("[") else name for name in names}
+        return {f"{name}:{port}" for name in names} | (names if port == 80 else set())
+    
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+    
+    def upstream_path(self, route: Route, request_path: str) -> tuple:
+        """把 /v1/chat/completions 映射为 <上游基础地址>/chat/completions"""
+        parts = urlsplit(route.base_url)
+        origin = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+        request = urlsplit(request_path)
+        path = request.path
+        if path.startswith("/v1/"):
+            path = path[3:]
+        path = parts.path.rstrip("/") + path + (f"?{request.query}" if request.query else "")
+        return origin, path
+    
+    def send_upstream(self, origin: tuple, method: str, path: str, body: bytes, headers: Dict):
+        """发送请求；复用的连接已被上游关闭时换新连接重试一次"""
+        for attempt in range(2):
+            connection = self.pool.acquire(origin)
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                return connection, connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                connection.close()
+                if attempt:
+                    raise
+            except Exception:
+                connection.close()
+                raise
+    
+    def forward(self, handler: GatewayHandler, route: Route, body: bytes):
+        """转发请求，响应边读边写回客户端"""
+        start = time.perf_counter()
+        origin, path = self.upstream_path(route, handler.path)
+        headers = {
+            "Authorization": f"Bearer {route.api_key}",
+            "Content-Type": handler.headers.get("Content-Type", "application/json"),
+            "Accept": handler.headers.get("Accept", "*/*"),
+            "Content-Length": str(len(body))
+        }
+        try:
+            connection, response = self.send_upstream(origin, handler.command, path, body, headers)
+        except (OSError, http.client.HTTPException) as e:
+            self.metrics.record(route.key_id, 502, len(body), 0, (time.perf_counter() - start) * 1000, 0)
+            handler.send_error_json(502, f"上游连接失败: {e}", "upstream_error")
+            return
+        ttfb_ms = (time.perf_counter() - start) * 1000
+        
+        # 上游给出长度时原样转发，否则（流式响应）以分块编码转发
+        length = response.getheader("Content-Length")
+        chunked = length is None
+        handler.send_response(response.status)
+        for name, value in response.getheaders():
+            if name.lower() not in HOP_BY_HOP_HEADERS:
+                handler.send_header(name, value)
+        if chunked:
+            handler.send_header("Transfer-Encoding", "chunked")
+        else:
+            handler.send_header("Content-Length", length)
+        handler.end_headers()
+        
+        received = 0
+        client_gone = False
+        try:
+            while True:
+                chunk = response.read1(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                received += len(chunk)
+                if chunked:
+                    handler.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                else:
+                    handler.wfile.write(chunk)
+                handler.wfile.flush()
+            if chunked:
+                handler.wfile.write(b"0\r\n\r\n")
+                handler.wfile.flush()
+            # 读到末尾，让响应对象标记为已完成
+            response.read()
+        except (OSError, http.client.HTTPException):
+            # 客户端断开或上游中途出错：连接状态未知，不再复用
+            client_gone = True
+            handler.close_connection = True
+        
+        # 响应完整读完且上游未要求关闭时连接可以复用
+        if client_gone or response.will_close or not response.isclosed():
+            connection.close()
+        else:
+            self.pool.release(origin, connection)
+        self.metrics.record(route.key_id, response.status, len(body), received,
+                            (time.perf_counter() - start) * 1000, ttfb_ms)
+    
+    def serve_forever(self):
+        self.server.serve_forever()
+    
+    def start(self) -> threading.Thread:
+        """在后台线程中运行"""
+        thread = threading.Thread(target=self.serve_forever, name="gateway", daemon=True)
+        thread.start()
+        return thread
+    
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.pool.close()
+
+class MockUpstreamHandler(BaseHTTPRequestHandler):
+    """模拟的 OpenAI 兼容上游：普通请求返回 JSON，stream=true 时返回 SSE 分片"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        payload = json.loads(body or b"{}")
+        if self.headers.get("Authorization") != f"Bearer {self.server.expected_key}":
+            data = b'{"error": {"message": "invalid api key"}}'
+            self.send_response(401)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        time.sleep(self.server.delay)
+        if payload.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for index in range(self.server.stream_chunks):
+                event = json.dumps({"model": payload.get("model"),
+                                    "choices": [{"delta": {"content": f"片段{index} "}}]}, ensure_ascii=False)
+                data = f"data: {event}\n\n".encode("utf-8")
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+                time.sleep(self.server.delay)
+            done = b"data: [DONE]\n\n"
+            self.wfile.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(done), done))
+            return
+        data = json.dumps({"model": payload.get("model"), "object": "chat.completion",
+                           "choices": [{"message": {"role": "assistant", "content": "ok"}}]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def start_mock_upstream(api_key: str = "sk-mock", delay: float = 0.005, stream_chunks: int = 5):
+    """启动模拟上游，返回 (服务器, 基础地址)"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockUpstreamHandler)
+    server.daemon_threads = True
+    server.expected_key = api_key
+    server.delay = delay
+    server.stream_chunks = stream_chunks
+    server.connections = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1"
+
+def run_load_test(total: int = 500, concurrency: int = 16, stream: bool = False):
+    """对模拟上游做压力测试：统计吞吐量、延迟分布和上游新建连接数"""
+    import os
+    import statistics
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+    
+    upstream, upstream_url = start_mock_upstream()
+    fd, db_file = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    con = vault_db.connect(db_file)
+    vault_db.init_schema(con)
+    con.execute("INSERT INTO api_keys (vendor, api_key, api_url, model, alias) VALUES (?, ?, ?, ?, ?)",
+                ("OpenAI", "sk-mock", upstream_url, "mock-model", "fast"))
+    con.commit()
+    con.close()
+    
+    gateway = Gateway(db_file, port=0)
+    gateway.start()
+    host, port = gateway.server.server_address[:2]
+    body = json.dumps({"model": "fast", "stream": stream,
+                       "messages": [{"role": "user", "content": "hi"}]}).encode("utf-8")
+    local = threading.local()
+    
+    def one_request(_):
+        connection = getattr(local, "connection", None)
+        if connection is None:
+            connection = local.connection = http.client.HTTPConnection(host, port, timeout=30)
+        start = time.perf_counter()
+        connection.request("POST", "/v1/chat/completions", body=body,
+                           headers={"Content-Type": "application/json", "Authorization": f"Bearer {gateway.token}"})
+        response = connection.getresponse()
+        response.read()
+        return response.status, (time.perf_counter() - start) * 1000
+    
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one_request, range(total)))
+        elapsed = time.perf_counter() - start
+        latencies = sorted(latency for _, latency in results)
+        ok = sum(1 for status, _ in results if status == 200)
+        print(f"请求 {total} 次（并发 {concurrency}，{'流式' if stream else '非流式'}）：成功 {ok}，"
+              f"{total / elapsed:.0f} 次/秒")
+        print(f"延迟 p50 {statistics.median(latencies):.1f} ms，p95 {latencies[int(len(latencies) * 0.95) - 1]:.1f} ms")
+        print(f"上游新建连接 {upstream.connections} 个（连接池新建 {gateway.pool.opened} 个）")
+        print(json.dumps(gateway.metrics.snapshot(), ensure_ascii=False, indent=2))
+    finally:
+        gateway.shutdown()
+        upstream.shutdown()
+        os.remove(db_file)
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="OpenAI 兼容的本地密钥网关")
+    parser.add_argument("--db", default=vault_db.DB_FILE, help="数据库文件")
+    parser.add_argument("--host", default=GATEWAY_HOST, help="监听地址")
+    parser.add_argument("--port", type=int, default=GATEWAY_PORT, help="监听端口")
+    parser.add_argument("--token", help="客户端需要携带的令牌（Authorization: Bearer <令牌>；未指定时随机生成）")
+    parser.add_argument("--verbose", action="store_true", help="输出每个请求的日志")
+    parser.add_argument("--set-alias", nargs=2, metavar=("KEY_ID", "ALIAS"), help="设置密钥的别名")
+    parser.add_argument("--load-test", type=int, metavar="N", help="对模拟上游发送 N 个请求进行压力测试")
+    parser.add_argument("--concurrency", type=int, default=16, help="压力测试并发数")
+    parser.add_argument("--stream", action="store_true", help="压力测试使用流式响应")
+    args = parser.parse_args()
+    
+    if args.load_test:
+        run_load_test(args.load_test, args.concurrency, args.stream)
+        raise SystemExit
+    
+    con = vault_db.connect(args.db)
+    vault_db.init_schema(con)
+    if args.set_alias:
+        key_id, alias = args.set_alias
+        with vault_db.actor_scope(con):
+            con.execute("UPDATE api_keys SET alias = ? WHERE id = ?", (alias or None, int(key_id)))
+        con.commit()
+        con.close()
+        print(f"密钥 #{key_id} 的别名已设置为 {alias}")
+        raise SystemExit
+    con.close()
+    
+    gateway = Gateway(args.db, args.host, args.port, args.token, args.verbose)
+    print(f"🚪 网关已启动: {gateway.url}（统计: http://{args.host}:{gateway.server.server_address[1]}/metrics）")
+    if gateway.token_generated:
+        print(f"🔑 本次运行的令牌（客户端以 Authorization: Bearer <令牌> 携带）: {gateway.token}")
+    try:
+        gateway.serve_forever()
+    except KeyboardInterrupt:
+        gateway.shutdown()
@@ -1,68 +1,204 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+from startup_timing import startup_timer  # 需最先导入，以便计时模式统计后续导入
+from profiling import profiler
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 import sqlite3
 import json
-import threading
-from tkinter.scrolledtext import ScrolledText
-from model_fetcher import model_fetcher
+import time
+from functools import lru_cache
+from model_index import ModelIndex
+import vault_db
+from vault_db import DB_FILE
+from vendor_catalog import vendor_catalog
+from task_runner import task_runner, batch_runner, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+from row_store import KeyRow, RowStore, ROW_QUERY, FEDERATED_ROW_QUERY, format_health
 
-# 数据库文件
-DB_FILE = "apikeys.db"
+startup_timer.mark("模块导入")
 
-# 厂商和模型配置 - 自动更新于 2025-09-13
-VENDOR_MODELS = {
-    "OpenAI": ["gpt-4", "gpt-4-turbo", "gpt-4o", "gpt-4o-mini", "gpt-3.5-turbo", "text-embedding-ada-002", "dall-e-3"],
-    "Google": ["gemini-1.5-pro", "gemini-1.5-flash", "gemini-pro", "gemini-pro-vision", "palm-2", "text-bison", "chat-bison", "embedding-gecko"],
-    "Anthropic": ["claude-3-opus-20240229", "claude-3-sonnet-20240229", "claude-3-haiku-20240307", "claude-2.1", "claude-2.0", "claude-instant-1.2"],
-    "Cohere": ["command", "command-r", "command-r-plus", "command-light", "embed-english", "embed-multilingual"],
-    "Groq": ["llama3-8b-8192", "llama3-70b-8192", "mixtral-8x7b-32768", "gemma-7b-it"],
-    "DeepSeek": ["deepseek-chat", "deepseek-coder", "deepseek-math", "deepseek-v2", "deepseek-v2-chat"],
-    "Moonshot": ["moonshot-v1-8k", "moonshot-v1-32k", "moonshot-v1-128k"],
-    "智谱AI": ["glm-4", "glm-4v", "glm-3-turbo", "chatglm3-6b", "chatglm2-6b"],
-    "百度文心": ["ernie-bot-4.0", "ernie-bot-turbo", "ernie-bot", "ernie-speed", "ernie-lite"],
-    "阿里通义": ["qwen-turbo", "qwen-plus", "qwen-max", "qwen-max-longcontext", "qwen-vl-plus"],
-    "字节豆包": ["doubao-lite-4k", "doubao-pro-4k", "doubao-pro-32k", "doubao-pro-128k"],
-    "腾讯混元": ["hunyuan-lite", "hunyuan-standard", "hunyuan-pro"],
-    "讯飞星火": ["spark-v3.5", "spark-v3.0", "spark-v2.0", "spark-lite"],
-    "Microsoft Azure": ["gpt-4", "gpt-4-turbo", "gpt-35-turbo", "gpt-35-turbo-16k", "text-embedding-ada-002"],
-    "Hugging Face": ["llama-2-7b", "llama-2-13b", "llama-2-70b", "mistral-7b", "codellama"],
-    "Perplexity": ["llama-3-sonar-small-32k-chat", "llama-3-sonar-large-32k-chat", "mixtral-8x7b-instruct"],
-    "Together AI": ["meta-llama/Llama-2-7b-chat-hf", "meta-llama/Llama-2-13b-chat-hf", "mistralai/Mixtral-8x7B-Instruct-v0.1"],
-    "自定义": []
+# 厂商、预设模型和默认API地址从 vendor_models_config.json 加载，文件修改后自动重新加载
+# （两个字典会被原地更新，可直接引用）
+VENDOR_MODELS = vendor_catalog.vendor_models
+DEFAULT_API_URLS = vendor_catalog.default_api_urls
+
+# 检查厂商目录文件是否修改的间隔（毫秒）
+CATALOG_POLL_INTERVAL_MS = 2000
+
+# 启动后检查厂商目录是否需要在线同步的延迟（毫秒）
+CATALOG_SYNC_DELAY_MS = 60 * 1000
+
+# 定时快照：首次检查延迟和检查周期（毫秒），是否需要快照由 vault_backup 按最新快照的时间判断
+BACKUP_INITIAL_DELAY_MS = 2 * 60 * 1000
+BACKUP_CHECK_INTERVAL_MS = 30 * 60 * 1000
+
+# 存储维护：首次检查延迟和检查周期（毫秒），以及视为空闲所需的无操作时间（秒）；哪些维护项到期由 vault_maintenance 判断
+MAINTENANCE_INITIAL_DELAY_MS = 5 * 60 * 1000
+MAINTENANCE_CHECK_INTERVAL_MS = 10 * 60 * 1000
+MAINTENANCE_IDLE_SECONDS = 60
+
+# 可点击排序的列及其对应的数据库字段
+SORTABLE_COLUMNS = {
+    "厂商": "vendor",
+    "模型": "model",
+    "备注": "notes",
+    "API URL": "api_url",
+    "创建时间": "created_at",
+    "来源": "source"
 }
 
-DEFAULT_API_URLS = {
-    "OpenAI": "https://api.openai.com/v1",
-    "Google": "https://generativelanguage.googleapis.com/v1beta",
-    "Anthropic": "https://api.anthropic.com/v1",
-    "Microsoft Azure": "https://your-resource.openai.azure.com",
-    "Cohere": "https://api.cohere.ai/v1",
-    "DeepSeek": "https://api.deepseek.com/v1",
-    "Moonshot": "https://api.moonshot.cn/v1",
-    "智谱AI": "https://open.bigmodel.cn/api/paas/v4",
-    "百度文心": "https://aip.baidubce.com/rpc/2.0/ai_custom/v1",
-    "阿里通义": "https://dashscope.aliyuncs.com/api/v1",
-    "字节豆包": "https://ark.cn-beijing.volces.com/api/v3",
-    "腾讯混元": "https://hunyuan.tencentcloudapi.com",
-    "讯飞星火": "https://spark-api.xf-yun.com/v1.1",
-    "Hugging Face": "https://api-inference.huggingface.co/models",
-    "Groq": "https://api.groq.com/openai/v1",
-    "Perplexity": "https://api.perplexity.ai",
-    "Together AI": "https://api.together.xyz/v1",
-    "自定义": ""
+# 保存冲突提示中显示的字段名
+FIELD_DISPLAY = {
+    "vendor": "厂商",
+    "api_key": "API密钥",
+    "api_url": "API URL",
+    "model": "模型",
+    "notes": "备注",
+    "example_code": "示例代码"
 }
 
+# 记录数超过该值时改用数据库索引排序（ORDER BY），否则在内存中排序
+SQL_SORT_THRESHOLD = 2000
+
+# 添加/编辑对话框尺寸，以及从调用到可交互的耗时预算（毫秒）
+DIALOG_WIDTH = 650
+DIALOG_HEIGHT = 750
+DIALOG_OPEN_BUDGET_MS = 150
+
+# 后台健康检查：首次检查延迟和检查周期（毫秒）
+HEALTH_CHECK_INITIAL_DELAY_MS = 30 * 1000
+HEALTH_CHECK_INTERVAL_MS = 5 * 60 * 1000
+
+# 可搜索模型选择器：最多渲染的匹配项数量，以及输入防抖间隔（毫秒）
+PICKER_VISIBLE_LIMIT = 200
+PICKER_DEBOUNCE_MS = 120
+
+# 主表格筛选框的输入防抖间隔（毫秒）
+FILTER_DEBOUNCE_MS = 150
+
+def make_sort_key(column, value):
+    """生成列排序键（与数据库排序一致：不区分大小写，中文厂商按拼音）"""
+    return vault_db.sort_key(SORTABLE_COLUMNS[column], value)
+
+def get_model_fetcher():
+    """按需加载模型获取模块（连带 requests 及其TLS依赖），多数会话不会用到；应在后台任务中调用"""
+    fetcher = startup_timer.timed_import("model_fetcher").model_fetcher
+    if fetcher.executor is not task_runner:
+        # 预取和连接预热也使用共享任务池
+        fetcher.use_executor(task_runner)
+    return fetcher
+
+@lru_cache(maxsize=None)
+def get_code_templates():
+    """示例代码模板（首次使用时才构建并缓存）"""
+    return {
+        "OpenAI": '''import openai
+
+client = openai.OpenAI(
+    api_key="YOUR_API_KEY",
+    base_url="https://api.openai.com/v1"
+)
+
+response = client.chat.completions.create(
+    model="gpt-4",
+    messages=[
+        {"role": "user", "content": "Hello!"}
+    ]
+)
+
+print(response.choices[0].message.content)''',
+
+        "Google": '''import google.generativeai as genai
+
+genai.configure(api_key="YOUR_API_KEY")
+model = genai.GenerativeModel('gemini-1.5-pro')
+
+response = model.generate_content("Hello!")
+print(response.text)''',
+
+        "Anthropic": '''import anthropic
+
+client = anthropic.Anthropic(
+    api_key="YOUR_API_KEY"
+)
+
+message = client.messages.create(
+    model="claude-3-sonnet",
+    max_tokens=1000,
+    messages=[
+        {"role": "user", "content": "Hello!"}
+    ]
+)
+
+print(message.content[0].text)''',
+
+        "智谱AI": '''from zhipuai import ZhipuAI
+
+client = ZhipuAI(api_key="YOUR_API_KEY")
+
+response = client.chat.completions.create(
+    model="glm-4",
+    messages=[
+        {"role": "user", "content": "Hello!"}
+    ]
+)
+
+print(response.choices[0].message.content)''',
+
+        "百度文心": '''import requests
+
+def call_ernie_api(prompt):
+    # 先获取access_token
+    token_url = "https://aip.baidubce.com/oauth/2.0/token"
+    token_params = {
+        "grant_type": "client_credentials",
+        "client_id": "YOUR_API_KEY",
+        "client_secret": "YOUR_SECRET_KEY"
+    }
+    
+    token_response = requests.post(token_url, params=token_params)
+    access_token = token_response.json()["access_token"]
+    
+    # 调用API
+    url = f"https://aip.baidubce.com/rpc/2.0/ai_custom/v1/wenxinworkshop/chat/completions?access_token={access_token}"
+    
+    payload = {
+        "messages": [{"role": "user", "content": prompt}]
+    }
+    
+    response = requests.post(url, json=payload)
+    return response.json()["result"]
+
+print(call_ernie_api("Hello!"))''',
+
+        "DeepSeek": '''import openai
+
+client = openai.OpenAI(
+    api_key="YOUR_API_KEY",
+    base_url="https://api.deepseek.com/v1"
+)
+
+response = client.chat.completions.create(
+    model="deepseek-chat",
+    messages=[
+        {"role": "user", "content": "Hello!"}
+    ]
+)
+
+print(response.choices[0].message.content)'''
+    }
+
 class ClickableField(tk.Frame):
     """支持双击编辑的字段组件"""
     
     def __init__(self, parent, label_text, field_type="entry", options=None, is_password=False, change_callback=None, **kwargs):
         super().__init__(parent, **kwargs)
         self.label_text = label_text
-        self.field_type = field_type  # "entry", "combobox", "text"
+        self.field_type = field_type  # "entry", "combobox", "picker", "text"
         self.options = options or []
+        self.model_index = None  # picker 模式的检索索引，选项变化后重建
+        self.filter_job = None
         self.is_password = is_password
         self.change_callback = change_callback
         self.value = ""
@@ -75,7 +211,7 @@ class ClickableField(tk.Frame):
         self.setup_ui()
         
         # 绑定事件
-        if self.field_type == "combobox":
+        if self.field_type in ("combobox", "picker"):
             self.bind("<Button-1>", self.on_single_click)
             self.display_label.bind("<Button-1>", self.on_single_click)
         else:
@@ -83,10 +219,12 @@ class ClickableField(tk.Frame):
             self.display_label.bind("<Double-Button-1>", self.on_double_click)
         
     def setup_ui(self):
-        """创建用户界面"""
+        """创建用户界面（显示区域只创建一次，编辑控件在首次编辑时创建后复用）"""
         # 创建主容器
         main_container = tk.Frame(self, bg="#2d2d2d")
         main_container.pack(fill="both", expand=True)
+        self.display_frame = main_container
+        self.edit_frame = None
         
         # 标签和按钮容器
         header_frame = tk.Frame(main_container, bg="#2d2d2d")
@@ -130,7 +268,7 @@ class ClickableField(tk.Frame):
             else:
                 display_text = self.value
         else:
-            if self.field_type == "combobox":
+            if self.field_type in ("combobox", "picker"):
                 display_text = f"点击选择 {self.label_text}..."
             else:
                 display_text = f"双击编辑 {self.label_text}..."
@@ -150,49 +288,62 @@ class ClickableField(tk.Frame):
             
         self.enter_edit_mode()
         
-    def enter_edit_mode(self):
-        """进入编辑模式"""
-        self.is_editing = True
-        
-        # 清除现有UI
-        for widget in self.winfo_children():
-            widget.destroy()
+    def build_edit_ui(self):
+        """创建编辑控件（仅在首次进入编辑模式时调用）"""
+        self.edit_frame = tk.Frame(self, bg="#2d2d2d")
         
         # 创建标签
-        self.label = tk.Label(self, text=self.label_text, 
+        edit_label = tk.Label(self.edit_frame, text=self.label_text,
                              bg="#2d2d2d", fg="#007acc", 
                              font=("Arial", 10, "bold"))
-        self.label.pack(anchor="w", pady=(0, 5))
+        edit_label.pack(anchor="w", pady=(0, 5))
         
         # 创建编辑控件
         if self.field_type == "entry":
-            self.edit_widget = tk.Entry(self, bg="#1a1a1a", fg="#e8e8e8",
+            self.edit_widget = tk.Entry(self.edit_frame, bg="#1a1a1a", fg="#e8e8e8",
                                        relief="flat", show="*" if self.is_password else "")
-            self.edit_widget.insert(0, self.value)
             self.edit_widget.bind("<Return>", self.save_and_exit)
             self.edit_widget.bind("<Escape>", self.cancel_edit)
             
         elif self.field_type == "combobox":
-            self.edit_widget = ttk.Combobox(self, values=self.options, state="readonly")
-            if self.value and self.value in self.options:
-                self.edit_widget.set(self.value)
-            elif self.options:
-                self.edit_widget.current(0)  # 默认选择第一个选项
+            self.edit_widget = ttk.Combobox(self.edit_frame, values=self.options, state="readonly")
             self.edit_widget.bind("<<ComboboxSelected>>", self.on_combobox_select)
             self.edit_widget.bind("<Escape>", self.cancel_edit)
             
+        elif self.field_type == "picker":
+            # 可搜索的选择器：输入框过滤，下方列表只渲染可见的匹配项
+            self.edit_widget = tk.Entry(self.edit_frame, bg="#1a1a1a", fg="#e8e8e8",
+                                       insertbackground="#e8e8e8", relief="flat")
+            self.edit_widget.bind("<KeyRelease>", self.on_picker_input)
+            self.edit_widget.bind("<Return>", self.on_picker_confirm)
+            self.edit_widget.bind("<Up>", self.on_picker_move)
+            self.edit_widget.bind("<Down>", self.on_picker_move)
+            self.edit_widget.bind("<Escape>", self.cancel_edit)
+        
         elif self.field_type == "text":
-            self.edit_widget = ScrolledText(self, height=4, bg="#1a1a1a", fg="#e8e8e8",
+            from tkinter.scrolledtext import ScrolledText
+            self.edit_widget = ScrolledText(self.edit_frame, height=4, bg="#1a1a1a", fg="#e8e8e8",
                                           wrap=tk.WORD, relief="flat")
-            self.edit_widget.insert("1.0", self.value)
             self.edit_widget.bind("<Control-Return>", self.save_and_exit)
             self.edit_widget.bind("<Escape>", self.cancel_edit)
             
         self.edit_widget.pack(fill="both", expand=True, pady=(0, 5))
-        self.edit_widget.focus_set()
+        
+        if self.field_type == "picker":
+            self.picker_list = tk.Listbox(self.edit_frame, height=8, bg="#1a1a1a", fg="#e8e8e8",
+                                          selectbackground="#007acc", relief="flat",
+                                          activestyle="none", exportselection=False)
+            self.picker_list.pack(fill="both", expand=True, pady=(0, 5))
+            self.picker_list.bind("<Double-Button-1>", self.on_picker_confirm)
+            self.picker_list.bind("<Return>", self.on_picker_confirm)
+            self.picker_list.bind("<Escape>", self.cancel_edit)
+            
+            self.picker_status = tk.Label(self.edit_frame, text="", bg="#2d2d2d", fg="#8a8a8a",
+                                          font=("Arial", 8))
+            self.picker_status.pack(anchor="w", pady=(0, 5))
         
         # 添加保存/取消按钮
-        button_frame = tk.Frame(self, bg="#2d2d2d")
+        button_frame = tk.Frame(self.edit_frame, bg="#2d2d2d")
         button_frame.pack(fill="x")
         
         save_btn = tk.Button(button_frame, text="✓", bg="#27ae60", fg="white",
@@ -208,6 +359,42 @@ class ClickableField(tk.Frame):
         cancel_btn = tk.Button(button_frame, text="✗", bg="#e74c3c", fg="white",
                              relief="flat", padx=10, command=self.cancel_edit)
         cancel_btn.pack(side="left")
+    
+    def enter_edit_mode(self):
+        """进入编辑模式"""
+        self.is_editing = True
+        
+        if self.edit_frame is None:
+            self.build_edit_ui()
+        
+        # 将当前值载入复用的编辑控件
+        if self.field_type == "entry":
+            self.edit_widget.delete(0, "end")
+            self.edit_widget.insert(0, self.value)
+        
+        elif self.field_type == "combobox":
+            self.edit_widget.configure(values=self.options)
+            if self.value and self.value in self.options:
+                self.edit_widget.set(self.value)
+            elif self.options:
+                self.edit_widget.current(0)  # 默认选择第一个选项
+            else:
+                self.edit_widget.set("")
+        
+        elif self.field_type == "picker":
+            self.edit_widget.delete(0, "end")
+            self.edit_widget.insert(0, self.value)
+            self.edit_widget.select_range(0, "end")
+            self.refresh_picker(query="")
+        
+        elif self.field_type == "text":
+            self.edit_widget.delete("1.0", "end")
+            self.edit_widget.insert("1.0", self.value)
+        
+        # 切换到编辑区域
+        self.display_frame.pack_forget()
+        self.edit_frame.pack(fill="both", expand=True)
+        self.edit_widget.focus_set()
         
     def on_combobox_select(self, event=None):
         """下拉框选择事件"""
@@ -221,15 +408,88 @@ class ClickableField(tk.Frame):
         # 自动退出编辑模式
         self.exit_edit_mode()
             
+    def get_model_index(self):
+        """获取选项的检索索引（选项变化后首次检索时重建）"""
+        if self.model_index is None:
+            self.model_index = ModelIndex(self.options)
+        return self.model_index
+    
+    def on_picker_input(self, event=None):
+        """输入变化时防抖过滤"""
+        if event is not None and event.keysym in ("Up", "Down", "Return", "Escape"):
+            return
+        if self.filter_job is not None:
+            self.after_cancel(self.filter_job)
+        self.filter_job = self.after(PICKER_DEBOUNCE_MS, self.refresh_picker)
+    
+    def refresh_picker(self, query=None):
+        """按输入内容刷新匹配列表"""
+        self.filter_job = None
+        if query is None:
+            query = self.edit_widget.get()
+        matches, total = self.get_model_index().search(query, PICKER_VISIBLE_LIMIT)
+        
+        self.picker_list.delete(0, "end")
+        if matches:
+            self.picker_list.insert("end", *matches)
+            if self.value in matches and not query:
+                index = matches.index(self.value)
+                self.picker_list.selection_set(index)
+                self.picker_list.see(index)
+        
+        status = f"共 {total} 个匹配"
+        if total > len(matches):
+            status += f"，显示前 {len(matches)} 个，继续输入以缩小范围"
+        self.picker_status.config(text=status)
+    
+    def on_picker_move(self, event):
+        """在输入框中用上下键移动列表选中项"""
+        size = self.picker_list.size()
+        if not size:
+            return "break"
+        current = self.picker_list.curselection()
+        step = 1 if event.keysym == "Down" else -1
+        index = max(0, min(size - 1, current[0] + step if current else 0))
+        self.picker_list.selection_clear(0, "end")
+        self.picker_list.selection_set(index)
+        self.picker_list.see(index)
+        return "break"
+    
+    def on_picker_confirm(self, event=None):
+        """确认选择：优先使用列表选中项，否则使用输入的文本（允许自定义模型名）"""
+        if self.filter_job is not None:
+            self.after_cancel(self.filter_job)
+            self.filter_job = None
+        selection = self.picker_list.curselection()
+        if selection:
+            self.value = self.picker_list.get(selection[0])
+        else:
+            self.value = self.edit_widget.get().strip()
+        
+        if self.change_callback:
+            self.change_callback(self.value)
+        
+        self.exit_edit_mode()
+        return "break"
+    
     def save_and_exit(self, event=None):
         """保存并退出编辑模式"""
+        if self.field_type == "picker":
+            self.on_picker_confirm()
+            return
+        previous = self.value
         if self.field_type == "text":
             self.value = self.edit_widget.get("1.0", "end-1c")
         else:
             self.value = self.edit_widget.get()
+        changed = self.value != previous
             
         self.exit_edit_mode()
         
+        # 输入框内容变化时通知父级（下拉框在选择时已通知）
+        if changed and self.field_type == "entry" and self.change_callback:
+            self.change_callback(self.value)
+        
     def cancel_edit(self, event=None):
         """取消编辑"""
         self.exit_edit_mode()
@@ -238,19 +498,11 @@ class ClickableField(tk.Frame):
         """退出编辑模式"""
         self.is_editing = False
         
-        # 清除所有子组件
-        for widget in self.winfo_children():
-            widget.destroy()
-        
-        # 重新创建UI
-        self.setup_ui()
+        # 隐藏编辑区域，恢复显示区域（控件保留以便下次复用）
+        self.edit_frame.pack_forget()
+        self.display_frame.pack(fill="both", expand=True)
+        self.update_display()
         
-    def update_options(self, new_options):
-        """更新下拉框选项"""
-        self.options = new_options
-        if self.is_editing and hasattr(self, 'edit_widget') and isinstance(self.edit_widget, ttk.Combobox):
-            self.edit_widget['values'] = new_options
-            
     def set_value(self, value):
         """设置字段值"""
         self.value = str(value) if value is not None else ""
@@ -269,16 +521,23 @@ class ClickableField(tk.Frame):
         """设置值"""
         self.value = value
         self.update_display()
+    
+    def clear(self):
+        """重置字段（对话框复用时调用）"""
+        if self.is_editing:
+            self.exit_edit_mode()
+        self.set_value("")
         
     def set_options(self, options):
         """设置下拉框选项"""
-        self.options = options
-        if self.is_editing and self.field_type == "combobox":
-            self.edit_widget.configure(values=options)
+        self.update_options(options)
     
     def update_options(self, new_options):
         """更新下拉框选项"""
         self.options = new_options or []
+        self.model_index = None
+        if self.is_editing and self.field_type == "picker":
+            self.refresh_picker()
         # 如果当前正在编辑且是combobox，更新选项
         if self.is_editing and self.field_type == "combobox" and hasattr(self, 'edit_widget'):
             current_value = self.edit_widget.get()
@@ -322,13 +581,40 @@ class ClickableField(tk.Frame):
 class APIKeyManager:
     """API密钥管理器主窗口"""
     
-    def __init__(self):
+    def __init__(self, vaults=None):
         self.root = tk.Tk()
         self.root.title("🔑 API Key Manager - 现代化密钥管理工具")
+        
+        # 同时打开多个密钥库时联合显示（第一个为主库，即 DB_FILE），行标识为“来源:ID”
+        self.federation = None
+        if vaults and len(vaults) > 1:
+            from vault_federation import VaultFederation
+            self.federation = VaultFederation(vaults)
+            self.root.title(f"🔑 API Key Manager - {len(self.federation)} 个密钥库")
         self.root.geometry("1200x700")
         self.root.configure(bg="#0f0f0f")
         self.root.minsize(800, 500)
         
+        # 行缓存（按行标识索引），当前加载顺序的行，排序状态：当前排序列、方向，以及各列的升序结果缓存
+        self.row_store = RowStore()
+        self.sort_column = None
+        self.sort_descending = False
+        self.display_rows = []
+        self.sort_cache = {}
+        self.filter_text = ""
+        self.filter_job = None
+        self.visible_count = 0
+        
+        # 复用的添加/编辑对话框（首次打开时创建）
+        self.edit_dialog = None
+        self.health_check_running = False
+        self.catalog_sync_running = False
+        self.backup_running = False
+        self.maintenance_running = False
+        self.last_input_time = time.monotonic()
+        self.refresh_task = None
+        self.refresh_generation = 0  # 每次刷新递增，丢弃过时的读取结果
+        
         # 设置窗口图标（如果有的话）
         try:
             # 可以添加ico文件路径
@@ -336,14 +622,46 @@ class APIKeyManager:
         except:
             pass
         
-        # 初始化数据库
-        self.init_database()
-        
         # 创建界面
         self.setup_ui()
+        startup_timer.mark("界面构建")
+        
+        # 记录最近一次键盘/鼠标操作，存储维护只在空闲时运行
+        self.root.bind_all("<KeyPress>", self.on_user_input, add="+")
+        self.root.bind_all("<ButtonPress>", self.on_user_input, add="+")
         
-        # 加载数据
-        self.refresh_data()
+        # 后台任务的结果由主循环定时取出执行
+        task_runner.attach(self.root)
+        
+        # 数据库初始化和数据加载推迟到首帧绘制之后，并在后台进行
+        self.update_status("正在加载数据...")
+        self.root.after_idle(self.load_initial_data)
+    
+    def load_initial_data(self):
+        """在后台初始化数据库，完成后加载数据"""
+        task_runner.schedule(self.init_database, priority=PRIORITY_HIGH, name="init_database",
+                             on_done=self.on_database_ready, on_error=self.on_refresh_error)
+    
+    def on_database_ready(self, result=None):
+        """数据库就绪：加载数据并启动各定时任务"""
+        def on_loaded():
+            startup_timer.mark("数据加载")
+            profiler.mark_startup()
+        
+        self.refresh_data(on_loaded=on_loaded)
+        self.schedule_health_check(HEALTH_CHECK_INITIAL_DELAY_MS)
+        self.root.after(CATALOG_POLL_INTERVAL_MS, self.poll_vendor_catalog)
+        self.root.after(CATALOG_SYNC_DELAY_MS, self.on_catalog_sync_timer)
+        self.root.after(BACKUP_INITIAL_DELAY_MS, self.on_backup_timer)
+        self.root.after(MAINTENANCE_INITIAL_DELAY_MS, self.on_maintenance_timer)
+    
+    def poll_vendor_catalog(self):
+        """定时检查厂商目录文件，修改后重新加载（监听者会收到通知）"""
+        try:
+            if vendor_catalog.reload_if_changed():
+                self.update_status(f"厂商目录已重新加载（{len(VENDOR_MODELS)} 个厂商）")
+        finally:
+            self.root.after(CATALOG_POLL_INTERVAL_MS, self.poll_vendor_catalog)
     
     def darken_color(self, color):
         """让颜色变暗，用于悬停效果"""
@@ -352,41 +670,55 @@ class APIKeyManager:
             "#ff9500": "#cc7700", 
             "#ff3b30": "#cc2e25",
             "#af52de": "#8a42b8",
-            "#34c759": "#2ba047"
+            "#34c759": "#2ba047",
+            "#5ac8fa": "#48a0c8",
+            "#ffcc00": "#cca300",
+            "#30b0c7": "#268d9f"
         }
         return color_map.get(color, color)
     
     def init_database(self):
         """初始化数据库"""
         con = sqlite3.connect(DB_FILE)
+        vault_db.init_schema(con)
         cur = con.cursor()
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS api_keys (
-                id INTEGER PRIMARY KEY,
-                vendor TEXT NOT NULL,
-                api_key TEXT NOT NULL,
-                api_url TEXT,
-                model TEXT,
-                notes TEXT,
-                example_code TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
         
         # 添加示例数据
         cur.execute("SELECT COUNT(*) FROM api_keys")
         if cur.fetchone()[0] == 0:
-            cur.execute(
-                "INSERT INTO api_keys (vendor, api_key, api_url, model, notes, example_code) VALUES (?, ?, ?, ?, ?, ?)",
-                ("OpenAI", "sk-1234567890", "https://api.openai.com/v1", "gpt-4", "Personal Account",
-                 "import openai\nclient = openai.OpenAI(api_key='YOUR_KEY')\nresponse = client.chat.completions.create(...)")
+            vault_db.insert_key(
+                con, "OpenAI", "sk-1234567890", "https://api.openai.com/v1", "gpt-4", "Personal Account",
+                "import openai\nclient = openai.OpenAI(api_key='YOUR_KEY')\nresponse = client.chat.completions.create(...)"
             )
             
         con.commit()
         con.close()
+        if self.federation is not None:
+            self.federation.prepare(self.federation.paths[1:])
         
     def setup_ui(self):
         """创建用户界面"""
+        # 菜单栏：不常用的数据维护操作
+        menubar = tk.Menu(self.root)
+        data_menu = tk.Menu(menubar, tearoff=0)
+        data_menu.add_command(label="💾 立即备份", command=self.backup_now)
+        data_menu.add_command(label="♻ 从快照恢复...", command=self.restore_backup)
+        data_menu.add_command(label="🧹 存储维护", command=self.maintain_storage)
+        data_menu.add_separator()
+        data_menu.add_command(label="🕘 查看密钥历史", command=self.show_key_history)
+        data_menu.add_separator()
+        data_menu.add_command(label="🔁 导出变更包...", command=self.export_changeset)
+        data_menu.add_command(label="🔁 应用变更包...", command=self.apply_changeset)
+        menubar.add_cascade(label="数据", menu=data_menu)
+        if profiler.enabled:
+            diagnostics_menu = tk.Menu(menubar, tearoff=0)
+            diagnostics_menu.add_command(label="▶ 开始采样（cProfile + tracemalloc）", command=self.start_profile_session)
+            diagnostics_menu.add_command(label="■ 停止采样并保存", command=self.stop_profile_session)
+            diagnostics_menu.add_separator()
+            diagnostics_menu.add_command(label="📄 保存耗时汇总", command=self.save_profile_report)
+            menubar.add_cascade(label="诊断", menu=diagnostics_menu)
+        self.root.configure(menu=menubar)
+        
         # 创建主容器，带有渐变效果
         main_container = tk.Frame(self.root, bg="#0f0f0f")
         main_container.pack(fill="both", expand=True)
@@ -430,7 +762,7 @@ class APIKeyManager:
             "font": ("Microsoft YaHei UI", 11, "bold"),
             "relief": "flat",
             "bd": 0,
-            "padx": 25,
+            "padx": 16,
             "pady": 8,
             "cursor": "hand2"
         }
@@ -441,14 +773,18 @@ class APIKeyManager:
             ("✏ 编辑", "#ff9500", self.edit_key),
             ("🗑 删除", "#ff3b30", self.delete_key),
             ("📋 复制", "#af52de", self.copy_api_key),
-            ("🔄 刷新", "#34c759", self.refresh_data)
+            ("🔄 刷新", "#34c759", self.refresh_data),
+            ("🩺 检查", "#5ac8fa", self.run_health_check),
+            ("🌐 同步", "#ffcc00", self.sync_catalog),
+            ("📥 导入", "#30b0c7", self.import_keys),
+            ("📤 导出", "#30b0c7", self.export_keys)
         ]
         
         # 创建按钮
         for text, color, command in buttons:
             btn = tk.Button(button_container, text=text, bg=color, fg="white",
                           command=command, **button_style)
-            btn.pack(side="left", padx=8)
+            btn.pack(side="left", padx=6)
             
             # 添加悬停效果
             def on_enter(e, btn=btn, original_color=color):
@@ -460,6 +796,19 @@ class APIKeyManager:
             btn.bind("<Enter>", on_enter)
             btn.bind("<Leave>", on_leave)
         
+        # 筛选框：按厂商、模型、备注、API地址筛选（在行缓存中进行，不查询数据库）
+        filter_frame = tk.Frame(content_frame, bg="#0f0f0f")
+        filter_frame.pack(fill="x", pady=(0, 10))
+        tk.Label(filter_frame, text="🔍 筛选", bg="#0f0f0f", fg="#8a8a8a",
+                 font=("Microsoft YaHei UI", 10)).pack(side="left", padx=(2, 8))
+        self.filter_var = tk.StringVar()
+        self.filter_entry = tk.Entry(filter_frame, textvariable=self.filter_var,
+                                     bg="#2a2a2a", fg="#e8e8e8", insertbackground="#00d4ff",
+                                     relief="flat", font=("Microsoft YaHei UI", 10))
+        self.filter_entry.pack(side="left", fill="x", expand=True, ipady=4)
+        self.filter_entry.bind("<KeyRelease>", self.on_filter_input)
+        self.filter_entry.bind("<Escape>", self.clear_filter)
+        
         # 表格框架，现代化设计
         table_frame = tk.Frame(content_frame, bg="#1e1e1e", relief="flat", bd=1)
         table_frame.pack(fill="both", expand=True)
@@ -491,9 +840,10 @@ class APIKeyManager:
                  background=[('active', '#404040')])
         
         # 创建Treeview
-        columns = ("ID", "厂商", "模型", "备注", "API URL", "示例代码")
+        columns = ("ID", "厂商", "模型", "备注", "API URL", "示例代码", "创建时间", "状态", "延迟", "检查时间", "来源")
         self.tree = ttk.Treeview(table_frame, columns=columns, show="headings", 
-                               height=15, style="Modern.Treeview")
+                               height=15, style="Modern.Treeview",
+                               selectmode="extended")  # Ctrl/Shift+单击多选
         
         # 配置列标题
         column_configs = {
@@ -502,12 +852,24 @@ class APIKeyManager:
             "模型": ("🤖 模型", 160),
             "备注": ("📝 备注", 200), 
             "API URL": ("🌐 API URL", 280),
-            "示例代码": ("💻 代码", 120)
+            "示例代码": ("💻 代码", 120),
+            "创建时间": ("🕒 创建时间", 150),
+            "状态": ("🩺 状态", 100),
+            "延迟": ("⏱ 延迟", 80),
+            "检查时间": ("🕑 检查时间", 120),
+            "来源": ("🗄 来源", 110)
         }
+        self.column_titles = {col_id: text for col_id, (text, _) in column_configs.items()}
         
         for col_id, (text, width) in column_configs.items():
-            self.tree.heading(col_id, text=text)
+            if col_id in SORTABLE_COLUMNS:
+                self.tree.heading(col_id, text=text,
+                                  command=lambda c=col_id: self.sort_by_column(c))
+            else:
+                self.tree.heading(col_id, text=text)
             self.tree.column(col_id, width=width, minwidth=50)
+        if self.federation is None:
+            self.tree.configure(displaycolumns=columns[:-1])
         
         # 现代化滚动条
         scrollbar_frame = tk.Frame(table_frame, bg="#1e1e1e", width=15)
@@ -521,7 +883,8 @@ class APIKeyManager:
         
         # 添加表格交互效果
         self.tree.bind("<Double-1>", self.on_item_double_click)
-        self.tree.bind("<Button-1>", self.on_item_click)
+        self.tree.bind("<<TreeviewSelect>>", self.on_item_click)
+        self.tree.bind("<Control-a>", self.select_all)
         
         # 底部状态栏
         status_frame = tk.Frame(main_container, bg="#1a1a1a", height=30)
@@ -533,63 +896,618 @@ class APIKeyManager:
                                    font=("Microsoft YaHei UI", 9))
         self.status_label.pack(side="left", padx=15, pady=5)
         
-    def refresh_data(self):
-        """刷新数据"""
+    def refresh_data(self, on_loaded=None):
+        """在后台读取数据库，读取完成后刷新表格"""
         self.update_status("正在刷新数据...")
-        
-        # 清空现有数据
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-            
-        # 从数据库加载数据
-        try:
+        if self.refresh_task is not None:
+            self.refresh_task.cancel()
+        self.refresh_generation += 1
+        generation = self.refresh_generation
+        sort_column, descending = self.sort_column, self.sort_descending
+        started = profiler.begin()
+        
+        def apply(result):
+            if generation == self.refresh_generation:
+                self.refresh_task = None
+                self.apply_rows(*result)
+                profiler.record("refresh_data", started)
+                if on_loaded:
+                    on_loaded()
+        
+        self.refresh_task = task_runner.schedule(self.load_rows, sort_column, descending,
+                                                 priority=PRIORITY_HIGH, name="refresh_data",
+                                                 on_done=apply, on_error=self.on_refresh_error)
+    
+    @profiler.profiled("refresh_data.load")
+    def load_rows(self, sort_column, descending):
+        """（后台线程）读取所有记录生成行缓存，返回 (行, 数据库排序所依据的列和方向)"""
+        if self.federation is not None:
+            # 多个密钥库：一条语句读取联合视图（各库依次按ID顺序返回，不加 ORDER BY 以免整体再排序一次）
+            con = self.federation.connect()
+            table, query, default_order = "all_keys", FEDERATED_ROW_QUERY, ""
+        else:
             con = sqlite3.connect(DB_FILE)
+            table, query, default_order = "api_keys", ROW_QUERY, "ORDER BY id"
+        try:
             cur = con.cursor()
-            cur.execute("SELECT id, vendor, model, notes, api_url, example_code FROM api_keys ORDER BY id")
+            cur.execute(f"SELECT COUNT(*) FROM {table}")
+            total = cur.fetchone()[0]
             
-            row_count = 0
-            for row in cur.fetchall():
-                item_id, vendor, model, notes, api_url, example_code = row
-                
-                # 处理显示文本，防止None值
-                notes = notes or ""
-                api_url = api_url or ""
-                example_code = example_code or ""
-                
-                notes_display = notes[:30] + "..." if notes and len(notes) > 30 else notes
-                url_display = api_url[:40] + "..." if api_url and len(api_url) > 40 else api_url
-                code_display = "✓ 有代码" if example_code.strip() else "○ 无代码"
-                
-                # 插入数据，交替行颜色
-                tags = ('evenrow',) if row_count % 2 == 0 else ('oddrow',)
-                self.tree.insert("", "end", values=(
-                    item_id, vendor, model, notes_display, url_display, code_display
-                ), tags=tags)
-                row_count += 1
-                
+            # 大表直接使用索引排序，小表在内存中排序
+            use_sql_sort = sort_column is not None and self.uses_sql_sort(total)
+            cur.execute(query + " "
+                        + (self.order_by_clause(sort_column, descending) if use_sql_sort else default_order))
+            rows = [KeyRow(*row) for row in cur]
+        finally:
             con.close()
+        return rows, ((sort_column, descending) if use_sql_sort else None)
+                
+    def apply_rows(self, rows, sql_order):
+        """（界面线程）用读取结果刷新行缓存和表格"""
+        self.row_store.load(rows)
+        self.display_rows = rows
+            
+        # 数据已变化，清空排序缓存
+        self.sort_cache = {}
+        if self.sort_column is not None and sql_order != (self.sort_column, self.sort_descending):
+            self.populate_tree(self.sorted_rows(self.sort_column, self.sort_descending))
+        else:
+            self.populate_tree(self.display_rows)
+            
+        message = f"共加载 {len(self.display_rows)} 条记录"
+        if self.federation is not None:
+            message += f"（{len(self.federation)} 个密钥库）"
+        self.update_status(self.count_message(message))
+            
+    def on_refresh_error(self, error):
+        """读取数据库失败"""
+        self.update_status(f"刷新失败: {str(error)}")
+        messagebox.showerror("错误", f"刷新数据失败: {str(error)}")
+    
+    def populate_tree(self, rows):
+        """按给定顺序重建表格内容（有筛选条件时只显示匹配的行）"""
+        # 清空现有数据
+        self.tree.delete(*self.tree.get_children())
+        if self.filter_text:
+            rows = self.row_store.filter(rows, self.filter_text)
+        self.visible_count = len(rows)
+        
+        for index, row in enumerate(rows):
+            # 插入数据，交替行颜色
+            tags = ('evenrow',) if index % 2 == 0 else ('oddrow',)
+            self.tree.insert("", "end", iid=row.iid, values=row.values(), tags=tags)
+        
+        # 配置行颜色
+        self.tree.tag_configure('evenrow', background='#2a2a2a')
+        self.tree.tag_configure('oddrow', background='#323232')
+    
+    def visible_rows(self):
+        """当前排序下的全部行（筛选在 populate_tree 中进行）"""
+        if self.sort_column is not None and not self.uses_sql_sort(len(self.display_rows)):
+            return self.sorted_rows(self.sort_column, self.sort_descending)
+        return self.display_rows
+    
+    def count_message(self, message):
+        """有筛选条件时在状态栏消息后附加匹配数"""
+        if self.filter_text:
+            return f"{message}，筛选出 {self.visible_count} 条"
+        return message
+    
+    def on_filter_input(self, event=None):
+        """筛选框输入防抖，停止输入后再筛选"""
+        if self.filter_job is not None:
+            self.root.after_cancel(self.filter_job)
+        self.filter_job = self.root.after(FILTER_DEBOUNCE_MS, self.apply_filter)
+    
+    def apply_filter(self):
+        """按筛选框内容重建表格"""
+        self.filter_job = None
+        text = self.filter_var.get().strip()
+        if text == self.filter_text:
+            return
+        self.filter_text = text
+        self.populate_tree(self.visible_rows())
+        self.update_status(self.count_message(f"共 {len(self.row_store)} 条记录"))
+    
+    def clear_filter(self, event=None):
+        """Esc 清空筛选"""
+        self.filter_var.set("")
+        self.apply_filter()
+    
+    def schedule_health_check(self, delay_ms=HEALTH_CHECK_INTERVAL_MS):
+        """定时触发后台健康检查"""
+        self.root.after(delay_ms, self.on_health_check_timer)
+    
+    def on_health_check_timer(self):
+        """定时器回调：检查过期的密钥并安排下一次检查"""
+        self.run_health_check(quiet=True)
+        self.run_endpoint_selection()
+        self.schedule_health_check()
+    
+    def run_endpoint_selection(self):
+        """在后台测量过期的API地址，为配置了备用地址的密钥切换到最快的可用地址"""
+        def select_in_background():
+            from endpoint_bench import EndpointBench
+            return EndpointBench(DB_FILE).refresh()
+        
+        def finish(switched):
+            if switched:
+                self.refresh_data()
+                self.update_status(f"🌐 已为 {len(switched)} 个密钥切换到更快的API地址")
+        
+        batch_runner.schedule(select_in_background, priority=PRIORITY_LOW, name="endpoint_selection",
+                              on_done=finish,
+                              on_error=lambda e: self.update_status(f"⚠️ API地址测速失败: {str(e)}"))
+    
+    def run_health_check(self, quiet=False):
+        """在后台检查结果已过期的密钥，逐个更新状态列，完成后刷新"""
+        if self.health_check_running:
+            if not quiet:
+                self.update_status("健康检查正在进行中...")
+            return
+        self.health_check_running = True
+        if not quiet:
+            self.update_status("🩺 正在检查密钥状态...")
+        
+        def update_row(result):
+            iid = self.row_iid(DB_FILE, result.key_id)
+            self.row_store.set_health(iid, result.status, result.latency_ms, result.checked_at)
+            if self.tree.exists(iid):
+                status, latency, checked = format_health(result.status, result.latency_ms, result.checked_at)
+                self.tree.set(iid, "状态", status)
+                self.tree.set(iid, "延迟", latency)
+                self.tree.set(iid, "检查时间", checked)
+        
+        def check_in_background():
+            from health_checker import HealthChecker
+            return HealthChecker(DB_FILE).check_due(on_result=lambda result: task_runner.post(update_row, result))
+            
+        def finish(results):
+            self.health_check_running = False
+            self.refresh_data()
+            self.update_status(f"🩺 已检查 {len(results)} 个密钥" if results else "🩺 所有密钥的检查结果均未过期")
+        
+        def fail(error):
+            self.health_check_running = False
+            self.update_status(f"健康检查失败: {str(error)}")
+        
+        batch_runner.schedule(check_in_background, priority=PRIORITY_LOW, name="health_check",
+                              on_done=finish, on_error=fail)
+    
+    def on_catalog_sync_timer(self):
+        """启动后若厂商目录已超过有效期，则在后台同步一次"""
+        from catalog_sync import catalog_age_seconds, SYNC_MAX_AGE_SECONDS
+        if catalog_age_seconds() > SYNC_MAX_AGE_SECONDS:
+            self.sync_catalog(quiet=True)
+    
+    def sync_catalog(self, quiet=False):
+        """用已保存的密钥在后台刷新各厂商的模型列表，有变化时写回厂商目录文件"""
+        if self.catalog_sync_running:
+            if not quiet:
+                self.update_status("厂商目录正在同步中...")
+            return
+        self.catalog_sync_running = True
+        if not quiet:
+            self.update_status("🌐 正在同步厂商模型目录...")
+        
+        def sync_in_background():
+            from catalog_sync import CatalogSync
+            return CatalogSync(DB_FILE).run()
             
-            # 配置行颜色
-            self.tree.tag_configure('evenrow', background='#2a2a2a')
-            self.tree.tag_configure('oddrow', background='#323232')
+        def finish(result):
+            changes, failed = result
+            self.catalog_sync_running = False
+            vendor_catalog.reload_if_changed()
+            if changes:
+                summary = "，".join(f"{c.vendor} +{len(c.added)}/-{len(c.removed)}" for c in changes)
+                message = f"🌐 厂商目录已更新: {summary}"
+            else:
+                message = "🌐 厂商目录没有变化"
+            if failed:
+                message += f"（获取失败: {', '.join(failed)}）"
+            if not quiet or changes:
+                self.update_status(message)
+        
+        def fail(error):
+            self.catalog_sync_running = False
+            self.update_status(f"厂商目录同步失败: {str(error)}")
+    
+        batch_runner.schedule(sync_in_background, priority=PRIORITY_LOW, name="catalog_sync",
+                              on_done=finish, on_error=fail)
+    
+    def on_backup_timer(self):
+        """定时器回调：最新快照已过期时在后台创建快照，并安排下一次检查"""
+        self.backup_now(quiet=True)
+        self.root.after(BACKUP_CHECK_INTERVAL_MS, self.on_backup_timer)
+    
+    def backup_now(self, quiet=False):
+        """用在线备份接口在后台创建快照（分步复制，不阻塞写入和界面）"""
+        if self.backup_running:
+            if not quiet:
+                self.update_status("备份正在进行中...")
+            return
+        self.backup_running = True
+        if not quiet:
+            self.update_status("💾 正在备份...")
+        
+        def backup_in_background():
+            from vault_backup import VaultBackup
+            backup = VaultBackup(DB_FILE)
+            if quiet and not backup.snapshot_due():
+                return None
+            return backup.snapshot()
+        
+        def finish(snapshot):
+            self.backup_running = False
+            if snapshot is not None:
+                self.update_status(f"💾 快照已保存: {snapshot.path}（{snapshot.size / 1024:.0f} KB）")
+        
+        def fail(error):
+            self.backup_running = False
+            self.update_status(f"备份失败: {str(error)}")
+            if not quiet:
+                messagebox.showerror("错误", f"备份失败: {str(error)}")
+        
+        batch_runner.schedule(backup_in_background, priority=PRIORITY_LOW, name="backup",
+                              on_done=finish, on_error=fail)
+    
+    def on_user_input(self, event=None):
+        self.last_input_time = time.monotonic()
+    
+    def on_maintenance_timer(self):
+        """定时器回调：界面空闲时在后台运行到期的存储维护，并安排下一次检查"""
+        if time.monotonic() - self.last_input_time >= MAINTENANCE_IDLE_SECONDS:
+            self.maintain_storage(quiet=True)
+        self.root.after(MAINTENANCE_CHECK_INTERVAL_MS, self.on_maintenance_timer)
+    
+    def maintain_storage(self, quiet=False):
+        """
+        在后台回收空闲页、更新统计信息、快速检查完整性（回收分小步进行，不阻塞界面和写入）；
+        手动运行时执行全部维护项并显示存储状态
+        """
+        if self.maintenance_running:
+            if not quiet:
+                self.update_status("存储维护正在进行中...")
+            return
+        self.maintenance_running = True
+        if not quiet:
+            self.update_status("🧹 正在维护存储...")
+        
+        def maintain_in_background():
+            from vault_maintenance import VaultMaintenance
+            maintenance = VaultMaintenance(DB_FILE)
+            result = maintenance.run(force=not quiet)
+            return result, None if quiet else maintenance.stats()
+        
+        def finish(outcome):
+            self.maintenance_running = False
+            result, stats = outcome
+            summary = result.describe()
+            if summary:
+                self.update_status(f"🧹 {summary}")
+            if result.check is not None and not result.check[0]:
+                messagebox.showwarning("完整性检查", f"数据库完整性检查未通过：\n{result.check[1]}\n\n"
+                                       "建议通过菜单“数据 → 从快照恢复”恢复到最近的快照。")
+            elif stats is not None:
+                messagebox.showinfo("存储维护", f"{summary}\n\n{stats.describe()}")
+                if stats.auto_vacuum != "incremental":
+                    self.confirm_storage_conversion(stats)
+        
+        def fail(error):
+            self.maintenance_running = False
+            self.update_status(f"存储维护失败: {str(error)}")
+            if not quiet:
+                messagebox.showerror("错误", f"存储维护失败: {str(error)}")
+        
+        batch_runner.schedule(maintain_in_background, priority=PRIORITY_LOW, name="maintenance",
+                              on_done=finish, on_error=fail)
+    
+    def confirm_storage_conversion(self, stats):
+        """旧数据库未启用增量回收：确认后在后台整体整理一次（VACUUM 重写整个文件，期间其他程序的写入会等待）"""
+        if not messagebox.askyesno("启用增量回收",
+                                   f"当前数据库未启用增量回收，空闲页无法自动归还（{stats.free_pages} 页）。\n"
+                                   f"是否现在整体整理一次数据库（{stats.file_size / 1024 / 1024:.1f} MB）？\n"
+                                   "整理期间其他程序的写入会等待，之后的回收都分小步进行。"):
+            return
+        self.maintenance_running = True
+        self.update_status("🧹 正在整理数据库...")
+        
+        def convert_in_background():
+            from vault_maintenance import VaultMaintenance
+            return VaultMaintenance(DB_FILE).convert()
+        
+        def finish(converted):
+            self.maintenance_running = False
+            self.update_status("🧹 已启用增量回收" if converted else "🧹 数据库已是增量回收模式")
+        
+        def fail(error):
+            self.maintenance_running = False
+            self.update_status(f"整理数据库失败: {str(error)}")
+            messagebox.showerror("错误", f"整理数据库失败: {str(error)}")
+        
+        batch_runner.schedule(convert_in_background, priority=PRIORITY_LOW, name="maintenance",
+                              on_done=finish, on_error=fail)
+    
+    def restore_backup(self):
+        """选择快照恢复数据库（恢复前会自动保存当前数据库的快照）"""
+        from tkinter import filedialog
+        from vault_backup import default_backup_dir
+        path = filedialog.askopenfilename(
+            title="选择要恢复的快照",
+            initialdir=default_backup_dir(DB_FILE),
+            filetypes=[("数据库快照", "*.db"), ("所有文件", "*.*")]
+        )
+        if not path:
+            return
+        if not messagebox.askyesno("确认恢复", f"用快照替换当前的全部数据？\n\n{path}\n\n恢复前会自动保存当前数据的快照。"):
+            return
+        self.update_status("♻ 正在校验并恢复快照...")
+        
+        def restore_in_background():
+            from vault_backup import VaultBackup
+            return VaultBackup(DB_FILE).restore(path)
+        
+        def finish(safety):
+            self.refresh_data()
+            self.update_status("♻ 已从快照恢复")
+            messagebox.showinfo("恢复完成", "已从快照恢复" + (f"\n\n恢复前的数据已保存到:\n{safety}" if safety else ""))
+        
+        def fail(error):
+            self.update_status(f"恢复失败: {str(error)}")
+            messagebox.showerror("错误", f"恢复失败: {str(error)}")
+        
+        task_runner.schedule(restore_in_background, priority=PRIORITY_HIGH, name="restore_backup",
+                             on_done=finish, on_error=fail)
+    
+    def show_key_history(self):
+        """在新窗口中显示选中密钥的变更历史（时间、操作、操作者、变化的字段）"""
+        iids = self.selected_iids()
+        if len(iids) != 1:
+            messagebox.showwarning("警告", "请选择一个密钥查看历史")
+            return
+        db_file, key_id = self.key_ref(iids[0])
+        
+        def load_in_background():
+            from vault_journal import VaultJournal
+            return VaultJournal(db_file).history(key_id)
+        
+        def show(entries):
+            from vault_journal import OP_DISPLAY
+            window = tk.Toplevel(self.root)
+            window.title(f"🕘 密钥 #{key_id} 的变更历史")
+            window.geometry("900x400")
+            window.configure(bg="#0f0f0f")
             
-            self.update_status(f"共加载 {row_count} 条记录")
+            columns = ("时间", "操作", "操作者", "变化")
+            tree = ttk.Treeview(window, columns=columns, show="headings", style="Modern.Treeview")
+            for column, width in zip(columns, (150, 60, 180, 500)):
+                tree.heading(column, text=column)
+                tree.column(column, width=width, stretch=(column == "变化"))
+            scrollbar = ttk.Scrollbar(window, orient="vertical", command=tree.yview)
+            tree.configure(yscrollcommand=scrollbar.set)
+            scrollbar.pack(side="right", fill="y")
+            tree.pack(fill="both", expand=True, padx=10, pady=10)
             
-        except Exception as e:
-            self.update_status(f"刷新失败: {str(e)}")
-            messagebox.showerror("错误", f"刷新数据失败: {str(e)}")
+            for entry in entries:
+                changes = entry.changes()
+                changes.pop("fingerprint", None)
+                if entry.op == "update":
+                    text = "；".join(f"{field}: {old or '空'} → {new or '空'}" for field, (old, new) in changes.items())
+                else:
+                    values = entry.new or entry.old or {}
+                    text = "；".join(f"{field}: {values[field]}" for field in ("vendor", "api_key", "model", "api_url")
+                                    if values.get(field))
+                tree.insert("", "end", values=(
+                    time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry.changed_at)),
+                    OP_DISPLAY.get(entry.op, entry.op), entry.actor or "未知", text))
+            if not entries:
+                tree.insert("", "end", values=("", "", "", "没有变更记录"))
+        
+        task_runner.schedule(load_in_background, priority=PRIORITY_HIGH, name="key_history",
+                             on_done=show, on_error=lambda e: messagebox.showerror("错误", f"读取历史失败: {str(e)}"))
+    
+    def start_profile_session(self):
+        """开始 cProfile 和 tracemalloc 采样（诊断模式）"""
+        if profiler.session_running:
+            self.update_status("采样已在进行中")
+            return
+        profiler.start_session()
+        self.update_status("▶ 正在采样，重现问题后选择「诊断 → 停止采样并保存」")
+    
+    def stop_profile_session(self):
+        """结束采样，把结果和耗时汇总写入诊断目录"""
+        if not profiler.session_running:
+            self.update_status("没有进行中的采样")
+            return
+        try:
+            paths = profiler.stop_session() + [profiler.write_report()]
+        except OSError as e:
+            messagebox.showerror("错误", f"保存诊断文件失败: {str(e)}")
+            return
+        self.update_status(f"■ 采样已保存到 {profiler.directory}")
+        messagebox.showinfo("采样完成", "已保存诊断文件（可附在问题反馈中）:\n\n" + "\n".join(paths))
+    
+    def save_profile_report(self):
+        """把各操作耗时汇总写入诊断目录"""
+        try:
+            path = profiler.write_report()
+        except OSError as e:
+            messagebox.showerror("错误", f"保存耗时汇总失败: {str(e)}")
+            return
+        self.update_status(f"📄 耗时汇总已保存到 {path}")
+        messagebox.showinfo("耗时汇总", f"{profiler.format_summary()}\n\n已保存到 {path}")
+    
+    def export_changeset(self):
+        """把自上次同步以来的变更导出为变更包，供另一台机器应用"""
+        from tkinter import filedialog
+        peer = simpledialog.askstring("导出变更包", "发给哪台机器？（机器名称或ID，同一台机器每次使用相同的名称）",
+                                      parent=self.root)
+        if not peer or not peer.strip():
+            return
+        path = filedialog.asksaveasfilename(
+            title="保存变更包",
+            defaultextension=".changeset.gz",
+            initialfile=f"apikeys-{peer.strip()}.changeset.gz",
+            filetypes=[("变更包", "*.changeset.gz"), ("所有文件", "*.*")]
+        )
+        if not path:
+            return
+        
+        def export_in_background():
+            from vault_sync import VaultSync
+            return VaultSync(DB_FILE).export_bundle(path, peer.strip())
+        
+        def finish(result):
+            records, tombstones = result
+            self.update_status(f"🔁 已导出 {records} 条变更、{tombstones} 个删除到 {path}")
+            messagebox.showinfo("导出完成", f"已导出 {records} 条变更、{tombstones} 个删除\n\n⚠ 变更包包含明文密钥，请妥善保管")
+        
+        task_runner.schedule(export_in_background, priority=PRIORITY_HIGH, name="export_changeset",
+                             on_done=finish, on_error=lambda e: messagebox.showerror("错误", f"导出失败: {str(e)}"))
+    
+    def apply_changeset(self):
+        """应用另一台机器导出的变更包（两边都修改过的记录以较晚的修改为准）"""
+        from tkinter import filedialog
+        path = filedialog.askopenfilename(
+            title="选择变更包",
+            filetypes=[("变更包", "*.changeset.gz"), ("所有文件", "*.*")]
+        )
+        if not path:
+            return
+        self.update_status("🔁 正在应用变更包...")
+        
+        def apply_in_background():
+            from vault_sync import VaultSync
+            return VaultSync(DB_FILE).apply_bundle(path)
+        
+        def finish(result):
+            self.refresh_data()
+            message = (f"新增 {result.inserted}，更新 {result.updated}，删除 {result.deleted}，"
+                       f"以本机为准 {result.skipped}，无变化 {result.unchanged}")
+            if result.gap:
+                message += "\n\n⚠ 与上次应用的变更包之间可能缺少变更包，请让对方重新导出"
+            self.update_status(f"🔁 {message.splitlines()[0]}")
+            messagebox.showinfo("同步完成", message)
+        
+        def fail(error):
+            self.update_status(f"应用变更包失败: {str(error)}")
+            messagebox.showerror("错误", f"应用变更包失败: {str(error)}")
+        
+        task_runner.schedule(apply_in_background, priority=PRIORITY_HIGH, name="apply_changeset",
+                             on_done=finish, on_error=fail)
+    
+    def order_by_clause(self, sort_column, descending):
+        """生成与索引一致的 ORDER BY 子句（顺序与内存排序的 make_sort_key 相同）"""
+        expression = vault_db.sort_expression(SORTABLE_COLUMNS[sort_column])
+        direction = " DESC" if descending else ""
+        return f"ORDER BY {expression}{direction}, id{direction}"
+    
+    def uses_sql_sort(self, count):
+        """
+        是否由数据库排序：单个密钥库的大表使用排序索引；联合视图上的 ORDER BY 要先物化整个 UNION ALL 视图再排序，
+        多个密钥库时总在内存的行缓存中排序
+        """
+        return self.federation is None and count > SQL_SORT_THRESHOLD
+    
+    def sorted_rows(self, column, descending):
+        """返回内存中排序后的行，升序结果按列缓存，切换方向时直接反转"""
+        ascending = self.sort_cache.get(column)
+        if ascending is None:
+            field = SORTABLE_COLUMNS[column]
+            keys = [(make_sort_key(column, getattr(row, field)), row.id) for row in self.display_rows]
+            order = sorted(range(len(keys)), key=keys.__getitem__)
+            ascending = [self.display_rows[i] for i in order]
+            self.sort_cache[column] = ascending
+        return ascending[::-1] if descending else ascending
+    
+    def sort_by_column(self, column):
+        """点击列标题排序，再次点击切换升降序"""
+        flipped = self.sort_column == column
+        if flipped:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_column = column
+            self.sort_descending = False
+        
+        # 更新列标题上的排序指示
+        for col_id, text in self.column_titles.items():
+            if col_id == column:
+                text += " ▼" if self.sort_descending else " ▲"
+            self.tree.heading(col_id, text=text)
+        
+        if self.uses_sql_sort(len(self.display_rows)):
+            if flipped:
+                # 数据已按该列排序，切换方向只需反转
+                self.display_rows.reverse()
+                self.populate_tree(self.display_rows)
+            else:
+                self.refresh_data()
+        else:
+            self.populate_tree(self.sorted_rows(column, self.sort_descending))
     
     def on_item_click(self, event):
-        """单击表格项时的处理"""
+        """选择变化时更新状态栏"""
         selection = self.tree.selection()
-        if selection:
-            item = selection[0]
-            values = self.tree.item(item)["values"]
-            if values:
-                self.update_status(f"已选择: {values[1]} - {values[2]}")
+        if len(selection) > 1:
+            self.update_status(f"已选择 {len(selection)} 项")
+        elif selection:
+            row = self.row_store.get(selection[0])
+            if row is not None:
+                self.update_status(f"已选择: {row.vendor} - {row.model}")
         else:
             self.update_status("准备就绪")
     
+    def select_all(self, event=None):
+        """选中所有行"""
+        self.tree.selection_set(self.tree.get_children())
+        return "break"
+    
+    def selected_iids(self):
+        """选中行的标识（按表格顺序）"""
+        return list(self.tree.selection())
+    
+    def row_iid(self, db_file, key_id):
+        """密钥库中某条记录的行标识"""
+        return self.federation.iid(db_file, key_id) if self.federation else str(key_id)
+    
+    def key_ref(self, iid):
+        """行标识 -> (所在的密钥库文件, ID)"""
+        return self.federation.split(iid) if self.federation else (DB_FILE, int(iid))
+    
+    def group_by_vault(self, iids):
+        """把行标识按所在的密钥库分组：文件 -> ID 列表"""
+        from vault_federation import group_by_vault
+        return group_by_vault(self.federation, iids, DB_FILE)
+    
+    def remove_rows(self, iids):
+        """批量删除后只从表格和缓存中移除这些行，不重新加载"""
+        removed = set(iids)
+        existing = [iid for iid in iids if self.tree.exists(iid)]
+        if existing:
+            self.tree.delete(*existing)
+        self.row_store.remove(removed)
+        self.display_rows = [row for row in self.display_rows if row.iid not in removed]
+        self.sort_cache = {column: [row for row in rows if row.iid not in removed]
+                           for column, rows in self.sort_cache.items()}
+        self.visible_count -= len(existing)
+    
+    def update_rows(self, iids, fields):
+        """批量修改后更新行缓存，只重绘这些行的单元格"""
+        rows = self.row_store.update(iids, fields)
+        sort_fields = {SORTABLE_COLUMNS[self.sort_column]} if self.sort_column is not None else set()
+        if sort_fields & set(fields):
+            # 修改了当前排序列，需要重新排序
+            self.sort_cache = {}
+            self.populate_tree(self.sorted_rows(self.sort_column, self.sort_descending))
+            return
+        if self.filter_text:
+            # 修改后的行可能不再匹配筛选条件
+            self.populate_tree(self.visible_rows())
+            return
+        for row in rows:
+            if self.tree.exists(row.iid):
+                self.tree.item(row.iid, values=row.values())
+    
     def update_status(self, message):
         """更新状态栏信息"""
         if hasattr(self, 'status_label'):
@@ -597,67 +1515,194 @@ class APIKeyManager:
     
     def add_key(self):
         """添加新密钥"""
-        AddEditDialog(self.root, self, title="添加新的 API 密钥")
+        self.open_dialog("添加新的 API 密钥")
         
     def edit_key(self):
-        """编辑选中的密钥"""
+        """编辑选中的密钥（选中多项时批量修改）"""
         selection = self.tree.selection()
         if not selection:
             messagebox.showwarning("警告", "请先选择要编辑的项目")
             return
+        if len(selection) > 1:
+            self.bulk_edit_keys()
+            return
             
-        item = selection[0]
-        key_id = self.tree.item(item)["values"][0]
+        db_file, key_id = self.key_ref(selection[0])
         
-        # 从数据库获取完整数据
-        con = sqlite3.connect(DB_FILE)
-        cur = con.cursor()
-        cur.execute("SELECT * FROM api_keys WHERE id = ?", (key_id,))
-        data = cur.fetchone()
-        con.close()
+        # 在后台从记录所在的数据库获取完整数据和行版本（行缓存中不含密钥和示例代码），读完即关闭连接，编辑期间不持有锁
+        def read_in_background():
+            con = sqlite3.connect(db_file)
+            try:
+                return vault_db.read_key(con, key_id)
+            finally:
+                con.close()
+        
+        def finish(data):
+            if data:
+                self.open_dialog("编辑 API 密钥", edit_data=data, db_file=db_file)
+            else:
+                messagebox.showerror("错误", "该记录已被删除")
         
-        if data:
-            AddEditDialog(self.root, self, title="编辑 API 密钥", edit_data=data)
+        task_runner.schedule(read_in_background, priority=PRIORITY_HIGH, name="read_key",
+                             on_done=finish, on_error=lambda e: messagebox.showerror("错误", f"读取失败: {str(e)}"))
+    
+    def open_dialog(self, title, edit_data=None, db_file=None):
+        """打开添加/编辑对话框，首次使用时创建，之后复用同一个窗口；新增的密钥保存到主库"""
+        db_file = db_file or DB_FILE
+        if self.edit_dialog is None or not self.edit_dialog.dialog.winfo_exists():
+            self.edit_dialog = AddEditDialog(self.root, self, title=title, edit_data=edit_data, db_file=db_file)
+        else:
+            self.edit_dialog.open(title, edit_data, db_file)
             
     def delete_key(self):
-        """删除选中的密钥"""
-        selection = self.tree.selection()
-        if not selection:
+        """删除选中的密钥（一个事务，只移除对应的行）"""
+        iids = self.selected_iids()
+        if not iids:
             messagebox.showwarning("警告", "请先选择要删除的项目")
             return
             
-        if messagebox.askyesno("确认删除", "确定要删除选中的API密钥吗？"):
-            item = selection[0]
-            key_id = self.tree.item(item)["values"][0]
+        prompt = "确定要删除选中的API密钥吗？" if len(iids) == 1 else f"确定要删除选中的 {len(iids)} 个API密钥吗？"
+        if messagebox.askyesno("确认删除", prompt):
+            groups = self.group_by_vault(iids)
             
-            con = sqlite3.connect(DB_FILE)
-            cur = con.cursor()
-            cur.execute("DELETE FROM api_keys WHERE id = ?", (key_id,))
-            con.commit()
-            con.close()
+            def delete_in_background():
+                count = 0
+                for db_file, ids in groups.items():  # 每个密钥库一个事务
+                    con = sqlite3.connect(db_file)
+                    try:
+                        count += vault_db.delete_keys(con, ids)
+                    finally:
+                        con.close()
+                return count
+            
+            def finish(count):
+                self.remove_rows(iids)
+                self.update_status(f"已删除 {count} 个API密钥，共 {len(self.row_store)} 条记录")
+                messagebox.showinfo("成功", "API密钥已删除" if count == 1 else f"已删除 {count} 个API密钥")
             
+            task_runner.schedule(delete_in_background, priority=PRIORITY_HIGH, name="delete_keys",
+                                 on_done=finish, on_error=lambda e: messagebox.showerror("错误", f"删除失败: {str(e)}"))
+    
+    def bulk_edit_keys(self):
+        """批量修改选中密钥的厂商/API地址/模型（一个事务，只更新对应的行）"""
+        iids = self.selected_iids()
+        dialog = BulkEditDialog(self.root, len(iids))
+        fields = dialog.result
+        if not fields:
+            return
+        groups = self.group_by_vault(iids)
+        
+        def update_in_background():
+            count = 0
+            for db_file, ids in groups.items():
+                con = sqlite3.connect(db_file)
+                try:
+                    count += vault_db.update_keys(con, ids, fields)
+                finally:
+                    con.close()
+            return count
+            
+        def finish(count):
+            self.update_rows(iids, fields)
+            self.update_status(f"已修改 {count} 个API密钥")
+        
+        task_runner.schedule(update_in_background, priority=PRIORITY_HIGH, name="update_keys",
+                             on_done=finish, on_error=lambda e: messagebox.showerror("错误", f"修改失败: {str(e)}"))
+    
+    def export_keys(self):
+        """把选中的密钥（未选择时为全部）导出为 CSV/JSON 文件"""
+        from tkinter import filedialog
+        groups = self.group_by_vault(self.selected_iids())
+        if len(groups) > 1:
+            messagebox.showwarning("警告", "一次只能导出同一个密钥库中的记录")
+            return
+        db_file, ids = next(iter(groups.items())) if groups else (DB_FILE, None)
+        path = filedialog.asksaveasfilename(
+            title="导出选中的密钥" if ids else "导出全部密钥",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON", "*.json")]
+        )
+        if not path:
+            return
+        
+        def export_in_background():
+            from key_import import export_file
+            return export_file(path, db_file, ids)
+        
+        def finish(count):
+            self.update_status(f"📤 已导出 {count} 个API密钥到 {path}")
+            messagebox.showinfo("导出完成", f"已导出 {count} 个API密钥\n\n⚠ 导出文件包含明文密钥，请妥善保管")
+        
+        task_runner.schedule(export_in_background, priority=PRIORITY_HIGH, name="export_keys",
+                             on_done=finish, on_error=lambda e: messagebox.showerror("错误", f"导出失败: {str(e)}"))
+    
+    def import_keys(self):
+        """从 CSV/JSON 文件批量导入密钥，重复的密钥按用户选择跳过或合并"""
+        from tkinter import filedialog
+        path = filedialog.askopenfilename(
+            title="选择导入文件",
+            filetypes=[("CSV / JSON", "*.csv *.json"), ("所有文件", "*.*")]
+        )
+        if not path:
+            return
+        merge = messagebox.askyesnocancel(
+            "重复的密钥", "导入的密钥已存在时如何处理？\n\n是：合并到已有记录（用非空字段覆盖）\n否：跳过")
+        if merge is None:
+            return
+        self.update_status("📥 正在导入...")
+        
+        def import_in_background():
+            from key_import import import_file
+            return import_file(path, DB_FILE, merge)
+        
+        def finish(result):
+            total, inserted, merged, duplicates = result
             self.refresh_data()
-            messagebox.showinfo("成功", "API密钥已删除")
+            message = f"读取 {total} 条，新增 {inserted} 条，重复 {duplicates} 条"
+            if duplicates:
+                message += f"（{'已合并' if merge else '已跳过'}）"
+            self.update_status(f"📥 {message}")
+            messagebox.showinfo("导入完成", message)
+        
+        def fail(error):
+            self.update_status(f"导入失败: {str(error)}")
+            messagebox.showerror("错误", f"导入失败: {str(error)}")
+        
+        task_runner.schedule(import_in_background, priority=PRIORITY_HIGH, name="import_keys",
+                             on_done=finish, on_error=fail)
             
     def copy_api_key(self):
-        """复制选中密钥的API Key到剪贴板"""
-        selection = self.tree.selection()
-        if not selection:
+        """复制选中密钥的API Key到剪贴板（多选时每行一个）"""
+        iids = self.selected_iids()
+        if not iids:
             messagebox.showwarning("警告", "请先选择要复制API密钥的项目")
             return
             
-        item = selection[0]
-        key_id = self.tree.item(item)["values"][0]
+        # 在后台从数据库获取API密钥（一次查询，多个密钥库时查询联合视图）
+        federation = self.federation
         
-        # 从数据库获取API密钥
-        con = sqlite3.connect(DB_FILE)
-        cur = con.cursor()
-        cur.execute("SELECT api_key FROM api_keys WHERE id = ?", (key_id,))
-        result = cur.fetchone()
-        con.close()
+        def read_in_background():
+            if federation is not None:
+                return federation.get_keys(iids)
+            con = sqlite3.connect(DB_FILE)
+            try:
+                return vault_db.get_keys(con, [int(iid) for iid in iids])
+            finally:
+                con.close()
         
-        if result:
-            api_key = result[0]
+        task_runner.schedule(read_in_background, priority=PRIORITY_HIGH, name="copy_api_key",
+                             on_done=self.copy_records,
+                             on_error=lambda e: messagebox.showerror("错误", f"读取API密钥失败: {str(e)}"))
+    
+    def copy_records(self, records):
+        """把读取到的API密钥放入剪贴板"""
+        if len(records) > 1:
+            self.root.clipboard_clear()
+            self.root.clipboard_append("\n".join(record["api_key"] for record in records))
+            self.root.update()
+            messagebox.showinfo("成功", f"已复制 {len(records)} 个API密钥到剪贴板（每行一个）")
+        elif records:
+            api_key = records[0]["api_key"]
             # 复制到剪贴板
             self.root.clipboard_clear()
             self.root.clipboard_append(api_key)
@@ -672,35 +1717,97 @@ class APIKeyManager:
         
     def run(self):
         """运行应用"""
+        if startup_timer.enabled:
+            # 等待主窗口首次可见，记录首帧绘制时间
+            self.root.wait_visibility()
+            self.root.update_idletasks()
+            startup_timer.mark("首帧绘制")
+            self.root.after_idle(startup_timer.report)
         self.root.mainloop()
+        profiler.shutdown()
 
 class AddEditDialog:
     """添加/编辑对话框"""
     
-    def __init__(self, parent, main_app, title="添加 API 密钥", edit_data=None):
+    def __init__(self, parent, main_app, title="添加 API 密钥", edit_data=None, db_file=None):
         self.main_app = main_app
         self.edit_data = edit_data
-        
-        # 创建现代化对话框
+        self.db_file = db_file or DB_FILE  # 保存到的密钥库
+        self.position = None
+        self.last_open_ms = 0.0
+        self.session = 0  # 每次打开递增，用于丢弃上一次打开时未完成的后台结果
+        self.models_from_preset = False  # 模型选项是否来自预设（厂商目录更新时需要同步）
+        self.saving = False  # 保存正在后台进行（防止重复提交）
+        self.prefetch_future = None
+        self.prefetch_generation = 0  # 每次发起预取递增，用于丢弃过时的预取回调
+        
+        # 创建现代化对话框（只创建一次，关闭时隐藏以便复用）
         self.dialog = tk.Toplevel(parent)
-        self.dialog.title(title)
-        self.dialog.geometry("650x750")
+        self.dialog.withdraw()
+        self.dialog.geometry(f"{DIALOG_WIDTH}x{DIALOG_HEIGHT}")
         self.dialog.configure(bg="#0f0f0f")
         self.dialog.resizable(False, False)
+        self.dialog.protocol("WM_DELETE_WINDOW", self.cancel)
         
         # 模态对话框
         self.dialog.transient(parent)
-        self.dialog.grab_set()
         
         # 创建界面
         self.setup_ui()
         
+        # 厂商目录更新时同步选项
+        vendor_catalog.add_listener(self.on_catalog_reload)
+        self.dialog.bind("<Destroy>", self.on_destroy, add="+")
+        
+        self.open(title, edit_data, self.db_file)
+    
+    def open(self, title="添加 API 密钥", edit_data=None, db_file=None):
+        """重置字段并显示对话框，记录打开到可交互的耗时"""
+        start = time.perf_counter()
+        self.session += 1
+        self.edit_data = edit_data
+        self.db_file = db_file or DB_FILE
+        
+        self.dialog.title(title)
+        self.title_label.config(text="✏ 编辑 API 密钥" if edit_data else "➕ 添加新的 API 密钥")
+        self.reset_fields()
+        
         # 如果是编辑模式，填充数据
         if edit_data:
             self.load_edit_data()
             
         # 居中显示
         self.center_dialog()
+        self.dialog.deiconify()
+        self.dialog.grab_set()
+        self.dialog.update_idletasks()
+        
+        self.last_open_ms = (time.perf_counter() - start) * 1000
+        if self.last_open_ms > DIALOG_OPEN_BUDGET_MS:
+            self.main_app.update_status(
+                f"⚠ 对话框打开耗时 {self.last_open_ms:.0f}ms，超出预算 {DIALOG_OPEN_BUDGET_MS}ms")
+    
+    def on_destroy(self, event=None):
+        """窗口销毁时注销厂商目录监听"""
+        if event is None or event.widget is self.dialog:
+            vendor_catalog.remove_listener(self.on_catalog_reload)
+    
+    def on_catalog_reload(self, catalog):
+        """厂商目录重新加载后更新厂商选项，以及来自预设的模型选项"""
+        self.vendor_field.update_options(catalog.vendors())
+        vendor = self.vendor_field.get_value().strip()
+        if self.models_from_preset and vendor in VENDOR_MODELS and vendor != "自定义":
+            preset_models = catalog.models_for(vendor)
+            if preset_models:
+                preset_models.append("🔄 点击上方按钮获取最新模型")
+            self.model_field.update_options(preset_models)
+        self.model_status_label.config(text="💡 厂商目录已更新", fg="#6c5ce7")
+    
+    def close(self):
+        """隐藏对话框（保留控件供下次复用）"""
+        self.cancel_prefetch()
+        self.dialog.grab_release()
+        self.dialog.withdraw()
     
     def setup_ui(self):
         """创建现代化用户界面"""
@@ -713,11 +1820,10 @@ class AddEditDialog:
         header_frame.pack(fill="x", padx=2, pady=(2, 0))
         header_frame.pack_propagate(False)
         
-        title_text = "✏ 编辑 API 密钥" if self.edit_data else "➕ 添加新的 API 密钥"
-        title_label = tk.Label(header_frame, text=title_text,
-                              bg="#1a1a1a", fg="#00d4ff",
-                              font=("Microsoft YaHei UI", 16, "bold"))
-        title_label.pack(expand=True)
+        self.title_label = tk.Label(header_frame, text="",
+                                   bg="#1a1a1a", fg="#00d4ff",
+                                   font=("Microsoft YaHei UI", 16, "bold"))
+        self.title_label.pack(expand=True)
         
         # 内容区域
         content_frame = tk.Frame(main_container, bg="#0f0f0f")
@@ -734,20 +1840,22 @@ class AddEditDialog:
         # 创建现代化字段
         self.vendor_field = ClickableField(inner_frame, "🏢 厂商名称", 
                                           field_type="combobox", 
-                                          options=list(VENDOR_MODELS.keys()),
+                                          options=vendor_catalog.vendors(),
                                           change_callback=self.on_vendor_change)
         self.vendor_field.pack(fill="x", pady=(0, 15))
         
         self.api_key_field = ClickableField(inner_frame, "🔐 API 密钥",
-                                           field_type="entry", is_password=True)
+                                           field_type="entry", is_password=True,
+                                           change_callback=self.on_connection_change)
         self.api_key_field.pack(fill="x", pady=(0, 15))
         
         self.api_url_field = ClickableField(inner_frame, "🌐 API URL", 
-                                           field_type="entry")
+                                           field_type="entry",
+                                           change_callback=self.on_connection_change)
         self.api_url_field.pack(fill="x", pady=(0, 15))
         
         self.model_field = ClickableField(inner_frame, "🤖 模型名称",
-                                         field_type="combobox", options=[])
+                                         field_type="picker", options=[])
         self.model_field.pack(fill="x", pady=(0, 10))
         
         # 获取模型按钮区域
@@ -811,9 +1919,6 @@ class AddEditDialog:
                               fg="white", command=buttons[2][2], **button_style)
         cancel_btn.pack(side="right", padx=8)
         
-        # 居中显示对话框
-        self.center_dialog()
-    
     def fetch_models(self):
         """获取模型列表"""
         vendor = self.vendor_field.get_value().strip()
@@ -833,46 +1938,56 @@ class AddEditDialog:
         self.fetch_models_btn.config(state="disabled", text="⟳ 获取中...")
         self.dialog.update()
         
-        # 在后台线程中获取模型
+        # 在后台任务中获取模型
+        session = self.session
+        key_id = self.edit_data[0] if self.edit_data else None
+        db_file = self.db_file
+        
+        @profiler.profiled("fetch_models")
         def fetch_in_background():
-            try:
-                models = model_fetcher.get_models_for_vendor(vendor, api_key, api_url)
+            details = []
+            # 预取已完成或仍在进行时直接使用其结果
+            models = get_model_fetcher().get_models_cached(vendor, api_key, api_url, details)
+            if details:
+                # 记录到模型目录（编辑已有密钥时同时记录该密钥可访问的模型）
+                from model_catalog import ModelCatalog
+                ModelCatalog(db_file).record(vendor, details, key_id=key_id)
+            return models
                 
-                # 在主线程中更新UI
-                def update_ui():
-                    if models and not any(model.startswith("错误:") for model in models):
-                        self.model_field.update_options(models)
-                        if models:
-                            self.model_field.set_value(models[0])
-                        self.model_status_label.config(text=f"✅ 获取到 {len(models)} 个模型", fg="#27ae60")
-                    else:
-                        error_msg = models[0] if models else "未知错误"
-                        self.model_status_label.config(text=f"❌ {error_msg}", fg="#e74c3c")
+        # 在主线程中更新UI
+        def update_ui(models):
+            if session != self.session:
+                return
+            if models and not any(model.startswith("错误:") for model in models):
+                self.models_from_preset = False
+                self.model_field.update_options(models)
+                if models:
+                    self.model_field.set_value(models[0])
+                self.model_status_label.config(text=f"✅ 获取到 {len(models)} 个模型", fg="#27ae60")
+            else:
+                error_msg = models[0] if models else "未知错误"
+                self.model_status_label.config(text=f"❌ {error_msg}", fg="#e74c3c")
                         
-                        # 如果API Key错误，提供预设模型列表
-                        if "无效" in error_msg or "错误" in error_msg:
-                            if vendor in VENDOR_MODELS:
-                                fallback_models = VENDOR_MODELS[vendor].copy()
-                                if fallback_models:
-                                    fallback_models.append("自定义模型")
-                                    self.model_field.update_options(fallback_models)
-                                    self.model_field.set_value(fallback_models[0])
-                                    self.model_status_label.config(text="⚠ 使用预设模型列表", fg="#f39c12")
+                # 如果API Key错误，提供预设模型列表
+                if "无效" in error_msg or "错误" in error_msg:
+                    if vendor in VENDOR_MODELS:
+                        fallback_models = VENDOR_MODELS[vendor].copy()
+                        if fallback_models:
+                            fallback_models.append("自定义模型")
+                            self.model_field.update_options(fallback_models)
+                            self.model_field.set_value(fallback_models[0])
+                            self.model_status_label.config(text="⚠ 使用预设模型列表", fg="#f39c12")
                     
-                    self.fetch_models_btn.config(state="normal", text="⟳ 获取模型列表")
+            self.fetch_models_btn.config(state="normal", text="⟳ 获取模型列表")
                 
-                self.dialog.after(0, update_ui)
+        def show_error(e):
+            if session != self.session:
+                return
+            self.model_status_label.config(text=f"❌ 获取失败: {str(e)}", fg="#e74c3c")
+            self.fetch_models_btn.config(state="normal", text="⟳ 获取模型列表")
                 
-            except Exception as e:
-                def show_error():
-                    self.model_status_label.config(text=f"❌ 获取失败: {str(e)}", fg="#e74c3c")
-                    self.fetch_models_btn.config(state="normal", text="⟳ 获取模型列表")
-                
-                self.dialog.after(0, show_error)
-        
-        # 启动后台线程
-        thread = threading.Thread(target=fetch_in_background, daemon=True)
-        thread.start()
+        task_runner.schedule(fetch_in_background, priority=PRIORITY_HIGH, name="fetch_models",
+                             on_done=update_ui, on_error=show_error)
     
     def on_vendor_change(self, vendor):
         """厂商变化时更新API URL和模型选项"""
@@ -886,8 +2001,9 @@ class AddEditDialog:
         if vendor in DEFAULT_API_URLS:
             self.api_url_field.set_value(DEFAULT_API_URLS[vendor])
         
-        # 提供预设模型选项（用户可以选择手动获取或使用预设）
+        # 提供预设模型选项（用户可以选择手动获取或使用预设），模型目录中已有记录时在读取完成后替换
         if vendor in VENDOR_MODELS:
+            self.models_from_preset = True
             preset_models = VENDOR_MODELS[vendor].copy()
             if preset_models and vendor != "自定义":
                 preset_models.append("🔄 点击上方按钮获取最新模型")
@@ -901,9 +2017,96 @@ class AddEditDialog:
                     self.model_status_label.config(text="💡 请手动输入模型名称", fg="#6c5ce7")
                 else:
                     self.model_status_label.config(text="💡 请点击上方按钮获取模型列表", fg="#6c5ce7")
+            if vendor != "自定义":
+                self.load_catalog_models(vendor)
                     
         # 生成示例代码
         self.update_example_code(vendor)
+        
+        # 提前获取模型列表（或预热连接），点击按钮时通常已经就绪
+        self.start_prefetch()
+    
+    def load_catalog_models(self, vendor):
+        """在后台读取对话框所在密钥库的模型目录，有记录时替换预设选项（期间已切换厂商或已获取模型时丢弃）"""
+        session = self.session
+        db_file = self.db_file
+        preset_default = (VENDOR_MODELS.get(vendor) or [""])[0]
+        
+        def read_in_background():
+            from model_catalog import ModelCatalog
+            return ModelCatalog(db_file).vendor_models(vendor)
+        
+        def finish(catalog_models):
+            if (session != self.session or not catalog_models or not self.models_from_preset
+                    or self.vendor_field.get_value().strip() != vendor):
+                return
+            self.models_from_preset = False
+            self.model_field.update_options(catalog_models + ["🔄 点击上方按钮获取最新模型"])
+            if self.model_field.get_value().strip() in ("", preset_default):
+                # 仍是预设的默认值（用户未选择、编辑时也不是已保存的模型）时改用目录中的第一个
+                self.model_field.set_value(catalog_models[0])
+        
+        task_runner.schedule(read_in_background, priority=PRIORITY_HIGH, name="catalog_models", on_done=finish)
+    
+    def on_connection_change(self, value):
+        """API密钥或URL修改后重新预取"""
+        self.start_prefetch()
+    
+    def start_prefetch(self):
+        """已选厂商且填写了密钥时在后台预取模型列表，否则只预热到厂商主机的连接"""
+        vendor = self.vendor_field.get_value().strip()
+        api_key = self.api_key_field.get_value().strip()
+        api_url = self.api_url_field.get_value().strip()
+        self.cancel_prefetch()
+        if not vendor:
+            return
+        generation = self.prefetch_generation
+        
+        def start_in_background():
+            # 首次使用时在后台加载 requests，不阻塞界面
+            fetcher = get_model_fetcher()
+            if generation != self.prefetch_generation:
+                return
+            future = fetcher.prefetch(vendor, api_key, api_url)
+            if future is None:
+                fetcher.warm_connection(vendor, api_url)
+                return
+            task_runner.post(self.on_prefetch_started, future, generation)
+            
+            def on_done(done):
+                if not done.cancelled():
+                    task_runner.post(self.on_prefetch_done, done, generation)
+            future.add_done_callback(on_done)
+        
+        self.prefetch_future = task_runner.schedule(start_in_background, priority=PRIORITY_NORMAL,
+                                                    name="start_prefetch")
+    
+    def cancel_prefetch(self):
+        """取消尚未开始的预取，并使进行中的预取回调失效"""
+        self.prefetch_generation += 1
+        if self.prefetch_future is not None:
+            self.prefetch_future.cancel()
+            self.prefetch_future = None
+    
+    def on_prefetch_started(self, future, generation):
+        """记录进行中的预取，以便厂商或密钥再次变化时取消"""
+        if generation == self.prefetch_generation:
+            self.prefetch_future = future
+        else:
+            future.cancel()
+    
+    def on_prefetch_done(self, future, generation):
+        """预取完成：提示模型列表已就绪（实际列表在点击获取按钮时从缓存取出）"""
+        if generation != self.prefetch_generation or str(self.fetch_models_btn["state"]) == "disabled":
+            return
+        self.prefetch_future = None
+        try:
+            models, _ = future.result()
+        except Exception:
+            return
+        if models and not any(model.startswith("错误:") for model in models):
+            self.model_status_label.config(text=f"⚡ 已预取 {len(models)} 个模型，点击上方按钮即可使用",
+                                           fg="#27ae60")
                 
     def load_edit_data(self):
         """加载编辑数据"""
@@ -938,51 +2141,139 @@ class AddEditDialog:
             messagebox.showerror("错误", "厂商名称和API密钥不能为空！")
             return
             
-        con = sqlite3.connect(DB_FILE)
-        cur = con.cursor()
-        
-        if self.edit_data:
-            # 更新现有记录
-            cur.execute("""
-                UPDATE api_keys 
-                SET vendor=?, api_key=?, api_url=?, model=?, notes=?, example_code=?
-                WHERE id=?
-            """, (vendor, api_key, api_url, model, notes, example_code, self.edit_data[0]))
-            messagebox.showinfo("成功", "API密钥已更新！")
+        fields = (vendor, api_key, api_url, model, notes, example_code)
+        self.write_fields(fields)
+    
+    def write_fields(self, fields, merge_into=None):
+        """在后台写入数据库，完成后在界面线程中提示结果；merge_into 为要合并到的已有记录ID"""
+        if self.saving:
+            return
+        self.saving = True
+        session = self.session
+        db_file = self.db_file
+        edit_data = self.edit_data
+        started = profiler.begin()
+        
+        def save_in_background():
+            return self.write_record(db_file, edit_data, fields, merge_into)
+        
+        def finish(outcome):
+            self.saving = False
+            if session != self.session:
+                return
+            status, detail = outcome
+            if status == "conflict":
+                self.resolve_conflict(fields, detail)
+            elif status == "duplicate":
+                if self.edit_data:
+                    messagebox.showerror("错误", f"该密钥已保存在记录 #{detail} 中，不能重复保存")
+                elif messagebox.askyesno("密钥已存在",
+                                         f"该密钥已保存在记录 #{detail} 中。\n是否把当前填写的内容合并到该记录？"):
+                    self.write_fields(fields, merge_into=detail)
+            else:
+                profiler.record("save", started)  # 不含提示框的等待时间
+                messagebox.showinfo("成功", detail)
+                self.main_app.refresh_data()
+                self.close()
+        
+        def fail(error):
+            # 数据库被锁定、磁盘已满等：已回滚，对话框保持打开以便重试
+            self.saving = False
+            messagebox.showerror("错误", f"保存失败: {error}")
+        
+        task_runner.schedule(save_in_background, priority=PRIORITY_HIGH, name="save",
+                             on_done=finish, on_error=fail)
+    
+    @staticmethod
+    def write_record(db_file, edit_data, fields, merge_into=None):
+        """
+        写入一条记录（后台线程中调用），返回 (结果, 详情)：("saved", 提示)、("duplicate", 已有记录ID)
+        或 ("conflict", 当前内容)；数据库出错时回滚后抛出，连接总会关闭
+        """
+        con = sqlite3.connect(db_file)
+        try:
+            if merge_into is not None:
+                vault_db.merge_key(con, merge_into, dict(zip(vault_db.KEY_FIELDS, fields)))
+                message = f"已合并到记录 #{merge_into}！"
+            elif edit_data:
+                # 更新现有记录（仅当打开对话框后记录未被其他程序修改）
+                vault_db.update_key(con, edit_data[0], *fields, expected_version=edit_data[-1])
+                message = "API密钥已更新！"
+            else:
+                # 插入新记录
+                vault_db.insert_key(con, *fields)
+                message = "API密钥已添加！"
+            con.commit()
+            return "saved", message
+        except vault_db.DuplicateKeyError as e:
+            con.rollback()
+            return "duplicate", e.existing_id
+        except vault_db.VersionConflictError as e:
+            con.rollback()
+            return "conflict", e.current
+        except sqlite3.Error:
+            con.rollback()
+            raise
+        finally:
+            con.close()
+    
+    def resolve_conflict(self, fields, current):
+        """保存时发现记录已被其他程序修改：合并双方的修改后保存，或放弃本次修改并重新加载"""
+        if current is None:
+            if messagebox.askyesno("记录已删除", "该记录在编辑期间已被其他程序删除。\n是否把当前内容另存为新记录？"):
+                self.edit_data = None
+                self.save()
+            return
+        merged, theirs, conflicts = vault_db.merge_versions(self.edit_data[1:-1], current[1:-1], fields)
+        if not theirs:
+            # 对方只修改了别名等不在对话框中的字段，直接按新版本保存
+            self.edit_data = current
+            self.save()
+            return
+        lines = ["该记录在编辑期间已被其他程序修改。", "",
+                 "对方修改了：" + "、".join(FIELD_DISPLAY[field] for field in theirs)]
+        if conflicts:
+            lines.append("双方都修改了（合并时保留你的内容）：" + "、".join(FIELD_DISPLAY[field] for field in conflicts))
+        lines += ["", "是：合并双方的修改并保存", "否：放弃你的修改，重新加载最新内容", "取消：返回继续编辑"]
+        choice = messagebox.askyesnocancel("保存冲突", "\n".join(lines))
+        if choice is None:
+            return  # 仍以原来读取的内容为基准，再次保存时会重新提示
+        self.edit_data = current
+        if choice:
+            for field, value in zip((self.vendor_field, self.api_key_field, self.api_url_field,
+                                     self.model_field, self.notes_field, self.code_field), merged):
+                field.set_value(value)
+            self.save()
         else:
-            # 插入新记录
-            cur.execute("""
-                INSERT INTO api_keys (vendor, api_key, api_url, model, notes, example_code)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (vendor, api_key, api_url, model, notes, example_code))
-            messagebox.showinfo("成功", "API密钥已添加！")
-            
-        con.commit()
-        con.close()
-        
-        self.main_app.refresh_data()
-        self.dialog.destroy()
+            self.load_edit_data()
         
     def reset(self):
         """重置表单"""
         if messagebox.askyesno("确认", "确定要重置所有字段吗？"):
-            self.vendor_field.set_value("")
-            self.api_key_field.set_value("")
-            self.api_url_field.set_value("")
-            self.model_field.set_value("")
-            self.notes_field.set_value("")
-            self.code_field.set_value("")
+            self.reset_fields()
+    
+    def reset_fields(self):
+        """清空所有字段和状态"""
+        for field in (self.vendor_field, self.api_key_field, self.api_url_field,
+                      self.model_field, self.notes_field, self.code_field):
+            field.clear()
+        self.model_field.update_options([])
+        self.models_from_preset = False
+        self.model_status_label.config(text="", fg="#8a8a8a")
+        self.fetch_models_btn.config(state="normal", text="🔄 获取模型")
             
     def cancel(self):
         """取消并关闭对话框"""
-        self.dialog.destroy()
+        self.close()
         
     def center_dialog(self):
-        """居中显示对话框"""
-        self.dialog.update_idletasks()
-        x = (self.dialog.winfo_screenwidth() // 2) - (self.dialog.winfo_width() // 2)
-        y = (self.dialog.winfo_screenheight() // 2) - (self.dialog.winfo_height() // 2)
-        self.dialog.geometry(f"+{x}+{y}")
+        """居中显示对话框（位置只计算一次，避免远程X会话下的多次往返）"""
+        if self.position is None:
+            self.dialog.update_idletasks()
+            x = (self.dialog.winfo_screenwidth() - DIALOG_WIDTH) // 2
+            y = (self.dialog.winfo_screenheight() - DIALOG_HEIGHT) // 2
+            self.position = f"+{x}+{y}"
+        self.dialog.geometry(self.position)
         
     def update_example_code(self, vendor):
         """根据厂商更新示例代码"""
@@ -991,102 +2282,7 @@ class AddEditDialog:
         if current_code and current_code != "":
             return
             
-        code_templates = {
-            "OpenAI": '''import openai
-
-client = openai.OpenAI(
-    api_key="YOUR_API_KEY",
-    base_url="https://api.openai.com/v1"
-)
-
-response = client.chat.completions.create(
-    model="gpt-4",
-    messages=[
-        {"role": "user", "content": "Hello!"}
-    ]
-)
-
-print(response.choices[0].message.content)''',
-
-            "Google": '''import google.generativeai as genai
-
-genai.configure(api_key="YOUR_API_KEY")
-model = genai.GenerativeModel('gemini-1.5-pro')
-
-response = model.generate_content("Hello!")
-print(response.text)''',
-
-            "Anthropic": '''import anthropic
-
-client = anthropic.Anthropic(
-    api_key="YOUR_API_KEY"
-)
-
-message = client.messages.create(
-    model="claude-3-sonnet",
-    max_tokens=1000,
-    messages=[
-        {"role": "user", "content": "Hello!"}
-    ]
-)
-
-print(message.content[0].text)''',
-
-            "智谱AI": '''from zhipuai import ZhipuAI
-
-client = ZhipuAI(api_key="YOUR_API_KEY")
-
-response = client.chat.completions.create(
-    model="glm-4",
-    messages=[
-        {"role": "user", "content": "Hello!"}
-    ]
-)
-
-print(response.choices[0].message.content)''',
-
-            "百度文心": '''import requests
-
-def call_ernie_api(prompt):
-    # 先获取access_token
-    token_url = "https://aip.baidubce.com/oauth/2.0/token"
-    token_params = {
-        "grant_type": "client_credentials",
-        "client_id": "YOUR_API_KEY",
-        "client_secret": "YOUR_SECRET_KEY"
-    }
-    
-    token_response = requests.post(token_url, params=token_params)
-    access_token = token_response.json()["access_token"]
-    
-    # 调用API
-    url = f"https://aip.baidubce.com/rpc/2.0/ai_custom/v1/wenxinworkshop/chat/completions?access_token={access_token}"
-    
-    payload = {
-        "messages": [{"role": "user", "content": prompt}]
-    }
-    
-    response = requests.post(url, json=payload)
-    return response.json()["result"]
-
-print(call_ernie_api("Hello!"))''',
-
-            "DeepSeek": '''import openai
-
-client = openai.OpenAI(
-    api_key="YOUR_API_KEY",
-    base_url="https://api.deepseek.com/v1"
-)
-
-response = client.chat.completions.create(
-    model="deepseek-chat",
-    messages=[
-        {"role": "user", "content": "Hello!"}
-    ]
-)
-
-print(response.choices[0].message.content)'''
-        }
+        code_templates = get_code_templates()
         
         if vendor in code_templates:
             self.code_field.set_value(code_templates[vendor])
@@ -1111,7 +2307,53 @@ response = client.chat.completions.create(
 print(response.choices[0].message.content)'''
             self.code_field.set_value(template)
 
+class BulkEditDialog(simpledialog.Dialog):
+    """批量修改对话框：留空的字段保持不变"""
+    
+    def __init__(self, parent, count):
+        self.count = count
+        super().__init__(parent, f"批量修改 {count} 个密钥")
+    
+    def body(self, master):
+        tk.Label(master, text=f"将修改选中的 {self.count} 个密钥，留空的字段保持不变",
+                 font=("Microsoft YaHei UI", 10)).grid(row=0, column=0, columnspan=2, pady=(0, 10), sticky="w")
+        self.entries = {}
+        fields = (("vendor", "🏢 厂商"), ("api_url", "🌐 API URL"), ("model", "🤖 模型"))
+        for row, (field, label) in enumerate(fields, start=1):
+            tk.Label(master, text=label, font=("Microsoft YaHei UI", 10)).grid(row=row, column=0, sticky="w", pady=3)
+            if field == "vendor":
+                widget = ttk.Combobox(master, values=vendor_catalog.vendors(), width=40)
+            else:
+                widget = tk.Entry(master, width=43)
+            widget.grid(row=row, column=1, sticky="we", padx=(10, 0), pady=3)
+            self.entries[field] = widget
+        return self.entries["vendor"]
+    
+    def validate(self):
+        if not any(widget.get().strip() for widget in self.entries.values()):
+            messagebox.showwarning("警告", "请至少填写一个字段", parent=self)
+            return False
+        return True
+    
+    def apply(self):
+        self.result = {field: widget.get().strip() for field, widget in self.entries.items()
+                       if widget.get().strip()}
+
 
 if __name__ == "__main__":
-    app = APIKeyManager()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="API Key Manager - 现代化密钥管理工具")
+    parser.add_argument("--startup-timing", action="store_true",
+                        help="输出启动耗时统计（也可设置环境变量 APIKEY_MANAGER_STARTUP_TIMING=1）")
+    parser.add_argument("--vault", action="append", metavar="FILE",
+                        help="打开的密钥库文件，可重复指定以同时浏览多个密钥库（第一个为主库，新增的密钥保存到主库）")
+    parser.add_argument("--profile", action="store_true",
+                        help="性能诊断模式：记录操作耗时，可按需采样，结果写入 diagnostics 目录"
+                             "（也可设置环境变量 APIKEY_MANAGER_PROFILE=1）")
+    args = parser.parse_args()
+    if args.vault:
+        DB_FILE = args.vault[0]
+    
+    app = APIKeyManager(vaults=args.vault)
     app.run()
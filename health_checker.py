@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+API Key 健康检查模块
+在共用的批处理通道（task_runner.batch_runner）中并发检查已保存的密钥，按厂商限速，结果（状态、延迟、检查时间）写回数据库；
+只重新检查超过有效期（TTL）的记录
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import vault_db
+from model_catalog import ModelCatalog
+from task_runner import batch_runner
+
+# 检查结果有效期（秒），过期后才会重新检查
+HEALTH_TTL_SECONDS = 60 * 60
+
+# 同时检查的最大密钥数（线程来自批处理通道，总数受 BATCH_MAX_WORKERS 限制）
+HEALTH_MAX_WORKERS = 4
+
+# 检查过程中每积累这么多结果、或距上次写入超过该时间（秒）就写回一次，程序中途退出时已完成的检查不会重做
+HEALTH_SAVE_BATCH = 20
+HEALTH_SAVE_INTERVAL = 5.0
+
+# 同一厂商两次请求之间的最小间隔（秒）
+VENDOR_MIN_INTERVALS = {
+    "OpenAI": 0.5,
+    "Anthropic": 1.0,
+    "Google": 0.5,
+    "Cohere": 1.0,
+    "Groq": 1.0,
+    "DeepSeek": 1.0,
+    "Microsoft Azure": 1.0
+}
+DEFAULT_MIN_INTERVAL = 1.0
+
+# 健康状态
+STATUS_OK = "ok"
+STATUS_INVALID = "invalid"
+STATUS_ERROR = "error"
+STATUS_SKIPPED = "skipped"
+
+class HealthResult(NamedTuple):
+    """单个密钥的检查结果"""
+    key_id: int
+    status: str
+    latency_ms: Optional[int]
+    message: str
+    checked_at: float
+
+class VendorRateLimiter:
+    """按厂商限速：保证同一厂商的请求间隔不小于设定值"""
+    
+    def __init__(self, intervals: Dict[str, float] = None, default_interval: float = DEFAULT_MIN_INTERVAL):
+        self.intervals = intervals if intervals is not None else VENDOR_MIN_INTERVALS
+        self.default_interval = default_interval
+        self.next_allowed: Dict[str, float] = {}
+        self.lock = threading.Lock()
+    
+    def acquire(self, vendor: str):
+        """占用该厂商的下一个请求时间片，必要时等待"""
+        interval = self.intervals.get(vendor, self.default_interval)
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_allowed.get(vendor, now))
+            self.next_allowed[vendor] = slot + interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def classify_result(models: List[str], source: str = None) -> Tuple[str, str]:
+    """
+    根据模型获取结果判断密钥状态。source 为结果来源（model_fetcher.SOURCE_*，默认取 models.source）：
+    只有接口实际返回的列表算作可用；提示文字和未经请求的预设列表不代表密钥有效
+    """
+    from model_fetcher import SOURCE_BUILTIN, SOURCE_ERROR, SOURCE_LIVE, SOURCE_PLACEHOLDER, SOURCE_PRESET
+    
+    if not models:
+        return STATUS_ERROR, "未返回任何模型"
+    first = models[0]
+    source = source or getattr(models, "source", None)
+    if source is None:
+        source = SOURCE_ERROR if first.startswith("错误:") else SOURCE_LIVE
+    if source == SOURCE_ERROR:
+        return (STATUS_INVALID if "无效" in first else STATUS_ERROR), first
+    if source == SOURCE_PLACEHOLDER:
+        # 未填写密钥属于配置错误；缺少地址、不支持的厂商等无法检查
+        return (STATUS_ERROR if first == "请先输入API Key" else STATUS_SKIPPED), first
+    if source == SOURCE_PRESET:
+        return STATUS_SKIPPED, "该厂商不支持在线验证"
+    if source == SOURCE_BUILTIN:
+        return STATUS_OK, "密钥有效（接口未提供模型列表）"
+    return STATUS_OK, f"{len(models)} 个模型可用"
+
+class HealthChecker:
+    """后台健康检查器"""
+    
+    def __init__(self, db_file: str = vault_db.DB_FILE, ttl: float = HEALTH_TTL_SECONDS,
+                 max_workers: int = HEALTH_MAX_WORKERS, rate_limiter: VendorRateLimiter = None):
+        self.db_file = db_file
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self.rate_limiter = rate_limiter or VendorRateLimiter()
+    
+    def due_keys(self, now: float = None) -> List[tuple]:
+        """返回检查结果已过期（或从未检查）的密钥"""
+        now = time.time() if now is None else now
+        con = vault_db.connect(self.db_file)
+        try:
+            cur = con.cursor()
+            cur.execute("""
+                SELECT id, vendor, api_key, api_url FROM api_keys
+                WHERE health_checked_at IS NULL OR health_checked_at < ?
+                ORDER BY health_checked_at
+            """, (now - self.ttl,))
+            return cur.fetchall()
+        finally:
+            con.close()
+    
+    def probe(self, key_id: int, vendor: str, api_key: str, api_url: str) -> HealthResult:
+        """检查单个密钥"""
+        from model_fetcher import model_fetcher
+        
+        if not model_fetcher.can_verify(vendor):
+            return HealthResult(key_id, STATUS_SKIPPED, None, "该厂商不支持在线验证", time.time())
+        if model_fetcher.requires_url(vendor) and not (api_url or "").strip():
+            return HealthResult(key_id, STATUS_SKIPPED, None, "未填写API URL，无法检查", time.time())
+        
+        self.rate_limiter.acquire(vendor)
+        details = []
+        start = time.perf_counter()
+        try:
+            models = model_fetcher.get_models_for_vendor(vendor, api_key or "", api_url or None, details)
+            status, message = classify_result(models)
+        except Exception as e:
+            status, message = STATUS_ERROR, f"错误: {str(e)}"
+        latency_ms = int((time.perf_counter() - start) * 1000)
+        
+        # 顺便更新模型目录，记录该密钥可访问的模型
+        if status == STATUS_OK and details:
+            ModelCatalog(self.db_file).record(vendor, details, key_id=key_id)
+        return HealthResult(key_id, status, latency_ms, message, time.time())
+    
+    def save_results(self, results: List[HealthResult]):
+        """在一个事务中写回检查结果"""
+        if not results:
+            return
+        con = vault_db.connect(self.db_file)
+        try:
+            con.executemany("""
+                UPDATE api_keys
+                SET health_status=?, health_latency_ms=?, health_message=?, health_checked_at=?
+                WHERE id=?
+            """, [(r.status, r.latency_ms, r.message, r.checked_at, r.key_id) for r in results])
+            con.commit()
+        finally:
+            con.close()
+    
+    def check_due(self, on_result: Callable[[HealthResult], None] = None) -> List[HealthResult]:
+        """检查所有过期的密钥，每完成一个调用 on_result，结果分批写回数据库"""
+        keys = self.due_keys()
+        results, pending = [], []
+        if not keys:
+            return results
+        
+        last_save = time.monotonic()
+        try:
+            for result in batch_runner.imap_unordered(lambda row: self.probe(*row), keys,
+                                                      parallelism=self.max_workers):
+                results.append(result)
+                pending.append(result)
+                if on_result:
+                    on_result(result)
+                if len(pending) >= HEALTH_SAVE_BATCH or time.monotonic() - last_save >= HEALTH_SAVE_INTERVAL:
+                    last_save = time.monotonic()
+                    try:
+                        self.save_results(pending)
+                    except sqlite3.Error:
+                        continue  # 数据库暂时被锁定等：保留这些结果，下次一起写入
+                    pending = []
+        finally:
+            # 中途出错时也写回已完成的检查
+            self.save_results(pending)
+        return results
+
+if __name__ == "__main__":
+    # 检查当前目录下数据库中所有过期的密钥
+    con = vault_db.connect()
+    vault_db.init_schema(con)
+    con.close()
+    
+    checker = HealthChecker()
+    print(f"🩺 待检查 {len(checker.due_keys())} 个密钥")
+    for item in checker.check_due():
+        print(f"#{item.key_id}: {item.status} {item.latency_ms} ms - {item.message}")
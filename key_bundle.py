@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+密钥包模块
+把选定的密钥导出为只读的二进制密钥包，供容器和 CI 在启动时读取，无需携带整个数据库：
+文件头 + 开放寻址哈希索引 + 记录区，读取时直接内存映射，按别名、厂商/模型或厂商一次定位，不做任何解析；
+可选用 AES-GCM 逐条加密（需要 cryptography 库），索引使用带密钥的哈希，不暴露别名和模型名
+
+读取端只依赖标准库（加密包另需 cryptography），可以单独复制到镜像中使用:
+    with KeyBundle("keys.akb") as bundle:
+        api_key = bundle.get("gpt-4o-prod").api_key
+"""
+
+import base64
+import hashlib
+import mmap
+import os
+import struct
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+# 文件头：魔数、格式版本、标志、记录数、索引槽数、索引偏移、记录区偏移、盐、密钥校验值（共 64 字节）
+BUNDLE_MAGIC = b"AKBUNDLE"
+BUNDLE_VERSION = 1
+HEADER = struct.Struct("<8sHHIIQQ16s8s4x")
+FLAG_ENCRYPTED = 0x1
+
+# 索引槽：名称哈希（0 表示空槽）+ 记录偏移
+SLOT = struct.Struct("<QQ")
+
+# 记录：负载长度 + 负载；负载为各字段的长度 + UTF-8 内容（加密时为 nonce + 密文）
+RECORD_LENGTH = struct.Struct("<I")
+RECORD_FIELDS = ("vendor", "model", "alias", "api_url", "api_key")
+FIELD_LENGTHS = struct.Struct(f"<{len(RECORD_FIELDS)}H")
+NONCE_SIZE = 12
+
+# 读取加密包时默认从该环境变量取密钥（base64）
+KEY_ENV = "APIKEY_BUNDLE_KEY"
+
+class BundleEntry(NamedTuple):
+    """密钥包中的一条记录"""
+    vendor: str
+    model: str
+    alias: str
+    api_url: str
+    api_key: str
+    
+    def names(self) -> List[str]:
+        """可用于查找的名称：别名、厂商/模型、厂商"""
+        names = [self.alias] if self.alias else []
+        if self.model:
+            names.append(f"{self.vendor}/{self.model}")
+        names.append(self.vendor)
+        return [name.casefold() for name in names]
+
+class BundleError(Exception):
+    """密钥包格式错误、密钥错误或记录损坏"""
+
+def new_key() -> str:
+    """生成加密密钥（base64），保存到 CI 密钥库或容器的环境变量中"""
+    return base64.urlsafe_b64encode(os.urandom(32)).decode("ascii")
+
+def decode_key(key: str) -> bytes:
+    try:
+        raw = base64.urlsafe_b64decode(key.strip())
+    except ValueError:
+        raw = b""
+    if len(raw) != 32:
+        raise BundleError("密钥应为 32 字节的 base64 字符串")
+    return raw
+
+def index_key(salt: bytes, key: Optional[bytes]) -> bytes:
+    """索引哈希的密钥：未加密时为盐，加密时由密钥派生（没有密钥无法由名称算出槽位）"""
+    if key is None:
+        return salt
+    return hashlib.blake2b(salt, key=key, digest_size=32, person=b"akb-index").digest()
+
+def key_check(salt: bytes, key: Optional[bytes]) -> bytes:
+    """密钥校验值：打开加密包时先确认密钥正确"""
+    if key is None:
+        return bytes(8)
+    return hashlib.blake2b(salt, key=key, digest_size=8, person=b"akb-check").digest()
+
+def name_hash(name: str, hash_key: bytes) -> int:
+    value = int.from_bytes(hashlib.blake2b(name.casefold().encode("utf-8"), digest_size=8,
+                                           key=hash_key).digest(), "little")
+    return value or 1
+
+def cipher(key: bytes):
+    """AES-GCM（cryptography 库在用到加密时才导入）"""
+    try:
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    except ImportError:
+        raise BundleError("加密密钥包需要 cryptography 库：pip install cryptography") from None
+    return AESGCM(key)
+
+def pack_entry(entry: BundleEntry) -> bytes:
+    values = [(getattr(entry, field) or "").encode("utf-8") for field in RECORD_FIELDS]
+    return FIELD_LENGTHS.pack(*map(len, values)) + b"".join(values)
+
+def unpack_entry(payload: bytes) -> BundleEntry:
+    try:
+        lengths = FIELD_LENGTHS.unpack_from(payload)
+        if FIELD_LENGTHS.size + sum(lengths) != len(payload):
+            raise BundleError("记录已损坏")
+        values = []
+        position = FIELD_LENGTHS.size
+        for length in lengths:
+            values.append(payload[position:position + length].decode("utf-8"))
+            position += length
+    except (struct.error, UnicodeDecodeError):
+        raise BundleError("记录已损坏") from None
+    return BundleEntry(*values)
+
+def write_bundle(path: str, entries: List[BundleEntry], key: str = None) -> int:
+    """
+    写出密钥包（先写临时文件再替换）。同名的记录以先出现的为准；
+    给出 key 时逐条加密，返回写入的记录数
+    """
+    raw_key = decode_key(key) if key else None
+    aead = cipher(raw_key) if raw_key else None
+    salt = os.urandom(16)
+    hash_key = index_key(salt, raw_key)
+    
+    names: Dict[str, int] = {}
+    for position, entry in enumerate(entries):
+        for name in entry.names():
+            names.setdefault(name, position)
+    slot_count = 1
+    while slot_count < max(len(names), 1) * 2:
+        slot_count *= 2
+    
+    index_offset = HEADER.size
+    data_offset = index_offset + slot_count * SLOT.size
+    records = bytearray()
+    offsets = []
+    for entry in entries:
+        payload = pack_entry(entry)
+        if aead is not None:
+            nonce = os.urandom(NONCE_SIZE)
+            payload = nonce + aead.encrypt(nonce, payload, salt)
+        offsets.append(data_offset + len(records))
+        records += RECORD_LENGTH.pack(len(payload)) + payload
+    
+    slots = [(0, 0)] * slot_count
+    mask = slot_count - 1
+    for name, position in names.items():
+        value = name_hash(name, hash_key)
+        slot = value & mask
+        while slots[slot][0]:
+            slot = (slot + 1) & mask
+        slots[slot] = (value, offsets[position])
+    
+    header = HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, FLAG_ENCRYPTED if aead else 0, len(entries),
+                         slot_count, index_offset, data_offset, salt, key_check(salt, raw_key))
+    # 密钥包含明文（或加密的）密钥：临时文件创建时即只允许所有者读写，替换后的密钥包沿用该权限
+    temp_path = path + ".partial"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)  # 上次中断遗留的临时文件可能权限较宽
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o600)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.write(b"".join(SLOT.pack(*slot) for slot in slots))
+            f.write(records)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return len(entries)
+
+class KeyBundle:
+    """只读的密钥包：内存映射后按名称一次定位"""
+    
+    def __init__(self, path: str, key: str = None):
+        with open(path, "rb") as f:
+            self.size = os.fstat(f.fileno()).st_size
+            if self.size < HEADER.size:
+                raise BundleError("不是有效的密钥包（文件为空或不完整）")
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.open(key)
+        except BaseException:
+            self.close()
+            raise
+    
+    def open(self, key: Optional[str]):
+        """读取文件头，加密包同时准备解密"""
+        try:
+            (magic, version, flags, self.count, self.slot_count,
+             self.index_offset, self.data_offset, self.salt, check) = HEADER.unpack_from(self.map)
+        except struct.error:
+            raise BundleError("不是有效的密钥包") from None
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+            raise BundleError("不是有效的密钥包或版本不支持")
+        # 索引槽数为 2 的幂，索引和记录区都在文件范围内（文件被截断时在这里报错，而不是读取时越界）
+        if (self.slot_count < 1 or self.slot_count & (self.slot_count - 1)
+                or self.index_offset < HEADER.size
+                or self.index_offset + self.slot_count * SLOT.size > self.data_offset
+                or self.data_offset + self.count * RECORD_LENGTH.size > self.size):
+            raise BundleError("密钥包不完整或已损坏")
+        self.encrypted = bool(flags & FLAG_ENCRYPTED)
+        self.aead = None
+        raw_key = None
+        if self.encrypted:
+            key = key or os.environ.get(KEY_ENV)
+            if not key:
+                raise BundleError(f"密钥包已加密，请提供密钥（或设置环境变量 {KEY_ENV}）")
+            raw_key = decode_key(key)
+            if key_check(self.salt, raw_key) != check:
+                raise BundleError("密钥错误")
+            self.aead = cipher(raw_key)
+        self.hash_key = index_key(self.salt, raw_key)
+        self.mask = self.slot_count - 1
+    
+    def close(self):
+        self.map.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def record_length(self, offset: int) -> int:
+        """记录的负载长度（记录超出文件范围时报错）"""
+        if offset < self.data_offset or offset + RECORD_LENGTH.size > self.size:
+            raise BundleError("密钥包不完整或已损坏")
+        length, = RECORD_LENGTH.unpack_from(self.map, offset)
+        if offset + RECORD_LENGTH.size + length > self.size:
+            raise BundleError("密钥包不完整或已损坏")
+        return length
+    
+    def read(self, offset: int) -> BundleEntry:
+        """读取指定偏移的记录（加密时解密）"""
+        length = self.record_length(offset)
+        start = offset + RECORD_LENGTH.size
+        payload = self.map[start:start + length]
+        if self.aead is not None:
+            from cryptography.exceptions import InvalidTag
+            try:
+                payload = self.aead.decrypt(payload[:NONCE_SIZE], payload[NONCE_SIZE:], self.salt)
+            except (InvalidTag, ValueError):
+                raise BundleError("解密失败：密钥错误或密钥包已损坏") from None
+        return unpack_entry(payload)
+    
+    def get(self, name: str) -> Optional[BundleEntry]:
+        """按别名、“厂商/模型”或厂商查找（不区分大小写），找不到时返回 None"""
+        name = name.casefold()
+        value = name_hash(name, self.hash_key)
+        slot = value & self.mask
+        for _ in range(self.slot_count):
+            stored, offset = SLOT.unpack_from(self.map, self.index_offset + slot * SLOT.size)
+            if stored == 0:
+                return None
+            if stored == value:
+                entry = self.read(offset)
+                if name in entry.names():
+                    return entry
+            slot = (slot + 1) & self.mask
+        return None  # 索引已损坏（没有空槽）
+    
+    def resolve(self, alias: str = None, vendor: str = None, model: str = None) -> Optional[BundleEntry]:
+        """依次按别名、厂商/模型、厂商查找"""
+        for name in (alias, f"{vendor}/{model}" if vendor and model else None, vendor):
+            if name:
+                entry = self.get(name)
+                if entry is not None:
+                    return entry
+        return None
+    
+    def __iter__(self) -> Iterator[BundleEntry]:
+        """按写入顺序遍历全部记录"""
+        offset = self.data_offset
+        for _ in range(self.count):
+            length = self.record_length(offset)
+            yield self.read(offset)
+            offset += RECORD_LENGTH.size + length
+
+def select_entries(db_file: str, ids: List[int] = None, aliases: List[str] = None,
+                   vendors: List[str] = None) -> List[BundleEntry]:
+    """从数据库选出要导出的密钥（条件之间为“或”，都不给时导出全部）；有效的密钥排在前面"""
+    import json
+    import vault_db
+    from vendor_catalog import vendor_catalog
+    
+    conditions, params = [], []
+    for column, values in (("id", ids), ("alias", aliases), ("vendor", vendors)):
+        if values:
+            conditions.append(f"{column} IN (SELECT value FROM json_each(?))")
+            params.append(vault_db.id_list(values) if column == "id" else
+                          json.dumps(list(values), ensure_ascii=False))
+    sql = "SELECT vendor, model, alias, api_url, api_key FROM api_keys"
+    if conditions:
+        sql += " WHERE " + " OR ".join(conditions)
+    sql += " ORDER BY health_status = 'ok' DESC, health_checked_at DESC, id"
+    con = vault_db.connect(db_file)
+    try:
+        rows = con.execute(sql, params).fetchall()
+    finally:
+        con.close()
+    return [BundleEntry(vendor, model or "", alias or "",
+                        (api_url or vendor_catalog.url_for(vendor) or "").strip(), api_key.strip())
+            for vendor, model, alias, api_url, api_key in rows]
+
+def export_bundle(path: str, db_file: str = None, ids: List[int] = None, aliases: List[str] = None,
+                  vendors: List[str] = None, key: str = None) -> int:
+    """把选定的密钥导出为密钥包，返回导出的记录数"""
+    import vault_db
+    return write_bundle(path, select_entries(db_file or vault_db.DB_FILE, ids, aliases, vendors), key)
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import time
+    
+    parser = argparse.ArgumentParser(description="密钥包：导出选定的密钥供容器/CI 使用，按名称读取")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    export_parser = commands.add_parser("export", help="从数据库导出密钥包")
+    export_parser.add_argument("path", help="输出文件")
+    export_parser.add_argument("--db", help="数据库文件")
+    export_parser.add_argument("--ids", help="密钥ID（逗号分隔）")
+    export_parser.add_argument("--alias", help="别名（逗号分隔）")
+    export_parser.add_argument("--vendor", help="厂商（逗号分隔）")
+    export_parser.add_argument("--encrypt", action="store_true", help="加密（生成新密钥并输出，需要 cryptography 库）")
+    export_parser.add_argument("--key", help="使用已有的密钥加密（base64）")
+    
+    get_parser = commands.add_parser("get", help="按别名、厂商/模型或厂商输出密钥")
+    get_parser.add_argument("path", help="密钥包")
+    get_parser.add_argument("name", help="别名、厂商/模型或厂商")
+    get_parser.add_argument("--field", default="api_key", choices=RECORD_FIELDS, help="输出的字段")
+    get_parser.add_argument("--key", help=f"解密密钥（默认读取环境变量 {KEY_ENV}）")
+    
+    list_parser = commands.add_parser("list", help="列出密钥包中的记录（密钥只显示前 4 位）")
+    list_parser.add_argument("path", help="密钥包")
+    list_parser.add_argument("--key", help=f"解密密钥（默认读取环境变量 {KEY_ENV}）")
+    
+    bench_parser = commands.add_parser("bench", help="测量打开密钥包并查找一次的耗时")
+    bench_parser.add_argument("path", help="密钥包")
+    bench_parser.add_argument("name", help="查找的名称")
+    bench_parser.add_argument("--key", help=f"解密密钥（默认读取环境变量 {KEY_ENV}）")
+    bench_parser.add_argument("--repeat", type=int, default=10000, help="重复次数")
+    args = parser.parse_args()
+    
+    try:
+        if args.command == "export":
+            bundle_key = args.key or (new_key() if args.encrypt else None)
+            split = lambda text: [item.strip() for item in text.split(",") if item.strip()] if text else None
+            ids = [int(i) for i in split(args.ids)] if args.ids else None
+            count = export_bundle(args.path, args.db, ids, split(args.alias), split(args.vendor), bundle_key)
+            print(f"已导出 {count} 条记录到 {args.path}")
+            if args.encrypt and not args.key:
+                print(f"密钥（请保存到 CI 密钥库，读取时设置为环境变量 {KEY_ENV}）: {bundle_key}")
+            elif not bundle_key:
+                print("⚠ 密钥包未加密，包含明文密钥，请妥善保管")
+        elif args.command == "get":
+            with KeyBundle(args.path, args.key) as bundle:
+                found = bundle.get(args.name)
+            if found is None:
+                print(f"找不到: {args.name}", file=sys.stderr)
+                sys.exit(1)
+            print(getattr(found, args.field))
+        elif args.command == "list":
+            with KeyBundle(args.path, args.key) as bundle:
+                for item in bundle:
+                    print(f"{item.vendor}\t{item.model}\t{item.alias}\t{item.api_url}\t{item.api_key[:4]}…")
+        elif args.command == "bench":
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                with KeyBundle(args.path, args.key) as bundle:
+                    bundle.get(args.name)
+            elapsed = (time.perf_counter() - started) / args.repeat
+            print(f"打开并查找一次: {elapsed * 1e6:.1f} µs")
+    except BundleError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
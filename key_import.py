@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+密钥导入/导出模块
+从 CSV（首行为列名）或 JSON（对象数组）文件批量导入密钥，通过指纹索引查重，重复的密钥跳过或合并；
+导出使用相同的格式，导出的文件可以直接再导入
+"""
+
+import csv
+import json
+import os
+from typing import Dict, List
+
+import vault_db
+
+# 常见的列名写法 -> 数据库字段
+COLUMN_ALIASES = {
+    "厂商": "vendor", "provider": "vendor",
+    "密钥": "api_key", "key": "api_key", "apikey": "api_key", "api key": "api_key",
+    "api url": "api_url", "url": "api_url", "base_url": "api_url",
+    "模型": "model",
+    "备注": "notes", "note": "notes",
+    "示例代码": "example_code", "code": "example_code"
+}
+
+def normalize_record(record: Dict) -> Dict[str, str]:
+    """统一列名，只保留密钥字段"""
+    result = {}
+    for name, value in record.items():
+        if name is None:
+            continue
+        key = str(name).strip()
+        key = COLUMN_ALIASES.get(key.lower(), COLUMN_ALIASES.get(key, key.lower()))
+        if key in vault_db.KEY_FIELDS and value is not None:
+            result[key] = str(value)
+    return result
+
+def read_records(path: str) -> List[Dict[str, str]]:
+    """读取导入文件（按扩展名识别 .json，其余按 CSV 处理）"""
+    if os.path.splitext(path)[1].lower() == ".json":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get("api_keys", [])
+        if not isinstance(data, list):
+            raise ValueError("JSON 文件应为对象数组")
+        return [normalize_record(item) for item in data if isinstance(item, dict)]
+    
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return [normalize_record(row) for row in csv.DictReader(f)]
+
+def import_file(path: str, db_file: str = vault_db.DB_FILE, merge: bool = False):
+    """导入文件，返回 (读取数, 新增数, 合并数, 重复数)"""
+    records = read_records(path)
+    con = vault_db.connect(db_file)
+    try:
+        vault_db.init_schema(con)
+        inserted, merged, duplicates = vault_db.import_keys(con, records, merge=merge)
+    finally:
+        con.close()
+    return len(records), inserted, merged, len(duplicates)
+
+def write_records(path: str, records: List[Dict[str, str]]):
+    """把密钥记录写入文件（按扩展名选择 JSON 或 CSV）"""
+    rows = [{field: record.get(field) or "" for field in vault_db.KEY_FIELDS} for record in records]
+    is_json = os.path.splitext(path)[1].lower() == ".json"
+    # 导出文件包含明文密钥：与密钥包相同，临时文件创建时即只允许所有者读写，替换后的文件沿用该权限
+    temp_path = path + ".partial"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)  # 上次中断遗留的临时文件可能权限较宽
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o600)
+    try:
+        if is_json:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(rows, f, ensure_ascii=False, indent=2)
+        else:
+            with os.fdopen(fd, "w", encoding="utf-8-sig", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=vault_db.KEY_FIELDS)
+                writer.writeheader()
+                writer.writerows(rows)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def export_file(path: str, db_file: str = vault_db.DB_FILE, ids: List[int] = None) -> int:
+    """导出指定的密钥（不指定时导出全部），返回导出的记录数"""
+    con = vault_db.connect(db_file)
+    try:
+        records = vault_db.get_keys(con, ids)
+    finally:
+        con.close()
+    write_records(path, records)
+    return len(records)
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="从 CSV/JSON 文件批量导入密钥")
+    parser.add_argument("file", help="导入文件（与 --export 一起使用时为导出文件）")
+    parser.add_argument("--db", default=vault_db.DB_FILE, help="数据库文件")
+    parser.add_argument("--merge", action="store_true", help="重复的密钥合并到已有记录（默认跳过）")
+    parser.add_argument("--export", action="store_true", help="把所有密钥导出到文件")
+    args = parser.parse_args()
+    
+    if args.export:
+        print(f"📤 已导出 {export_file(args.file, args.db)} 条")
+        raise SystemExit
+    
+    total, inserted, merged, duplicates = import_file(args.file, args.db, args.merge)
+    print(f"📥 读取 {total} 条，新增 {inserted} 条，重复 {duplicates} 条"
+          + (f"（已合并 {merged} 条）" if args.merge else "（已跳过）"))
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+模型目录模块
+把各厂商 /models 接口返回的模型元数据（上下文长度、输入/输出模态、价格、首次/最近出现时间）
+持久化到 SQLite，并提供基于索引的能力查询，例如“哪些密钥能访问 ≥128k 上下文的模型”
+"""
+
+import json
+import time
+from typing import Dict, Iterable, List, Optional
+
+import vault_db
+
+# 不同接口中表示上下文长度的字段
+CONTEXT_FIELDS = ("context_window", "context_length", "inputTokenLimit", "max_context_length",
+                  "max_model_len", "max_input_tokens")
+# 不同接口中表示最大输出长度的字段
+OUTPUT_FIELDS = ("max_output_tokens", "outputTokenLimit", "max_completion_tokens")
+# extract_metadata 用到的全部字段（获取模型列表时只保留这些，丢弃描述、参数列表等）
+METADATA_FIELDS = ("id",) + CONTEXT_FIELDS + OUTPUT_FIELDS + (
+    "top_provider", "architecture", "input_modalities", "output_modalities", "pricing")
+_METADATA_FIELD_SET = frozenset(METADATA_FIELDS)
+
+def _to_int(value) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+def _parse_modality_string(modality: str):
+    """解析 "text+image->text" 形式的模态描述"""
+    if "->" not in modality:
+        return [], []
+    inputs, outputs = modality.split("->", 1)
+    return [m for m in inputs.split("+") if m], [m for m in outputs.split("+") if m]
+
+def slim_item(item: Dict) -> Dict:
+    """只保留模型信息中写入目录的字段"""
+    return {field: value for field, value in item.items() if field in _METADATA_FIELD_SET}
+
+def extract_metadata(item: Dict) -> Dict:
+    """从接口返回的单个模型信息中提取目录字段（兼容 OpenAI/OpenRouter/Groq/Google/Cohere 等格式）"""
+    top_provider = item.get("top_provider") or {}
+    context_window = next((_to_int(item[f]) for f in CONTEXT_FIELDS if item.get(f) is not None), None)
+    if context_window is None:
+        context_window = _to_int(top_provider.get("context_length"))
+    max_output = next((_to_int(item[f]) for f in OUTPUT_FIELDS if item.get(f) is not None), None)
+    if max_output is None:
+        max_output = _to_int(top_provider.get("max_completion_tokens"))
+    
+    architecture = item.get("architecture") or {}
+    inputs = architecture.get("input_modalities") or item.get("input_modalities") or []
+    outputs = architecture.get("output_modalities") or item.get("output_modalities") or []
+    if not inputs and not outputs and isinstance(architecture.get("modality"), str):
+        inputs, outputs = _parse_modality_string(architecture["modality"])
+    
+    pricing = item.get("pricing") if isinstance(item.get("pricing"), dict) else None
+    return {
+        "model_id": item.get("id", ""),
+        "context_window": context_window,
+        "max_output_tokens": max_output,
+        "input_modalities": sorted({str(m).lower() for m in inputs}),
+        "output_modalities": sorted({str(m).lower() for m in outputs}),
+        "prompt_price": _to_float(pricing.get("prompt")) if pricing else None,
+        "completion_price": _to_float(pricing.get("completion")) if pricing else None,
+        "pricing_json": json.dumps(pricing, ensure_ascii=False, sort_keys=True) if pricing else None
+    }
+
+class ModelCatalog:
+    """持久化模型目录"""
+    
+    def __init__(self, db_file: str = vault_db.DB_FILE):
+        self.db_file = db_file
+    
+    def record(self, vendor: str, items: Iterable[Dict], key_id: int = None, seen_at: float = None) -> int:
+        """
+        写入一次 /models 结果：新模型记录首次出现时间，已有模型更新最近出现时间和元数据；
+        提供 key_id 时同时记录该密钥可访问这些模型。返回写入的模型数
+        """
+        seen_at = time.time() if seen_at is None else seen_at
+        rows = [extract_metadata(item) for item in items]
+        rows = [row for row in rows if row["model_id"]]
+        if not rows:
+            return 0
+        
+        con = vault_db.connect(self.db_file)
+        try:
+            cur = con.cursor()
+            for row in rows:
+                cur.execute("""
+                    INSERT INTO models (vendor, model_id, context_window, max_output_tokens,
+                                        prompt_price, completion_price, pricing_json, first_seen, last_seen)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (vendor, model_id) DO UPDATE SET
+                        context_window = COALESCE(excluded.context_window, models.context_window),
+                        max_output_tokens = COALESCE(excluded.max_output_tokens, models.max_output_tokens),
+                        prompt_price = COALESCE(excluded.prompt_price, models.prompt_price),
+                        completion_price = COALESCE(excluded.completion_price, models.completion_price),
+                        pricing_json = COALESCE(excluded.pricing_json, models.pricing_json),
+                        last_seen = excluded.last_seen
+                """, (vendor, row["model_id"], row["context_window"], row["max_output_tokens"],
+                      row["prompt_price"], row["completion_price"], row["pricing_json"], seen_at, seen_at))
+                cur.execute("SELECT id FROM models WHERE vendor = ? AND model_id = ?", (vendor, row["model_id"]))
+                model_pk = cur.fetchone()[0]
+                
+                modalities = [(m, "input", model_pk) for m in row["input_modalities"]]
+                modalities += [(m, "output", model_pk) for m in row["output_modalities"]]
+                if modalities:
+                    cur.execute("DELETE FROM model_modalities WHERE model_pk = ?", (model_pk,))
+                    cur.executemany("INSERT INTO model_modalities (modality, direction, model_pk) VALUES (?, ?, ?)",
+                                    modalities)
+                if key_id is not None:
+                    cur.execute("""
+                        INSERT INTO key_models (key_id, model_pk, last_seen) VALUES (?, ?, ?)
+                        ON CONFLICT (key_id, model_pk) DO UPDATE SET last_seen = excluded.last_seen
+                    """, (key_id, model_pk, seen_at))
+            con.commit()
+        finally:
+            con.close()
+        return len(rows)
+    
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        con = vault_db.connect(self.db_file)
+        try:
+            return con.execute(sql, params).fetchall()
+        finally:
+            con.close()
+    
+    def vendor_models(self, vendor: str) -> List[str]:
+        """目录中某厂商的模型（最近出现的在前）"""
+        return [row[0] for row in self._query(
+            "SELECT model_id FROM models WHERE vendor = ? ORDER BY last_seen DESC, model_id", (vendor,))]
+    
+    def keys_with_min_context(self, min_tokens: int) -> List[tuple]:
+        """能访问上下文长度 ≥ min_tokens 的模型的密钥：(密钥ID, 厂商, 备注, 最大上下文, 模型)"""
+        return self._query("""
+            SELECT k.id, k.vendor, k.notes, MAX(m.context_window), m.model_id
+            FROM models m
+            JOIN key_models km ON km.model_pk = m.id
+            JOIN api_keys k ON k.id = km.key_id
+            WHERE m.context_window >= ?
+            GROUP BY k.id
+            ORDER BY MAX(m.context_window) DESC, k.id
+        """, (min_tokens,))
+    
+    def keys_with_modality(self, modality: str, direction: str = "input") -> List[tuple]:
+        """能访问支持某输入/输出模态（如 image、audio）模型的密钥：(密钥ID, 厂商, 备注, 模型数)"""
+        return self._query("""
+            SELECT k.id, k.vendor, k.notes, COUNT(*)
+            FROM model_modalities mm
+            JOIN key_models km ON km.model_pk = mm.model_pk
+            JOIN api_keys k ON k.id = km.key_id
+            WHERE mm.modality = ? AND mm.direction = ?
+            GROUP BY k.id
+            ORDER BY k.id
+        """, (modality.lower(), direction))
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="查询本地模型目录")
+    parser.add_argument("--db", default=vault_db.DB_FILE, help="数据库文件")
+    parser.add_argument("--min-context", type=int, help="列出能访问上下文长度不小于该值的模型的密钥")
+    parser.add_argument("--modality", help="列出能访问支持该输入模态（如 image）的模型的密钥")
+    args = parser.parse_args()
+    
+    con = vault_db.connect(args.db)
+    vault_db.init_schema(con)
+    con.close()
+    
+    catalog = ModelCatalog(args.db)
+    if args.min_context:
+        for key_id, vendor, notes, context, model in catalog.keys_with_min_context(args.min_context):
+            print(f"#{key_id} {vendor} {notes or ''}: {model} ({context} tokens)")
+    if args.modality:
+        for key_id, vendor, notes, count in catalog.keys_with_modality(args.modality):
+            print(f"#{key_id} {vendor} {notes or ''}: {count} 个模型支持 {args.modality}")
@@ -9,15 +9,104 @@
 import requests
 import json
 import time
-from typing import List, Dict, Optional
+import hashlib
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Iterator, List, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+from catalog_stream import CATALOG_CHUNK_SIZE, iter_items
+from model_catalog import slim_item
+from vendor_catalog import vendor_catalog
+
+# 模型列表缓存有效期（秒）
+MODEL_CACHE_TTL = 5 * 60
+
+# 预取和连接预热使用的后台线程数
+PREFETCH_MAX_WORKERS = 2
+
+# 同一主机的连接在该时间（秒）内预热过则不再重复预热
+WARM_INTERVAL = 60
+
+# 各厂商的默认API地址（未填写API URL时使用）
+DEFAULT_BASE_URLS = {
+    "OpenAI": "https://api.openai.com/v1",
+    "Anthropic": "https://api.anthropic.com/v1",
+    "Google": "https://generativelanguage.googleapis.com/v1beta",
+    "Cohere": "https://api.cohere.ai/v1",
+    "Groq": "https://api.groq.com/openai/v1",
+    "DeepSeek": "https://api.deepseek.com/v1"
+}
+
+# 模型列表的来源
+SOURCE_LIVE = "live"                # 厂商 /models 接口的实际返回
+SOURCE_BUILTIN = "builtin"          # 接口已接受密钥，但列表是内置的（没有列表接口或接口未返回模型）
+SOURCE_PRESET = "preset"            # 未请求接口，来自预设列表
+SOURCE_PLACEHOLDER = "placeholder"  # 提示文字（未填写密钥或地址、不支持的厂商）
+SOURCE_ERROR = "error"              # 错误信息（以 "错误:" 开头）
+
+class ModelList(list):
+    """模型列表，source 记录其来源（SOURCE_*），调用方可据此区分真实结果和提示文字、内置列表"""
+    
+    def __init__(self, models=(), source: str = SOURCE_LIVE):
+        super().__init__(models)
+        self.source = source
 
 class ModelFetcher:
     """模型获取器，支持从各厂商API实时获取模型列表"""
     
+    # 可以通过接口在线验证API Key的厂商（其余厂商只返回预设列表）
+    VERIFIABLE_VENDORS = {"OpenAI", "Anthropic", "Google", "Cohere", "Groq", "DeepSeek", "Microsoft Azure"}
+    
     def __init__(self):
         self.timeout = 10
+        # 复用连接池：同一主机的后续请求省去TCP/TLS握手
+        self.http = requests.Session()
+        # (厂商, API地址, 密钥摘要) -> (过期时间, 模型列表, 模型详情)
+        self.cache: Dict[tuple, Tuple[float, List[str], List[Dict]]] = {}
+        self.inflight: Dict[tuple, Future] = {}
+        self.warmed: Dict[str, float] = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=PREFETCH_MAX_WORKERS, thread_name_prefix="prefetch")
+    
+    def use_executor(self, executor: Executor):
+        """改用外部线程池执行预取和预热（如界面的共享任务池）"""
+        self.executor = executor
+    
+    # 有模型列表接口（/models）的厂商
+    LISTING_VENDORS = {"OpenAI", "Google", "Cohere", "Groq", "DeepSeek"}
+    
+    # 没有默认地址、必须填写API URL的厂商
+    URL_REQUIRED_VENDORS = {"Microsoft Azure"}
+    
+    def can_verify(self, vendor: str) -> bool:
+        """该厂商的API Key能否在线验证"""
+        return vendor in self.VERIFIABLE_VENDORS
+    
+    def has_listing(self, vendor: str) -> bool:
+        """该厂商能否通过接口获取真实的模型列表"""
+        return vendor in self.LISTING_VENDORS
+    
+    def is_default_url(self, vendor: str, api_url: str = None) -> bool:
+        """API URL 为空或就是该厂商的官方地址（而不是代理、网关或私有部署）"""
+        default = DEFAULT_BASE_URLS.get(vendor)
+        url = (api_url or "").strip().rstrip("/")
+        return bool(default) and (not url or url == default)
+    
+    def requires_url(self, vendor: str) -> bool:
+        """该厂商是否必须填写API URL"""
+        return vendor in self.URL_REQUIRED_VENDORS
         
-    def fetch_openai_models(self, api_key: str, base_url: str = "https://api.openai.com/v1") -> List[str]:
+    def iter_models(self, response, key: str) -> Iterator[Dict]:
+        """
+        边接收边解析响应中 key 字段的模型数组，逐个返回模型信息（需以 stream=True 发起请求）；
+        未被调用方保留的模型随即释放，不会构建整个响应的对象树
+        """
+        for item in iter_items(response.iter_content(CATALOG_CHUNK_SIZE), key):
+            if isinstance(item, dict):
+                yield item
+    
+    def fetch_openai_models(self, api_key: str, base_url: str = "https://api.openai.com/v1",
+                            details: Optional[List[Dict]] = None) -> List[str]:
         """获取OpenAI模型列表"""
         try:
             headers = {
@@ -25,21 +114,21 @@ class ModelFetcher:
                 "Content-Type": "application/json"
             }
             
-            response = requests.get(f"{base_url}/models", headers=headers, timeout=self.timeout)
-            
-            if response.status_code == 200:
-                data = response.json()
-                models = []
-                for model in data.get("data", []):
-                    model_id = model.get("id", "")
-                    # 过滤出常用的聊天和文本模型
-                    if any(keyword in model_id.lower() for keyword in ["gpt", "davinci", "embedding", "dall-e", "whisper", "tts"]):
-                        models.append(model_id)
-                return sorted(models)
-            elif response.status_code == 401:
-                return ["错误: API Key无效"]
-            else:
-                return ["错误: 无法连接到API"]
+            with self.http.get(f"{base_url}/models", headers=headers, timeout=self.timeout, stream=True) as response:
+                if response.status_code == 200:
+                    models = []
+                    for model in self.iter_models(response, "data"):
+                        model_id = model.get("id", "")
+                        # 过滤出常用的聊天和文本模型
+                        if any(keyword in model_id.lower() for keyword in ["gpt", "davinci", "embedding", "dall-e", "whisper", "tts"]):
+                            models.append(model_id)
+                            if details is not None:
+                                details.append(slim_item(model))
+                    return ModelList(sorted(models))
+                elif response.status_code == 401:
+                    return ["错误: API Key无效"]
+                else:
+                    return ["错误: 无法连接到API"]
                 
         except requests.exceptions.Timeout:
             return ["错误: 请求超时"]
@@ -65,20 +154,20 @@ class ModelFetcher:
                 "messages": [{"role": "user", "content": "test"}]
             }
             
-            response = requests.post(f"{base_url}/messages", 
+            response = self.http.post(f"{base_url}/messages",
                                    headers=headers, 
                                    json=test_data, 
                                    timeout=self.timeout)
             
             if response.status_code in [200, 400]:  # 400可能是因为消息格式，但API Key有效
-                return [
+                return ModelList([
                     "claude-3-opus-20240229",
                     "claude-3-sonnet-20240229", 
                     "claude-3-haiku-20240307",
                     "claude-2.1",
                     "claude-2.0",
                     "claude-instant-1.2"
-                ]
+                ], SOURCE_BUILTIN)
             elif response.status_code == 401:
                 return ["错误: API Key无效"]
             else:
@@ -91,26 +180,27 @@ class ModelFetcher:
         except Exception as e:
             return [f"错误: {str(e)}"]
     
-    def fetch_google_models(self, api_key: str, base_url: str = "https://generativelanguage.googleapis.com/v1beta") -> List[str]:
+    def fetch_google_models(self, api_key: str, base_url: str = "https://generativelanguage.googleapis.com/v1beta",
+                            details: Optional[List[Dict]] = None) -> List[str]:
         """获取Google模型列表"""
         try:
-            response = requests.get(f"{base_url}/models?key={api_key}", timeout=self.timeout)
-            
-            if response.status_code == 200:
-                data = response.json()
-                models = []
-                for model in data.get("models", []):
-                    model_name = model.get("name", "")
-                    if model_name.startswith("models/"):
-                        model_id = model_name.replace("models/", "")
-                        models.append(model_id)
-                return sorted(models) if models else [
-                    "gemini-1.5-pro", "gemini-1.5-flash", "gemini-pro", "gemini-pro-vision"
-                ]
-            elif response.status_code in [400, 403]:
-                return ["错误: API Key无效"]
-            else:
-                return ["错误: 无法连接到API"]
+            with self.http.get(f"{base_url}/models?key={api_key}", timeout=self.timeout, stream=True) as response:
+                if response.status_code == 200:
+                    models = []
+                    for model in self.iter_models(response, "models"):
+                        model_name = model.get("name", "")
+                        if model_name.startswith("models/"):
+                            model_id = model_name.replace("models/", "")
+                            models.append(model_id)
+                            if details is not None:
+                                details.append(dict(slim_item(model), id=model_id))
+                    return ModelList(sorted(models)) if models else ModelList([
+                        "gemini-1.5-pro", "gemini-1.5-flash", "gemini-pro", "gemini-pro-vision"
+                    ], SOURCE_BUILTIN)
+                elif response.status_code in [400, 403]:
+                    return ["错误: API Key无效"]
+                else:
+                    return ["错误: 无法连接到API"]
                 
         except requests.exceptions.Timeout:
             return ["错误: 请求超时"]
@@ -119,7 +209,8 @@ class ModelFetcher:
         except Exception as e:
             return [f"错误: {str(e)}"]
     
-    def fetch_cohere_models(self, api_key: str, base_url: str = "https://api.cohere.ai/v1") -> List[str]:
+    def fetch_cohere_models(self, api_key: str, base_url: str = "https://api.cohere.ai/v1",
+                            details: Optional[List[Dict]] = None) -> List[str]:
         """获取Cohere模型列表"""
         try:
             headers = {
@@ -127,20 +218,20 @@ class ModelFetcher:
                 "Content-Type": "application/json"
             }
             
-            response = requests.get(f"{base_url}/models", headers=headers, timeout=self.timeout)
-            
-            if response.status_code == 200:
-                data = response.json()
-                models = []
-                for model in data.get("models", []):
-                    model_name = model.get("name", "")
-                    if model_name:
-                        models.append(model_name)
-                return sorted(models)
-            elif response.status_code == 401:
-                return ["错误: API Key无效"]
-            else:
-                return ["错误: 无法连接到API"]
+            with self.http.get(f"{base_url}/models", headers=headers, timeout=self.timeout, stream=True) as response:
+                if response.status_code == 200:
+                    models = []
+                    for model in self.iter_models(response, "models"):
+                        model_name = model.get("name", "")
+                        if model_name:
+                            models.append(model_name)
+                            if details is not None:
+                                details.append(dict(slim_item(model), id=model_name))
+                    return ModelList(sorted(models))
+                elif response.status_code == 401:
+                    return ["错误: API Key无效"]
+                else:
+                    return ["错误: 无法连接到API"]
                 
         except requests.exceptions.Timeout:
             return ["错误: 请求超时"]
@@ -149,7 +240,8 @@ class ModelFetcher:
         except Exception as e:
             return [f"错误: {str(e)}"]
     
-    def fetch_groq_models(self, api_key: str, base_url: str = "https://api.groq.com/openai/v1") -> List[str]:
+    def fetch_groq_models(self, api_key: str, base_url: str = "https://api.groq.com/openai/v1",
+                          details: Optional[List[Dict]] = None) -> List[str]:
         """获取Groq模型列表"""
         try:
             headers = {
@@ -157,20 +249,20 @@ class ModelFetcher:
                 "Content-Type": "application/json"
             }
             
-            response = requests.get(f"{base_url}/models", headers=headers, timeout=self.timeout)
-            
-            if response.status_code == 200:
-                data = response.json()
-                models = []
-                for model in data.get("data", []):
-                    model_id = model.get("id", "")
-                    if model_id:
-                        models.append(model_id)
-                return sorted(models)
-            elif response.status_code == 401:
-                return ["错误: API Key无效"]
-            else:
-                return ["错误: 无法连接到API"]
+            with self.http.get(f"{base_url}/models", headers=headers, timeout=self.timeout, stream=True) as response:
+                if response.status_code == 200:
+                    models = []
+                    for model in self.iter_models(response, "data"):
+                        model_id = model.get("id", "")
+                        if model_id:
+                            models.append(model_id)
+                            if details is not None:
+                                details.append(slim_item(model))
+                    return ModelList(sorted(models))
+                elif response.status_code == 401:
+                    return ["错误: API Key无效"]
+                else:
+                    return ["错误: 无法连接到API"]
                 
         except requests.exceptions.Timeout:
             return ["错误: 请求超时"]
@@ -179,7 +271,8 @@ class ModelFetcher:
         except Exception as e:
             return [f"错误: {str(e)}"]
     
-    def fetch_deepseek_models(self, api_key: str, base_url: str = "https://api.deepseek.com/v1") -> List[str]:
+    def fetch_deepseek_models(self, api_key: str, base_url: str = "https://api.deepseek.com/v1",
+                              details: Optional[List[Dict]] = None) -> List[str]:
         """获取DeepSeek模型列表"""
         try:
             headers = {
@@ -187,22 +280,22 @@ class ModelFetcher:
                 "Content-Type": "application/json"
             }
             
-            response = requests.get(f"{base_url}/models", headers=headers, timeout=self.timeout)
-            
-            if response.status_code == 200:
-                data = response.json()
-                models = []
-                for model in data.get("data", []):
-                    model_id = model.get("id", "")
-                    if model_id:
-                        models.append(model_id)
-                return sorted(models) if models else [
-                    "deepseek-chat", "deepseek-coder", "deepseek-math", "deepseek-v2"
-                ]
-            elif response.status_code == 401:
-                return ["错误: API Key无效"]
-            else:
-                return ["错误: 无法连接到API"]
+            with self.http.get(f"{base_url}/models", headers=headers, timeout=self.timeout, stream=True) as response:
+                if response.status_code == 200:
+                    models = []
+                    for model in self.iter_models(response, "data"):
+                        model_id = model.get("id", "")
+                        if model_id:
+                            models.append(model_id)
+                            if details is not None:
+                                details.append(slim_item(model))
+                    return ModelList(sorted(models)) if models else ModelList([
+                        "deepseek-chat", "deepseek-coder", "deepseek-math", "deepseek-v2"
+                    ], SOURCE_BUILTIN)
+                elif response.status_code == 401:
+                    return ["错误: API Key无效"]
+                else:
+                    return ["错误: 无法连接到API"]
                 
         except requests.exceptions.Timeout:
             return ["错误: 请求超时"]
@@ -211,68 +304,151 @@ class ModelFetcher:
         except Exception as e:
             return [f"错误: {str(e)}"]
     
-    def get_models_for_vendor(self, vendor: str, api_key: str, api_url: str = None) -> List[str]:
-        """根据厂商获取模型列表"""
+    def get_models_for_vendor(self, vendor: str, api_key: str, api_url: str = None,
+                              details: Optional[List[Dict]] = None) -> ModelList:
+        """
+        根据厂商获取模型列表，返回值的 source 说明结果来自接口、内置/预设列表、提示文字还是错误
+        传入 details 列表时，会把接口返回的每个模型的原始信息（上下文长度、模态、价格等）追加进去
+        """
+        models = self.list_models(vendor, api_key, api_url, details)
+        if not isinstance(models, ModelList):
+            # 各获取方法中未标注来源的返回值只有错误信息
+            models = ModelList(models, SOURCE_ERROR)
+        return models
+    
+    def list_models(self, vendor: str, api_key: str, api_url: str = None,
+                    details: Optional[List[Dict]] = None) -> List[str]:
+        """按厂商分派到对应的获取方法"""
         if not api_key or not api_key.strip():
-            return ["请先输入API Key"]
+            return ModelList(["请先输入API Key"], SOURCE_PLACEHOLDER)
         
         api_key = api_key.strip()
         
         # 根据厂商选择对应的获取方法
         if vendor == "OpenAI":
-            base_url = api_url or "https://api.openai.com/v1"
-            return self.fetch_openai_models(api_key, base_url)
+            base_url = api_url or DEFAULT_BASE_URLS["OpenAI"]
+            return self.fetch_openai_models(api_key, base_url, details)
         
         elif vendor == "Anthropic":
-            base_url = api_url or "https://api.anthropic.com/v1"
+            base_url = api_url or DEFAULT_BASE_URLS["Anthropic"]
             return self.fetch_anthropic_models(api_key, base_url)
         
         elif vendor == "Google":
-            base_url = api_url or "https://generativelanguage.googleapis.com/v1beta"
-            return self.fetch_google_models(api_key, base_url)
+            base_url = api_url or DEFAULT_BASE_URLS["Google"]
+            return self.fetch_google_models(api_key, base_url, details)
         
         elif vendor == "Cohere":
-            base_url = api_url or "https://api.cohere.ai/v1"
-            return self.fetch_cohere_models(api_key, base_url)
+            base_url = api_url or DEFAULT_BASE_URLS["Cohere"]
+            return self.fetch_cohere_models(api_key, base_url, details)
         
         elif vendor == "Groq":
-            base_url = api_url or "https://api.groq.com/openai/v1"
-            return self.fetch_groq_models(api_key, base_url)
+            base_url = api_url or DEFAULT_BASE_URLS["Groq"]
+            return self.fetch_groq_models(api_key, base_url, details)
         
         elif vendor == "DeepSeek":
-            base_url = api_url or "https://api.deepseek.com/v1"
-            return self.fetch_deepseek_models(api_key, base_url)
+            base_url = api_url or DEFAULT_BASE_URLS["DeepSeek"]
+            return self.fetch_deepseek_models(api_key, base_url, details)
         
         elif vendor in ["Microsoft Azure"]:
             # Azure使用OpenAI格式
             if api_url:
-                return self.fetch_openai_models(api_key, api_url)
+                return self.fetch_openai_models(api_key, api_url, details)
             else:
-                return ["请填写Azure资源的API URL"]
+                return ModelList(["请填写Azure资源的API URL"], SOURCE_PLACEHOLDER)
         
         elif vendor in ["智谱AI", "百度文心", "阿里通义", "字节豆包", "腾讯混元", "讯飞星火", "Moonshot"]:
             # 中国厂商，返回预设模型列表（需要特殊认证方式）
-            return self.get_chinese_vendor_models(vendor)
+            return ModelList(self.get_chinese_vendor_models(vendor), SOURCE_PRESET)
         
         elif vendor == "自定义":
-            return ["请手动输入模型名称"]
+            return ModelList(["请手动输入模型名称"], SOURCE_PLACEHOLDER)
         
         else:
-            return ["不支持的厂商"]
+            return ModelList(["不支持的厂商"], SOURCE_PLACEHOLDER)
+    
+    def cache_key(self, vendor: str, api_key: str, api_url: str = None) -> tuple:
+        """缓存键（只保存密钥摘要）"""
+        digest = hashlib.sha256(api_key.strip().encode("utf-8")).hexdigest()[:16]
+        return vendor, (api_url or DEFAULT_BASE_URLS.get(vendor, "")).rstrip("/"), digest
+    
+    def fetch_and_cache(self, vendor: str, api_key: str, api_url: str = None) -> Tuple[List[str], List[Dict]]:
+        """实时获取模型列表，成功时写入缓存"""
+        details = []
+        models = self.get_models_for_vendor(vendor, api_key, api_url, details)
+        if models and models.source != SOURCE_ERROR:
+            with self.lock:
+                self.cache[self.cache_key(vendor, api_key, api_url)] = (
+                    time.monotonic() + MODEL_CACHE_TTL, models, details)
+        return models, details
+    
+    def get_models_cached(self, vendor: str, api_key: str, api_url: str = None,
+                          details: Optional[List[Dict]] = None) -> ModelList:
+        """优先使用未过期的缓存或正在进行的预取结果，否则实时获取"""
+        key = self.cache_key(vendor, api_key or "", api_url)
+        with self.lock:
+            entry = self.cache.get(key)
+            future = self.inflight.get(key)
+        if entry and entry[0] > time.monotonic():
+            models, item_details = entry[1], entry[2]
+        elif future and not future.cancel():
+            # 预取已在执行：等待其结果（尚未开始的预取已被取消，直接在当前线程获取）
+            try:
+                models, item_details = future.result()
+            except Exception:
+                models, item_details = self.fetch_and_cache(vendor, api_key, api_url)
+        else:
+            models, item_details = self.fetch_and_cache(vendor, api_key, api_url)
+        if details is not None:
+            details.extend(item_details)
+        return ModelList(models, getattr(models, "source", SOURCE_LIVE))
+    
+    def prefetch(self, vendor: str, api_key: str, api_url: str = None) -> Optional[Future]:
+        """
+        在后台预取模型列表，返回可取消的 Future；已有缓存、正在预取或该厂商无法在线获取时返回 None
+        （Future 已开始执行后无法中断，结果仍会写入缓存）
+        """
+        if not self.can_verify(vendor) or not api_key or not api_key.strip():
+            return None
+        key = self.cache_key(vendor, api_key, api_url)
+        with self.lock:
+            entry = self.cache.get(key)
+            if (entry and entry[0] > time.monotonic()) or key in self.inflight:
+                return None
+            future = self.executor.submit(self.fetch_and_cache, vendor, api_key, api_url)
+            self.inflight[key] = future
+        
+        def forget(done, key=key):
+            with self.lock:
+                if self.inflight.get(key) is done:
+                    del self.inflight[key]
+        future.add_done_callback(forget)
+        return future
+    
+    def warm_connection(self, vendor: str, api_url: str = None) -> Optional[Future]:
+        """提前与厂商主机建立连接（DNS、TCP、TLS），放入连接池供随后的请求复用"""
+        base_url = api_url or DEFAULT_BASE_URLS.get(vendor)
+        if not self.can_verify(vendor) or not base_url:
+            return None
+        parts = urlsplit(base_url)
+        if not parts.scheme or not parts.netloc:
+            return None
+        origin = f"{parts.scheme}://{parts.netloc}"
+        now = time.monotonic()
+        with self.lock:
+            if self.warmed.get(origin, 0) > now:
+                return None
+            self.warmed[origin] = now + WARM_INTERVAL
+        
+        def warm():
+            try:
+                self.http.head(origin, timeout=self.timeout, allow_redirects=False)
+            except requests.exceptions.RequestException:
+                pass
+        return self.executor.submit(warm)
     
     def get_chinese_vendor_models(self, vendor: str) -> List[str]:
-        """获取中国厂商的预设模型列表"""
-        chinese_models = {
-            "智谱AI": ["glm-4", "glm-4v", "glm-3-turbo", "chatglm3-6b", "chatglm2-6b"],
-            "百度文心": ["ernie-bot-4.0", "ernie-bot-turbo", "ernie-bot", "ernie-speed", "ernie-lite"],
-            "阿里通义": ["qwen-turbo", "qwen-plus", "qwen-max", "qwen-max-longcontext", "qwen-vl-plus"],
-            "字节豆包": ["doubao-lite-4k", "doubao-pro-4k", "doubao-pro-32k", "doubao-pro-128k"],
-            "腾讯混元": ["hunyuan-lite", "hunyuan-standard", "hunyuan-pro"],
-            "讯飞星火": ["spark-v3.5", "spark-v3.0", "spark-v2.0", "spark-lite"],
-            "Moonshot": ["moonshot-v1-8k", "moonshot-v1-32k", "moonshot-v1-128k"],
-            "DeepSeek": ["deepseek-chat", "deepseek-coder", "deepseek-math", "deepseek-v2"]
-        }
-        return chinese_models.get(vendor, ["请手动输入模型名称"])
+        """获取中国厂商的预设模型列表（来自厂商目录配置文件）"""
+        return vendor_catalog.models_for(vendor) or ["请手动输入模型名称"]
 
 # 全局模型获取器实例
 model_fetcher = ModelFetcher()
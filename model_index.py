@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+模型名称检索索引
+对获取到的模型列表一次性建立前缀索引（有序列表 + 二分查找）和子串索引（三字母倒排表），
+支持在上万个模型ID中按输入实时过滤
+"""
+
+import bisect
+from typing import Dict, List, Sequence, Tuple
+
+# 子串索引使用的 n-gram 长度
+NGRAM_SIZE = 3
+
+class ModelIndex:
+    """模型名称的前缀/子串索引"""
+    
+    def __init__(self, models: Sequence[str]):
+        # 去重并保持原有顺序
+        self.models: List[str] = list(dict.fromkeys(m for m in models if m))
+        self.lowered: List[str] = [m.casefold() for m in self.models]
+        
+        # 前缀索引：按小写名称排序的 (名称, 下标)
+        self.sorted_keys: List[Tuple[str, int]] = sorted((name, i) for i, name in enumerate(self.lowered))
+        
+        # 子串索引：n-gram -> 包含该片段的模型下标（升序）
+        self.ngrams: Dict[str, List[int]] = {}
+        for i, name in enumerate(self.lowered):
+            for gram in {name[j:j + NGRAM_SIZE] for j in range(len(name) - NGRAM_SIZE + 1)}:
+                self.ngrams.setdefault(gram, []).append(i)
+    
+    def __len__(self):
+        return len(self.models)
+    
+    def prefix_matches(self, query: str) -> List[int]:
+        """返回以 query 开头的模型下标（按名称排序）"""
+        start = bisect.bisect_left(self.sorted_keys, (query, -1))
+        result = []
+        for name, i in self.sorted_keys[start:]:
+            if not name.startswith(query):
+                break
+            result.append(i)
+        return result
+    
+    def substring_candidates(self, query: str) -> Sequence[int]:
+        """利用 n-gram 倒排表缩小子串匹配的候选范围"""
+        if len(query) < NGRAM_SIZE:
+            return range(len(self.models))
+        postings = []
+        for j in range(len(query) - NGRAM_SIZE + 1):
+            posting = self.ngrams.get(query[j:j + NGRAM_SIZE])
+            if not posting:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                break
+        return sorted(candidates)
+    
+    def search(self, query: str, limit: int = 200) -> Tuple[List[str], int]:
+        """
+        检索模型：前缀匹配排在前面，其余子串匹配其次
+        返回 (最多 limit 个匹配项, 匹配总数)
+        """
+        query = query.strip().casefold()
+        if not query:
+            return self.models[:limit], len(self.models)
+        
+        prefix = self.prefix_matches(query)
+        seen = set(prefix)
+        others = [i for i in self.substring_candidates(query)
+                  if i not in seen and query in self.lowered[i]]
+        total = len(prefix) + len(others)
+        ordered = prefix[:limit] + others[:max(0, limit - len(prefix))]
+        return [self.models[i] for i in ordered], total
+
+if __name__ == "__main__":
+    # 以一万个模型ID测试检索耗时
+    import time
+    
+    vendors = ["openai", "meta-llama", "mistralai", "google", "qwen", "deepseek-ai"]
+    names = [f"{vendors[i % len(vendors)]}/model-{i}-{'chat' if i % 3 else 'instruct'}" for i in range(10000)]
+    
+    start = time.perf_counter()
+    index = ModelIndex(names)
+    print(f"建立索引: {len(index)} 个模型, {(time.perf_counter() - start) * 1000:.1f} ms")
+    
+    for query in ["", "q", "qwen", "model-99", "instruct", "llama/model-12"]:
+        start = time.perf_counter()
+        matches, total = index.search(query)
+        print(f"{query!r:20} {total:6} 个匹配, {(time.perf_counter() - start) * 1000:.2f} ms, 前3项: {matches[:3]}")
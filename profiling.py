@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+性能诊断模块
+通过环境变量 APIKEY_MANAGER_PROFILE=1 或命令行参数 --profile 开启：记录刷新、保存、获取模型、启动等操作的耗时，
+并可按需采集 cProfile 和 tracemalloc 数据；汇总和采样文件写入诊断目录，可直接附在问题反馈中。
+未开启时计时调用只返回一个空上下文，装饰器直接返回原函数；采样和报告用到的模块在使用时才导入
+"""
+
+import contextlib
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from startup_timing import START_TIME
+
+ENV_FLAG = "APIKEY_MANAGER_PROFILE"
+CLI_FLAG = "--profile"
+
+# 诊断文件目录
+DIAGNOSTICS_DIR = "diagnostics"
+
+# 每个操作保留的最近耗时样本数（用于计算分位数）
+PROFILE_MAX_SAMPLES = 1000
+
+# tracemalloc 记录的调用栈深度，以及报告中列出的条目数
+TRACEMALLOC_FRAMES = 10
+REPORT_TOP = 30
+
+# 未开启时 timed() 返回的空上下文（可重复使用）
+_NULL_CONTEXT = contextlib.nullcontext()
+
+def is_requested() -> bool:
+    """是否开启了性能诊断模式"""
+    return os.environ.get(ENV_FLAG, "") not in ("", "0") or CLI_FLAG in sys.argv
+
+def environment() -> Dict[str, str]:
+    """运行环境（写入诊断和性能测试结果，便于比较）"""
+    import platform
+    import sqlite3
+    
+    return {"python": sys.version.split()[0], "platform": platform.platform(), "sqlite": sqlite3.sqlite_version}
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """已排序样本的分位数（最近秩）"""
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+class OperationStats:
+    """单个操作的耗时统计"""
+    
+    __slots__ = ("count", "total", "max", "samples")
+    
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=PROFILE_MAX_SAMPLES)
+    
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+    
+    def summary(self) -> Dict[str, float]:
+        """毫秒为单位的汇总"""
+        samples = sorted(self.samples)
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total / self.count * 1000, 3),
+            "p50_ms": round(percentile(samples, 0.5) * 1000, 3),
+            "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3)
+        }
+
+class Profiler:
+    """操作计时与按需采样"""
+    
+    def __init__(self, directory: str = DIAGNOSTICS_DIR):
+        self.enabled = False
+        self.directory = directory
+        self.stats: Dict[str, OperationStats] = {}
+        self.lock = threading.Lock()
+        self.cpu_profile = None  # cProfile.Profile
+        self.session_started: Optional[float] = None
+        self.tracing_memory = False
+    
+    def enable(self):
+        self.enabled = True
+    
+    def begin(self) -> Optional[float]:
+        """开始计时跨越多个回调的操作（未开启时返回 None）"""
+        return time.perf_counter() if self.enabled else None
+    
+    def record(self, name: str, started: Optional[float]):
+        """记录从 started 到现在的耗时（started 为 None 时忽略）"""
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = OperationStats()
+            stats.add(elapsed)
+    
+    def timed(self, name: str):
+        """计时上下文：with profiler.timed("操作"): ..."""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return self._timed(name)
+    
+    @contextlib.contextmanager
+    def _timed(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, started)
+    
+    def profiled(self, name: str = None) -> Callable:
+        """计时装饰器（定义时未开启则直接返回原函数）"""
+        def decorate(fn):
+            if not self.enabled:
+                return fn
+            label = name or fn.__qualname__
+            
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.record(label, started)
+            wrapper.__name__, wrapper.__qualname__, wrapper.__doc__ = fn.__name__, fn.__qualname__, fn.__doc__
+            return wrapper
+        return decorate
+    
+    def mark_startup(self):
+        """记录自进程启动到现在的耗时（数据首次加载完成时调用）"""
+        self.record("startup", START_TIME if self.enabled else None)
+    
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self.lock:
+            return {name: stats.summary() for name, stats in sorted(self.stats.items())}
+    
+    # ---------- 按需采样 ----------
+    
+    @property
+    def session_running(self) -> bool:
+        return self.session_started is not None
+    
+    def start_session(self, cpu: bool = True, memory: bool = True):
+        """开始采样：cProfile 记录界面线程的函数调用，tracemalloc 记录全部线程的内存分配"""
+        import cProfile
+        import tracemalloc
+        
+        if self.session_running:
+            return
+        self.session_started = time.time()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self.tracing_memory = True
+        if cpu:
+            self.cpu_profile = cProfile.Profile()
+            self.cpu_profile.enable()
+    
+    def stop_session(self) -> List[str]:
+        """结束采样并写入诊断目录，返回写出的文件"""
+        import io
+        import pstats
+        import tracemalloc
+        
+        if not self.session_running:
+            return []
+        stamp = self.file_stamp()
+        paths = []
+        os.makedirs(self.directory, exist_ok=True)
+        if self.cpu_profile is not None:
+            self.cpu_profile.disable()
+            path = os.path.join(self.directory, f"cpu-{stamp}.prof")
+            self.cpu_profile.dump_stats(path)
+            paths.append(path)
+            text = io.StringIO()
+            pstats.Stats(self.cpu_profile, stream=text).sort_stats("cumulative").print_stats(REPORT_TOP)
+            paths.append(self.write_text(f"cpu-{stamp}.txt", text.getvalue()))
+            self.cpu_profile = None
+        if self.tracing_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            self.tracing_memory = False
+            lines = [f"采样时长 {time.time() - self.session_started:.1f} 秒",
+                     f"当前 {current / 1024:.1f} KiB，峰值 {peak / 1024:.1f} KiB", "",
+                     f"分配最多的 {REPORT_TOP} 处代码:"]
+            lines += [str(stat) for stat in snapshot.statistics("lineno")[:REPORT_TOP]]
+            paths.append(self.write_text(f"memory-{stamp}.txt", "\n".join(lines) + "\n"))
+        self.session_started = None
+        return paths
+    
+    # ---------- 诊断文件 ----------
+    
+    @staticmethod
+    def file_stamp() -> str:
+        return time.strftime("%Y%m%d-%H%M%S")
+    
+    def write_text(self, name: str, text: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+    
+    def write_report(self) -> str:
+        """写出各操作耗时汇总和运行环境（JSON），返回文件路径"""
+        import json
+        
+        report = {
+            "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "uptime_seconds": round(time.perf_counter() - START_TIME, 1),
+            "environment": environment(),
+            "operations": self.summary()
+        }
+        return self.write_text(f"timings-{self.file_stamp()}.json",
+                               json.dumps(report, ensure_ascii=False, indent=2))
+    
+    def format_summary(self) -> str:
+        """耗时汇总文本"""
+        lines = [f"{'操作':<24}{'次数':>6}{'平均ms':>10}{'p50ms':>10}{'p95ms':>10}{'最大ms':>10}"]
+        for name, item in self.summary().items():
+            lines.append(f"{name:<24}{item['count']:>6}{item['mean_ms']:>10.1f}{item['p50_ms']:>10.1f}"
+                         f"{item['p95_ms']:>10.1f}{item['max_ms']:>10.1f}")
+        return "\n".join(lines)
+    
+    def shutdown(self):
+        """程序退出时结束未完成的采样并写出汇总"""
+        if not self.enabled:
+            return
+        self.stop_session()
+        if self.stats:
+            path = self.write_report()
+            print(f"[profile] 耗时汇总已写入 {path}", file=sys.stderr)
+            print(self.format_summary(), file=sys.stderr)
+
+# 全局性能诊断实例
+profiler = Profiler()
+
+if is_requested():
+    profiler.enable()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+主窗口行缓存模块
+每条记录只保存列表显示和筛选需要的字段（不含密钥和示例代码），使用 __slots__ 对象，
+厂商、模型、API地址等重复出现的字符串全局复用同一份；按表格行标识查找为 O(1)，选择、筛选和状态栏无需查询数据库。
+同时打开多个密钥库时行标识为“来源:ID”，否则即为ID
+"""
+
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# 健康状态在表格中的显示文本
+HEALTH_STATUS_DISPLAY = {
+    "ok": "✅ 有效",
+    "invalid": "❌ 无效",
+    "error": "⚠ 异常",
+    "skipped": "○ 未验证"
+}
+
+# 列表中备注和API地址的最大显示长度
+NOTES_DISPLAY_LENGTH = 30
+URL_DISPLAY_LENGTH = 40
+
+# 从数据库读取行缓存所需字段的查询（不含密钥）；联合多个密钥库时从 all_keys 视图读取并附加来源
+ROW_COLUMNS = ("id, vendor, model, notes, api_url, "
+               "example_code IS NOT NULL AND trim(example_code) != '', created_at, "
+               "health_status, health_latency_ms, health_checked_at")
+ROW_QUERY = f"SELECT {ROW_COLUMNS} FROM api_keys"
+FEDERATED_ROW_QUERY = f"SELECT {ROW_COLUMNS}, source FROM all_keys"
+
+def intern(value: Optional[str]) -> str:
+    """复用相同内容的字符串（None 视为空字符串）"""
+    return sys.intern(value) if value else ""
+
+def truncate(text: str, length: int) -> str:
+    return text[:length] + "..." if len(text) > length else text
+
+def format_health(status: Optional[str], latency_ms: Optional[int], checked_at: Optional[float]):
+    """格式化健康检查列：状态、延迟、检查时间"""
+    status_display = HEALTH_STATUS_DISPLAY.get(status, "… 未检查")
+    latency_display = f"{latency_ms} ms" if latency_ms is not None else ""
+    checked_display = time.strftime("%m-%d %H:%M", time.localtime(checked_at)) if checked_at else ""
+    return status_display, latency_display, checked_display
+
+class KeyRow:
+    """列表中的一行"""
+    
+    __slots__ = ("id", "vendor", "model", "notes", "api_url", "has_code", "created_at",
+                 "health_status", "health_latency_ms", "health_checked_at", "source")
+    
+    def __init__(self, key_id: int, vendor: str, model: str, notes: str, api_url: str, has_code: bool,
+                 created_at: str, health_status: Optional[str] = None, health_latency_ms: Optional[int] = None,
+                 health_checked_at: Optional[float] = None, source: str = ""):
+        self.id = key_id
+        self.vendor = intern(vendor)
+        self.model = intern(model)
+        self.notes = notes or ""
+        self.api_url = intern(api_url)
+        self.has_code = bool(has_code)
+        self.created_at = created_at or ""
+        self.health_status = intern(health_status) or None
+        self.health_latency_ms = health_latency_ms
+        self.health_checked_at = health_checked_at
+        self.source = intern(source)  # 所在密钥库（只打开一个密钥库时为空）
+    
+    @property
+    def iid(self) -> str:
+        """表格行标识"""
+        return f"{self.source}:{self.id}" if self.source else str(self.id)
+    
+    def values(self) -> tuple:
+        """表格各列的显示文本"""
+        return (self.id, self.vendor, self.model, truncate(self.notes, NOTES_DISPLAY_LENGTH),
+                truncate(self.api_url, URL_DISPLAY_LENGTH), "✓ 有代码" if self.has_code else "○ 无代码",
+                self.created_at, *format_health(self.health_status, self.health_latency_ms, self.health_checked_at),
+                self.source)
+    
+    def search_text(self) -> str:
+        """筛选时匹配的文本（不区分大小写）"""
+        return f"{self.vendor}\n{self.model}\n{self.notes}\n{self.api_url}\n{self.source}".casefold()
+
+class RowStore:
+    """按行标识索引的行缓存（按加载顺序迭代）"""
+    
+    def __init__(self):
+        self.rows: Dict[str, KeyRow] = {}
+        self.search_index: Optional[SearchIndex] = None  # 首次筛选时建立，数据变化后重建
+    
+    def load(self, rows: Iterable[KeyRow]):
+        """替换全部行"""
+        self.rows = {row.iid: row for row in rows}
+        self.search_index = None
+    
+    def __len__(self) -> int:
+        return len(self.rows)
+    
+    def __iter__(self) -> Iterator[KeyRow]:
+        return iter(self.rows.values())
+    
+    def __contains__(self, iid: str) -> bool:
+        return iid in self.rows
+    
+    def get(self, iid: str) -> Optional[KeyRow]:
+        return self.rows.get(iid)
+    
+    def remove(self, iids: Iterable[str]):
+        for iid in iids:
+            self.rows.pop(iid, None)  # 索引中残留的标识在筛选时自然被排除
+    
+    def update(self, iids: Iterable[str], fields: Dict[str, str]) -> List[KeyRow]:
+        """批量修改列表字段（同时清除健康检查结果），返回修改的行"""
+        changed = []
+        for iid in iids:
+            row = self.rows.get(iid)
+            if row is None:
+                continue
+            for field, value in fields.items():
+                setattr(row, field, value if field == "notes" else intern(value))
+            row.health_status = row.health_latency_ms = row.health_checked_at = None
+            changed.append(row)
+        if changed:
+            self.search_index = None
+        return changed
+    
+    def set_health(self, iid: str, status: Optional[str], latency_ms: Optional[int],
+                   checked_at: Optional[float]) -> Optional[KeyRow]:
+        """更新一行的健康检查结果"""
+        row = self.rows.get(iid)
+        if row is not None:
+            row.health_status = intern(status) or None
+            row.health_latency_ms = latency_ms
+            row.health_checked_at = checked_at
+        return row
+    
+    def filter(self, rows: Iterable[KeyRow], query: str) -> List[KeyRow]:
+        """按厂商、模型、备注、API地址筛选（空格分隔的多个词需全部匹配），保持给定顺序"""
+        terms = query.casefold().split()
+        if not terms:
+            return list(rows)
+        if self.search_index is None:
+            self.search_index = SearchIndex(self.rows.values())
+        matched = self.search_index.search(terms)
+        return [row for row in rows if row.iid in matched]
+
+class SearchIndex:
+    """筛选索引：各行的搜索文本（与行标识并列存放），每个词一次列表推导依次缩小范围"""
+    
+    def __init__(self, rows: Iterable[KeyRow]):
+        self.iids: List[str] = []
+        self.texts: List[str] = []
+        for row in rows:
+            self.iids.append(row.iid)
+            self.texts.append(row.search_text())
+    
+    def search(self, terms: List[str]) -> set:
+        """包含全部词的行标识（先用最长的词缩小范围）"""
+        terms = sorted(terms, key=len, reverse=True)
+        first = terms[0]
+        pairs = [(iid, text) for iid, text in zip(self.iids, self.texts) if first in text]
+        for term in terms[1:]:
+            pairs = [(iid, text) for iid, text in pairs if term in text]
+        return {iid for iid, _ in pairs}
+
+def measure_memory(count: int = 100000) -> Dict[str, float]:
+    """对比 count 行的内存占用（字节/行）：显示用元组 vs KeyRow"""
+    import tracemalloc
+    
+    vendors = ("OpenAI", "Anthropic", "DeepSeek", "智谱AI", "阿里通义")
+    models = ("gpt-4o", "claude-3-5-sonnet", "deepseek-chat", "glm-4", "qwen-max")
+    urls = ("https://api.openai.com/v1", "https://api.anthropic.com/v1", "https://api.deepseek.com/v1")
+    
+    def source(i):
+        # 模拟数据库返回的新字符串对象（未去重）
+        return (i, "".join(vendors[i % 5]), "".join(models[i % 5]), f"项目 {i} 的备注",
+                "".join(urls[i % 3]), i % 2, f"2026-01-{i % 28 + 1:02d} 12:{i % 60:02d}:00", "ok", 120, 1.8e9)
+    
+    results = {}
+    for name in ("tuple", "slots"):
+        tracemalloc.start()
+        if name == "tuple":
+            rows = [(i, v, m, truncate(n, NOTES_DISPLAY_LENGTH), truncate(u, URL_DISPLAY_LENGTH),
+                     "✓ 有代码" if c else "○ 无代码", t, *format_health(s, l, h))
+                    for i, v, m, n, u, c, t, s, l, h in map(source, range(count))]
+        else:
+            store = RowStore()
+            store.load(KeyRow(*source(i)) for i in range(count))
+            rows = store
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = current / count
+        del rows
+    return results
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    usage = measure_memory(count)
+    print(f"{count} 行: 显示用元组 {usage['tuple']:.0f} 字节/行，"
+          f"KeyRow {usage['slots']:.0f} 字节/行（含按行标识索引）")
+    
+    store = RowStore()
+    store.load(KeyRow(i, "OpenAI", "gpt-4o", f"备注 {i}", "https://api.openai.com/v1", True, "")
+               for i in range(count))
+    started = time.perf_counter()
+    store.filter(store, "openai 备注 99")
+    first = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    matched = store.filter(store, "备注 999")
+    print(f"筛选: 首次 {first:.0f} ms（建立索引），之后 {(time.perf_counter() - started) * 1000:.0f} ms，"
+          f"匹配 {len(matched)} 行")
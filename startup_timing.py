@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+启动耗时统计模块
+通过环境变量 APIKEY_MANAGER_STARTUP_TIMING=1 或命令行参数 --startup-timing 开启，
+记录各阶段耗时、首帧绘制时间，以及与 python -X importtime 同格式的模块导入耗时
+"""
+
+import importlib
+import os
+import sys
+import time
+from typing import List, Tuple
+
+# 尽早记录起点：本模块应在主程序中最先导入
+START_TIME = time.perf_counter()
+
+ENV_FLAG = "APIKEY_MANAGER_STARTUP_TIMING"
+CLI_FLAG = "--startup-timing"
+
+def is_requested() -> bool:
+    """是否开启了启动计时模式"""
+    return os.environ.get(ENV_FLAG, "") not in ("", "0") or CLI_FLAG in sys.argv
+
+class _TimedLoader:
+    """包装模块加载器，记录 exec_module 的自身耗时与累计耗时"""
+    
+    def __init__(self, loader, name, timer):
+        self._loader = loader
+        self._name = name
+        self._timer = timer
+    
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+    
+    def exec_module(self, module):
+        timer = self._timer
+        depth = len(timer.import_stack)
+        timer.import_stack.append(0)
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            cumulative = int((time.perf_counter() - start) * 1_000_000)
+            children = timer.import_stack.pop()
+            if timer.import_stack:
+                timer.import_stack[-1] += cumulative
+            timer.imports.append((self._name, cumulative - children, cumulative, depth))
+    
+    def __getattr__(self, attr):
+        return getattr(self._loader, attr)
+
+class _TimingFinder:
+    """插入 sys.meta_path 首位，为找到的模块包装计时加载器"""
+    
+    def __init__(self, timer):
+        self._timer = timer
+    
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader, name, self._timer)
+                return spec
+        return None
+
+class StartupTimer:
+    """启动阶段计时器"""
+    
+    def __init__(self):
+        self.enabled = False
+        self.marks: List[Tuple[str, float]] = []
+        self.imports: List[Tuple[str, int, int, int]] = []  # (模块, 自身us, 累计us, 嵌套深度)
+        self.import_stack: List[int] = []
+        self.reported = False
+        self._finder = None
+    
+    def enable(self):
+        """开启计时并安装导入计时钩子"""
+        if self.enabled:
+            return
+        self.enabled = True
+        self._finder = _TimingFinder(self)
+        sys.meta_path.insert(0, self._finder)
+    
+    def mark(self, label: str):
+        """记录一个阶段节点"""
+        if self.enabled:
+            self.marks.append((label, time.perf_counter()))
+    
+    def timed_import(self, module_name: str):
+        """导入模块（用于延迟加载的子系统），计时模式下记录耗时"""
+        if not self.enabled or module_name in sys.modules:
+            return importlib.import_module(module_name)
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        self.mark(f"延迟加载 {module_name}")
+        print(f"[startup] 延迟加载 {module_name}: {(time.perf_counter() - start) * 1000:.1f} ms",
+              file=sys.stderr)
+        return module
+    
+    def format_report(self, top: int = 15) -> str:
+        """生成启动耗时报告"""
+        lines = ["[startup] 启动耗时统计（自进程加载本模块起）"]
+        previous = START_TIME
+        for label, moment in self.marks:
+            lines.append(f"[startup] {label:<12} 累计 {(moment - START_TIME) * 1000:8.1f} ms"
+                         f"  本阶段 {(moment - previous) * 1000:8.1f} ms")
+            previous = moment
+        
+        if self.imports:
+            lines.append(f"[startup] 累计耗时最高的 {top} 个导入（单位与 -X importtime 相同）:")
+            lines.append("import time: self [us] | cumulative | imported package")
+            slowest = sorted(self.imports, key=lambda item: item[2], reverse=True)[:top]
+            for name, self_us, cumulative_us, depth in slowest:
+                lines.append(f"import time: {self_us:>9} | {cumulative_us:>10} | {'  ' * depth}{name}")
+        return "\n".join(lines)
+    
+    def report(self):
+        """首帧绘制后输出一次报告，并卸载导入钩子"""
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        if self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+        print(self.format_report(), file=sys.stderr)
+
+# 全局启动计时器实例
+startup_timer = StartupTimer()
+
+if is_requested():
+    startup_timer.enable()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试数据生成模块
+按 vendor_models_config.json 中的厂商、预设模型和默认地址生成逼真的密钥记录（长备注、示例代码），
+批量写入数据库，用于性能测试；相同的数量和随机种子总是生成相同的数据
+"""
+
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, Iterator
+
+import vault_db
+from vendor_catalog import vendor_catalog
+
+# 默认写入的数据库（与正式数据库分开，避免混入测试数据）
+SYNTHETIC_DB_FILE = "apikeys-synthetic.db"
+
+# 每个事务写入的记录数
+SYNTHETIC_BATCH_SIZE = 10000
+
+# 各厂商密钥的前缀和随机部分长度
+KEY_FORMATS = {
+    "OpenAI": ("sk-proj-", 48),
+    "Anthropic": ("sk-ant-api03-", 95),
+    "Google": ("AIza", 35),
+    "Groq": ("gsk_", 52),
+    "Hugging Face": ("hf_", 34),
+    "Perplexity": ("pplx-", 48),
+    "Cohere": ("", 40),
+    "Microsoft Azure": ("", 32)
+}
+DEFAULT_KEY_FORMAT = ("sk-", 48)
+KEY_ALPHABET = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+# 备注由以下片段组合而成
+NOTE_PURPOSES = ("生产环境", "测试环境", "预发布", "个人项目", "团队共享", "客服机器人", "数据标注",
+                 "代码助手", "翻译服务", "夜间批处理", "评测脚本", "演示账号")
+NOTE_DETAILS = ("每月额度 100 美元，超出后自动停用", "绑定公司信用卡，续费前需走审批流程",
+                "仅允许内网出口 IP 调用", "已开启用量告警，负责人见 wiki", "2026 年底到期，需要提前轮换",
+                "与 staging 共用，请勿用于压测", "限速 60 RPM / 100k TPM", "由运维统一申请，勿外传",
+                "旧项目迁移过来的密钥，确认无调用后删除", "Batch API 专用")
+
+def parse_count(text: str) -> int:
+    """解析记录数：1000、10k、1m"""
+    text = text.strip().lower()
+    for suffix, factor in (("k", 1000), ("m", 1000000)):
+        if text.endswith(suffix):
+            return int(float(text[:-1]) * factor)
+    return int(text)
+
+def make_key(rng: random.Random, vendor: str, index: int) -> str:
+    """生成密钥（末尾带序号，保证不重复）"""
+    prefix, length = KEY_FORMATS.get(vendor, DEFAULT_KEY_FORMAT)
+    suffix = format(index, "x")
+    body = "".join(rng.choices(KEY_ALPHABET, k=max(8, length - len(suffix))))
+    return f"{prefix}{body}{suffix}"
+
+def make_notes(rng: random.Random, index: int) -> str:
+    """生成备注：长度从几十到几百字不等"""
+    parts = [f"{rng.choice(NOTE_PURPOSES)} #{index}"]
+    parts += rng.sample(NOTE_DETAILS, rng.randint(1, 6))
+    return "；".join(parts)
+
+def make_code(rng: random.Random, vendor: str, model: str, api_url: str) -> str:
+    """生成 OpenAI 兼容格式的示例代码（约 0.3~2 KB）"""
+    lines = ["import openai", "", "client = openai.OpenAI(", '    api_key="YOUR_API_KEY",',
+             f'    base_url="{api_url or "YOUR_API_URL"}"  # {vendor}', ")", ""]
+    for turn in range(rng.randint(1, 8)):
+        lines += [f"response_{turn} = client.chat.completions.create(",
+                  f'    model="{model or "YOUR_MODEL"}",',
+                  f'    messages=[{{"role": "user", "content": "第 {turn + 1} 个问题"}}],',
+                  f"    temperature={rng.choice((0, 0.2, 0.7, 1.0))},",
+                  ")",
+                  f"print(response_{turn}.choices[0].message.content)", ""]
+    return "\n".join(lines)
+
+def generate_records(count: int, seed: int = 0, start: int = 0) -> Iterator[Dict[str, str]]:
+    """生成 count 条记录；厂商按目录顺序呈长尾分布（靠前的厂商记录更多）"""
+    rng = random.Random(seed * 1000003 + start)
+    vendors = [vendor for vendor in vendor_catalog.vendors() if vendor_catalog.models_for(vendor)]
+    weights = [1 / (rank + 1) for rank in range(len(vendors))]
+    for index in range(start, start + count):
+        vendor = rng.choices(vendors, weights)[0]
+        model = rng.choice(vendor_catalog.models_for(vendor))
+        api_url = vendor_catalog.url_for(vendor)
+        yield {
+            "vendor": vendor,
+            "api_key": make_key(rng, vendor, index),
+            "api_url": api_url,
+            "model": model,
+            "notes": make_notes(rng, index),
+            "example_code": make_code(rng, vendor, model, api_url) if rng.random() < 0.6 else ""
+        }
+
+def fill_vault(db_file: str, count: int, seed: int = 0, batch_size: int = SYNTHETIC_BATCH_SIZE,
+               progress: Callable[[int, int], None] = None) -> int:
+    """向数据库追加 count 条生成的记录（每批一个事务），返回新增数"""
+    con = vault_db.connect(db_file)
+    try:
+        vault_db.init_schema(con)
+        start = con.execute("SELECT COALESCE(MAX(id), 0) FROM api_keys").fetchone()[0]
+        inserted = 0
+        for offset in range(0, count, batch_size):
+            size = min(batch_size, count - offset)
+            added, _, _ = vault_db.import_keys(con, generate_records(size, seed, start + offset))
+            inserted += added
+            if progress:
+                progress(offset + size, count)
+        return inserted
+    finally:
+        con.close()
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="生成性能测试用的密钥数据")
+    parser.add_argument("count", help="记录数，如 1000、10k、1m")
+    parser.add_argument("--db", default=SYNTHETIC_DB_FILE,
+                        help=f"目标数据库（默认 {SYNTHETIC_DB_FILE}；指定 {vault_db.DB_FILE} 时需加 --force）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--fresh", action="store_true", help="先删除已有的数据库文件")
+    parser.add_argument("--force", action="store_true", help="允许写入正式数据库")
+    args = parser.parse_args()
+    
+    if os.path.abspath(args.db) == os.path.abspath(vault_db.DB_FILE) and not args.force:
+        parser.error(f"{args.db} 是正式数据库，确认要写入测试数据请加 --force")
+    if args.fresh:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+    
+    started = time.perf_counter()
+    
+    def report(done, total):
+        print(f"\r已写入 {done}/{total}", end="", file=sys.stderr, flush=True)
+    
+    added = fill_vault(args.db, parse_count(args.count), args.seed, progress=report)
+    print(f"\n新增 {added} 条记录到 {args.db}，用时 {time.perf_counter() - started:.1f} 秒")
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+后台任务模块
+全程序共用一个有界的优先级线程池，所有耗时操作（模型获取、数据库扫描、模块加载）都提交到这里；
+健康检查、目录同步、测速等周期性批量作业在独立的批处理通道 batch_runner 中运行，不占用用户操作的线程，
+程序的工作线程总数不超过 TASK_MAX_WORKERS + BATCH_MAX_WORKERS。
+任务完成后的界面回调放入同一个结果队列，由 Tk 主循环按固定间隔取出执行，界面线程从不阻塞
+"""
+
+import itertools
+import queue
+import sys
+import threading
+import traceback
+from concurrent.futures import Executor, Future
+from typing import Callable, Iterable, Iterator, List
+
+# 任务优先级（数值越小越先执行）
+PRIORITY_HIGH = 0     # 用户正在等待的操作，如点击获取模型、刷新表格
+PRIORITY_NORMAL = 10  # 预取、预热等推测性操作
+PRIORITY_LOW = 20     # 健康检查、目录同步等周期性后台操作
+
+# 工作线程数上限
+TASK_MAX_WORKERS = 4
+
+# 批处理通道的工作线程数上限（周期性作业本身和它们逐个密钥、逐个地址的网络请求共用）
+BATCH_MAX_WORKERS = 4
+
+# 主循环取出结果回调的间隔（毫秒），以及每次最多执行的回调数
+RESULT_TICK_MS = 50
+RESULT_BATCH_LIMIT = 200
+
+class Task(Future):
+    """后台任务：在 Future 基础上支持取消已开始的任务（结果回调不再执行）"""
+    
+    def __init__(self, fn: Callable, args: tuple, priority: int, name: str = ""):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.priority = priority
+        self.name = name or getattr(fn, "__name__", "task")
+        self.cancel_requested = False
+    
+    def cancel(self) -> bool:
+        """取消任务：尚未开始的不再执行；已开始的照常运行，但完成后不回调界面"""
+        self.cancel_requested = True
+        return super().cancel()
+
+class TaskRunner(Executor):
+    """有界优先级线程池 + 界面结果队列"""
+    
+    def __init__(self, max_workers: int = TASK_MAX_WORKERS, results: queue.SimpleQueue = None):
+        self.max_workers = max_workers
+        self.tasks = queue.PriorityQueue()
+        self.results = results or queue.SimpleQueue()  # 可与其他任务池共用，由同一个主循环取出
+        self.counter = itertools.count()  # 同优先级按提交顺序执行
+        self.threads: List[threading.Thread] = []
+        self.queued = 0  # 已提交、尚未被工作线程取走的任务数
+        self.busy = 0    # 正在执行任务的工作线程数
+        self.closed = False
+        self.lock = threading.Lock()
+    
+    def submit(self, fn: Callable, *args, **kwargs) -> Task:
+        """Executor 接口：以普通优先级提交（供 ModelFetcher 等模块使用）"""
+        if kwargs:
+            return self.schedule(lambda: fn(*args, **kwargs), name=getattr(fn, "__name__", ""))
+        return self.schedule(fn, *args)
+    
+    def schedule(self, fn: Callable, *args, priority: int = PRIORITY_NORMAL,
+                 on_done: Callable = None, on_error: Callable = None, name: str = "") -> Task:
+        """
+        提交任务。on_done(结果) / on_error(异常) 在界面线程中调用；任务被取消时两者都不会调用
+        """
+        task = Task(fn, args, priority, name)
+        if on_done or on_error:
+            def deliver(done: Task):
+                if done.cancel_requested:
+                    return
+                error = done.exception()
+                if error is None:
+                    if on_done:
+                        self.post(on_done, done.result())
+                elif on_error:
+                    self.post(on_error, error)
+                else:
+                    self.post(self.report_error, done, error)
+            task.add_done_callback(deliver)
+        
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("任务池已关闭")
+            self.tasks.put((priority, next(self.counter), task))
+            self.queued += 1
+            # 排队的任务多于能接手的线程时才增加线程；两个计数都在锁内维护，不依赖工作线程是否已进入等待
+            if self.queued > len(self.threads) - self.busy and len(self.threads) < self.max_workers:
+                thread = threading.Thread(target=self.worker, name=f"task-{len(self.threads)}", daemon=True)
+                self.threads.append(thread)
+                thread.start()
+        return task
+    
+    def worker(self):
+        """工作线程：按优先级取出任务执行"""
+        while True:
+            _, _, task = self.tasks.get()
+            if task is None:
+                return
+            with self.lock:
+                self.queued -= 1
+                self.busy += 1
+            try:
+                if not task.set_running_or_notify_cancel():
+                    continue
+                try:
+                    result = task.fn(*task.args)
+                except BaseException as e:
+                    task.set_exception(e)
+                else:
+                    task.set_result(result)
+            finally:
+                with self.lock:
+                    self.busy -= 1
+    
+    def imap_unordered(self, fn: Callable, items: Iterable, priority: int = PRIORITY_LOW,
+                       parallelism: int = None) -> Iterator:
+        """
+        并发处理 items，按完成顺序逐个返回 fn(条目) 的结果（出错时抛出该异常）。
+        调用线程自己也处理条目，另外最多提交 parallelism-1 个辅助任务分担；任务池已满时全部由调用线程完成，
+        作业之间不会互相等待而死锁
+        """
+        pending = list(items)[::-1]  # 从末尾取出，保持提交顺序
+        remaining = len(pending)
+        lock = threading.Lock()
+        results = queue.SimpleQueue()
+        
+        def run_one() -> bool:
+            """取出并处理一个条目，没有剩余条目时返回 False"""
+            with lock:
+                if not pending:
+                    return False
+                item = pending.pop()
+            try:
+                results.put((True, fn(item)))
+            except BaseException as e:
+                results.put((False, e))
+            return True
+        
+        def work():
+            while run_one():
+                pass
+        
+        helpers = [self.schedule(work, priority=priority, name=getattr(fn, "__name__", "batch"))
+                   for _ in range(min(parallelism or self.max_workers, remaining) - 1)]
+        try:
+            while remaining:
+                try:
+                    ok, value = results.get_nowait()
+                except queue.Empty:
+                    # 没有现成的结果时调用线程自己处理一个条目，条目都已被取走时等待辅助任务
+                    if run_one():
+                        continue
+                    ok, value = results.get()
+                remaining -= 1
+                if not ok:
+                    raise value
+                yield value
+        finally:
+            with lock:
+                pending.clear()  # 提前结束时辅助任务不再取新的条目
+            for helper in helpers:
+                helper.cancel()
+    
+    def post(self, callback: Callable, *args):
+        """从任意线程安排一个界面回调（代替在后台线程中调用 after）"""
+        self.results.put((callback, args))
+    
+    def drain(self, limit: int = RESULT_BATCH_LIMIT) -> int:
+        """在界面线程中执行排队的回调，返回执行的数量"""
+        count = 0
+        while count < limit:
+            try:
+                callback, args = self.results.get_nowait()
+            except queue.Empty:
+                break
+            count += 1
+            try:
+                callback(*args)
+            except Exception:
+                traceback.print_exc()
+        return count
+    
+    def attach(self, root, interval_ms: int = RESULT_TICK_MS):
+        """让 Tk 主循环按固定间隔取出结果回调"""
+        def tick():
+            self.drain()
+            root.after(interval_ms, tick)
+        root.after(interval_ms, tick)
+    
+    def report_error(self, task: Task, error: BaseException):
+        """没有 on_error 的任务出错时输出到标准错误"""
+        print(f"后台任务 {task.name} 失败:", file=sys.stderr)
+        traceback.print_exception(type(error), error, error.__traceback__)
+    
+    def pending(self) -> int:
+        """排队中的任务数"""
+        return self.tasks.qsize()
+    
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        """关闭任务池"""
+        with self.lock:
+            self.closed = True
+            threads = list(self.threads)
+        if cancel_futures:
+            while True:
+                try:
+                    _, _, task = self.tasks.get_nowait()
+                except queue.Empty:
+                    break
+                if task is not None:
+                    task.cancel()
+        for _ in threads:
+            self.tasks.put((float("inf"), next(self.counter), None))
+        if wait:
+            for thread in threads:
+                thread.join()
+
+# 全局任务池实例，以及周期性批量作业使用的批处理通道（与任务池共用结果队列）
+task_runner = TaskRunner()
+batch_runner = TaskRunner(BATCH_MAX_WORKERS, results=task_runner.results)
+
+if __name__ == "__main__":
+    import time
+    
+    # 演示：低优先级任务排在高优先级之后执行，取消的任务不会回调
+    runner = TaskRunner(max_workers=1)
+    order = []
+    blocker = runner.schedule(time.sleep, 0.2, name="占位")
+    runner.schedule(order.append, "低", priority=PRIORITY_LOW)
+    cancelled = runner.schedule(order.append, "已取消", on_done=lambda _: order.append("不应出现"))
+    runner.schedule(order.append, "高", priority=PRIORITY_HIGH, on_done=lambda _: order.append("高的回调"))
+    cancelled.cancel()
+    
+    time.sleep(0.5)
+    runner.drain()
+    print("执行顺序:", order)
+    runner.shutdown()
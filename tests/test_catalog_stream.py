@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+"""模型列表流式解析：截断的响应、跨数据块的值"""
+
+import json
+
+import pytest
+
+from catalog_stream import CatalogStreamError, iter_items
+
+def split(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+CATALOG = json.dumps({"object": "list", "data": [
+    {"id": "gpt-4o", "created": 1715367049, "context_length": 128000, "price": 2.5e-06},
+    {"id": "模型-中文", "created": 1700000000, "context_length": 32768, "price": 0.125}
+], "has_more": False}, ensure_ascii=False).encode("utf-8")
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, len(CATALOG)])
+def test_values_split_across_chunks(size):
+    # 数字、多字节字符在任意位置被切开时结果都与整体解析相同
+    assert list(iter_items(split(CATALOG, size), "data")) == json.loads(CATALOG)["data"]
+
+@pytest.mark.parametrize("cut", range(1, 6))
+def test_truncated_array_raises(cut):
+    data = CATALOG[:CATALOG.index(b"]")]  # 缺少数组结束符
+    with pytest.raises(CatalogStreamError):
+        list(iter_items(split(data[:len(data) - cut + 1], 5), "data"))
+
+def test_truncated_after_element_reports_incomplete():
+    with pytest.raises(CatalogStreamError, match="响应不完整"):
+        list(iter_items([b'{"data": [{"id": "a"}, {"id": "b"}'], "data"))
+
+def test_truncated_number_is_not_returned_as_complete():
+    # 截断在数字处时不能把残缺的数字当作完整元素返回后静默结束
+    items = []
+    with pytest.raises(CatalogStreamError):
+        for item in iter_items([b"[1", b"2", b", 34"], "data"):
+            items.append(item)
+    assert items == [12, 34]
+
+def test_truncated_inside_element_raises():
+    with pytest.raises(CatalogStreamError):
+        list(iter_items([b'{"data": [{"id": "a"}, {"id": "gp'], "data"))
+    with pytest.raises(CatalogStreamError):
+        list(iter_items([b'{"object": "li'], "data"))
+
+def test_truncated_object_without_target_reports_incomplete():
+    with pytest.raises(CatalogStreamError, match="响应不完整"):
+        list(iter_items([b'{"object": "list", "has_more": false'], "data"))
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+"""厂商目录同步只采用官方接口的真实模型列表"""
+
+import json
+
+import vault_db
+from catalog_sync import CatalogSync
+from model_fetcher import SOURCE_BUILTIN, SOURCE_PLACEHOLDER, ModelList, model_fetcher
+from vendor_catalog import VendorCatalog
+
+def make_sync(tmp_path, keys):
+    config = tmp_path / "vendor_models.json"
+    config.write_text(json.dumps({"vendor_models": {
+        "OpenAI": ["gpt-4o"], "Anthropic": ["claude-2.1"], "Microsoft Azure": ["gpt-4"], "Groq": ["llama3"]
+    }}), encoding="utf-8")
+    db_file = str(tmp_path / "vault.db")
+    con = vault_db.connect(db_file)
+    vault_db.init_schema(con)
+    for vendor, api_key, api_url in keys:
+        vault_db.insert_key(con, vendor, api_key, api_url)
+    con.commit()
+    con.close()
+    return CatalogSync(db_file, VendorCatalog(str(config)), str(tmp_path / "history.jsonl"))
+
+def test_pick_keys_uses_official_endpoints_only(tmp_path):
+    sync = make_sync(tmp_path, [
+        ("Microsoft Azure", "azure-key", ""),
+        ("Anthropic", "anthropic-key", ""),
+        ("OpenAI", "proxy-key", "https://proxy.example.com/v1"),
+        ("OpenAI", "official-key", "https://api.openai.com/v1/"),
+        ("Groq", "groq-proxy-key", "https://gateway.example.com/groq"),
+    ])
+    assert sync.pick_keys() == {"OpenAI": ("official-key", None)}
+
+def test_fetch_vendor_rejects_non_live_results(tmp_path, monkeypatch):
+    sync = make_sync(tmp_path, [])
+    results = {
+        "OpenAI": ModelList(["gpt-4o", "gpt-4.1"]),
+        "Google": ModelList(["gemini-pro"], SOURCE_BUILTIN),
+        "Microsoft Azure": ModelList(["请填写Azure资源的API URL"], SOURCE_PLACEHOLDER),
+        "Groq": ModelList(["错误: API Key无效"], "error"),
+    }
+    monkeypatch.setattr(model_fetcher, "get_models_for_vendor", lambda vendor, *args, **kwargs: results[vendor])
+    assert sync.fetch_vendor("OpenAI", "k", None) == ["gpt-4o", "gpt-4.1"]
+    assert sync.fetch_vendor("Google", "k", None) is None
+    assert sync.fetch_vendor("Microsoft Azure", "k", None) is None
+    assert sync.fetch_vendor("Groq", "k", None) is None
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+"""端点测速与备用地址切换"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import vault_db
+from endpoint_bench import BenchResult, EndpointBench, Sample, default_url, summarize
+
+def sample(status, error=""):
+    return Sample(1.0, 1.0, None, 1.0, 3.0, status, error)
+
+@pytest.mark.parametrize("status, healthy", [
+    (200, True), (204, True), (401, True), (403, True),
+    (301, False), (404, False), (429, False), (503, False),
+])
+def test_healthy_statuses(status, healthy):
+    assert summarize("http://x/v1", [sample(status)] * 3).healthy is healthy
+
+def test_mostly_failing_is_unhealthy():
+    result = summarize("http://x/v1", [sample(200), sample(None, "timeout"), sample(None, "timeout")])
+    assert not result.healthy
+
+@pytest.fixture
+def servers():
+    started = []
+    
+    def start(delay, status=401):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(delay)
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            
+            def log_message(self, format, *args):
+                pass
+        
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        started.append(server)
+        return f"http://127.0.0.1:{server.server_port}/v1"
+    
+    yield start
+    for server in started:
+        server.shutdown()
+        server.server_close()
+
+def make_key(db_file, vendor, api_url):
+    con = vault_db.connect(db_file)
+    vault_db.init_schema(con)
+    key_id = vault_db.insert_key(con, vendor, "sk-test", api_url)
+    con.commit()
+    con.close()
+    return key_id
+
+def api_url(db_file, key_id):
+    con = vault_db.connect(db_file)
+    try:
+        return con.execute("SELECT api_url FROM api_keys WHERE id = ?", (key_id,)).fetchone()[0]
+    finally:
+        con.close()
+
+def test_switches_to_fastest_healthy_mirror(tmp_path, servers):
+    db_file = str(tmp_path / "vault.db")
+    slow, fast, missing, broken = servers(0.15), servers(0.0), servers(0.0, 404), servers(0.0, 503)
+    key_id = make_key(db_file, "OpenAI", slow)
+    bench = EndpointBench(db_file, samples=3, timeout=2.0)
+    for url in (fast, missing, broken):
+        bench.add_mirror(key_id, url)
+    
+    assert bench.refresh() == [(key_id, slow, fast)]
+    assert api_url(db_file, key_id) == fast
+    ranked = [url for url, *_ in bench.mirrors(key_id)]
+    assert ranked[:2] == [fast, slow]
+    assert set(ranked[2:]) == {missing, broken}
+
+def test_empty_url_keeps_faster_default(tmp_path):
+    db_file = str(tmp_path / "vault.db")
+    key_id = make_key(db_file, "OpenAI", "")
+    bench = EndpointBench(db_file)
+    mirror = "https://mirror.example.com/v1"
+    bench.add_mirror(key_id, mirror)
+    default = default_url("OpenAI")
+    assert {url for url, *_ in bench.mirrors(key_id)} == {default, mirror}
+    
+    def result(url, total_ms):
+        return BenchResult(url, 1.0, 1.0, 1.0, 1.0, total_ms, 401, 3, 0, True, "", time.time())
+    
+    bench.save_results([result(default, 50.0), result(mirror, 300.0)])
+    assert bench.select_fastest() == []
+    assert api_url(db_file, key_id) == ""
+    
+    bench.save_results([result(default, 500.0), result(mirror, 30.0)])
+    assert bench.select_fastest() == [(key_id, "", mirror)]
+    assert api_url(db_file, key_id) == mirror
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+"""本地网关：流式转发、连接复用和密钥选择"""
+
+import http.client
+import json
+import socket
+import time
+
+import pytest
+
+import vault_db
+from gateway import Gateway, KeyResolver, start_mock_upstream
+
+@pytest.fixture
+def upstream():
+    server, url = start_mock_upstream(api_key="sk-mock", delay=0.05, stream_chunks=4)
+    yield server, url
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def db_file(tmp_path, upstream):
+    path = str(tmp_path / "vault.db")
+    con = vault_db.connect(path)
+    vault_db.init_schema(con)
+    con.executemany("INSERT INTO api_keys (vendor, api_key, api_url, model, alias) VALUES (?, ?, ?, ?, ?)", [
+        ("OpenAI", "sk-mock", upstream[1], "mock-model", "fast"),
+        ("Google", "google-key", upstream[1], "gemini-pro", "gem"),
+        ("Anthropic", "anthropic-key", upstream[1], "claude-2.1", None),
+    ])
+    con.commit()
+    con.close()
+    return path
+
+@pytest.fixture
+def gateway(db_file):
+    gateway = Gateway(db_file, port=0)
+    gateway.start()
+    yield gateway
+    gateway.shutdown()
+
+def post(connection, payload, **headers):
+    body = json.dumps(payload).encode("utf-8")
+    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {connection.token}", **headers}
+    connection.request("POST", "/v1/chat/completions", body=body, headers=headers)
+    return connection.getresponse()
+
+def connect(gateway):
+    host, port = gateway.server.server_address[:2]
+    connection = http.client.HTTPConnection(host, port, timeout=10)
+    connection.token = gateway.token
+    return connection
+
+def test_stream_is_passed_through_incrementally(gateway):
+    connection = connect(gateway)
+    start = time.perf_counter()
+    response = post(connection, {"model": "fast", "stream": True, "messages": []})
+    assert response.status == 200
+    assert response.getheader("Content-Type") == "text/event-stream"
+    first = response.read1(65536)
+    first_at = time.perf_counter() - start
+    rest = response.read()
+    total = time.perf_counter() - start
+    # 上游每个分片间隔 50ms：第一个分片应在上游结束前到达客户端
+    assert first.startswith(b"data: ")
+    assert first_at < total - 0.1
+    events = [line for line in (first + rest).decode("utf-8").split("\n\n") if line]
+    assert events[-1] == "data: [DONE]"
+    chunks = [json.loads(event[len("data: "):]) for event in events[:-1]]
+    assert [c["choices"][0]["delta"]["content"] for c in chunks] == [f"片段{i} " for i in range(4)]
+    assert all(c["model"] == "mock-model" for c in chunks)  # 别名已替换为真实模型名
+    connection.close()
+
+def test_upstream_connection_is_reused(gateway, upstream):
+    connection = connect(gateway)
+    for stream in (False, True, False, True, False):
+        response = post(connection, {"model": "fast", "stream": stream, "messages": []})
+        response.read()
+        assert response.status == 200
+    assert upstream[0].connections == 1
+    assert gateway.pool.opened == 1
+    # 统计在响应写完之后记录
+    deadline = time.monotonic() + 2
+    while gateway.metrics.snapshot()["keys"]["1"]["requests"] < 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert gateway.metrics.snapshot()["keys"]["1"]["requests"] == 5
+    connection.close()
+
+@pytest.mark.parametrize("model", ["gem", "gemini-pro", "claude-2.1"])
+def test_non_bearer_vendors_are_not_routed(gateway, upstream, model):
+    connection = connect(gateway)
+    response = post(connection, {"model": model, "messages": []})
+    response.read()
+    assert response.status == 404
+    assert upstream[0].connections == 0
+    connection.close()
+
+def test_models_lists_only_routable_keys(gateway):
+    assert gateway.resolver.models() == ["fast", "mock-model"]
+
+@pytest.mark.parametrize("length", [b"abc", b"-5"])
+def test_invalid_content_length(gateway, length):
+    host, port = gateway.server.server_address[:2]
+    with socket.create_connection((host, port), timeout=5) as sock:
+        sock.sendall(b"POST /v1/chat/completions HTTP/1.1\r\nHost: x\r\nContent-Length: " + length + b"\r\n\r\n")
+        data = b""
+        while True:
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+    assert data.startswith(b"HTTP/1.1 400")
+
+def test_route_cache_is_bounded(db_file):
+    resolver = KeyResolver(db_file, cache_size=8)
+    for index in range(50):
+        resolver.resolve(f"unknown-{index}")
+    assert len(resolver.cache) == 8
+    assert resolver.resolve("fast").api_key == "sk-mock"
+    assert "fast" in resolver.cache
+
+def test_token_is_generated_when_not_given(gateway, upstream):
+    assert gateway.token_generated and len(gateway.token) >= 32
+    connection = connect(gateway)
+    connection.token = "wrong"
+    response = post(connection, {"model": "fast", "messages": []})
+    response.read()
+    assert response.status == 401
+    assert upstream[0].connections == 0
+    connection.close()
+
+def test_metrics_requires_token(gateway):
+    connection = connect(gateway)
+    connection.request("GET", "/metrics")
+    response = connection.getresponse()
+    response.read()
+    assert response.status == 401
+    connection.request("GET", "/metrics", headers={"Authorization": f"Bearer {gateway.token}"})
+    response = connection.getresponse()
+    assert response.status == 200 and "keys" in json.loads(response.read())
+    connection.close()
+
+@pytest.mark.parametrize("headers", [
+    {"Host": "attacker.example:8787"},  # DNS 重绑定：网页域名解析到 127.0.0.1
+    {"Origin": "https://attacker.example"},  # 跨站表单或 fetch
+    {"Origin": "null"}
+])
+def test_browser_requests_are_rejected(gateway, upstream, headers):
+    connection = connect(gateway)
+    if "Host" in headers:
+        connection.putrequest("POST", "/v1/chat/completions", skip_host=True)
+        body = json.dumps({"model": "fast", "messages": []}).encode("utf-8")
+        for name, value in {"Host": headers["Host"], "Content-Type": "text/plain",
+                            "Authorization": f"Bearer {gateway.token}", "Content-Length": str(len(body))}.items():
+            connection.putheader(name, value)
+        connection.endheaders(body)
+        response = connection.getresponse()
+    else:
+        response = post(connection, {"model": "fast", "messages": []}, **headers)
+    response.read()
+    assert response.status == 403
+    assert upstream[0].connections == 0
+    connection.close()
+
+def test_loopback_host_aliases_are_accepted(gateway):
+    port = gateway.server.server_address[1]
+    assert {f"127.0.0.1:{port}", f"localhost:{port}", f"[::1]:{port}"} <= gateway.allowed_hosts
+    assert "127.0.0.1" not in gateway.allowed_hosts
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+"""健康检查结果分类"""
+
+import sqlite3
+
+import pytest
+
+import health_checker
+import vault_db
+from health_checker import (STATUS_ERROR, STATUS_INVALID, STATUS_OK, STATUS_SKIPPED,
+                            HealthChecker, HealthResult, classify_result)
+from model_fetcher import (SOURCE_BUILTIN, SOURCE_ERROR, SOURCE_PLACEHOLDER, SOURCE_PRESET,
+                           ModelList, model_fetcher)
+
+def test_live_listing_is_ok():
+    status, message = classify_result(ModelList(["gpt-4o", "gpt-4o-mini"]))
+    assert status == STATUS_OK
+    assert message == "2 个模型可用"
+
+@pytest.mark.parametrize("text, expected", [
+    ("请先输入API Key", STATUS_ERROR),
+    ("请填写Azure资源的API URL", STATUS_SKIPPED),
+    ("请手动输入模型名称", STATUS_SKIPPED),
+    ("不支持的厂商", STATUS_SKIPPED),
+])
+def test_placeholders_are_not_ok(text, expected):
+    assert classify_result(ModelList([text], SOURCE_PLACEHOLDER)) == (expected, text)
+
+def test_placeholders_from_fetcher_are_not_ok():
+    assert classify_result(model_fetcher.get_models_for_vendor("OpenAI", ""))[0] == STATUS_ERROR
+    assert classify_result(model_fetcher.get_models_for_vendor("Microsoft Azure", "k"))[0] == STATUS_SKIPPED
+    assert classify_result(model_fetcher.get_models_for_vendor("自定义", "k"))[0] == STATUS_SKIPPED
+
+def test_presets_are_skipped():
+    models = model_fetcher.get_models_for_vendor("Moonshot", "k")
+    assert models.source == SOURCE_PRESET
+    assert classify_result(models)[0] == STATUS_SKIPPED
+
+def test_builtin_list_reports_key_only():
+    status, message = classify_result(ModelList(["claude-2.1"], SOURCE_BUILTIN))
+    assert status == STATUS_OK
+    assert "个模型可用" not in message
+
+def test_errors():
+    assert classify_result(ModelList(["错误: API Key无效"], SOURCE_ERROR))[0] == STATUS_INVALID
+    assert classify_result(["错误: 请求超时"])[0] == STATUS_ERROR
+    assert classify_result([])[0] == STATUS_ERROR
+
+def test_probe_skips_azure_without_url(monkeypatch, tmp_path):
+    def fail(*args, **kwargs):
+        raise AssertionError("不应发起请求")
+    monkeypatch.setattr(model_fetcher, "get_models_for_vendor", fail)
+    checker = HealthChecker(str(tmp_path / "vault.db"))
+    result = checker.probe(1, "Microsoft Azure", "k", "")
+    assert result.status == STATUS_SKIPPED
+    assert result.latency_ms is None
+
+def make_vault(tmp_path, count):
+    path = str(tmp_path / "vault.db")
+    con = vault_db.connect(path)
+    vault_db.init_schema(con)
+    for index in range(count):
+        vault_db.insert_key(con, "OpenAI", f"sk-proj-{index:024d}")
+    con.commit()
+    con.close()
+    return path
+
+def checked_ids(path):
+    con = vault_db.connect(path)
+    try:
+        return {row[0] for row in con.execute("SELECT id FROM api_keys WHERE health_checked_at IS NOT NULL")}
+    finally:
+        con.close()
+
+def test_results_are_saved_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(health_checker, "HEALTH_SAVE_BATCH", 2)
+    path = make_vault(tmp_path, 5)
+    checker = HealthChecker(path, max_workers=1)
+    saved_during_run = []
+    
+    def probe(key_id, vendor, api_key, api_url):
+        saved_during_run.append(len(checked_ids(path)))
+        if key_id == 5:
+            raise RuntimeError("程序退出")
+        return HealthResult(key_id, STATUS_OK, 10, "ok", 1.0)
+    monkeypatch.setattr(checker, "probe", probe)
+    
+    with pytest.raises(RuntimeError):
+        checker.check_due()
+    # 每两个结果写回一次，中途出错时已完成的检查也已保存
+    assert saved_during_run == [0, 0, 2, 2, 4]
+    assert checked_ids(path) == {1, 2, 3, 4}
+
+def test_failed_batch_is_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr(health_checker, "HEALTH_SAVE_BATCH", 1)
+    path = make_vault(tmp_path, 3)
+    checker = HealthChecker(path, max_workers=1)
+    monkeypatch.setattr(checker, "probe", lambda key_id, *rest: HealthResult(key_id, STATUS_OK, 10, "ok", 1.0))
+    save = checker.save_results
+    calls = []
+    
+    def flaky_save(results):
+        calls.append(len(results))
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        save(results)
+    monkeypatch.setattr(checker, "save_results", flaky_save)
+    
+    assert len(checker.check_due()) == 3
+    assert calls[:2] == [1, 2]
+    assert checked_ids(path) == {1, 2, 3}
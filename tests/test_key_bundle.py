@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+"""密钥包的读写、文件权限和损坏文件的处理"""
+
+import os
+import stat
+import sys
+
+import pytest
+
+from key_bundle import BundleEntry, BundleError, KeyBundle, new_key, write_bundle
+
+ENTRIES = [
+    BundleEntry("OpenAI", "gpt-4o", "prod", "https://api.openai.com/v1", "sk-prod-0123456789"),
+    BundleEntry("OpenAI", "gpt-4o-mini", "", "https://api.openai.com/v1", "sk-mini-0123456789"),
+    BundleEntry("DeepSeek", "deepseek-chat", "cheap", "https://api.deepseek.com/v1", "sk-ds-0123456789"),
+]
+
+def test_lookup_by_alias_model_and_vendor(tmp_path):
+    path = str(tmp_path / "keys.akb")
+    assert write_bundle(path, ENTRIES) == 3
+    with KeyBundle(path) as bundle:
+        assert len(bundle) == 3
+        assert bundle.get("PROD").api_key == "sk-prod-0123456789"
+        assert bundle.get("openai/gpt-4o-mini").api_key == "sk-mini-0123456789"
+        assert bundle.get("OpenAI").alias == "prod"  # 同名以先出现的为准
+        assert bundle.get("missing") is None
+        assert list(bundle) == ENTRIES
+
+def test_encrypted_round_trip(tmp_path):
+    pytest.importorskip("cryptography")
+    path = str(tmp_path / "keys.akb")
+    key = new_key()
+    write_bundle(path, ENTRIES, key)
+    with KeyBundle(path, key) as bundle:
+        assert bundle.get("cheap").api_key == "sk-ds-0123456789"
+    with pytest.raises(BundleError):
+        KeyBundle(path, new_key())
+    assert b"sk-prod" not in open(path, "rb").read()
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX 文件权限")
+def test_bundle_is_private(tmp_path):
+    path = str(tmp_path / "keys.akb")
+    partial = path + ".partial"
+    with open(partial, "wb"):
+        pass
+    os.chmod(partial, 0o644)  # 上次中断遗留的临时文件
+    with open(path, "wb"):
+        pass
+    os.chmod(path, 0o644)
+    write_bundle(path, ENTRIES)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert not os.path.exists(partial)
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.akb"
+    path.write_bytes(b"")
+    with pytest.raises(BundleError):
+        KeyBundle(str(path))
+
+def test_truncated_files_raise_bundle_error(tmp_path):
+    path = str(tmp_path / "keys.akb")
+    write_bundle(path, ENTRIES)
+    data = open(path, "rb").read()
+    truncated = tmp_path / "truncated.akb"
+    for size in range(1, len(data)):
+        truncated.write_bytes(data[:size])
+        try:
+            with KeyBundle(str(truncated)) as bundle:
+                list(bundle)
+                bundle.get("prod")
+                bundle.get("deepseek")
+        except BundleError:
+            continue
+        pytest.fail(f"截断到 {size} 字节时未报错")
+
+def test_corrupted_record(tmp_path):
+    path = str(tmp_path / "keys.akb")
+    write_bundle(path, ENTRIES)
+    data = bytearray(open(path, "rb").read())
+    data[-3:] = b"\xff\xfe\xfd"
+    open(path, "wb").write(bytes(data))
+    with KeyBundle(path) as bundle:
+        with pytest.raises(BundleError):
+            list(bundle)
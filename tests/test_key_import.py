@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+"""批量导出：文件权限和再导入"""
+
+import os
+import stat
+
+import pytest
+
+import vault_db
+from key_import import export_file, read_records
+
+@pytest.fixture
+def db_file(tmp_path):
+    path = str(tmp_path / "vault.db")
+    con = vault_db.connect(path)
+    vault_db.init_schema(con)
+    vault_db.insert_key(con, "OpenAI", "sk-proj-abcdefghijklmnopqrstuvwxyz", notes="备注")
+    con.commit()
+    con.close()
+    return path
+
+@pytest.mark.parametrize("name", ["keys.csv", "keys.json"])
+def test_export_is_owner_only_and_reimportable(db_file, tmp_path, name):
+    path = str(tmp_path / name)
+    with open(path, "w") as f:
+        f.write("old")
+    os.chmod(path, 0o644)  # 覆盖已有的、权限较宽的文件
+    assert export_file(path, db_file) == 1
+    if os.name == "posix":
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert not os.path.exists(path + ".partial")
+    assert read_records(path) == [{"vendor": "OpenAI", "api_key": "sk-proj-abcdefghijklmnopqrstuvwxyz",
+                                   "api_url": "", "model": "", "notes": "备注", "example_code": ""}]
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+"""后台任务池"""
+
+import threading
+
+import pytest
+
+from task_runner import PRIORITY_HIGH, PRIORITY_LOW, TaskRunner
+
+def test_burst_gets_a_thread_per_task():
+    # 一个空闲线程刚取走任务时连续提交：每个任务都应有线程接手，而不是排在同一个线程后面
+    runner = TaskRunner(max_workers=4)
+    try:
+        runner.schedule(lambda: None).result(timeout=5)
+        barrier = threading.Barrier(4, timeout=5)
+        tasks = [runner.schedule(barrier.wait) for _ in range(4)]
+        for task in tasks:
+            task.result(timeout=5)
+        assert len(runner.threads) == 4
+    finally:
+        runner.shutdown()
+
+def test_idle_threads_are_reused():
+    runner = TaskRunner(max_workers=4)
+    try:
+        for _ in range(20):
+            runner.schedule(lambda: None).result(timeout=5)
+        assert len(runner.threads) == 1
+    finally:
+        runner.shutdown()
+
+def test_priority_order_and_callbacks():
+    runner = TaskRunner(max_workers=1)
+    release = threading.Event()
+    order = []
+    try:
+        runner.schedule(release.wait, 5)
+        low = runner.schedule(order.append, "低", priority=PRIORITY_LOW)
+        high = runner.schedule(order.append, "高", priority=PRIORITY_HIGH, on_done=lambda _: order.append("回调"))
+        cancelled = runner.schedule(order.append, "已取消")
+        cancelled.cancel()
+        release.set()
+        low.result(timeout=5)
+        high.result(timeout=5)
+        runner.drain()
+        assert order == ["高", "低", "回调"]
+    finally:
+        runner.shutdown()
+
+def test_batch_map_runs_everything_with_bounded_threads():
+    runner = TaskRunner(max_workers=2)
+    seen = set()
+    try:
+        results = sorted(runner.imap_unordered(lambda n: (seen.add(threading.current_thread().name), n * n)[1],
+                                               range(50)))
+        assert results == [n * n for n in range(50)]
+        assert len(runner.threads) <= 2
+        assert len(seen) <= 3  # 调用线程加上最多两个工作线程
+    finally:
+        runner.shutdown()
+
+def test_batch_map_does_not_deadlock_when_pool_is_full():
+    # 任务池的唯一线程正在运行一个批量作业：作业内部的条目由调用线程自己完成
+    runner = TaskRunner(max_workers=1)
+    try:
+        job = runner.schedule(lambda: sorted(runner.imap_unordered(lambda n: n + 1, range(10))))
+        assert job.result(timeout=5) == list(range(1, 11))
+    finally:
+        runner.shutdown()
+
+def test_batch_map_raises_item_errors():
+    runner = TaskRunner(max_workers=2)
+    
+    def fail_on_three(n):
+        if n == 3:
+            raise ValueError("bad item")
+        return n
+    try:
+        with pytest.raises(ValueError, match="bad item"):
+            list(runner.imap_unordered(fail_on_three, range(6)))
+    finally:
+        runner.shutdown()
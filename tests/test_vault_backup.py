@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+"""快照：文件权限与内容"""
+
+import os
+import stat
+
+import pytest
+
+import vault_db
+from vault_backup import VaultBackup, verify
+
+@pytest.fixture
+def db_file(tmp_path):
+    path = str(tmp_path / "vault.db")
+    con = vault_db.connect(path)
+    vault_db.init_schema(con)
+    vault_db.insert_key(con, "OpenAI", "sk-proj-abcdefghijklmnopqrstuvwxyz")
+    con.commit()
+    con.close()
+    return path
+
+@pytest.mark.skipif(os.name != "posix", reason="文件权限位只在 POSIX 上有意义")
+def test_snapshot_is_owner_only(db_file, tmp_path):
+    umask = os.umask(0o022)  # 常见的默认值：新文件对其他用户可读
+    try:
+        snapshot = VaultBackup(db_file, str(tmp_path / "backups"), sleep=0).snapshot()
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(os.stat(snapshot.path).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(os.path.dirname(snapshot.path)).st_mode) == 0o700
+    assert verify(snapshot.path) == (True, "校验通过（1 条记录）")
+    assert [name for name in os.listdir(tmp_path / "backups") if name.endswith(".partial")] == []
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+"""保存时的版本检查（比较并交换）与对话框的冲突处理"""
+
+import sqlite3
+import threading
+import types
+
+import pytest
+
+import gui_apikey_manager as g
+import vault_db
+
+API_KEY = "sk-proj-abcdefghijklmnopqrstuvwxyz"
+
+@pytest.fixture
+def db_file(tmp_path):
+    path = str(tmp_path / "vault.db")
+    con = vault_db.connect(path)
+    vault_db.init_schema(con)
+    con.close()
+    return path
+
+class Field:
+    def __init__(self, value):
+        self.value = value
+    
+    def get_value(self):
+        return self.value
+
+    def set_value(self, value):
+        self.value = value
+    
+    def update_options(self, options):
+        self.options = options
+
+class InlineRunner:
+    """代替全局任务池：任务在另一个线程中执行完后立即回调，并记录任务名"""
+    
+    def __init__(self):
+        self.names = []
+    
+    def schedule(self, fn, *args, priority=None, on_done=None, on_error=None, name=""):
+        self.names.append(name)
+        outcome = {}
+        
+        def run():
+            try:
+                outcome["result"] = fn(*args)
+            except Exception as e:
+                outcome["error"] = e
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        if "error" in outcome:
+            on_error(outcome["error"])
+        elif on_done:
+            on_done(outcome["result"])
+
+def fake_dialog(db_file, edit_data, fields):
+    names = ("vendor_field", "api_key_field", "api_url_field", "model_field", "notes_field", "code_field")
+    dialog = types.SimpleNamespace(db_file=db_file, edit_data=edit_data, conflicts=[], closed=False,
+                                   session=1, saving=False, write_record=g.AddEditDialog.write_record,
+                                   **{name: Field(value) for name, value in zip(names, fields)})
+    dialog.resolve_conflict = lambda fields, current: dialog.conflicts.append((fields, current))
+    dialog.main_app = types.SimpleNamespace(refresh_data=lambda: None)
+    dialog.close = lambda: setattr(dialog, "closed", True)
+    dialog.save = types.MethodType(g.AddEditDialog.save, dialog)
+    dialog.write_fields = types.MethodType(g.AddEditDialog.write_fields, dialog)
+    return dialog
+
+@pytest.fixture
+def opened(monkeypatch):
+    """记录对话框打开的连接（并确认不在界面线程中打开），屏蔽提示框"""
+    connections, errors = [], []
+    connect = sqlite3.connect
+    
+    def tracking_connect(*args, **kwargs):
+        con = connect(*args, check_same_thread=False, **kwargs)
+        connections.append((con, threading.current_thread() is threading.main_thread()))
+        return con
+    monkeypatch.setattr(g.sqlite3, "connect", tracking_connect)
+    monkeypatch.setattr(g, "task_runner", InlineRunner())
+    monkeypatch.setattr(g.messagebox, "showerror", lambda title, message: errors.append(message))
+    monkeypatch.setattr(g.messagebox, "showinfo", lambda title, message: None)
+    return connections, errors
+
+def is_closed(con):
+    try:
+        con.execute("SELECT 1")
+    except sqlite3.ProgrammingError:
+        return True
+    return False
+
+def test_stale_version_raises_conflict_with_current_row(db_file):
+    con = vault_db.connect(db_file)
+    key_id = vault_db.insert_key(con, "OpenAI", API_KEY, notes="a")
+    con.commit()
+    base = vault_db.read_key(con, key_id)
+    
+    vault_db.update_key(con, key_id, "OpenAI", API_KEY, notes="theirs", expected_version=base[-1])
+    con.commit()
+    with pytest.raises(vault_db.VersionConflictError) as raised:
+        vault_db.update_key(con, key_id, "OpenAI", API_KEY, model="gpt-4o", notes="a", expected_version=base[-1])
+    con.rollback()
+    current = raised.value.current
+    assert current[vault_db.EDIT_COLUMNS.index("notes")] == "theirs"
+    
+    merged, theirs, conflicts = vault_db.merge_versions(
+        base[1:-1], current[1:-1], ("OpenAI", API_KEY, "", "gpt-4o", "a", ""))
+    assert merged[vault_db.KEY_FIELDS.index("notes")] == "theirs"
+    assert merged[vault_db.KEY_FIELDS.index("model")] == "gpt-4o"
+    assert theirs == ["notes"] and conflicts == []
+    con.close()
+
+def test_save_conflict_closes_connection_before_resolving(db_file, opened):
+    connections, errors = opened
+    con = vault_db.connect(db_file)
+    key_id = vault_db.insert_key(con, "OpenAI", API_KEY, notes="a")
+    con.commit()
+    base = vault_db.read_key(con, key_id)
+    con.execute("UPDATE api_keys SET notes = 'theirs' WHERE id = ?", (key_id,))
+    con.commit()
+    
+    dialog = fake_dialog(db_file, base, ("OpenAI", API_KEY, "", "", "mine", ""))
+    del connections[:]
+    dialog.save()
+    assert connections
+    assert len(dialog.conflicts) == 1 and not dialog.closed and not errors
+    assert dialog.conflicts[0][1][vault_db.EDIT_COLUMNS.index("notes")] == "theirs"
+    assert all(is_closed(con) and not on_main_thread for con, on_main_thread in connections)
+    # 冲突时不写入
+    assert vault_db.read_key(con, key_id)[vault_db.EDIT_COLUMNS.index("notes")] == "theirs"
+    con.close()
+
+def test_save_database_error_rolls_back_and_reports(db_file, opened, monkeypatch):
+    connections, errors = opened
+    
+    def locked(con, *fields):
+        con.execute("INSERT INTO api_keys (vendor, api_key) VALUES ('half', 'written')")
+        raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(g.vault_db, "insert_key", locked)
+    
+    dialog = fake_dialog(db_file, None, ("OpenAI", API_KEY, "", "", "", ""))
+    dialog.save()
+    assert connections
+    assert errors and "database is locked" in errors[0]
+    assert not dialog.closed
+    assert all(is_closed(con) and not on_main_thread for con, on_main_thread in connections)
+    con = vault_db.connect(db_file)
+    assert con.execute("SELECT COUNT(*) FROM api_keys").fetchone()[0] == 0
+    con.close()
+
+def test_catalog_models_are_read_from_the_dialogs_vault(db_file, opened):
+    connections, _ = opened
+    from model_catalog import ModelCatalog
+    ModelCatalog(db_file).record("OpenAI", [{"id": "gpt-from-this-vault"}])
+    
+    dialog = fake_dialog(db_file, None, ("OpenAI", "", "", g.VENDOR_MODELS["OpenAI"][0], "", ""))
+    dialog.models_from_preset = True
+    del connections[:]
+    g.AddEditDialog.load_catalog_models(dialog, "OpenAI")
+    assert g.task_runner.names == ["catalog_models"]
+    assert dialog.model_field.options[0] == "gpt-from-this-vault"
+    assert dialog.model_field.get_value() == "gpt-from-this-vault"
+    assert not dialog.models_from_preset
+    assert connections and not any(on_main_thread for _, on_main_thread in connections)
+
+@pytest.mark.parametrize("column", ["厂商", "模型", "备注", "API URL"])
+@pytest.mark.parametrize("descending", [False, True])
+def test_sql_and_memory_sort_agree(db_file, column, descending):
+    # 超过 SQL_SORT_THRESHOLD 时在数据库中排序，否则在内存中排序：两者顺序必须相同
+    vendors = ["OpenAI", "智谱AI", "anthropic", "百度文心", "Zeta", "字节豆包", "阿里通义", "deepseek",
+               "自定义", " Groq", "腾讯混元", "Éclair", "讯飞星火", "openai"]
+    con = vault_db.connect(db_file)
+    con.executemany("INSERT INTO api_keys (vendor, api_key, model, notes, api_url) VALUES (?, ?, ?, ?, ?)", [
+        (vendor, f"sk-{index}", ("GPT-4o", "claude", "Qwen", "ébène")[index % 4], ("b", "A", "", "备注")[index % 4],
+         ("https://B.example", "https://a.example")[index % 2])
+        for index, vendor in enumerate(vendors * 3)])
+    con.commit()
+    
+    from row_store import ROW_QUERY, KeyRow
+    order = g.APIKeyManager.order_by_clause(None, column, descending)
+    from_sql = [KeyRow(*row).id for row in con.execute(f"{ROW_QUERY} {order}")]
+    rows = [KeyRow(*row) for row in con.execute(f"{ROW_QUERY} ORDER BY id")]
+    field = g.SORTABLE_COLUMNS[column]
+    in_memory = [row.id for row in sorted(rows, key=lambda row: (g.make_sort_key(column, getattr(row, field)), row.id))]
+    assert from_sql == (in_memory[::-1] if descending else in_memory)
+    
+    if column == "厂商":
+        names = [con.execute("SELECT vendor FROM api_keys WHERE id = ?", (key_id,)).fetchone()[0]
+                 for key_id in from_sql[::-1 if descending else 1][::3]]
+        assert names[:4] == ["阿里通义", "anthropic", "百度文心", "deepseek"]
+        plan = " ".join(row[-1] for row in con.execute(f"EXPLAIN QUERY PLAN {ROW_QUERY} {order}"))
+        assert "idx_api_keys_vendor_sort" in plan and "TEMP B-TREE" not in plan
+    con.close()
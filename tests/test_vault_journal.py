@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+"""变更日志：操作者记录、密钥脱敏和回滚"""
+
+import time
+
+import pytest
+
+import vault_db
+from vault_journal import VaultJournal
+
+API_KEY = "sk-proj-abcdefghijklmnopqrstuvwxyz"
+
+@pytest.fixture
+def db_file(tmp_path):
+    path = str(tmp_path / "vault.db")
+    con = vault_db.connect(path)
+    vault_db.init_schema(con)
+    con.close()
+    return path
+
+def latest(con):
+    return con.execute("SELECT actor, new_values FROM key_journal ORDER BY seq DESC LIMIT 1").fetchone()
+
+def test_actor_does_not_outlive_its_write(db_file):
+    con = vault_db.connect(db_file)
+    key_id = vault_db.insert_key(con, "OpenAI", API_KEY, notes="a")
+    con.commit()
+    assert latest(con)[0] == vault_db.default_actor()
+    
+    # 未标记的写入（如其他工具直接修改）记为未知，而不是上一个写入者
+    con.execute("UPDATE api_keys SET notes = 'b' WHERE id = ?", (key_id,))
+    con.commit()
+    assert latest(con)[0] is None
+    assert con.execute("SELECT COUNT(*) FROM journal_context").fetchone()[0] == 0
+    con.close()
+
+def test_nested_scopes_restore_outer_actor(db_file):
+    con = vault_db.connect(db_file)
+    key_id = vault_db.insert_key(con, "OpenAI", API_KEY)
+    with vault_db.actor_scope(con, "outer"):
+        vault_db.merge_key(con, key_id, {"notes": "inner"})
+        con.execute("UPDATE api_keys SET model = 'm' WHERE id = ?", (key_id,))
+    con.commit()
+    actors = [row[0] for row in con.execute("SELECT actor FROM key_journal ORDER BY seq")]
+    assert actors == [vault_db.default_actor(), vault_db.default_actor(), "outer"]
+    con.close()
+
+def test_journal_keeps_only_prefix_and_fingerprint(db_file):
+    con = vault_db.connect(db_file)
+    vault_db.insert_key(con, "OpenAI", API_KEY)
+    con.commit()
+    values = VaultJournal(db_file).history(1)[0].new
+    assert values["api_key"] == API_KEY[:vault_db.JOURNAL_KEY_PREFIX] + "…"
+    assert API_KEY[-4:] not in values["api_key"]
+    assert values["fingerprint"] == vault_db.key_fingerprint(vault_db.vault_salt(con), API_KEY)
+    con.close()
+
+def test_rollback_restores_fields_and_removes_new_keys(db_file):
+    con = vault_db.connect(db_file)
+    key_id = vault_db.insert_key(con, "OpenAI", API_KEY, api_url="https://a.example.com/v1", notes="原始备注")
+    con.commit()
+    time.sleep(0.05)
+    checkpoint = time.time()
+    time.sleep(0.05)
+    vault_db.update_key(con, key_id, "OpenAI", API_KEY, "https://b.example.com/v1", "gpt-4o", "改过的备注")
+    added = vault_db.insert_key(con, "Groq", "gsk_0123456789abcdefghij")
+    con.commit()
+    con.close()
+    
+    journal = VaultJournal(db_file)
+    assert journal.rollback(checkpoint, dry_run=True) == ([key_id], [added], [])
+    updated, deleted, unrecoverable = journal.rollback(checkpoint)
+    assert (updated, deleted, unrecoverable) == ([key_id], [added], [])
+    
+    con = vault_db.connect(db_file)
+    assert vault_db.get_keys(con) == [{"id": key_id, "vendor": "OpenAI", "api_key": API_KEY,
+                                       "api_url": "https://a.example.com/v1", "model": "", "notes": "原始备注",
+                                       "example_code": ""}]
+    rollback_entries = con.execute(
+        "SELECT op, actor FROM key_journal WHERE changed_at > ? ORDER BY seq DESC LIMIT 2", (checkpoint,)).fetchall()
+    assert {op for op, _ in rollback_entries} == {"update", "delete"}
+    assert all(actor.endswith("（回滚）") for _, actor in rollback_entries)
+    con.execute("UPDATE api_keys SET notes = 'later' WHERE id = ?", (key_id,))
+    con.commit()
+    assert latest(con)[0] is None
+    con.close()
+
+def test_rollback_reports_replaced_key_as_unrecoverable(db_file):
+    con = vault_db.connect(db_file)
+    key_id = vault_db.insert_key(con, "OpenAI", API_KEY)
+    con.commit()
+    time.sleep(0.05)
+    checkpoint = time.time()
+    time.sleep(0.05)
+    rotated = "gsk_zyxwvutsrqponmlkjihgfedcba"
+    vault_db.update_key(con, key_id, "Groq", rotated, "https://api.groq.com/openai/v1", "llama3", "已轮换")
+    con.commit()
+    before = vault_db.get_keys(con)
+    con.close()
+    
+    journal = VaultJournal(db_file)
+    assert journal.rollback(checkpoint, dry_run=True) == ([], [], [key_id])
+    assert journal.rollback(checkpoint) == ([], [], [key_id])
+    con = vault_db.connect(db_file)
+    assert vault_db.get_keys(con) == before
+    assert before[0]["vendor"] == "Groq" and before[0]["api_key"] == rotated
+    con.close()
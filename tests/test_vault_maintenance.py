@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+"""存储维护：自动维护不做整体 VACUUM，转换只在明确要求时进行"""
+
+import sqlite3
+
+import pytest
+
+from vault_maintenance import VaultMaintenance
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    """未启用增量回收的旧数据库，删除后留下空闲页"""
+    path = str(tmp_path / "legacy.db")
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE api_keys (id INTEGER PRIMARY KEY, notes TEXT)")
+    con.executemany("INSERT INTO api_keys (notes) VALUES (?)", [("x" * 500,)] * 2000)
+    con.commit()
+    con.execute("DELETE FROM api_keys")
+    con.commit()
+    con.close()
+    return path
+
+def test_scheduled_run_never_converts(legacy_db):
+    maintenance = VaultMaintenance(legacy_db, sleep=0)
+    before = maintenance.stats(with_fragmentation=False)
+    result = maintenance.run(force=True)
+    after = maintenance.stats(with_fragmentation=False)
+    assert not result.converted and result.optimized
+    assert after.auto_vacuum == "none"
+    assert after.page_count == before.page_count
+
+def test_convert_only_when_requested(legacy_db):
+    maintenance = VaultMaintenance(legacy_db, sleep=0)
+    result = maintenance.run(force=True, convert=True)
+    assert result.converted
+    assert maintenance.stats(with_fragmentation=False).auto_vacuum == "incremental"
+    assert maintenance.convert() is False
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+"""多机同步：双向收敛、墓碑和回声过滤"""
+
+import gzip
+import json
+import time
+
+import pytest
+
+import vault_db
+from vault_sync import RECORD_COLUMNS, VaultSync
+
+@pytest.fixture
+def vaults(tmp_path):
+    return VaultSync(str(tmp_path / "laptop.db")), VaultSync(str(tmp_path / "desktop.db"))
+
+def node(vault):
+    return vault.status()[0]
+
+def exchange(tmp_path, source, target, peer=None):
+    bundle = str(tmp_path / "bundle.gz")
+    source.export_bundle(bundle, peer or node(target))
+    with gzip.open(bundle, "rb") as f:
+        payload = json.loads(f.read().decode("utf-8"))
+    return payload, target.apply_bundle(bundle)
+
+def snapshot(vault):
+    con = vault_db.connect(vault.db_file)
+    try:
+        return con.execute(f"SELECT {', '.join(RECORD_COLUMNS)} FROM api_keys ORDER BY uid").fetchall()
+    finally:
+        con.close()
+
+def seed(vault, count):
+    con = vault.connect()
+    vault_db.import_keys(con, [{"vendor": "OpenAI", "api_key": f"sk-sync-test-{i:04d}", "notes": f"#{i}"}
+                               for i in range(count)])
+    con.close()
+
+def test_both_directions_converge_with_tombstones(tmp_path, vaults):
+    laptop, desktop = vaults
+    seed(laptop, 6)
+    _, result = exchange(tmp_path, laptop, desktop)
+    assert result.inserted == 6
+    assert snapshot(laptop) == snapshot(desktop)
+    
+    con_a, con_b = vault_db.connect(laptop.db_file), vault_db.connect(desktop.db_file)
+    # 两边修改同一条记录：后改的生效
+    vault_db.update_keys(con_b, [1], {"model": "desktop-model"})
+    # 一边删除另一边早先修改过的记录：删除生效
+    vault_db.update_keys(con_b, [2], {"model": "edited-before-delete"})
+    time.sleep(0.01)
+    vault_db.update_keys(con_a, [1], {"model": "laptop-model"})
+    vault_db.delete_keys(con_a, [2])
+    # 各自删除、修改不同的记录
+    vault_db.delete_keys(con_b, [3])
+    vault_db.update_keys(con_b, [4], {"api_url": "https://proxy.example.com/v1"})
+    # 两边各自添加同一个密钥
+    for con in (con_a, con_b):
+        vault_db.insert_key(con, "DeepSeek", "sk-added-on-both")
+        con.commit()
+        con.close()
+    
+    exchange(tmp_path, laptop, desktop)
+    exchange(tmp_path, desktop, laptop)
+    exchange(tmp_path, laptop, desktop)
+    assert snapshot(laptop) == snapshot(desktop)
+    
+    for vault in vaults:
+        con = vault_db.connect(vault.db_file)
+        rows = {row["notes"]: row for row in vault_db.get_keys(con)}
+        tombstones = con.execute("SELECT COUNT(*) FROM sync_tombstones").fetchone()[0]
+        con.close()
+        assert set(rows) == {"#0", "#3", "#4", "#5", ""}
+        assert rows["#0"]["model"] == "laptop-model"
+        assert rows["#3"]["api_url"] == "https://proxy.example.com/v1"
+        assert tombstones == 2
+
+def test_edit_after_delete_survives(tmp_path, vaults):
+    laptop, desktop = vaults
+    seed(laptop, 2)
+    exchange(tmp_path, laptop, desktop)
+    con_a, con_b = vault_db.connect(laptop.db_file), vault_db.connect(desktop.db_file)
+    vault_db.delete_keys(con_a, [1])
+    time.sleep(0.01)
+    vault_db.update_keys(con_b, [1], {"model": "edited-after-delete"})
+    con_a.close()
+    con_b.close()
+    
+    _, result = exchange(tmp_path, laptop, desktop)
+    assert result.deleted == 0
+    exchange(tmp_path, desktop, laptop)
+    assert snapshot(laptop) == snapshot(desktop)
+    assert sorted(row[RECORD_COLUMNS.index("model")] for row in snapshot(laptop)) == ["", "edited-after-delete"]
+
+@pytest.mark.parametrize("peer_by_name", [False, True])
+def test_changes_are_not_echoed_back(tmp_path, vaults, peer_by_name):
+    laptop, desktop = vaults
+    seed(laptop, 3)
+    con = vault_db.connect(laptop.db_file)
+    vault_db.delete_keys(con, [3])
+    con.close()
+    exchange(tmp_path, laptop, desktop)
+    
+    # 对方按变更包头中的机器ID记录；用名称导出时也映射到该ID
+    peer = None
+    if peer_by_name:
+        peers = desktop.status()[1]
+        assert [row[0] for row in peers] == [node(laptop)]
+        peer = peers[0][1]
+    payload, _ = exchange(tmp_path, desktop, laptop, peer)
+    assert payload["source"] == node(desktop)
+    assert payload["upserts"] == [] and payload["tombstones"] == []
+    
+    # 本机随后修改的记录照常发回
+    con = vault_db.connect(desktop.db_file)
+    vault_db.update_keys(con, [1], {"model": "desktop-model"})
+    con.close()
+    payload, result = exchange(tmp_path, desktop, laptop, peer)
+    assert len(payload["upserts"]) == 1 and result.updated == 1
+
+def test_relayed_changes_are_not_echoed_to_their_origin(tmp_path, vaults):
+    laptop, desktop = vaults
+    server = VaultSync(str(tmp_path / "server.db"))
+    seed(laptop, 2)
+    exchange(tmp_path, laptop, server)
+    exchange(tmp_path, server, desktop)
+    exchange(tmp_path, laptop, desktop)  # 让 desktop 认识 laptop 的机器ID
+    
+    # desktop 上的记录是经 server 转发来的 laptop 的版本，不再发回 laptop
+    payload, _ = exchange(tmp_path, desktop, laptop)
+    assert payload["upserts"] == []
+    assert snapshot(laptop) == snapshot(desktop) == snapshot(server)
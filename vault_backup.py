@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+密钥库备份模块
+使用 SQLite 在线备份接口分步复制数据库（每步少量页面，步间让出锁），程序写入时也能得到一致的副本；
+支持定时快照、按数量和天数保留，以及校验后的恢复
+"""
+
+import os
+import sqlite3
+import time
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+import vault_db
+
+# 每步复制的页数和步间休眠（秒）：每步只短暂持有读锁，写入方最多等待一步
+BACKUP_PAGES_PER_STEP = 64
+BACKUP_STEP_SLEEP = 0.005
+
+# 分步备份被其他连接的写入打断、从头开始的次数上限
+BACKUP_MAX_RESTARTS = 3
+
+# 快照保留策略：最近的若干个，以及最近若干天每天最新的一个
+BACKUP_KEEP_LAST = 10
+BACKUP_KEEP_DAILY = 7
+
+# 定时快照的间隔（秒）：最新快照超过该时间才创建新的
+SNAPSHOT_INTERVAL_SECONDS = 6 * 60 * 60
+
+# 快照文件名前缀和时间格式
+SNAPSHOT_PREFIX = "apikeys-"
+SNAPSHOT_TIME_FORMAT = "%Y%m%d-%H%M%S"
+
+class Snapshot(NamedTuple):
+    """一个快照文件"""
+    path: str
+    created_at: float
+    size: int
+
+def default_backup_dir(db_file: str = vault_db.DB_FILE) -> str:
+    """快照目录：数据库所在目录下的 backups"""
+    return os.path.join(os.path.dirname(os.path.abspath(db_file)), "backups")
+
+class BackupRestarted(Exception):
+    """其他连接在备份期间持续写入，分步备份反复从头开始"""
+
+def run_backup(source: sqlite3.Connection, dest: sqlite3.Connection, pages: int = BACKUP_PAGES_PER_STEP,
+               sleep: float = BACKUP_STEP_SLEEP, progress: Callable[[int, int], None] = None):
+    """
+    分步复制数据库。其他连接写入源库会让备份从头开始；重新开始超过 BACKUP_MAX_RESTARTS 次时
+    改为一步完成（读锁持有到复制结束），避免写入频繁时备份永远无法完成
+    """
+    state = {"remaining": None, "restarts": 0}
+    
+    def on_step(status, remaining, total):
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] > BACKUP_MAX_RESTARTS:
+                raise BackupRestarted()
+        state["remaining"] = remaining
+        if progress:
+            progress(total - remaining, total)
+    
+    try:
+        source.backup(dest, pages=pages, sleep=sleep, progress=on_step)
+    except BackupRestarted:
+        source.backup(dest, pages=-1)
+        if progress:
+            progress(1, 1)
+
+def online_backup(source: sqlite3.Connection, dest_path: str, pages: int = BACKUP_PAGES_PER_STEP,
+                  sleep: float = BACKUP_STEP_SLEEP, progress: Callable[[int, int], None] = None):
+    """把打开的数据库分步复制到 dest_path（覆盖）"""
+    dest = sqlite3.connect(dest_path)
+    try:
+        run_backup(source, dest, pages, sleep, progress)
+    finally:
+        dest.close()
+
+def verify(path: str) -> Tuple[bool, str]:
+    """完整性检查：integrity_check 通过且包含密钥表"""
+    try:
+        con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    except sqlite3.Error as e:
+        return False, str(e)
+    try:
+        result = [row[0] for row in con.execute("PRAGMA integrity_check")]
+        if result != ["ok"]:
+            return False, "; ".join(result[:5])
+        if con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'api_keys'").fetchone() is None:
+            return False, "缺少 api_keys 表"
+        count = con.execute("SELECT COUNT(*) FROM api_keys").fetchone()[0]
+        return True, f"校验通过（{count} 条记录）"
+    except sqlite3.Error as e:
+        return False, str(e)
+    finally:
+        con.close()
+
+class VaultBackup:
+    """快照管理"""
+    
+    def __init__(self, db_file: str = vault_db.DB_FILE, backup_dir: str = None,
+                 keep_last: int = BACKUP_KEEP_LAST, keep_daily: int = BACKUP_KEEP_DAILY,
+                 pages: int = BACKUP_PAGES_PER_STEP, sleep: float = BACKUP_STEP_SLEEP):
+        self.db_file = db_file
+        self.backup_dir = backup_dir or default_backup_dir(db_file)
+        self.keep_last = keep_last
+        self.keep_daily = keep_daily
+        self.pages = pages
+        self.sleep = sleep
+    
+    def snapshot(self, progress: Callable[[int, int], None] = None, prune: bool = True) -> Snapshot:
+        """创建校验过的快照：先写入临时文件，校验通过后才改为正式文件名"""
+        os.makedirs(self.backup_dir, mode=0o700, exist_ok=True)
+        now = time.time()
+        name = f"{SNAPSHOT_PREFIX}{time.strftime(SNAPSHOT_TIME_FORMAT, time.localtime(now))}.db"
+        path = os.path.join(self.backup_dir, name)
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(self.backup_dir, name[:-3] + f"-{suffix}.db")
+            suffix += 1
+        temp_path = path + ".partial"
+        # 快照包含整个密钥库：与密钥包相同，临时文件创建时即只允许所有者读写（SQLite 打开空文件时按新库写入），
+        # 改名后的快照沿用该权限
+        if os.path.exists(temp_path):
+            os.remove(temp_path)  # 上次中断遗留的临时文件可能权限较宽
+        os.close(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o600))
+        
+        source = vault_db.connect(self.db_file)
+        try:
+            online_backup(source, temp_path, self.pages, self.sleep, progress)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        finally:
+            source.close()
+        ok, message = verify(temp_path)
+        if not ok:
+            os.remove(temp_path)
+            raise RuntimeError(f"快照校验失败: {message}")
+        os.replace(temp_path, path)
+        
+        if prune:
+            self.prune()
+        return Snapshot(path, now, os.path.getsize(path))
+    
+    def snapshots(self) -> List[Snapshot]:
+        """已有的快照（最新的在前）"""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        result = []
+        for name in os.listdir(self.backup_dir):
+            if not (name.startswith(SNAPSHOT_PREFIX) and name.endswith(".db")):
+                continue
+            stamp = name[len(SNAPSHOT_PREFIX):len(SNAPSHOT_PREFIX) + 15]
+            try:
+                created_at = time.mktime(time.strptime(stamp, SNAPSHOT_TIME_FORMAT))
+            except ValueError:
+                continue
+            path = os.path.join(self.backup_dir, name)
+            result.append(Snapshot(path, created_at, os.path.getsize(path)))
+        result.sort(key=lambda s: (s.created_at, s.path), reverse=True)
+        return result
+    
+    def prune(self) -> List[str]:
+        """按保留策略删除旧快照，返回删除的文件"""
+        snapshots = self.snapshots()
+        keep = {s.path for s in snapshots[:self.keep_last]}
+        days = []
+        for snapshot in snapshots:
+            day = time.strftime("%Y%m%d", time.localtime(snapshot.created_at))
+            if day not in days:
+                days.append(day)
+                if len(days) <= self.keep_daily:
+                    keep.add(snapshot.path)
+        removed = []
+        for snapshot in snapshots:
+            if snapshot.path not in keep:
+                os.remove(snapshot.path)
+                removed.append(snapshot.path)
+        return removed
+    
+    def restore(self, snapshot_path: str, progress: Callable[[int, int], None] = None) -> str:
+        """
+        从快照恢复：先校验快照，再为当前数据库创建一个恢复前快照，
+        然后通过备份接口写回正在使用的数据库文件并再次校验。返回恢复前快照的路径
+        """
+        ok, message = verify(snapshot_path)
+        if not ok:
+            raise RuntimeError(f"快照无法使用: {message}")
+        
+        safety = self.snapshot(prune=False) if os.path.exists(self.db_file) else None
+        source = sqlite3.connect(f"file:{snapshot_path}?mode=ro", uri=True)
+        dest = vault_db.connect(self.db_file)
+        try:
+            run_backup(source, dest, self.pages, self.sleep, progress)
+        finally:
+            source.close()
+            dest.close()
+        
+        ok, message = verify(self.db_file)
+        if not ok:
+            raise RuntimeError(f"恢复后校验失败（恢复前快照: {safety.path if safety else '无'}）: {message}")
+        return safety.path if safety else ""
+    
+    def latest(self) -> Optional[Snapshot]:
+        """最新的快照"""
+        snapshots = self.snapshots()
+        return snapshots[0] if snapshots else None
+    
+    def snapshot_due(self, interval: float = SNAPSHOT_INTERVAL_SECONDS) -> bool:
+        """是否需要创建定时快照"""
+        latest = self.latest()
+        return latest is None or time.time() - latest.created_at >= interval
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="密钥库在线备份与恢复")
+    parser.add_argument("--db", default=vault_db.DB_FILE, help="数据库文件")
+    parser.add_argument("--dir", help="快照目录（默认为数据库所在目录下的 backups）")
+    parser.add_argument("--list", action="store_true", help="列出已有快照")
+    parser.add_argument("--verify", metavar="SNAPSHOT", help="校验快照")
+    parser.add_argument("--restore", metavar="SNAPSHOT", help="从快照恢复")
+    parser.add_argument("--if-due", action="store_true", help="仅在最新快照已超过定时间隔时创建（供计划任务调用）")
+    args = parser.parse_args()
+    
+    backup = VaultBackup(args.db, args.dir)
+    if args.list:
+        for item in backup.snapshots():
+            created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(item.created_at))
+            print(f"{created}  {item.size / 1024:.0f} KB  {item.path}")
+    elif args.verify:
+        ok, message = verify(args.verify)
+        print(("✅ " if ok else "❌ ") + message)
+    elif args.restore:
+        safety = backup.restore(args.restore)
+        print(f"✅ 已从 {args.restore} 恢复" + (f"（恢复前快照: {safety}）" if safety else ""))
+    elif args.if_due and not backup.snapshot_due():
+        print("最新快照尚未过期，跳过")
+    else:
+        item = backup.snapshot(progress=lambda done, total: print(f"\r💾 {done}/{total} 页", end=""))
+        print(f"\n✅ 快照已保存: {item.path}（{item.size / 1024:.0f} KB）")
@@ -0,0 +1,622 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+密钥库数据库模块
+集中管理 apikeys.db 的表结构、索引和字段迁移，供界面和后台任务共用
+"""
+
+import getpass
+import hashlib
+import hmac
+import json
+import os
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 数据库文件
+DB_FILE = "apikeys.db"
+
+# 建立排序索引的列（文本列按不区分大小写排序）
+SORT_INDEX_COLUMNS = ("vendor", "model", "notes", "api_url", "created_at")
+
+# 中文厂商名的拼音排序键，使其与英文厂商按字母顺序混排（数据库排序和内存排序共用）
+VENDOR_SORT_KEYS = {
+    "智谱AI": "zhipu ai",
+    "百度文心": "baidu wenxin",
+    "阿里通义": "ali tongyi",
+    "字节豆包": "zijie doubao",
+    "腾讯混元": "tengxun hunyuan",
+    "讯飞星火": "xunfei xinghuo",
+    "自定义": "zidingyi"
+}
+
+# 后续版本新增的列：列名 -> 列定义，旧数据库启动时自动补齐
+EXTRA_COLUMNS = {
+    "health_status": "TEXT",
+    "health_latency_ms": "INTEGER",
+    "health_message": "TEXT",
+    "health_checked_at": "REAL",
+    "alias": "TEXT",
+    "fingerprint": "TEXT",
+    "uid": "TEXT",
+    "updated_at": "REAL",
+    "origin": "TEXT",
+    "version": "INTEGER NOT NULL DEFAULT 1"
+}
+
+# 密钥记录中可由用户填写的字段
+KEY_FIELDS = ("vendor", "api_key", "api_url", "model", "notes", "example_code")
+
+# 支持批量修改的字段
+BULK_UPDATE_FIELDS = ("vendor", "api_url", "model")
+
+# 编辑时读取的字段：ID、用户填写的字段和行版本（保存时用于检测其他程序的修改）
+EDIT_COLUMNS = ("id",) + KEY_FIELDS + ("version",)
+
+# 变更日志记录、多机同步的字段（日志中的密钥只记录脱敏形式和指纹）
+JOURNAL_FIELDS = KEY_FIELDS + ("alias",)
+
+# 日志中保留的密钥开头字符数
+JOURNAL_KEY_PREFIX = 4
+
+# 触发器中使用的当前时间（Unix 时间戳，与 health_checked_at 等列一致）和新记录的全局ID
+EPOCH_NOW_SQL = "((julianday('now') - 2440587.5) * 86400.0)"
+NEW_UID_SQL = "lower(hex(randomblob(16)))"
+
+class DuplicateKeyError(Exception):
+    """保存的密钥与已有记录重复"""
+    
+    def __init__(self, existing_id: int):
+        super().__init__(f"该密钥已存在（#{existing_id}）")
+        self.existing_id = existing_id
+
+class VersionConflictError(Exception):
+    """记录在读取之后已被其他程序修改或删除；current 为当前内容（EDIT_COLUMNS 顺序），已删除时为 None"""
+    
+    def __init__(self, key_id: int, current: Optional[tuple]):
+        super().__init__(f"记录 #{key_id} 已被修改" if current else f"记录 #{key_id} 已被删除")
+        self.key_id = key_id
+        self.current = current
+
+def connect(db_file: str = DB_FILE) -> sqlite3.Connection:
+    """打开数据库连接"""
+    return sqlite3.connect(db_file)
+
+def sort_collation(column: str) -> str:
+    """查找和索引使用的排序规则"""
+    return "" if column == "created_at" else " COLLATE NOCASE"
+
+def sort_expression(column: str) -> str:
+    """ORDER BY 使用的表达式（与排序索引一致）：厂商按拼音排序键，其余文本列不区分大小写"""
+    if column == "vendor":
+        cases = " ".join(f"WHEN '{name}' THEN '{key}'" for name, key in VENDOR_SORT_KEYS.items())
+        return f"(CASE trim(vendor) {cases} ELSE lower(trim(vendor)) END)"
+    return column + sort_collation(column)
+
+# SQLite 的 lower() 和 NOCASE 只转换 ASCII 字母
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+def sort_key(column: str, value) -> str:
+    """与 sort_expression 顺序相同的内存排序键（行缓存中的空值为空字符串）"""
+    text = "" if value is None else str(value)
+    if column == "vendor":
+        text = text.strip(" ")
+        return VENDOR_SORT_KEYS.get(text) or text.translate(_ASCII_LOWER)
+    return text if column == "created_at" else text.translate(_ASCII_LOWER)
+
+def ensure_column(cur: sqlite3.Cursor, table: str, column: str, definition: str):
+    """列不存在时添加"""
+    cur.execute(f"PRAGMA table_info({table})")
+    if column not in {row[1] for row in cur.fetchall()}:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def init_schema(con: sqlite3.Connection):
+    """创建表结构、补齐新增列并建立索引"""
+    cur = con.cursor()
+    # 新建的数据库直接启用增量回收（只在建表前生效；已有数据库由用户确认后经 vault_maintenance 转换）
+    cur.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS api_keys (
+            id INTEGER PRIMARY KEY,
+            vendor TEXT NOT NULL,
+            api_key TEXT NOT NULL,
+            api_url TEXT,
+            model TEXT,
+            notes TEXT,
+            example_code TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    for column, definition in EXTRA_COLUMNS.items():
+        ensure_column(cur, "api_keys", column, definition)
+    
+    # 为可排序列建立索引，大表排序时由数据库按索引顺序返回
+    for column in SORT_INDEX_COLUMNS:
+        cur.execute(f"CREATE INDEX IF NOT EXISTS idx_api_keys_{column} "
+                    f"ON api_keys ({column}{sort_collation(column)}, id)")
+    # 厂商按拼音排序键排序（表达式索引）；排序键表变化后重建
+    vendor_sort_index = f"CREATE INDEX idx_api_keys_vendor_sort ON api_keys ({sort_expression('vendor')}, id)"
+    existing = cur.execute("SELECT sql FROM sqlite_master WHERE name = 'idx_api_keys_vendor_sort'").fetchone()
+    if existing is None or existing[0] != vendor_sort_index:
+        cur.execute("DROP INDEX IF EXISTS idx_api_keys_vendor_sort")
+        cur.execute(vendor_sort_index)
+    
+    # 健康检查按检查时间筛选过期记录
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_api_keys_health_checked_at ON api_keys (health_checked_at)")
+    
+    # 本地网关按别名查找密钥
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_api_keys_alias ON api_keys (alias)")
+    
+    # 密钥指纹：查重只需一次索引查找，无需读取或解密密钥本身
+    cur.execute("CREATE TABLE IF NOT EXISTS vault_meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    backfill_fingerprints(cur)
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_api_keys_fingerprint ON api_keys (fingerprint)")
+    
+    init_catalog_schema(cur)
+    init_endpoint_schema(cur)
+    init_sync_schema(cur)
+    init_journal_schema(cur)
+    init_version_schema(cur)
+    con.commit()
+
+def vault_salt(cur) -> bytes:
+    """本密钥库的指纹盐（首次使用时随机生成并保存）"""
+    row = cur.execute("SELECT value FROM vault_meta WHERE name = 'fingerprint_salt'").fetchone()
+    if row:
+        return bytes.fromhex(row[0])
+    salt = os.urandom(32)
+    cur.execute("INSERT INTO vault_meta (name, value) VALUES ('fingerprint_salt', ?)", (salt.hex(),))
+    return salt
+
+def key_fingerprint(salt: bytes, api_key: str) -> str:
+    """密钥指纹：以库内盐为键的 HMAC-SHA256（不同库的指纹不可比对，也无法反推密钥）"""
+    return hmac.new(salt, api_key.strip().encode("utf-8"), hashlib.sha256).hexdigest()
+
+def backfill_fingerprints(cur: sqlite3.Cursor):
+    """为旧记录补齐指纹；重复的密钥只有最早的一条获得指纹"""
+    rows = cur.execute("SELECT id, api_key FROM api_keys WHERE fingerprint IS NULL ORDER BY id").fetchall()
+    if not rows:
+        return
+    salt = vault_salt(cur)
+    taken = {row[0] for row in cur.execute("SELECT fingerprint FROM api_keys WHERE fingerprint IS NOT NULL")}
+    updates = []
+    for key_id, api_key in rows:
+        fingerprint = key_fingerprint(salt, api_key or "")
+        if fingerprint not in taken:
+            taken.add(fingerprint)
+            updates.append((fingerprint, key_id))
+    cur.executemany("UPDATE api_keys SET fingerprint = ? WHERE id = ?", updates)
+
+def default_actor() -> str:
+    """默认的操作者：系统用户名@程序名"""
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = "unknown"
+    program = os.path.splitext(os.path.basename(sys.argv[0] or ""))[0] or "python"
+    return f"{user}@{program}"
+
+def stamp_actor(con: sqlite3.Connection, actor: str = None):
+    """记录随后写入的操作者，由变更日志触发器写入日志（须在同一事务中、修改之前调用，提交前用 clear_actor 清除）"""
+    con.execute("INSERT OR REPLACE INTO journal_context (id, actor) VALUES (1, ?)", (actor or default_actor(),))
+
+def clear_actor(con: sqlite3.Connection):
+    """清除操作者标记，之后未标记的写入在日志中记为未知"""
+    con.execute("DELETE FROM journal_context")
+
+@contextmanager
+def actor_scope(con: sqlite3.Connection, actor: str = None):
+    """
+    with 块内的写入记为 actor 所做，块结束时在同一事务中恢复外层的标记（没有外层时清除），
+    标记不会随事务提交留给之后的写入。块内不要提交事务
+    """
+    previous = con.execute("SELECT actor FROM journal_context WHERE id = 1").fetchone()
+    stamp_actor(con, actor)
+    try:
+        yield
+    finally:
+        if previous is None:
+            clear_actor(con)
+        else:
+            stamp_actor(con, previous[0])
+
+def find_duplicate(con: sqlite3.Connection, api_key: str, exclude_id: int = None) -> Optional[int]:
+    """查找保存了相同密钥的记录ID"""
+    fingerprint = key_fingerprint(vault_salt(con), api_key)
+    row = con.execute("SELECT id FROM api_keys WHERE fingerprint = ?", (fingerprint,)).fetchone()
+    if row and row[0] != exclude_id:
+        return row[0]
+    return None
+
+def insert_key(con: sqlite3.Connection, vendor: str, api_key: str, api_url: str = "", model: str = "",
+               notes: str = "", example_code: str = "") -> int:
+    """添加密钥，返回新记录ID；密钥已存在时抛出 DuplicateKeyError（不提交事务）"""
+    fingerprint = key_fingerprint(vault_salt(con), api_key)
+    try:
+        with actor_scope(con):
+            cur = con.execute("""
+                INSERT INTO api_keys (vendor, api_key, api_url, model, notes, example_code, fingerprint,
+                                      uid, updated_at, origin)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (vendor, api_key, api_url, model, notes, example_code, fingerprint) + new_version(con))
+    except sqlite3.IntegrityError:
+        existing = con.execute("SELECT id FROM api_keys WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        if existing is None:
+            raise
+        raise DuplicateKeyError(existing[0]) from None
+    return cur.lastrowid
+
+def read_key(con: sqlite3.Connection, key_id: int) -> Optional[tuple]:
+    """读取一条记录用于编辑（EDIT_COLUMNS 顺序），不存在时返回 None"""
+    return con.execute(f"SELECT {', '.join(EDIT_COLUMNS)} FROM api_keys WHERE id = ?", (key_id,)).fetchone()
+
+def update_key(con: sqlite3.Connection, key_id: int, vendor: str, api_key: str, api_url: str = "",
+               model: str = "", notes: str = "", example_code: str = "", expected_version: int = None):
+    """
+    更新密钥（同时清除健康检查结果）；与其他记录重复时抛出 DuplicateKeyError（不提交事务）。
+    指定 expected_version 时只在行版本未变时写入，否则抛出 VersionConflictError（不提交事务）
+    """
+    duplicate = find_duplicate(con, api_key, exclude_id=key_id)
+    if duplicate is not None:
+        raise DuplicateKeyError(duplicate)
+    sql = """
+        UPDATE api_keys
+        SET vendor=?, api_key=?, api_url=?, model=?, notes=?, example_code=?, fingerprint=?,
+            health_status=NULL, health_latency_ms=NULL, health_message=NULL, health_checked_at=NULL
+        WHERE id=?
+    """
+    params = [vendor, api_key, api_url, model, notes, example_code,
+              key_fingerprint(vault_salt(con), api_key), key_id]
+    if expected_version is not None:
+        sql += " AND version=?"
+        params.append(expected_version)
+    with actor_scope(con):
+        count = con.execute(sql, params).rowcount
+    if count == 0 and expected_version is not None:
+        raise VersionConflictError(key_id, read_key(con, key_id))
+
+def merge_versions(base: Sequence[str], current: Sequence[str],
+                   mine: Sequence[str]) -> Tuple[List[str], List[str], List[str]]:
+    """
+    三方合并 KEY_FIELDS：base 为编辑前读取的内容，current 为数据库中的最新内容，mine 为本次填写的内容。
+    只有一方修改的字段取修改后的值，双方改成不同值时以 mine 为准。返回 (合并结果, 对方修改的字段, 冲突字段)
+    """
+    merged, theirs, conflicts = [], [], []
+    for field, old, new, own in zip(KEY_FIELDS, base, current, mine):
+        old, new, own = old or "", new or "", own or ""
+        if new != old:
+            theirs.append(field)
+            if own != old and own != new:
+                conflicts.append(field)
+        merged.append(new if own == old else own)
+    return merged, theirs, conflicts
+
+def merge_key(con: sqlite3.Connection, key_id: int, fields: Dict[str, str]):
+    """把新记录合并到已有记录：只用非空的新值覆盖"""
+    columns = [c for c in KEY_FIELDS if c != "api_key" and fields.get(c)]
+    if columns:
+        with actor_scope(con):
+            con.execute(f"UPDATE api_keys SET {', '.join(f'{c} = ?' for c in columns)} WHERE id = ?",
+                        [fields[c] for c in columns] + [key_id])
+
+def import_keys(con: sqlite3.Connection, records: Iterable[Dict[str, str]],
+                merge: bool = False) -> Tuple[int, int, List[int]]:
+    """
+    批量导入（一个事务）：每条记录一次索引查重；重复时跳过或合并到已有记录。
+    返回 (新增数, 合并数, 重复记录对应的已有ID)
+    """
+    salt = vault_salt(con)
+    node = node_id(con)
+    inserted = merged = 0
+    duplicates = []
+    try:
+        with actor_scope(con):
+            for record in records:
+                api_key = (record.get("api_key") or "").strip()
+                vendor = (record.get("vendor") or "").strip()
+                if not api_key or not vendor:
+                    continue
+                values = {c: (record.get(c) or "").strip() for c in KEY_FIELDS}
+                values["api_key"] = api_key
+                fingerprint = key_fingerprint(salt, api_key)
+                cur = con.execute("""
+                    INSERT INTO api_keys (vendor, api_key, api_url, model, notes, example_code, fingerprint,
+                                          uid, updated_at, origin)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (fingerprint) DO NOTHING
+                """, [values[c] for c in KEY_FIELDS] + [fingerprint, os.urandom(16).hex(), time.time(), node])
+                if cur.rowcount:
+                    inserted += 1
+                    continue
+                existing_id = con.execute("SELECT id FROM api_keys WHERE fingerprint = ?", (fingerprint,)).fetchone()[0]
+                duplicates.append(existing_id)
+                if merge:
+                    merge_key(con, existing_id, values)
+                    merged += 1
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    return inserted, merged, duplicates
+
+def id_list(ids: Iterable[int]) -> str:
+    """把ID列表编码为 JSON 数组，配合 json_each 用一条语句处理任意数量的记录"""
+    return json.dumps([int(i) for i in ids])
+
+def delete_keys(con: sqlite3.Connection, ids: Iterable[int], actor: str = None) -> int:
+    """在一个事务中删除多个密钥及其关联数据，返回删除的记录数"""
+    payload = id_list(ids)
+    try:
+        with actor_scope(con, actor):
+            con.execute("DELETE FROM key_models WHERE key_id IN (SELECT value FROM json_each(?))", (payload,))
+            con.execute("DELETE FROM key_mirrors WHERE key_id IN (SELECT value FROM json_each(?))", (payload,))
+            count = con.execute("DELETE FROM api_keys WHERE id IN (SELECT value FROM json_each(?))",
+                                (payload,)).rowcount
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    return count
+
+def update_keys(con: sqlite3.Connection, ids: Iterable[int], fields: Dict[str, str]) -> int:
+    """在一个事务中批量修改多个密钥的厂商/API地址/模型（同时清除健康检查结果），返回修改的记录数"""
+    columns = [c for c in BULK_UPDATE_FIELDS if c in fields]
+    if not columns:
+        return 0
+    assignments = ", ".join(f"{c} = ?" for c in columns)
+    try:
+        with actor_scope(con):
+            count = con.execute(f"""
+                UPDATE api_keys
+                SET {assignments},
+                    health_status=NULL, health_latency_ms=NULL, health_message=NULL, health_checked_at=NULL
+                WHERE id IN (SELECT value FROM json_each(?))
+            """, [fields[c] for c in columns] + [id_list(ids)]).rowcount
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    return count
+
+def get_keys(con: sqlite3.Connection, ids: Iterable[int] = None) -> List[Dict[str, str]]:
+    """读取密钥记录（不指定ID时读取全部），按ID排序"""
+    sql = f"SELECT id, {', '.join(KEY_FIELDS)} FROM api_keys"
+    params = ()
+    if ids is not None:
+        sql += " WHERE id IN (SELECT value FROM json_each(?))"
+        params = (id_list(ids),)
+    rows = con.execute(sql + " ORDER BY id", params).fetchall()
+    return [dict(zip(("id",) + KEY_FIELDS, row)) for row in rows]
+
+def init_catalog_schema(cur: sqlite3.Cursor):
+    """模型目录：模型元数据、模态（每个模态一行，便于索引查询）以及密钥可访问的模型"""
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS models (
+            id INTEGER PRIMARY KEY,
+            vendor TEXT NOT NULL,
+            model_id TEXT NOT NULL,
+            context_window INTEGER,
+            max_output_tokens INTEGER,
+            prompt_price REAL,
+            completion_price REAL,
+            pricing_json TEXT,
+            first_seen REAL NOT NULL,
+            last_seen REAL NOT NULL,
+            UNIQUE (vendor, model_id)
+        )
+    ''')
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS model_modalities (
+            modality TEXT NOT NULL,
+            direction TEXT NOT NULL CHECK (direction IN ('input', 'output')),
+            model_pk INTEGER NOT NULL REFERENCES models (id) ON DELETE CASCADE,
+            PRIMARY KEY (modality, direction, model_pk)
+        ) WITHOUT ROWID
+    ''')
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS key_models (
+            key_id INTEGER NOT NULL REFERENCES api_keys (id) ON DELETE CASCADE,
+            model_pk INTEGER NOT NULL REFERENCES models (id) ON DELETE CASCADE,
+            last_seen REAL NOT NULL,
+            PRIMARY KEY (key_id, model_pk)
+        ) WITHOUT ROWID
+    ''')
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_models_context_window ON models (context_window)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_models_vendor_last_seen ON models (vendor, last_seen)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_model_modalities_model ON model_modalities (model_pk)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_key_models_model ON key_models (model_pk, key_id)")
+
+def init_endpoint_schema(cur: sqlite3.Cursor):
+    """端点测速：每个地址最近一次的测速结果（各阶段中位数），以及每个密钥的备用地址排名"""
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS endpoint_benchmarks (
+            url TEXT PRIMARY KEY,
+            dns_ms REAL,
+            connect_ms REAL,
+            tls_ms REAL,
+            ttfb_ms REAL,
+            total_ms REAL,
+            status INTEGER,
+            samples INTEGER NOT NULL,
+            failures INTEGER NOT NULL,
+            healthy INTEGER NOT NULL,
+            error TEXT,
+            measured_at REAL NOT NULL
+        )
+    ''')
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS key_mirrors (
+            key_id INTEGER NOT NULL REFERENCES api_keys (id) ON DELETE CASCADE,
+            url TEXT NOT NULL,
+            rank INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (key_id, url)
+        ) WITHOUT ROWID
+    ''')
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_key_mirrors_url ON key_mirrors (url)")
+
+def journal_values(row: str) -> str:
+    """触发器中生成记录快照 JSON 的表达式（row 为 NEW 或 OLD），密钥只保留指纹和开头几位（足以辨认厂商前缀）"""
+    pairs = []
+    for field in JOURNAL_FIELDS:
+        if field == "api_key":
+            value = (f"CASE WHEN length({row}.api_key) > 12 "
+                     f"THEN substr({row}.api_key, 1, {JOURNAL_KEY_PREFIX}) || '…' ELSE '***' END")
+        else:
+            value = f"{row}.{field}"
+        pairs.append(f"'{field}', {value}")
+    pairs.append(f"'fingerprint', {row}.fingerprint")
+    pairs.append(f"'uid', {row}.uid")
+    return f"json_object({', '.join(pairs)})"
+
+def init_journal_schema(cur: sqlite3.Cursor):
+    """
+    变更日志：api_keys 的每次插入、修改、删除由触发器追加一行，与修改在同一事务中提交，不额外落盘。
+    日志只允许追加；首次建表时为已有记录写入基线
+    """
+    created = cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'key_journal'").fetchone() is None
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS key_journal (
+            seq INTEGER PRIMARY KEY,
+            key_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            changed_at REAL NOT NULL,
+            actor TEXT,
+            old_values TEXT,
+            new_values TEXT
+        )
+    ''')
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_key_journal_key ON key_journal (key_id, seq)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_key_journal_changed_at ON key_journal (changed_at)")
+    cur.execute("CREATE TABLE IF NOT EXISTS journal_context (id INTEGER PRIMARY KEY CHECK (id = 1), actor TEXT)")
+    # 旧版本提交后遗留的标记会被记到之后所有未标记的写入上
+    cur.execute("DELETE FROM journal_context")
+    
+    now = EPOCH_NOW_SQL
+    actor = "(SELECT actor FROM journal_context WHERE id = 1)"
+    changed = " OR ".join(f"OLD.{field} IS NOT NEW.{field}" for field in JOURNAL_FIELDS)
+    triggers = {
+        "api_keys_journal_insert": f"""
+            AFTER INSERT ON api_keys BEGIN
+                INSERT INTO key_journal (key_id, op, changed_at, actor, new_values)
+                VALUES (NEW.id, 'insert', {now}, {actor}, {journal_values("NEW")});
+            END""",
+        "api_keys_journal_update": f"""
+            AFTER UPDATE ON api_keys WHEN {changed} BEGIN
+                INSERT INTO key_journal (key_id, op, changed_at, actor, old_values, new_values)
+                VALUES (NEW.id, 'update', {now}, {actor}, {journal_values("OLD")}, {journal_values("NEW")});
+            END""",
+        "api_keys_journal_delete": f"""
+            AFTER DELETE ON api_keys BEGIN
+                INSERT INTO key_journal (key_id, op, changed_at, actor, old_values)
+                VALUES (OLD.id, 'delete', {now}, {actor}, {journal_values("OLD")});
+            END""",
+        "key_journal_append_only_update": """
+            BEFORE UPDATE ON key_journal BEGIN SELECT RAISE(ABORT, 'key_journal 只允许追加'); END""",
+        "key_journal_append_only_delete": """
+            BEFORE DELETE ON key_journal BEGIN SELECT RAISE(ABORT, 'key_journal 只允许追加'); END"""
+    }
+    # 触发器每次重建，记录字段变化后自动生效
+    for name, body in triggers.items():
+        cur.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cur.execute(f"CREATE TRIGGER {name} {body}")
+    
+    if created:
+        cur.execute(f"""
+            INSERT INTO key_journal (key_id, op, changed_at, actor, new_values)
+            SELECT id, 'insert', {now}, 'baseline', {journal_values("api_keys")}
+            FROM api_keys ORDER BY id
+        """)
+
+def journal_touch(con: sqlite3.Connection, key_id: int, actor: str = None):
+    """为内容未变的记录追加一条日志（如同步合并重复密钥后，使其在下次导出时重新发送）"""
+    con.execute(f"""
+        INSERT INTO key_journal (key_id, op, changed_at, actor, old_values, new_values)
+        SELECT id, 'update', {EPOCH_NOW_SQL}, ?, {journal_values("api_keys")}, {journal_values("api_keys")}
+        FROM api_keys WHERE id = ?
+    """, (actor or default_actor(), key_id))
+
+def init_sync_schema(cur: sqlite3.Cursor):
+    """
+    多机同步：每条记录有全局ID（uid）和版本（修改时间 updated_at + 修改的机器 origin），
+    本机修改时由触发器更新版本，删除时留下墓碑；sync_peers 记录与每台机器交换变更包的进度
+    """
+    node = node_id(cur)
+    cur.execute(f"""
+        UPDATE api_keys SET uid = {NEW_UID_SQL}, updated_at = COALESCE(updated_at, {EPOCH_NOW_SQL}),
+                            origin = COALESCE(origin, ?)
+        WHERE uid IS NULL
+    """, (node,))
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_api_keys_uid ON api_keys (uid)")
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS sync_tombstones (
+            uid TEXT PRIMARY KEY,
+            deleted_at REAL NOT NULL,
+            origin TEXT NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS sync_peers (
+            peer TEXT PRIMARY KEY,
+            name TEXT,
+            exported_seq INTEGER NOT NULL DEFAULT 0,
+            exported_at REAL,
+            imported_seq INTEGER NOT NULL DEFAULT 0,
+            imported_at REAL
+        )
+    ''')
+    
+    node_sql = "(SELECT value FROM vault_meta WHERE name = 'node_id')"
+    changed = " OR ".join(f"OLD.{field} IS NOT NEW.{field}" for field in JOURNAL_FIELDS)
+    # 新版本不早于旧版本（本机时钟落后于其他机器时也能覆盖刚同步来的修改）
+    bumped = f"max({EPOCH_NOW_SQL}, COALESCE(OLD.updated_at, 0) + 0.001)"
+    triggers = {
+        "api_keys_sync_insert": f"""
+            AFTER INSERT ON api_keys WHEN NEW.uid IS NULL BEGIN
+                UPDATE api_keys SET uid = {NEW_UID_SQL}, updated_at = {EPOCH_NOW_SQL}, origin = {node_sql}
+                WHERE id = NEW.id;
+            END""",
+        "api_keys_sync_update": f"""
+            AFTER UPDATE ON api_keys WHEN NEW.updated_at IS OLD.updated_at AND ({changed}) BEGIN
+                UPDATE api_keys SET updated_at = {bumped}, origin = {node_sql} WHERE id = NEW.id;
+            END""",
+        "api_keys_sync_delete": f"""
+            AFTER DELETE ON api_keys WHEN OLD.uid IS NOT NULL BEGIN
+                INSERT OR IGNORE INTO sync_tombstones (uid, deleted_at, origin)
+                VALUES (OLD.uid, {bumped}, {node_sql});
+            END"""
+    }
+    for name, body in triggers.items():
+        cur.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cur.execute(f"CREATE TRIGGER {name} {body}")
+
+def init_version_schema(cur: sqlite3.Cursor):
+    """
+    乐观并发：用户字段每次修改时行版本 version 加一。编辑时记下读取的版本，保存时按版本条件更新（UPDATE ... AND version=?），
+    打开对话框期间不持有任何锁；版本由触发器维护，脚本、同步、网关等所有写入方的修改都会被检测到
+    """
+    changed = " OR ".join(f"OLD.{field} IS NOT NEW.{field}" for field in JOURNAL_FIELDS)
+    cur.execute("DROP TRIGGER IF EXISTS api_keys_version_update")
+    cur.execute(f"""
+        CREATE TRIGGER api_keys_version_update
+        AFTER UPDATE ON api_keys WHEN NEW.version IS OLD.version AND ({changed}) BEGIN
+            UPDATE api_keys SET version = OLD.version + 1 WHERE id = NEW.id;
+        END""")
+
+def new_version(cur) -> Tuple[str, float, str]:
+    """新记录的 (uid, updated_at, origin)；由程序直接填写，省去插入触发器的一次回写"""
+    return os.urandom(16).hex(), time.time(), node_id(cur)
+
+def node_id(cur) -> str:
+    """本机（本密钥库）的同步ID（首次使用时随机生成并保存）"""
+    row = cur.execute("SELECT value FROM vault_meta WHERE name = 'node_id'").fetchone()
+    if row:
+        return row[0]
+    node = os.urandom(8).hex()
+    cur.execute("INSERT INTO vault_meta (name, value) VALUES ('node_id', ?)", (node,))
+    return node
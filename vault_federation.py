@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+多密钥库联合查询模块
+同时打开多个密钥库：第一个作为主库，其余以 ATTACH 方式挂载为独立的 schema，
+临时视图 all_keys 用 UNION ALL 合并各库的 api_keys 并附加来源列；按厂商/模型/别名的精确查找下推到每个库各自的索引，
+命令行的文本搜索（LIKE）逐库扫描，界面的筛选和排序在内存的行缓存中进行。每条记录以“来源:ID”标识，修改时直接写回所在的密钥库
+"""
+
+import json
+import os
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import vault_db
+
+# 联合视图中的字段（不含来源）
+FEDERATED_COLUMNS = ("id", "vendor", "api_key", "api_url", "model", "notes", "example_code", "created_at",
+                     "alias", "health_status", "health_latency_ms", "health_checked_at")
+
+# 搜索时匹配的字段
+SEARCH_COLUMNS = ("vendor", "model", "notes", "api_url", "alias")
+
+# SQLite 默认最多挂载 10 个数据库（编译选项 SQLITE_MAX_ATTACHED），加上主库共 11 个
+DEFAULT_ATTACH_LIMIT = 10
+
+def vault_label(path: str, taken: Iterable[str]) -> str:
+    """密钥库的显示名称：文件名（通用文件名时用所在目录名），重名时加序号"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if stem == os.path.splitext(vault_db.DB_FILE)[0]:
+        stem = os.path.basename(os.path.dirname(os.path.abspath(path))) or stem
+    stem = stem.replace(":", "-")
+    label, number = stem, 2
+    while label in taken:
+        label = f"{stem}-{number}"
+        number += 1
+    return label
+
+def sql_literal(text: str) -> str:
+    return "'" + text.replace("'", "''") + "'"
+
+class VaultFederation:
+    """一组密钥库的联合查询"""
+    
+    def __init__(self, paths: Iterable[str]):
+        self.paths: List[str] = []
+        for path in paths:
+            path = os.path.abspath(path)
+            if path not in self.paths:
+                self.paths.append(path)
+        if not self.paths:
+            raise ValueError("至少需要一个密钥库")
+        self.labels: List[str] = []
+        for path in self.paths:
+            self.labels.append(vault_label(path, self.labels))
+        self.sources: Dict[str, str] = dict(zip(self.labels, self.paths))
+    
+    def __len__(self) -> int:
+        return len(self.paths)
+    
+    @property
+    def primary(self) -> str:
+        """主库（新增的密钥保存到这里）"""
+        return self.paths[0]
+    
+    def db_file(self, source: str) -> str:
+        return self.sources[source]
+    
+    def iid(self, db_file: str, key_id: int) -> str:
+        """记录标识：来源:ID"""
+        return f"{self.labels[self.paths.index(os.path.abspath(db_file))]}:{key_id}"
+    
+    def split(self, iid: str) -> Tuple[str, int]:
+        """记录标识 -> (密钥库文件, ID)"""
+        source, _, key_id = iid.rpartition(":")
+        return self.sources[source], int(key_id)
+    
+    def prepare(self, paths: Iterable[str] = None):
+        """初始化（升级）各密钥库的表结构，使联合视图的字段一致"""
+        for path in self.paths if paths is None else paths:
+            con = vault_db.connect(path)
+            try:
+                vault_db.init_schema(con)
+                con.commit()
+            finally:
+                con.close()
+    
+    def connect(self) -> sqlite3.Connection:
+        """打开主库并挂载其余密钥库，创建联合视图 all_keys（来源、来源序号 + 各字段）"""
+        limit = DEFAULT_ATTACH_LIMIT
+        con = vault_db.connect(self.primary)
+        try:
+            if hasattr(con, "getlimit"):  # Python 3.11+
+                limit = con.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+            if len(self.paths) - 1 > limit:
+                raise ValueError(f"最多同时打开 {limit + 1} 个密钥库（SQLite 挂载数量上限）")
+            schemas = ["main"]
+            for number, path in enumerate(self.paths[1:], 1):
+                schema = f"vault{number}"
+                con.execute("ATTACH DATABASE ? AS " + schema, (path,))
+                schemas.append(schema)
+            columns = ", ".join(FEDERATED_COLUMNS)
+            arms = [f"SELECT {sql_literal(label)} AS source, {rank} AS source_rank, {columns} FROM {schema}.api_keys"
+                    for rank, (label, schema) in enumerate(zip(self.labels, schemas))]
+            con.execute("DROP VIEW IF EXISTS temp.all_keys")
+            con.execute("CREATE TEMP VIEW all_keys AS " + " UNION ALL ".join(arms))
+        except Exception:
+            con.close()
+            raise
+        return con
+    
+    def search_sql(self, query: str, columns: str = "source, id, vendor, model, alias, api_url, notes",
+                   limit: int = None) -> Tuple[str, list]:
+        """搜索语句：空格分隔的词需全部匹配（任一字段包含即可，不区分大小写）"""
+        conditions, params = [], []
+        for term in query.split():
+            pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            conditions.append("(" + " OR ".join(f"{column} LIKE ? ESCAPE '\\'" for column in SEARCH_COLUMNS) + ")")
+            params += [pattern] * len(SEARCH_COLUMNS)
+        sql = f"SELECT {columns} FROM all_keys"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY source_rank, id"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return sql, params
+    
+    def search(self, query: str, limit: int = None) -> List[Dict[str, str]]:
+        """跨全部密钥库搜索（供命令行使用，各库逐行扫描），返回不含密钥的字段"""
+        sql, params = self.search_sql(query, limit=limit)
+        con = self.connect()
+        try:
+            cur = con.execute(sql, params)
+            names = [column[0] for column in cur.description]
+            return [dict(zip(names, row)) for row in cur]
+        finally:
+            con.close()
+    
+    def find_sql(self, vendor: str = None, model: str = None, alias: str = None) -> Tuple[str, list]:
+        """按厂商/模型/别名精确查找的语句（条件下推后使用各库的索引）"""
+        conditions, params = [], []
+        for column, value in (("vendor", vendor), ("model", model), ("alias", alias)):
+            if value:
+                collate = vault_db.sort_collation(column) if column in vault_db.SORT_INDEX_COLUMNS else ""
+                conditions.append(f"{column} = ?{collate}")
+                params.append(value)
+        sql = "SELECT source, id, vendor, model, alias, api_url FROM all_keys"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        return sql + " ORDER BY source_rank, id", params
+    
+    def find(self, vendor: str = None, model: str = None, alias: str = None) -> List[Dict[str, str]]:
+        sql, params = self.find_sql(vendor, model, alias)
+        con = self.connect()
+        try:
+            cur = con.execute(sql, params)
+            names = [column[0] for column in cur.description]
+            return [dict(zip(names, row)) for row in cur]
+        finally:
+            con.close()
+    
+    def get_keys(self, iids: Iterable[str]) -> List[Dict[str, str]]:
+        """按记录标识读取完整记录（一条语句，各库按主键查找），按密钥库和ID排序"""
+        refs = []
+        for iid in iids:
+            source, _, key_id = iid.rpartition(":")
+            refs.append([source, int(key_id)])
+        con = self.connect()
+        try:
+            # 不在语句中排序：对联合视图排序会先物化整个视图
+            cur = con.execute(f"""
+                SELECT a.source_rank, a.source, a.{', a.'.join(("id",) + vault_db.KEY_FIELDS)} FROM all_keys a
+                JOIN json_each(?) r ON a.source = json_extract(r.value, '$[0]')
+                                   AND a.id = json_extract(r.value, '$[1]')
+            """, (json.dumps(refs, ensure_ascii=False),))
+            names = [column[0] for column in cur.description][1:]
+            rows = sorted(cur.fetchall(), key=lambda row: (row[0], row[2]))
+            return [dict(zip(names, row[1:])) for row in rows]
+        finally:
+            con.close()
+    
+    def counts(self) -> Dict[str, int]:
+        """各密钥库的记录数"""
+        con = self.connect()
+        try:
+            counts = dict(con.execute("SELECT source, COUNT(*) FROM all_keys GROUP BY source"))
+        finally:
+            con.close()
+        return {label: counts.get(label, 0) for label in self.labels}
+    
+    def explain(self, sql: str, params: list = ()) -> List[str]:
+        """查询计划（用于确认条件已下推到各库的索引）"""
+        con = self.connect()
+        try:
+            return [row[3] for row in con.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        finally:
+            con.close()
+
+def group_by_vault(federation: Optional[VaultFederation], iids: Iterable[str],
+                   default_db: str = vault_db.DB_FILE) -> Dict[str, List[int]]:
+    """把记录标识按所在的密钥库分组：文件 -> ID 列表（未联合时标识即 ID）"""
+    groups: Dict[str, List[int]] = {}
+    for iid in iids:
+        db_file, key_id = federation.split(iid) if federation else (default_db, int(iid))
+        groups.setdefault(db_file, []).append(key_id)
+    return groups
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="多密钥库联合查询")
+    parser.add_argument("vaults", nargs="+", help="密钥库文件（第一个为主库）")
+    parser.add_argument("--search", help="跨库搜索（空格分隔的多个词需全部匹配）")
+    parser.add_argument("--vendor", help="按厂商查找")
+    parser.add_argument("--model", help="按模型查找")
+    parser.add_argument("--alias", help="按别名查找")
+    parser.add_argument("--explain", action="store_true", help="同时输出查询计划")
+    args = parser.parse_args()
+    
+    federation = VaultFederation(args.vaults)
+    federation.prepare()
+    if args.search is not None or args.vendor or args.model or args.alias:
+        if args.search is not None:
+            sql, params = federation.search_sql(args.search)
+            results = federation.search(args.search)
+        else:
+            sql, params = federation.find_sql(args.vendor, args.model, args.alias)
+            results = federation.find(args.vendor, args.model, args.alias)
+        for item in results:
+            print(f"{item['source']}:{item['id']}\t{item['vendor']}\t{item['model'] or ''}\t"
+                  f"{item['alias'] or ''}\t{item['api_url'] or ''}")
+        print(f"共 {len(results)} 条")
+        if args.explain:
+            print("\n".join(federation.explain(sql, params)))
+    else:
+        for label, count in federation.counts().items():
+            print(f"{label}\t{count} 条\t{federation.db_file(label)}")
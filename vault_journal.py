@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+密钥变更日志模块
+读取 key_journal（由 vault_db 的触发器在每次修改时追加）：查看单个密钥的历史、重建任意时间点的状态，
+以及把密钥回滚到某个时间点（日志中的密钥已脱敏，被删除或更换的密钥需从备份快照中找回）
+"""
+
+import json
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import vault_db
+
+# 回滚时写回的字段（日志中的 api_key 已脱敏，不能写回）
+RESTORABLE_FIELDS = tuple(field for field in vault_db.JOURNAL_FIELDS if field != "api_key")
+
+# 操作的显示文本
+OP_DISPLAY = {"insert": "新增", "update": "修改", "delete": "删除"}
+
+class JournalEntry(NamedTuple):
+    """一条变更记录"""
+    seq: int
+    key_id: int
+    op: str
+    changed_at: float
+    actor: Optional[str]
+    old: Optional[Dict[str, str]]
+    new: Optional[Dict[str, str]]
+    
+    def changes(self) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """发生变化的字段：字段 -> (旧值, 新值)"""
+        old, new = self.old or {}, self.new or {}
+        return {field: (old.get(field), new.get(field)) for field in vault_db.JOURNAL_FIELDS + ("fingerprint",)
+                if old.get(field) != new.get(field)}
+
+def parse_time(text: str) -> float:
+    """解析时间点：时间戳或 YYYY-MM-DD[ HH:MM[:SS]]（本地时间）"""
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return time.mktime(time.strptime(text.strip(), fmt))
+        except ValueError:
+            continue
+    raise ValueError(f"无法识别的时间: {text}")
+
+def row_to_entry(row) -> JournalEntry:
+    seq, key_id, op, changed_at, actor, old_values, new_values = row
+    return JournalEntry(seq, key_id, op, changed_at, actor,
+                        json.loads(old_values) if old_values else None,
+                        json.loads(new_values) if new_values else None)
+
+class VaultJournal:
+    """变更日志查询与回放"""
+    
+    def __init__(self, db_file: str = vault_db.DB_FILE):
+        self.db_file = db_file
+    
+    def history(self, key_id: int, limit: int = None) -> List[JournalEntry]:
+        """单个密钥的变更历史（最新的在前，按 (key_id, seq) 索引读取）"""
+        con = vault_db.connect(self.db_file)
+        try:
+            sql = """
+                SELECT seq, key_id, op, changed_at, actor, old_values, new_values
+                FROM key_journal WHERE key_id = ? ORDER BY seq DESC
+            """
+            params = [key_id]
+            if limit:
+                sql += " LIMIT ?"
+                params.append(limit)
+            return [row_to_entry(row) for row in con.execute(sql, params)]
+        finally:
+            con.close()
+    
+    def state_at(self, timestamp: float, key_ids: Iterable[int] = None) -> Dict[int, Dict[str, str]]:
+        """按顺序回放截至 timestamp 的日志，返回当时存在的记录：ID -> 字段（密钥为脱敏形式）"""
+        con = vault_db.connect(self.db_file)
+        try:
+            sql = """
+                SELECT seq, key_id, op, changed_at, actor, old_values, new_values
+                FROM key_journal WHERE changed_at <= ?
+            """
+            params = [timestamp]
+            if key_ids is not None:
+                sql += " AND key_id IN (SELECT value FROM json_each(?))"
+                params.append(vault_db.id_list(key_ids))
+            state: Dict[int, Dict[str, str]] = {}
+            for row in con.execute(sql + " ORDER BY seq", params):
+                entry = row_to_entry(row)
+                if entry.op == "delete":
+                    state.pop(entry.key_id, None)
+                else:
+                    state[entry.key_id] = entry.new
+            return state
+        finally:
+            con.close()
+    
+    def rollback(self, timestamp: float, key_ids: Iterable[int] = None,
+                 dry_run: bool = False) -> Tuple[List[int], List[int], List[int]]:
+        """
+        把密钥的非密钥字段恢复到 timestamp 时的状态，并删除之后新增的记录（一个事务，回滚本身也会记入日志）。
+        返回 (修改的ID, 删除的ID, 无法恢复的ID)：日志中的密钥已脱敏，之后被删除或更换了密钥的记录
+        无法从日志恢复（可从备份快照中找回）
+        """
+        key_ids = None if key_ids is None else list(key_ids)
+        past = self.state_at(timestamp, key_ids)
+        con = vault_db.connect(self.db_file)
+        try:
+            current = {row["id"]: row for row in vault_db.get_keys(con, key_ids)}
+            aliases = dict(con.execute("SELECT id, alias FROM api_keys"))
+            salt = vault_db.vault_salt(con)
+            if key_ids is None:
+                # 回滚全部时，时间点之后新增的记录也要删除
+                touched = {row[0] for row in con.execute(
+                    "SELECT DISTINCT key_id FROM key_journal WHERE changed_at > ?", (timestamp,))}
+            else:
+                touched = set(key_ids)
+            
+            updates, deleted, unrecoverable = {}, [], []
+            for key_id in sorted(touched | set(past)):
+                before, now = past.get(key_id), current.get(key_id)
+                if before is None:
+                    if now is not None:
+                        deleted.append(key_id)
+                    continue
+                if now is None:
+                    unrecoverable.append(key_id)
+                    continue
+                if before.get("fingerprint") != vault_db.key_fingerprint(salt, now["api_key"] or ""):
+                    # 之后更换了密钥：旧的厂商、地址不能配到新密钥上，整条记录保持不变
+                    unrecoverable.append(key_id)
+                    continue
+                now = dict(now, alias=aliases.get(key_id))
+                fields = {f: before.get(f) for f in RESTORABLE_FIELDS if before.get(f) != now.get(f)}
+                if fields:
+                    updates[key_id] = fields
+            
+            if not dry_run and (updates or deleted):
+                actor = f"{vault_db.default_actor()}（回滚）"
+                with vault_db.actor_scope(con, actor):
+                    for key_id, fields in updates.items():
+                        con.execute(f"UPDATE api_keys SET {', '.join(f'{c} = ?' for c in fields)} WHERE id = ?",
+                                    list(fields.values()) + [key_id])
+                vault_db.delete_keys(con, deleted, actor=actor)  # 同时提交整个回滚
+            return sorted(updates), deleted, unrecoverable
+        except Exception:
+            con.rollback()
+            raise
+        finally:
+            con.close()
+
+def format_entry(entry: JournalEntry) -> str:
+    """一行文本描述"""
+    when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry.changed_at))
+    changes = "，".join(f"{field}: {old!r} → {new!r}" for field, (old, new) in entry.changes().items()
+                       if field != "fingerprint")
+    return f"#{entry.seq} {when} {OP_DISPLAY.get(entry.op, entry.op)} 密钥#{entry.key_id} [{entry.actor or '未知'}] {changes}"
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="密钥变更日志：查看历史、重建时间点状态、回滚")
+    parser.add_argument("--db", default=vault_db.DB_FILE, help="数据库文件")
+    parser.add_argument("--history", type=int, metavar="ID", help="查看某个密钥的变更历史")
+    parser.add_argument("--at", metavar="TIME", help="显示该时间点的全部记录（YYYY-MM-DD HH:MM[:SS] 或时间戳）")
+    parser.add_argument("--rollback", metavar="TIME", help="把密钥恢复到该时间点")
+    parser.add_argument("--ids", help="只处理这些密钥（逗号分隔）")
+    parser.add_argument("--dry-run", action="store_true", help="回滚时只显示将要进行的修改")
+    args = parser.parse_args()
+    
+    con = vault_db.connect(args.db)
+    vault_db.init_schema(con)
+    con.close()
+    journal = VaultJournal(args.db)
+    ids = [int(i) for i in args.ids.split(",")] if args.ids else None
+    
+    if args.history is not None:
+        for item in journal.history(args.history):
+            print(format_entry(item))
+    elif args.at:
+        for key_id, values in sorted(journal.state_at(parse_time(args.at), ids).items()):
+            print(f"#{key_id} {values.get('vendor')} {values.get('api_key')} {values.get('model') or ''} "
+                  f"{values.get('api_url') or ''} {values.get('notes') or ''}")
+    elif args.rollback:
+        updated, deleted, unrecoverable = journal.rollback(parse_time(args.rollback), ids, args.dry_run)
+        prefix = "将" if args.dry_run else "已"
+        print(f"{prefix}修改 {len(updated)} 条，{prefix}删除 {len(deleted)} 条")
+        if unrecoverable:
+            print(f"⚠ 之后被删除或更换了密钥、无法从日志恢复: {', '.join(f'#{i}' for i in unrecoverable)}"
+                  f"（可从备份快照中找回）")
+    else:
+        parser.print_help()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+密钥库存储维护模块
+启用增量自动回收（auto_vacuum=INCREMENTAL）后，删除和导入产生的空闲页分小步归还给文件系统，每步只短暂持有写锁；
+已有数据库转换为增量模式需要整体 VACUUM 一次，只在命令行指定 --convert 或界面中确认后进行，自动维护从不转换；
+定期更新查询规划器的统计信息（ANALYZE / PRAGMA optimize），并在只读连接上做快速完整性检查。
+上次维护的时间和检查结果记录在 vault_meta 中，各项只在到期时运行
+"""
+
+import os
+import sqlite3
+import time
+from typing import Callable, NamedTuple, Optional, Tuple
+
+import vault_db
+
+# 每步回收的页数和步间休眠（秒）：每步是一个很短的写事务，步间其他连接可以读写
+VACUUM_PAGES_PER_STEP = 256
+VACUUM_STEP_SLEEP = 0.01
+
+# 每次自动维护回收空闲页的时间上限（秒），剩余的留到下次空闲时
+VACUUM_TIME_BUDGET = 2.0
+
+# 空闲页少于该数量时不回收
+VACUUM_MIN_FREE_PAGES = 64
+
+# 统计信息更新和完整性检查的周期（秒）
+OPTIMIZE_INTERVAL_SECONDS = 24 * 60 * 60
+QUICK_CHECK_INTERVAL_SECONDS = 24 * 60 * 60
+
+# ANALYZE 每个索引最多采样的行数（PRAGMA analysis_limit），大表也只需很短时间
+ANALYSIS_LIMIT = 1000
+
+# 完整性检查最多报告的错误数
+QUICK_CHECK_MAX_ERRORS = 10
+
+# vault_meta 中的维护记录
+META_OPTIMIZED_AT = "maintenance_optimized_at"
+META_CHECKED_AT = "maintenance_checked_at"
+META_CHECK_RESULT = "maintenance_check_result"
+
+AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+class StorageStats(NamedTuple):
+    """存储状态"""
+    file_size: int
+    page_size: int
+    page_count: int
+    free_pages: int
+    auto_vacuum: str
+    fragmentation: Optional[float]  # 未连续存放的页面比例（dbstat 不可用时为 None）
+    optimized_at: Optional[float]
+    checked_at: Optional[float]
+    check_result: str
+    
+    @property
+    def free_ratio(self) -> float:
+        return self.free_pages / self.page_count if self.page_count else 0.0
+    
+    def describe(self) -> str:
+        def when(stamp):
+            return time.strftime("%Y-%m-%d %H:%M", time.localtime(stamp)) if stamp else "从未"
+        fragmentation = "未知" if self.fragmentation is None else f"{self.fragmentation:.1%}"
+        return "\n".join([
+            f"文件大小: {self.file_size / 1024 / 1024:.2f} MB（{self.page_count} 页 × {self.page_size} 字节）",
+            f"空闲页: {self.free_pages}（{self.free_ratio:.1%}，{self.free_pages * self.page_size / 1024:.0f} KB）",
+            f"碎片率: {fragmentation}",
+            f"自动回收: {self.auto_vacuum}",
+            f"统计信息更新: {when(self.optimized_at)}",
+            f"完整性检查: {when(self.checked_at)}" + (f"（{self.check_result}）" if self.check_result else "")
+        ])
+
+class MaintenanceResult(NamedTuple):
+    """一次维护做了什么"""
+    converted: bool  # 本次转换为增量回收模式（整体 VACUUM 一次）
+    reclaimed_pages: int
+    reclaimed_bytes: int
+    optimized: bool
+    check: Optional[Tuple[bool, str]]  # 未检查时为 None
+    
+    def describe(self) -> str:
+        parts = []
+        if self.converted:
+            parts.append("已启用增量回收")
+        if self.reclaimed_pages:
+            parts.append(f"回收 {self.reclaimed_pages} 页（{self.reclaimed_bytes / 1024:.0f} KB）")
+        if self.optimized:
+            parts.append("已更新统计信息")
+        if self.check is not None:
+            parts.append("完整性检查通过" if self.check[0] else f"完整性检查失败: {self.check[1]}")
+        return "，".join(parts)
+
+def fragmentation(con: sqlite3.Connection) -> Optional[float]:
+    """各表和索引按顺序遍历时页号不连续的比例（需要 dbstat 虚拟表）"""
+    try:
+        rows = con.execute("SELECT name, pageno FROM dbstat")
+    except sqlite3.OperationalError:
+        return None
+    total = scattered = 0
+    previous = {}
+    for name, pageno in rows:
+        total += 1
+        last = previous.get(name)
+        if last is not None and pageno != last + 1:
+            scattered += 1
+        previous[name] = pageno
+    return scattered / total if total else 0.0
+
+class VaultMaintenance:
+    """存储维护"""
+    
+    def __init__(self, db_file: str = vault_db.DB_FILE, pages: int = VACUUM_PAGES_PER_STEP,
+                 sleep: float = VACUUM_STEP_SLEEP):
+        self.db_file = db_file
+        self.pages = pages
+        self.sleep = sleep
+    
+    def connect(self) -> sqlite3.Connection:
+        con = vault_db.connect(self.db_file)
+        con.execute("CREATE TABLE IF NOT EXISTS vault_meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        con.commit()
+        return con
+    
+    # ---------- 维护记录 ----------
+    
+    @staticmethod
+    def meta(con: sqlite3.Connection, name: str) -> Optional[str]:
+        row = con.execute("SELECT value FROM vault_meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+    
+    @staticmethod
+    def set_meta(con: sqlite3.Connection, name: str, value):
+        con.execute("INSERT OR REPLACE INTO vault_meta (name, value) VALUES (?, ?)", (name, str(value)))
+        con.commit()
+    
+    def stamp(self, con: sqlite3.Connection, name: str) -> Optional[float]:
+        value = self.meta(con, name)
+        return float(value) if value else None
+    
+    def due(self, con: sqlite3.Connection, name: str, interval: float) -> bool:
+        stamp = self.stamp(con, name)
+        return stamp is None or time.time() - stamp >= interval
+    
+    # ---------- 空闲页回收 ----------
+    
+    @staticmethod
+    def auto_vacuum(con: sqlite3.Connection) -> str:
+        return AUTO_VACUUM_MODES.get(con.execute("PRAGMA auto_vacuum").fetchone()[0], "none")
+    
+    def enable_incremental(self, con: sqlite3.Connection) -> bool:
+        """
+        转换为增量回收模式。已有数据库需要整体 VACUUM 一次（重写文件，期间其他连接的写入会等待），
+        之后的回收都是小步进行；已是增量模式时直接返回 False
+        """
+        if self.auto_vacuum(con) == "incremental":
+            return False
+        con.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        con.execute("VACUUM")
+        return True
+    
+    def reclaim(self, con: sqlite3.Connection, budget: float = None,
+                progress: Callable[[int, int], None] = None) -> int:
+        """分步回收空闲页（需已是增量模式），超过时间预算时停止；返回回收的页数"""
+        if self.auto_vacuum(con) != "incremental":
+            return 0
+        free = start = con.execute("PRAGMA freelist_count").fetchone()[0]
+        deadline = None if budget is None else time.monotonic() + budget
+        while free > 0:
+            # incremental_vacuum 每执行一步释放一页，execute() 只执行一步，executescript() 才会执行到底
+            con.executescript(f"PRAGMA incremental_vacuum({int(self.pages)});")
+            free = con.execute("PRAGMA freelist_count").fetchone()[0]
+            if progress:
+                progress(start - free, start)
+            if free <= 0 or (deadline is not None and time.monotonic() >= deadline):
+                break
+            time.sleep(self.sleep)
+        return start - free
+    
+    def convert(self) -> bool:
+        """转换为增量回收模式（整体 VACUUM，由用户确认后调用）；已是增量模式时返回 False"""
+        con = self.connect()
+        try:
+            return self.enable_incremental(con)
+        finally:
+            con.close()
+    
+    # ---------- 统计信息与完整性检查 ----------
+    
+    def optimize(self, con: sqlite3.Connection):
+        """更新查询规划器的统计信息：首次完整 ANALYZE，之后由 PRAGMA optimize 只分析需要的表"""
+        con.execute(f"PRAGMA analysis_limit = {int(ANALYSIS_LIMIT)}")
+        analyzed = con.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+        con.execute("PRAGMA optimize" if analyzed else "ANALYZE")
+        con.commit()
+        self.set_meta(con, META_OPTIMIZED_AT, time.time())
+    
+    def quick_check(self) -> Tuple[bool, str]:
+        """在只读连接上运行 PRAGMA quick_check（不校验索引内容，比 integrity_check 快得多）"""
+        try:
+            con = sqlite3.connect(f"file:{os.path.abspath(self.db_file)}?mode=ro", uri=True)
+        except sqlite3.Error as e:
+            return False, str(e)
+        try:
+            result = [row[0] for row in con.execute(f"PRAGMA quick_check({QUICK_CHECK_MAX_ERRORS})")]
+        except sqlite3.Error as e:
+            return False, str(e)
+        finally:
+            con.close()
+        return (True, "ok") if result == ["ok"] else (False, "; ".join(result[:5]))
+    
+    def record_check(self, con: sqlite3.Connection, ok: bool, message: str):
+        self.set_meta(con, META_CHECKED_AT, time.time())
+        self.set_meta(con, META_CHECK_RESULT, "通过" if ok else f"失败: {message}")
+    
+    # ---------- 汇总 ----------
+    
+    def stats(self, with_fragmentation: bool = True) -> StorageStats:
+        con = self.connect()
+        try:
+            return StorageStats(
+                file_size=os.path.getsize(self.db_file),
+                page_size=con.execute("PRAGMA page_size").fetchone()[0],
+                page_count=con.execute("PRAGMA page_count").fetchone()[0],
+                free_pages=con.execute("PRAGMA freelist_count").fetchone()[0],
+                auto_vacuum=self.auto_vacuum(con),
+                fragmentation=fragmentation(con) if with_fragmentation else None,
+                optimized_at=self.stamp(con, META_OPTIMIZED_AT),
+                checked_at=self.stamp(con, META_CHECKED_AT),
+                check_result=self.meta(con, META_CHECK_RESULT) or ""
+            )
+        finally:
+            con.close()
+    
+    def run(self, force: bool = False, budget: Optional[float] = VACUUM_TIME_BUDGET,
+            convert: bool = False) -> MaintenanceResult:
+        """
+        运行到期的维护项：快速完整性检查、回收空闲页（不超过时间预算）、更新统计信息。
+        force 时忽略周期，回收全部空闲页；convert 时先转换为增量回收模式（整体 VACUUM，大文件可能需要较长时间），
+        否则非增量模式的数据库不回收空闲页；检查未通过时不再做任何写入
+        """
+        con = self.connect()
+        try:
+            check = None
+            if force or self.due(con, META_CHECKED_AT, QUICK_CHECK_INTERVAL_SECONDS):
+                check = self.quick_check()
+                self.record_check(con, *check)
+                if not check[0]:
+                    return MaintenanceResult(False, 0, 0, False, check)
+            converted = convert and self.enable_incremental(con)
+            page_size = con.execute("PRAGMA page_size").fetchone()[0]
+            reclaimed = 0
+            if force or con.execute("PRAGMA freelist_count").fetchone()[0] >= VACUUM_MIN_FREE_PAGES:
+                reclaimed = self.reclaim(con, None if force else budget)
+            optimized = force or self.due(con, META_OPTIMIZED_AT, OPTIMIZE_INTERVAL_SECONDS)
+            if optimized:
+                self.optimize(con)
+            return MaintenanceResult(converted, reclaimed, reclaimed * page_size, optimized, check)
+        finally:
+            con.close()
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="密钥库存储维护")
+    parser.add_argument("--db", default=vault_db.DB_FILE, help="数据库文件")
+    parser.add_argument("--run", action="store_true", help="运行到期的维护项（供计划任务调用）")
+    parser.add_argument("--force", action="store_true", help="立即运行全部维护项并回收全部空闲页")
+    parser.add_argument("--check", action="store_true", help="只做快速完整性检查")
+    parser.add_argument("--convert", action="store_true",
+                        help="转换为增量回收模式（整体 VACUUM 一次，期间其他程序的写入会等待）")
+    args = parser.parse_args()
+    
+    maintenance = VaultMaintenance(args.db)
+    if args.check:
+        ok, message = maintenance.quick_check()
+        print(("✅ " if ok else "❌ ") + message)
+    elif args.run or args.force or args.convert:
+        started = time.perf_counter()
+        result = maintenance.run(force=args.force, convert=args.convert)
+        print(f"{result.describe() or '没有到期的维护项'}（用时 {time.perf_counter() - started:.2f} 秒）")
+    print(maintenance.stats().describe())
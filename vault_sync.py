@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+多机同步模块
+按变更日志导出自上次同步以来修改过的记录和删除墓碑，生成压缩的变更包；应用其他机器的变更包时
+按版本（修改时间，相同时比较机器ID）保留较新的一方，各机器交换变更包后得到相同的结果。
+变更包的大小和应用耗时只取决于变更数量，与密钥库大小无关
+"""
+
+import gzip
+import json
+import os
+import platform
+import tempfile
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import vault_db
+
+# 变更包格式标识和版本
+BUNDLE_FORMAT = "apimanager-changeset"
+BUNDLE_VERSION = 1
+
+# 同步的字段（各机器的健康检查结果、测速和备用地址不同步）
+SYNC_FIELDS = vault_db.JOURNAL_FIELDS
+
+# 变更包中每条记录的列顺序
+RECORD_COLUMNS = ("uid", "updated_at", "origin") + SYNC_FIELDS
+
+class ApplyResult(NamedTuple):
+    """应用变更包的结果"""
+    inserted: int
+    updated: int
+    deleted: int
+    skipped: int    # 本机版本较新，或与本机重复的密钥以本机为准
+    unchanged: int
+    gap: bool       # 与上次从该机器应用的变更包之间可能缺少变更包
+
+def sync_actor(node: str) -> str:
+    """应用某台机器的变更包时记录在变更日志中的操作者"""
+    return f"sync:{node}"
+
+def write_bundle(path: str, bundle: Dict):
+    """原子地写入 gzip 压缩的变更包"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+            f.write(json.dumps(bundle, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def read_bundle(path: str) -> Dict:
+    """读取并检查变更包"""
+    with gzip.open(path, "rb") as f:
+        bundle = json.loads(f.read().decode("utf-8"))
+    if not isinstance(bundle, dict) or bundle.get("format") != BUNDLE_FORMAT:
+        raise ValueError("不是有效的变更包")
+    if bundle.get("version") != BUNDLE_VERSION:
+        raise ValueError(f"不支持的变更包版本: {bundle.get('version')}")
+    if bundle.get("columns") != list(RECORD_COLUMNS):
+        raise ValueError("变更包的字段与当前版本不一致")
+    return bundle
+
+class VaultSync:
+    """变更包的导出和应用"""
+    
+    def __init__(self, db_file: str = vault_db.DB_FILE):
+        self.db_file = db_file
+    
+    def connect(self):
+        con = vault_db.connect(self.db_file)
+        vault_db.init_schema(con)
+        return con
+    
+    def resolve_peer(self, con, peer: str) -> str:
+        """按机器ID或名称查找已知的机器，未知时以给定名称新建"""
+        row = con.execute("SELECT peer FROM sync_peers WHERE peer = ? OR name = ? ORDER BY peer = ? DESC LIMIT 1",
+                          (peer, peer, peer)).fetchone()
+        if row:
+            return row[0]
+        con.execute("INSERT INTO sync_peers (peer, name) VALUES (?, ?)", (peer, peer))
+        return peer
+    
+    def export_bundle(self, path: str, peer: str) -> Tuple[int, int]:
+        """
+        导出自上次发给该机器以来的变更（首次导出时为全部记录），返回 (记录数, 墓碑数)。
+        版本来自该机器本身（origin 为其机器ID）的记录和墓碑不再发回：机器ID取自之前应用的变更包头，
+        与输入的名称无关，经其他机器转发回来的修改同样会被过滤
+        """
+        con = self.connect()
+        try:
+            peer = self.resolve_peer(con, peer)
+            since = con.execute("SELECT exported_seq FROM sync_peers WHERE peer = ?", (peer,)).fetchone()[0]
+            until = con.execute("SELECT COALESCE(MAX(seq), 0) FROM key_journal").fetchone()[0]
+            # 每个变更过的记录取最近一条日志，按 seq 主键范围扫描
+            upserts = con.execute(f"""
+                SELECT {', '.join(f'k.{c}' for c in RECORD_COLUMNS)}
+                FROM key_journal j JOIN api_keys k ON k.id = j.key_id
+                WHERE j.seq IN (SELECT MAX(seq) FROM key_journal WHERE seq > ? AND seq <= ? GROUP BY key_id)
+                  AND j.op != 'delete'
+                  AND k.origin IS NOT ?
+                  AND k.uid IS NOT NULL
+                ORDER BY k.id
+            """, (since, until, peer)).fetchall()
+            tombstones = con.execute("""
+                SELECT t.uid, t.deleted_at, t.origin
+                FROM key_journal j JOIN sync_tombstones t ON t.uid = json_extract(j.old_values, '$.uid')
+                WHERE j.seq > ? AND j.seq <= ? AND j.op = 'delete' AND t.origin != ?
+                GROUP BY t.uid
+            """, (since, until, peer)).fetchall()
+            
+            bundle = {
+                "format": BUNDLE_FORMAT,
+                "version": BUNDLE_VERSION,
+                "source": vault_db.node_id(con),
+                "source_name": platform.node() or "",
+                "from_seq": since,
+                "to_seq": until,
+                "created_at": time.time(),
+                "columns": list(RECORD_COLUMNS),
+                "upserts": [list(row) for row in upserts],
+                "tombstones": [list(row) for row in tombstones]
+            }
+            write_bundle(path, bundle)
+            con.execute("UPDATE sync_peers SET exported_seq = ?, exported_at = ? WHERE peer = ?",
+                        (until, time.time(), peer))
+            con.commit()
+            return len(upserts), len(tombstones)
+        finally:
+            con.close()
+    
+    def apply_bundle(self, path: str) -> ApplyResult:
+        """在一个事务中应用变更包：按 uid 逐条比较版本，较新的一方生效"""
+        bundle = read_bundle(path)
+        source = bundle["source"]
+        con = self.connect()
+        try:
+            if source == vault_db.node_id(con):
+                raise ValueError("这是本机导出的变更包")
+            salt = vault_db.vault_salt(con)
+            vault_db.stamp_actor(con, sync_actor(source))
+            inserted = updated = skipped = unchanged = 0
+            doomed: List[int] = []
+            
+            # 一次查询取出变更包涉及的本机记录、墓碑和相同密钥的记录，逐条比较时不再查库
+            records = [dict(zip(RECORD_COLUMNS, values)) for values in bundle["upserts"]]
+            fingerprints = [vault_db.key_fingerprint(salt, record["api_key"] or "") for record in records]
+            uids = json.dumps([record["uid"] for record in records] + [t[0] for t in bundle["tombstones"]])
+            local = {row[0]: row[1:] for row in con.execute(
+                "SELECT uid, id, updated_at, origin FROM api_keys WHERE uid IN (SELECT value FROM json_each(?))", (uids,))}
+            tombstones = {row[0]: row[1:] for row in con.execute(
+                "SELECT uid, deleted_at, origin FROM sync_tombstones WHERE uid IN (SELECT value FROM json_each(?))",
+                (uids,))}
+            # 可能与本机记录重复的密钥指纹（命中时再查询确认）
+            taken = {row[0] for row in con.execute(
+                "SELECT fingerprint FROM api_keys WHERE fingerprint IN (SELECT value FROM json_each(?))",
+                (json.dumps(fingerprints),))}
+            insert_sql = (f"INSERT INTO api_keys ({', '.join(RECORD_COLUMNS)}, fingerprint) "
+                          f"VALUES ({', '.join('?' for _ in RECORD_COLUMNS)}, ?)")
+            
+            for record, fingerprint in zip(records, fingerprints):
+                version = (record["updated_at"], record["origin"])
+                row = local.get(record["uid"])
+                if row is None:
+                    tombstone = tombstones.get(record["uid"])
+                    if tombstone and tuple(tombstone) >= version:
+                        skipped += 1
+                        continue
+                    duplicate = con.execute("SELECT id, uid, updated_at, origin FROM api_keys WHERE fingerprint = ?",
+                                            (fingerprint,)).fetchone() if fingerprint in taken else None
+                    if duplicate is None:
+                        con.execute(insert_sql, [record[c] for c in RECORD_COLUMNS] + [fingerprint])
+                        if tombstone:
+                            con.execute("DELETE FROM sync_tombstones WHERE uid = ?", (record["uid"],))
+                        taken.add(fingerprint)
+                        inserted += 1
+                        continue
+                    # 两台机器各自添加了同一个密钥：统一使用较小的 uid，再按版本合并
+                    if record["uid"] > duplicate[1]:
+                        skipped += 1
+                        continue
+                    con.execute("UPDATE api_keys SET uid = ? WHERE id = ?", (record["uid"], duplicate[0]))
+                    row = (duplicate[0], duplicate[2], duplicate[3])
+                    if (duplicate[2], duplicate[3]) > version:
+                        vault_db.journal_touch(con, duplicate[0])  # 本机版本较新，下次导出时发回
+                        skipped += 1
+                        continue
+                
+                local_version = (row[1], row[2])
+                if version == local_version:
+                    unchanged += 1
+                elif version < local_version:
+                    skipped += 1
+                elif fingerprint in taken and con.execute("SELECT 1 FROM api_keys WHERE fingerprint = ? AND id != ?",
+                                                          (fingerprint, row[0])).fetchone():
+                    skipped += 1  # 修改后的密钥与本机另一条记录重复
+                else:
+                    columns = ("updated_at", "origin") + SYNC_FIELDS
+                    con.execute(f"""
+                        UPDATE api_keys SET {', '.join(f'{c} = ?' for c in columns)}, fingerprint = ?,
+                            health_status=NULL, health_latency_ms=NULL, health_message=NULL, health_checked_at=NULL
+                        WHERE id = ?
+                    """, [record[c] for c in columns] + [fingerprint, row[0]])
+                    taken.add(fingerprint)
+                    updated += 1
+            
+            for uid, deleted_at, origin in bundle["tombstones"]:
+                row = con.execute("SELECT id, updated_at, origin FROM api_keys WHERE uid = ?", (uid,)).fetchone()
+                if row is not None and (deleted_at, origin) <= (row[1], row[2]):
+                    skipped += 1  # 删除之后本机又修改过，保留
+                    continue
+                # 墓碑只保留最新的版本；记录随后删除时触发器不会覆盖它
+                con.execute("""
+                    INSERT INTO sync_tombstones (uid, deleted_at, origin) VALUES (?, ?, ?)
+                    ON CONFLICT (uid) DO UPDATE SET deleted_at = excluded.deleted_at, origin = excluded.origin
+                    WHERE (excluded.deleted_at, excluded.origin) > (deleted_at, origin)
+                """, (uid, deleted_at, origin))
+                if row is not None:
+                    doomed.append(row[0])
+            
+            previous = con.execute("SELECT imported_seq FROM sync_peers WHERE peer = ?", (source,)).fetchone()
+            gap = previous is not None and bundle["from_seq"] > previous[0]
+            # 之前以名称导出过的机器，改为以机器ID记录
+            name = bundle.get("source_name") or None
+            if previous is None and name:
+                con.execute("UPDATE sync_peers SET peer = ? WHERE peer = ? AND name = ?", (source, name, name))
+            con.execute("""
+                INSERT INTO sync_peers (peer, name, imported_seq, imported_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (peer) DO UPDATE SET name = COALESCE(excluded.name, name),
+                    imported_seq = max(imported_seq, excluded.imported_seq), imported_at = excluded.imported_at
+            """, (source, name, bundle["to_seq"], time.time()))
+            
+            # 清除操作者标记（不随提交留给之后的写入），删除关联数据并提交整个事务
+            vault_db.clear_actor(con)
+            vault_db.delete_keys(con, doomed, actor=sync_actor(source))
+            return ApplyResult(inserted, updated, len(doomed), skipped, unchanged, gap)
+        except Exception:
+            con.rollback()
+            raise
+        finally:
+            con.close()
+    
+    def status(self) -> Tuple[str, List[Tuple]]:
+        """本机ID和已知机器的同步进度"""
+        con = self.connect()
+        try:
+            peers = con.execute("""
+                SELECT peer, name, exported_seq, exported_at, imported_seq, imported_at
+                FROM sync_peers ORDER BY COALESCE(name, peer)
+            """).fetchall()
+            return vault_db.node_id(con), peers
+        finally:
+            con.close()
+
+def run_demo(size: int = 100000, changes: int = 10):
+    """用两个临时密钥库演示：交叉修改后互相应用变更包得到相同结果，变更包大小只取决于变更数量"""
+    directory = tempfile.mkdtemp(prefix="vault_sync_")
+    laptop, desktop = (os.path.join(directory, name) for name in ("laptop.db", "desktop.db"))
+    a, b = VaultSync(laptop), VaultSync(desktop)
+    
+    def exchange(source: VaultSync, target: VaultSync) -> Tuple[int, float, ApplyResult]:
+        bundle = os.path.join(directory, "bundle.gz")
+        source.export_bundle(bundle, target.status()[0])
+        started = time.perf_counter()
+        result = target.apply_bundle(bundle)
+        return os.path.getsize(bundle), (time.perf_counter() - started) * 1000, result
+    
+    def snapshot(vault: VaultSync) -> List[Tuple]:
+        con = vault_db.connect(vault.db_file)
+        try:
+            return con.execute(f"SELECT {', '.join(RECORD_COLUMNS)} FROM api_keys ORDER BY uid").fetchall()
+        finally:
+            con.close()
+    
+    con = a.connect()
+    vault_db.import_keys(con, [{"vendor": "OpenAI", "api_key": f"sk-demo-{i:08d}", "model": "gpt-4o-mini",
+                                "notes": f"#{i}"} for i in range(size)])
+    con.close()
+    size_bytes, elapsed, result = exchange(a, b)
+    print(f"首次同步: {size} 条记录，变更包 {size_bytes / 1024:.0f} KB，应用 {elapsed:.0f} ms（新增 {result.inserted}）")
+    
+    # 两边交叉修改：同一条记录两边都改（后改的生效）、一边删除另一边早先修改、两边各自添加同一个密钥
+    con_a, con_b = vault_db.connect(laptop), vault_db.connect(desktop)
+    vault_db.update_keys(con_b, [1], {"model": "desktop-model"})
+    vault_db.update_keys(con_b, [2], {"model": "edited-before-delete"})
+    time.sleep(0.01)
+    vault_db.update_keys(con_a, [1], {"model": "laptop-model"})
+    vault_db.delete_keys(con_a, [2])
+    vault_db.update_keys(con_a, range(3, 3 + changes), {"api_url": "https://proxy.example.com/v1"})
+    for con in (con_a, con_b):
+        vault_db.insert_key(con, "DeepSeek", "sk-added-on-both", "https://api.deepseek.com/v1")
+        con.commit()
+        con.close()
+    
+    size_bytes, elapsed, result = exchange(a, b)
+    print(f"laptop → desktop: 变更包 {size_bytes} 字节，应用 {elapsed:.1f} ms，{result}")
+    size_bytes, elapsed, result = exchange(b, a)
+    print(f"desktop → laptop: 变更包 {size_bytes} 字节，应用 {elapsed:.1f} ms，{result}")
+    size_bytes, elapsed, result = exchange(a, b)
+    print(f"laptop → desktop: 变更包 {size_bytes} 字节，应用 {elapsed:.1f} ms，{result}")
+    
+    same = snapshot(a) == snapshot(b)
+    con = vault_db.connect(laptop)
+    model = con.execute("SELECT model FROM api_keys WHERE id = 1").fetchone()[0]
+    deleted = con.execute("SELECT COUNT(*) FROM api_keys WHERE id = 2").fetchone()[0] == 0
+    con.close()
+    print(f"{'✅' if same else '❌'} 两个密钥库{'一致' if same else '不一致'}；记录1的模型: {model}；记录2已删除: {deleted}")
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="通过变更包在多台机器之间同步密钥库")
+    parser.add_argument("--db", default=vault_db.DB_FILE, help="数据库文件")
+    parser.add_argument("--export", metavar="FILE", help="导出自上次同步以来的变更")
+    parser.add_argument("--peer", help="导出给哪台机器（机器ID或名称）")
+    parser.add_argument("--apply", metavar="FILE", help="应用其他机器的变更包")
+    parser.add_argument("--status", action="store_true", help="显示本机ID和各机器的同步进度")
+    parser.add_argument("--demo", action="store_true", help="用两个临时密钥库演示同步")
+    args = parser.parse_args()
+    
+    def format_time(value: Optional[float]) -> str:
+        return time.strftime("%Y-%m-%d %H:%M", time.localtime(value)) if value else "从未"
+    
+    sync = VaultSync(args.db)
+    if args.demo:
+        run_demo()
+    elif args.export:
+        if not args.peer:
+            parser.error("--export 需要 --peer")
+        records, tombstones = sync.export_bundle(args.export, args.peer)
+        print(f"🔁 已导出 {records} 条记录、{tombstones} 个删除到 {args.export}（⚠ 变更包包含明文密钥）")
+    elif args.apply:
+        result = sync.apply_bundle(args.apply)
+        print(f"🔁 新增 {result.inserted}，更新 {result.updated}，删除 {result.deleted}，"
+              f"以本机为准 {result.skipped}，无变化 {result.unchanged}")
+        if result.gap:
+            print("⚠ 与上次应用的变更包之间可能缺少变更包，请让对方重新导出")
+    else:
+        node, peers = sync.status()
+        print(f"本机ID: {node}")
+        for peer, name, exported_seq, exported_at, imported_seq, imported_at in peers:
+            print(f"  {name or peer} ({peer}): 上次导出 {format_time(exported_at)}，上次应用 {format_time(imported_at)}")
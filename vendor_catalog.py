@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+厂商目录模块
+从 vendor_models_config.json 加载厂商、预设模型和默认API地址，解析一次后保存为查找表；
+文件修改时间变化时才重新加载，并通知已注册的监听者（如打开中的对话框）
+"""
+
+import json
+import os
+import sys
+import threading
+from typing import Callable, Dict, List
+
+# 厂商目录配置文件（与程序放在同一目录）
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vendor_models_config.json")
+
+class VendorCatalog:
+    """可热加载的厂商目录"""
+    
+    def __init__(self, path: str = CONFIG_FILE):
+        self.path = path
+        # 以下字典在重新加载时原地更新，外部持有的引用始终有效
+        self.vendor_models: Dict[str, List[str]] = {}
+        self.default_api_urls: Dict[str, str] = {}
+        self.model_vendors: Dict[str, List[str]] = {}  # 模型名 -> 提供该模型的厂商
+        self.last_updated = ""
+        self.signature = None
+        self.listeners: List[Callable[["VendorCatalog"], None]] = []
+        self.lock = threading.RLock()
+        self.reload_if_changed()
+    
+    def file_signature(self):
+        """文件的修改时间和大小，用于判断是否需要重新加载"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    def reload_if_changed(self) -> bool:
+        """文件变化时重新加载，返回是否发生了重新加载"""
+        signature = self.file_signature()
+        with self.lock:
+            if signature is None or signature == self.signature:
+                return False
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    config = json.load(f)
+            except (OSError, ValueError) as e:
+                # 文件正在写入或格式错误时保留上一次的目录
+                print(f"厂商目录加载失败，继续使用当前目录: {e}", file=sys.stderr)
+                return False
+            self.signature = signature
+            self.apply(config)
+            listeners = list(self.listeners)
+        
+        for listener in listeners:
+            listener(self)
+        return True
+    
+    def apply(self, config: Dict):
+        """用配置内容更新查找表"""
+        vendor_models = config.get("vendor_models", {})
+        self.vendor_models.clear()
+        self.vendor_models.update({vendor: list(models) for vendor, models in vendor_models.items()})
+        self.default_api_urls.clear()
+        self.default_api_urls.update(config.get("default_api_urls", {}))
+        self.last_updated = config.get("last_updated", "")
+        
+        self.model_vendors.clear()
+        for vendor, models in self.vendor_models.items():
+            for model in models:
+                self.model_vendors.setdefault(model, []).append(vendor)
+    
+    def add_listener(self, listener: Callable[["VendorCatalog"], None]):
+        """注册目录更新回调"""
+        with self.lock:
+            if listener not in self.listeners:
+                self.listeners.append(listener)
+    
+    def remove_listener(self, listener: Callable[["VendorCatalog"], None]):
+        """注销目录更新回调"""
+        with self.lock:
+            if listener in self.listeners:
+                self.listeners.remove(listener)
+    
+    def vendors(self) -> List[str]:
+        """所有厂商名称（按配置文件顺序）"""
+        return list(self.vendor_models)
+    
+    def models_for(self, vendor: str) -> List[str]:
+        """某厂商的预设模型"""
+        return list(self.vendor_models.get(vendor, []))
+    
+    def url_for(self, vendor: str) -> str:
+        """某厂商的默认API地址"""
+        return self.default_api_urls.get(vendor, "")
+
+# 全局厂商目录实例
+vendor_catalog = VendorCatalog()